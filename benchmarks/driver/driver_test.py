@@ -0,0 +1,116 @@
+import pickle
+import random
+
+import pytest
+
+from esrally import metrics, track
+from esrally.driver import driver
+
+CLIENTS = 8
+SAMPLES_PER_CLIENT = 25000
+
+
+def calculate_global_throughput_per_sample(samples, bucket_interval_secs=1):
+    """
+    The previous implementation of ``driver.calculate_global_throughput`` which iterates over all samples. We keep it as a reference.
+    """
+    samples_per_task = {}
+    for sample in samples:
+        k = sample.task
+        if k not in samples_per_task:
+            samples_per_task[k] = []
+        samples_per_task[k].append(sample)
+
+    global_throughput = {}
+    for k, v in samples_per_task.items():
+        task = k
+        if task not in global_throughput:
+            global_throughput[task] = []
+        current_samples = sorted(v, key=lambda s: s.absolute_time)
+
+        total_count = 0
+        interval = 0
+        current_bucket = 0
+        current_sample_type = current_samples[0].sample_type
+        sample_count_for_current_sample_type = 0
+        start_time = current_samples[0].absolute_time - current_samples[0].time_period
+        for sample in current_samples:
+            if current_sample_type < sample.sample_type:
+                current_sample_type = sample.sample_type
+                sample_count_for_current_sample_type = 0
+
+            total_count += sample.total_ops
+            interval = max(sample.absolute_time - start_time, interval)
+
+            if interval > 0 and interval >= current_bucket:
+                sample_count_for_current_sample_type += 1
+                current_bucket = int(interval) + bucket_interval_secs
+                throughput = (total_count / interval)
+                global_throughput[task].append(
+                    (sample.absolute_time, sample.relative_time, current_sample_type, throughput, "%s/s" % sample.total_ops_unit))
+        if interval > 0 and sample_count_for_current_sample_type == 0:
+            throughput = (total_count / interval)
+            global_throughput[task].append(
+                (sample.absolute_time, sample.relative_time, current_sample_type, throughput, "%s/s" % sample.total_ops_unit))
+
+    return global_throughput
+
+
+def create_samples():
+    rnd = random.Random(42)
+    tasks = [track.Task(track.Operation("index-append", "bulk")), track.Task(track.Operation("search", "custom-query"))]
+    start = 1470838595
+    samples = []
+    for task in tasks:
+        for client_id in range(CLIENTS):
+            relative_time = rnd.random()
+            for i in range(SAMPLES_PER_CLIENT):
+                relative_time += rnd.uniform(0.001, 0.02)
+                sample_type = metrics.SampleType.Warmup if i < SAMPLES_PER_CLIENT // 5 else metrics.SampleType.Normal
+                samples.append(driver.Sample(client_id, start + relative_time, relative_time, task, sample_type, None, 10, 9,
+                                             rnd.randint(1, 5000), "docs", rnd.uniform(0.001, 0.02), i / SAMPLES_PER_CLIENT))
+    # samples of all clients arrive interleaved
+    rnd.shuffle(samples)
+    return samples
+
+
+SAMPLES = create_samples()
+
+
+def test_implementations_are_equivalent():
+    for bucket_interval_secs in [1, 5]:
+        expected = calculate_global_throughput_per_sample(SAMPLES, bucket_interval_secs)
+        actual = driver.calculate_global_throughput(SAMPLES, bucket_interval_secs)
+        assert expected == actual
+
+
+def test_implementations_are_equivalent_for_pickled_batches():
+    # the coordinator receives samples in pickled batches so each batch contains its own copy of a task
+    batch_size = 1000
+    samples = []
+    for start in range(0, len(SAMPLES), batch_size):
+        samples.extend(pickle.loads(pickle.dumps(SAMPLES[start:start + batch_size])))
+    for bucket_interval_secs in [1, 5]:
+        expected = calculate_global_throughput_per_sample(samples, bucket_interval_secs)
+        actual = driver.calculate_global_throughput(samples, bucket_interval_secs)
+        assert expected == actual
+
+
+@pytest.mark.benchmark(
+    group="global-throughput",
+    warmup="on",
+    warmup_iterations=3,
+    disable_gc=True
+)
+def test_calculate_global_throughput_per_sample(benchmark):
+    benchmark(calculate_global_throughput_per_sample, SAMPLES)
+
+
+@pytest.mark.benchmark(
+    group="global-throughput",
+    warmup="on",
+    warmup_iterations=3,
+    disable_gc=True
+)
+def test_calculate_global_throughput(benchmark):
+    benchmark(driver.calculate_global_throughput, SAMPLES)
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def run_python(statement):
+    # modules are only imported once per interpreter so we need to measure in a fresh process
+    subprocess.check_call([sys.executable, "-c", statement])
+
+
+@pytest.mark.benchmark(
+    group="startup",
+    warmup="on",
+    warmup_iterations=3,
+    disable_gc=True
+)
+def test_interpreter_startup(benchmark):
+    benchmark(run_python, "pass")
+
+
+@pytest.mark.benchmark(
+    group="startup",
+    warmup="on",
+    warmup_iterations=3,
+    disable_gc=True
+)
+def test_import_rally(benchmark):
+    benchmark(run_python, "import esrally.rally")
+
+
+@pytest.mark.benchmark(
+    group="startup",
+    warmup="on",
+    warmup_iterations=3,
+    disable_gc=True
+)
+def test_import_race_control(benchmark):
+    # this is what a race needs to import in addition
+    benchmark(run_python, "import esrally.rally; import esrally.racecontrol")
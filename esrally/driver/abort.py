@@ -0,0 +1,110 @@
+"""
+Abort conditions allow to stop a benchmark early when its results would be meaningless anyway, e.g. because the cluster has turned red
+and all requests fail. They are defined per task with the following keys:
+
+* ``error-rate``: The maximum error rate (between 0 and 1) within the window.
+* ``latency-p99``: The maximum 99th percentile of latency in milliseconds within the window.
+* ``window``: The number of most recent requests of a task that are considered for ``error-rate`` and ``latency-p99``.
+* ``red-cluster``: If ``true``, abort as soon as the cluster health is red while the task is running.
+"""
+
+import collections
+import logging
+
+from esrally import exceptions, metrics
+
+logger = logging.getLogger("rally.driver")
+
+DEFAULT_WINDOW = 100
+
+
+class AbortPolicy:
+    def __init__(self, max_error_rate=None, max_latency_p99=None, window=DEFAULT_WINDOW, red_cluster=False):
+        """
+        :param max_error_rate: The maximum error rate (between 0 and 1) or ``None`` if the error rate should not be checked.
+        :param max_latency_p99: The maximum 99th percentile of latency in ms or ``None`` if latency should not be checked.
+        :param window: The number of most recent requests that are considered for the error rate and latency.
+        :param red_cluster: ``True`` iff the benchmark should be aborted when the cluster health is red.
+        """
+        self.max_error_rate = max_error_rate
+        self.max_latency_p99 = max_latency_p99
+        self.window = window
+        self.red_cluster = red_cluster
+
+    @property
+    def checks_samples(self):
+        return self.max_error_rate is not None or self.max_latency_p99 is not None
+
+    @property
+    def enabled(self):
+        return self.checks_samples or self.red_cluster
+
+    @staticmethod
+    def from_spec(spec):
+        """
+        :param spec: A dict with abort conditions (see the module documentation for valid keys). May be ``None`` or empty.
+        :return: A corresponding ``AbortPolicy``.
+        """
+        spec = spec if spec else {}
+        unknown = sorted(set(spec.keys()) - {"error-rate", "latency-p99", "window", "red-cluster"})
+        if unknown:
+            raise exceptions.SystemSetupError("Unknown abort conditions %s. Valid conditions are error-rate, latency-p99, window and "
+                                              "red-cluster." % unknown)
+        max_error_rate = spec.get("error-rate")
+        max_latency_p99 = spec.get("latency-p99")
+        window = spec.get("window", DEFAULT_WINDOW)
+        red_cluster = spec.get("red-cluster", False)
+        if max_error_rate is not None and not 0 <= max_error_rate <= 1:
+            raise exceptions.SystemSetupError("The abort condition error-rate must be between 0 and 1 but is [%s]." % str(max_error_rate))
+        if max_latency_p99 is not None and max_latency_p99 <= 0:
+            raise exceptions.SystemSetupError("The abort condition latency-p99 must be positive but is [%s]." % str(max_latency_p99))
+        if not isinstance(window, int) or window < 1:
+            raise exceptions.SystemSetupError("The abort condition window must be a positive integer but is [%s]." % str(window))
+        if not isinstance(red_cluster, bool):
+            raise exceptions.SystemSetupError("The abort condition red-cluster must be true or false but is [%s]." % str(red_cluster))
+        return AbortPolicy(max_error_rate, max_latency_p99, window, red_cluster)
+
+    @staticmethod
+    def for_task(task, defaults):
+        """
+        :param task: A task.
+        :param defaults: A dict with abort conditions that apply to all tasks. Conditions of the task take precedence.
+        :return: The ``AbortPolicy`` for this task.
+        """
+        spec = dict(defaults) if defaults else {}
+        spec.update(task.abort_on)
+        return AbortPolicy.from_spec(spec)
+
+
+class SampleMonitor:
+    """
+    Checks the most recent samples of a task against its abort policy.
+    """
+    def __init__(self, task, policy):
+        self.task = task
+        self.policy = policy
+        # tuples of (success, latency)
+        self.window = collections.deque(maxlen=policy.window)
+
+    def update(self, samples):
+        """
+        :param samples: A list of new samples of this task.
+        :return: The reason why the benchmark should be aborted or ``None`` if all conditions are met.
+        """
+        for sample in samples:
+            success = not sample.request_meta_data or sample.request_meta_data.get("success", True)
+            self.window.append((success, sample.latency_ms))
+        # we only check a full window to avoid aborting on a few initial outliers
+        if len(self.window) < self.policy.window:
+            return None
+        if self.policy.max_error_rate is not None:
+            error_rate = sum(1 for success, _ in self.window if not success) / len(self.window)
+            if error_rate > self.policy.max_error_rate:
+                return "Error rate of task [%s] is [%.2f%%] for the last [%d] requests but at most [%.2f%%] are allowed." % \
+                       (self.task.operation.name, error_rate * 100, len(self.window), self.policy.max_error_rate * 100)
+        if self.policy.max_latency_p99 is not None:
+            latency_p99 = metrics.InMemoryMetricsStore.percentile_value(sorted(latency for _, latency in self.window), 99)
+            if latency_p99 > self.policy.max_latency_p99:
+                return "99th percentile latency of task [%s] is [%.2f ms] for the last [%d] requests but at most [%.2f ms] is allowed." % \
+                       (self.task.operation.name, latency_p99, len(self.window), self.policy.max_latency_p99)
+        return None
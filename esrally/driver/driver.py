@@ -1,15 +1,22 @@
+import bisect
 import concurrent.futures
 import threading
 import datetime
+import itertools
 import json
 import logging
+import operator
+import os
 import queue
+import random
+import shutil
 import socket
+import tempfile
 import time
 
 import thespian.actors
-from esrally import actor, exceptions, metrics, track, client, PROGRAM_NAME
-from esrally.driver import runner, scheduler
+from esrally import actor, config, exceptions, metrics, track, client, paths, PROGRAM_NAME
+from esrally.driver import runner, scheduler, rawsamples, progress, abort
 from esrally.utils import convert, console, versions, io
 
 logger = logging.getLogger("rally.driver")
@@ -118,9 +125,13 @@ class BenchmarkFailure:
 
 class BenchmarkCancelled:
     """
-    Indicates that the benchmark has been cancelled (by the user).
+    Indicates that the benchmark has been cancelled (by the user or because an abort condition has been violated).
     """
-    pass
+    def __init__(self, reason=None):
+        """
+        :param reason: The reason why the benchmark has been aborted. ``None`` if the user has cancelled the benchmark.
+        """
+        self.reason = reason
 
 
 class DriverActor(actor.RallyActor):
@@ -146,8 +157,9 @@ class DriverActor(actor.RallyActor):
             elif isinstance(msg, UpdateSamples):
                 self.update_samples(msg)
             elif isinstance(msg, thespian.actors.WakeupMessage):
-                if not self.coordinator.finished():
+                if not self.coordinator.finished() and not self.coordinator.aborted:
                     self.coordinator.update_progress_message()
+                    self.coordinator.check_cluster_health()
                     self.wakeupAfter(datetime.timedelta(seconds=DriverActor.WAKEUP_INTERVAL_SECONDS))
             elif isinstance(msg, BenchmarkFailure):
                 logger.error("Main driver received a fatal exception from a load generator. Shutting down.")
@@ -204,11 +216,18 @@ class DriverActor(actor.RallyActor):
     def on_benchmark_complete(self, metrics):
         self.send(self.start_sender, BenchmarkComplete(metrics))
 
+    def on_benchmark_aborted(self, reason):
+        self.send(self.start_sender, BenchmarkCancelled(reason))
+
     def update_samples(self, msg):
         self.coordinator.update_samples(msg.samples)
 
 
 class Driver:
+    DEFAULT_TASK_START_DELAY_SECONDS = 1.0
+    CLUSTER_HEALTH_CHECK_INTERVAL_SECONDS = 10
+    CLUSTER_HEALTH_CHECK_TIMEOUT_SECONDS = 2
+
     def __init__(self, target, config):
         """
         Coordinates all workers. It is technology-agnostic, i.e. it does not know anything about actors. To allow us to hook in an actor,
@@ -230,7 +249,17 @@ class Driver:
         self.quiet = False
         self.allocations = None
         self.raw_samples = []
+        self.raw_sample_writer = None
+        self.live_stats = None
+        self.progress_server = None
+        self.lap = None
         self.most_recent_sample_per_client = {}
+        self.es = None
+        self.abort_on = None
+        self.abort_policies = {}
+        self.sample_monitors = {}
+        self.last_cluster_health_check = None
+        self.aborted = False
 
         self.number_of_steps = 0
         self.currently_completed = 0
@@ -238,6 +267,9 @@ class Driver:
         self.current_step = -1
         self.ops_per_join_point = None
         self.complete_current_task_sent = False
+        self.rate_limiter_dir = None
+        self.task_start_delay = self.config.opts("driver", "task.start.delay", mandatory=False,
+                                                 default_value=Driver.DEFAULT_TASK_START_DELAY_SECONDS)
 
     def start_benchmark(self, t, lap, metrics_meta_info):
         self.track = t
@@ -256,13 +288,35 @@ class Driver:
         self.metrics_store = metrics.InMemoryMetricsStore(cfg=self.config, meta_info=metrics_meta_info, lap=lap)
         invocation = self.config.opts("system", "time.start")
         self.metrics_store.open(invocation, track_name, challenge_name, car_name)
+        self.lap = lap
+        if self.config.opts("driver", "raw.samples.export", mandatory=False, default_value=False):
+            raw_samples_path = "%s/raw-samples.bin" % paths.race_root(self.config)
+            logger.info("Writing raw samples to [%s]." % raw_samples_path)
+            self.raw_sample_writer = rawsamples.RawSampleWriter(raw_samples_path).open()
+        progress_endpoint = self.config.opts("driver", "progress.endpoint", mandatory=False)
+        if progress_endpoint:
+            host, port = progress.parse_endpoint(progress_endpoint)
+            self.live_stats = progress.LiveStats(lap=lap)
+            self.progress_server = progress.ProgressServer(self.live_stats, host, port).start()
+        self.abort_on = self.config.opts("driver", "abort.on", mandatory=False, default_value={})
+        # fail early on invalid abort conditions; task-specific conditions have already been validated when loading the track
+        abort.AbortPolicy.from_spec(self.abort_on)
 
         self.prepare_cluster()
 
         allocator = Allocator(self.challenge.schedule)
         self.allocations = allocator.allocations
+        rate_limiter_names = shared_rate_limiter_names(self.allocations)
+        if rate_limiter_names:
+            self.rate_limiter_dir = tempfile.mkdtemp(prefix="rally-rate-limiters-")
+            self.config.add(config.Scope.benchmark, "driver", "rate.limiter.dir", self.rate_limiter_dir)
+            # shared rate limiters coordinate via files so all load generators need to run on this host
+            self.config.add(config.Scope.benchmark, "driver", "rate.limiter.host", socket.gethostname())
+            self.config.add(config.Scope.benchmark, "driver", "rate.limiter.names", rate_limiter_names)
         self.number_of_steps = len(allocator.join_points) - 1
         self.ops_per_join_point = allocator.operations_per_joinpoint
+        if self.live_stats:
+            self.live_stats.start(self.number_of_steps)
 
         logger.info("Benchmark consists of [%d] steps executed by (at most) [%d] clients as specified by the allocation matrix:\n%s" %
                     (self.number_of_steps, len(self.allocations), self.allocations))
@@ -276,6 +330,9 @@ class Driver:
         self.update_progress_message()
 
     def joinpoint_reached(self, client_id, client_local_timestamp, task):
+        if self.aborted:
+            logger.info("Ignoring join point of client [%d] as the benchmark has been aborted." % client_id)
+            return
         self.currently_completed += 1
         self.clients_completed_current_step[client_id] = (client_local_timestamp, time.perf_counter())
         logger.info("[%d/%d] drivers reached join point [%d/%d]." %
@@ -292,11 +349,19 @@ class Driver:
             self.update_progress_message(task_finished=True)
             # clear per step
             self.most_recent_sample_per_client = {}
+            # a later step may run an equal task which must not inherit the window of this step
+            self.sample_monitors = {}
             self.current_step += 1
+            if self.live_stats:
+                self.live_stats.step_completed(self.current_step)
             if self.finished():
                 logger.info("All steps completed.")
+                if self.live_stats:
+                    self.live_stats.finish()
+                self.stop_progress_server()
                 # Don't terminate any actors here; this will be triggered from outside. We shutdown child actors in our shutdown procedure.
                 logger.info("Postprocessing samples...")
+                self.close_raw_sample_writer()
                 self.post_process_samples()
                 # TODO #257: In case we are not on a single machine, spilling to disk will not work. Check and reimplement if necessary.
                 # Spill to disk to guard against a too large representation of metrics store.
@@ -305,6 +370,7 @@ class Driver:
                 self.metrics_store.close()
                 # immediately clear as we don't need it anymore and it can consume a significant amount of memory
                 del self.metrics_store
+                self.remove_rate_limiters()
                 logger.info("Sending benchmark results...")
                 self.target.on_benchmark_complete(m)
             else:
@@ -312,11 +378,11 @@ class Driver:
                     # don't wait if test mode is enabled and start the next task immediately.
                     start_next_task = time.perf_counter()
                 else:
-                    # start the next task in five seconds (relative to master's timestamp)
+                    # start the next task after the configured delay (relative to master's timestamp) so all clients start together
                     #
                     # Assumption: We don't have a lot of clock skew between reaching the join point and sending the next task
                     #             (it doesn't matter too much if we're a few ms off).
-                    start_next_task = time.perf_counter() + 5.0
+                    start_next_task = time.perf_counter() + self.task_start_delay
                 for client_id, driver in enumerate(self.drivers):
                     client_ended_task_at, master_received_msg_at = clients_curr_step[client_id]
                     client_start_timestamp = client_ended_task_at + (start_next_task - master_received_msg_at)
@@ -351,21 +417,106 @@ class Driver:
         self.progress_reporter.finish()
         if self.metrics_store:
             self.metrics_store.close()
+        self.close_raw_sample_writer()
+        self.stop_progress_server()
+        self.remove_rate_limiters()
+
+    def close_raw_sample_writer(self):
+        if self.raw_sample_writer:
+            self.raw_sample_writer.close()
+            self.raw_sample_writer = None
+
+    def stop_progress_server(self):
+        if self.progress_server:
+            self.progress_server.stop()
+            self.progress_server = None
+
+    def remove_rate_limiters(self):
+        if self.rate_limiter_dir:
+            shutil.rmtree(self.rate_limiter_dir, ignore_errors=True)
+            self.rate_limiter_dir = None
 
     def prepare_cluster(self):
         expected_cluster_health = self.config.opts("benchmarks", "cluster.health")
-        es = client.EsClientFactory(self.config.opts("client", "hosts"), self.config.opts("client", "options")).create()
+        self.es = client.EsClientFactory(self.config.opts("client", "hosts"), self.config.opts("client", "options")).create()
         for template in self.track.templates:
-            setup_template(es, template)
+            setup_template(self.es, template)
         for index in self.track.indices:
-            setup_index(es, index, self.challenge.index_settings)
-        wait_for_status(es, expected_cluster_health)
+            setup_index(self.es, index, self.challenge.index_settings)
+        wait_for_status(self.es, expected_cluster_health)
 
     def update_samples(self, samples):
         self.raw_samples += samples
+        if self.raw_sample_writer:
+            # stream samples to disk as they arrive so they are available even if the benchmark is interrupted
+            self.raw_sample_writer.write(samples, self.lap)
+        if self.live_stats:
+            self.live_stats.add(samples)
         if len(samples) > 0:
             most_recent = samples[-1]
             self.most_recent_sample_per_client[most_recent.client_id] = most_recent
+        self.check_samples(samples)
+
+    def abort_policy_key(self, task):
+        # equality of tasks does not consider their abort conditions
+        return task, frozenset(task.abort_on.items())
+
+    def abort_policy(self, task):
+        key = self.abort_policy_key(task)
+        if key not in self.abort_policies:
+            self.abort_policies[key] = abort.AbortPolicy.for_task(task, self.abort_on)
+        return self.abort_policies[key]
+
+    def sample_monitor(self, task):
+        key = self.abort_policy_key(task)
+        if key not in self.sample_monitors:
+            policy = self.abort_policy(task)
+            self.sample_monitors[key] = abort.SampleMonitor(task, policy) if policy.checks_samples else None
+        return self.sample_monitors[key]
+
+    def check_samples(self, samples):
+        if self.aborted:
+            return
+        samples_per_task = {}
+        for sample in samples:
+            k = self.abort_policy_key(sample.task)
+            if k not in samples_per_task:
+                samples_per_task[k] = (sample.task, [])
+            samples_per_task[k][1].append(sample)
+        for task, task_samples in samples_per_task.values():
+            monitor = self.sample_monitor(task)
+            if monitor:
+                reason = monitor.update(task_samples)
+                if reason:
+                    self.abort(reason)
+                    return
+
+    def check_cluster_health(self):
+        if self.aborted or self.es is None:
+            return
+        now = time.perf_counter()
+        if self.last_cluster_health_check is not None and \
+                now - self.last_cluster_health_check < Driver.CLUSTER_HEALTH_CHECK_INTERVAL_SECONDS:
+            return
+        # only check while a task is running that needs it
+        tasks = [s.task for s in self.most_recent_sample_per_client.values() if self.abort_policy(s.task).red_cluster]
+        if not tasks:
+            return
+        self.last_cluster_health_check = now
+        try:
+            # we are called on the actor thread so we must not block it for long
+            status = self.es.cluster.health(request_timeout=Driver.CLUSTER_HEALTH_CHECK_TIMEOUT_SECONDS)["status"]
+        except BaseException:
+            logger.exception("Could not check cluster health. Not aborting the benchmark.")
+            return
+        if status == "red":
+            self.abort("Cluster health is [red] while running task [%s]." % tasks[0].operation.name)
+
+    def abort(self, reason):
+        logger.error("Aborting benchmark: %s" % reason)
+        self.aborted = True
+        self.close()
+        self.target.on_benchmark_aborted(reason)
 
     def update_progress_message(self, task_finished=False):
         if not self.quiet and self.current_step >= 0:
@@ -382,23 +533,33 @@ class Driver:
 
     def post_process_samples(self):
         logger.info("Storing latency and service time... ")
+        # Meta data that are identical for all samples of a task are stored only once by the metrics store. Samples of one batch share
+        # their task but each batch contains equal copies. Equal tasks may still differ in their meta data, so we compare them as well.
+        static_meta_data_per_task = {}
+        static_meta_data_per_instance = {}
         for sample in self.raw_samples:
-            meta_data = self.merge(
-                self.track.meta_data,
-                self.challenge.meta_data,
-                sample.operation.meta_data,
-                sample.task.meta_data,
-                sample.request_meta_data)
+            # all samples are still referenced so ids of tasks are unique
+            static_meta_data = static_meta_data_per_instance.get(id(sample.task))
+            if static_meta_data is None:
+                static_meta_data = self.merge(
+                    self.track.meta_data,
+                    self.challenge.meta_data,
+                    sample.operation.meta_data,
+                    sample.task.meta_data)
+                key = (sample.task, json.dumps(static_meta_data, sort_keys=True, default=str))
+                static_meta_data = static_meta_data_per_task.setdefault(key, static_meta_data)
+                static_meta_data_per_instance[id(sample.task)] = static_meta_data
 
             self.metrics_store.put_value_cluster_level(name="latency", value=sample.latency_ms, unit="ms", operation=sample.operation.name,
                                                        operation_type=sample.operation.type, sample_type=sample.sample_type,
                                                        absolute_time=sample.absolute_time, relative_time=sample.relative_time,
-                                                       meta_data=meta_data)
+                                                       meta_data=sample.request_meta_data, shared_meta_data=static_meta_data)
 
             self.metrics_store.put_value_cluster_level(name="service_time", value=sample.service_time_ms, unit="ms",
                                                        operation=sample.operation.name, operation_type=sample.operation.type,
                                                        sample_type=sample.sample_type, absolute_time=sample.absolute_time,
-                                                       relative_time=sample.relative_time, meta_data=meta_data)
+                                                       relative_time=sample.relative_time, meta_data=sample.request_meta_data,
+                                                       shared_meta_data=static_meta_data)
 
         logger.info("Calculating throughput... ")
         aggregates = calculate_global_throughput(self.raw_samples)
@@ -414,7 +575,8 @@ class Driver:
             for absolute_time, relative_time, sample_type, throughput, throughput_unit in samples:
                 self.metrics_store.put_value_cluster_level(name="throughput", value=throughput, unit=throughput_unit,
                                                            operation=op.name, operation_type=op.type, sample_type=sample_type,
-                                                           absolute_time=absolute_time, relative_time=relative_time, meta_data=meta_data)
+                                                           absolute_time=absolute_time, relative_time=relative_time,
+                                                           shared_meta_data=meta_data)
 
     def merge(self, *args):
         result = {}
@@ -432,6 +594,8 @@ class LoadGenerator(actor.RallyActor):
     """
 
     WAKEUP_INTERVAL_SECONDS = 5
+    # default size of the connection pool of the Elasticsearch client
+    DEFAULT_MAX_CONNECTIONS = 10
 
     def __init__(self):
         super().__init__()
@@ -454,7 +618,12 @@ class LoadGenerator(actor.RallyActor):
         self.executor_future = None
         self.sampler = None
         self.start_driving = False
+        self.client_start_timestamp = None
         self.wakeup_interval = LoadGenerator.WAKEUP_INTERVAL_SECONDS
+        # we cannot tell wakeup messages apart, so we need to track how many are outstanding
+        self.pending_wakeups = 0
+        # the executor thread notifies the actor about completion via this pipe so we don't need to poll for it
+        self.completion_notification, self.completion_notifier = os.pipe()
 
     def receiveMessage(self, msg, sender):
         try:
@@ -463,7 +632,8 @@ class LoadGenerator(actor.RallyActor):
                 logger.info("LoadGenerator[%d] is about to start." % msg.client_id)
                 self.master = sender
                 self.client_id = msg.client_id
-                self.es = client.EsClientFactory(msg.config.opts("client", "hosts"), msg.config.opts("client", "options")).create()
+                client_options = client_options_for(msg.config.opts("client", "options"), msg.tasks)
+                self.es = client.EsClientFactory(msg.config.opts("client", "hosts"), client_options).create()
                 self.config = msg.config
                 self.track = msg.track
                 self.tasks = msg.tasks
@@ -480,7 +650,8 @@ class LoadGenerator(actor.RallyActor):
                 logger.debug("LoadGenerator[%d] is continuing its work at task index [%d] on [%f]." %
                              (self.client_id, self.current_task_index, msg.client_start_timestamp))
                 self.start_driving = True
-                self.wakeupAfter(datetime.timedelta(seconds=time.perf_counter() - msg.client_start_timestamp))
+                self.client_start_timestamp = msg.client_start_timestamp
+                self.wakeup(max(self.client_start_timestamp - time.perf_counter(), 0))
             elif isinstance(msg, CompleteCurrentTask):
                 # finish now ASAP. Remaining samples will be sent with the next WakeupMessage. We will also need to skip to the next
                 # JoinPoint. But if we are already at a JoinPoint at the moment, there is nothing to do.
@@ -491,27 +662,34 @@ class LoadGenerator(actor.RallyActor):
                     logger.info("LoadGenerator[%s] has received CompleteCurrentTask. Completing current task [%s]."
                                 % (str(self.client_id), self.current_task))
                     self.complete.set()
+            elif isinstance(msg, thespian.actors.WatchMessage):
+                if self.completion_notification in msg.ready:
+                    # drain all notifications; we check the executor's state directly
+                    os.read(self.completion_notification, 1024)
+                if self.executor_future is not None and self.executor_future.done():
+                    self.send_samples()
+                    self.executor_completed()
             elif isinstance(msg, thespian.actors.WakeupMessage):
+                self.pending_wakeups -= 1
                 # it would be better if we could send ourselves a message at a specific time, simulate this with a boolean...
                 if self.start_driving:
-                    logger.info("LoadGenerator[%s] starts driving now." % str(self.client_id))
-                    self.start_driving = False
-                    self.drive()
-                else:
+                    remaining = self.client_start_timestamp - time.perf_counter()
+                    if remaining <= 0:
+                        logger.info("LoadGenerator[%s] starts driving now." % str(self.client_id))
+                        self.start_driving = False
+                        self.drive()
+                    else:
+                        # we have been woken up early (e.g. by a wakeup that has been requested while executing the previous task)
+                        self.wakeup(remaining)
+                elif self.executor_future is not None:
                     current_samples = self.send_samples()
                     if self.cancel.is_set():
                         logger.info("LoadGenerator[%s] has detected that benchmark has been cancelled. Notifying master..." %
                                     str(self.client_id))
                         self.send(self.master, BenchmarkCancelled())
-                    elif self.executor_future is not None and self.executor_future.done():
-                        e = self.executor_future.exception(timeout=0)
-                        if e:
-                            logger.info("LoadGenerator[%s] has detected a benchmark failure. Notifying master..." % str(self.client_id))
-                            self.send(self.master, BenchmarkFailure("Error in load generator [%d]" % self.client_id, e))
-                        else:
-                            logger.info("LoadGenerator[%s] is ready for the next task." % str(self.client_id))
-                            self.executor_future = None
-                            self.drive()
+                    elif self.executor_future.done():
+                        # only relevant if the actor system does not support watching the completion notification
+                        self.executor_completed()
                     else:
                         if current_samples and len(current_samples) > 0:
                             most_recent_sample = current_samples[-1]
@@ -519,17 +697,47 @@ class LoadGenerator(actor.RallyActor):
                                         (str(self.client_id), most_recent_sample.task, most_recent_sample.percent_completed * 100.0))
                         else:
                             logger.info("LoadGenerator[%s] is executing (no samples)." % (str(self.client_id)))
-                        self.wakeupAfter(datetime.timedelta(seconds=self.wakeup_interval))
+                        if self.pending_wakeups == 0:
+                            self.wakeup(self.wakeup_interval)
             elif isinstance(msg, thespian.actors.ActorExitRequest):
                 logger.info("LoadGenerator[%s] is exiting due to ActorExitRequest." % str(self.client_id))
                 if self.executor_future is not None and self.executor_future.running():
                     self.cancel.set()
                     self.pool.shutdown()
+                os.close(self.completion_notification)
+                os.close(self.completion_notifier)
+                return None
             else:
                 logger.info("LoadGenerator[%d] received unknown message [%s] (ignoring)." % (self.client_id, str(msg)))
         except Exception as e:
             logger.exception("Fatal error in LoadGenerator[%d]" % self.client_id)
             self.send(self.master, BenchmarkFailure("Fatal error in load generator [%d]" % self.client_id, e))
+        # The watch needs to be renewed with every message. It allows us to react immediately when the executor has finished.
+        if self.executor_future is not None:
+            return thespian.actors.ThespianWatch([self.completion_notification])
+        return None
+
+    def wakeup(self, seconds):
+        self.pending_wakeups += 1
+        self.wakeupAfter(datetime.timedelta(seconds=seconds))
+
+    def notify_completion(self, future):
+        # called on the executor thread
+        try:
+            os.write(self.completion_notifier, b"x")
+        except OSError:
+            # the actor is already shutting down
+            pass
+
+    def executor_completed(self):
+        e = self.executor_future.exception(timeout=0)
+        self.executor_future = None
+        if e:
+            logger.info("LoadGenerator[%s] has detected a benchmark failure. Notifying master..." % str(self.client_id))
+            self.send(self.master, BenchmarkFailure("Error in load generator [%d]" % self.client_id, e))
+        else:
+            logger.info("LoadGenerator[%s] is ready for the next task." % str(self.client_id))
+            self.drive()
 
     def drive(self):
         profiling_enabled = self.config.opts("driver", "profiling")
@@ -556,16 +764,20 @@ class LoadGenerator(actor.RallyActor):
             if self.complete.is_set():
                 logger.info("LoadGenerator[%d] is skipping [%s] because it has been asked to complete all tasks until next join point." %
                             (self.client_id, task))
+                self.drive()
             else:
                 logger.info("LoadGenerator[%d] is executing [%s]." % (self.client_id, task))
                 self.sampler = Sampler(self.client_id, task, self.start_timestamp)
-                schedule = schedule_for(self.track, task, self.client_id)
+                rate_limiter = shared_rate_limiter_for(self.config, self.client_id, self.current_task_index - 1, task)
+                schedule = schedule_for(self.track, task, self.client_id, rate_limiter)
 
-                executor = Executor(task, schedule, self.es, self.sampler, self.cancel, self.complete)
+                executor = Executor(task, schedule, self.es, self.sampler, self.cancel, self.complete, rate_limiter)
                 final_executor = Profiler(executor, self.client_id, task.operation) if profiling_enabled else executor
 
                 self.executor_future = self.pool.submit(final_executor)
-                self.wakeupAfter(datetime.timedelta(seconds=self.wakeup_interval))
+                self.executor_future.add_done_callback(self.notify_completion)
+                if self.pending_wakeups == 0:
+                    self.wakeup(self.wakeup_interval)
         else:
             raise exceptions.RallyAssertionError("Unknown task type [%s]" % type(task))
 
@@ -586,6 +798,85 @@ class LoadGenerator(actor.RallyActor):
         return None
 
 
+def uses_shared_rate_limiter(task):
+    """
+    :param task: A task.
+    :return: ``True`` iff all clients of this task should achieve the target throughput together.
+    """
+    return task.params.get("rate-limiter", "client") == "shared" and \
+        (task.params.get("target-throughput") is not None or task.params.get("target-interval") is not None)
+
+
+def shared_rate_limiter_names(allocations):
+    """
+    Assigns a distinct name to each task that uses a shared rate limiter. All clients that execute the same task use the same name.
+
+    :param allocations: The allocation matrix as calculated by ``Allocator``.
+    :return: A dict that maps a client id to a dict of the index of a task in the client's allocations and the name of its rate limiter.
+             Clients without any shared rate limiter are omitted.
+    """
+    # The allocator assigns the very same task object to all of its clients. We need to key by identity though as the same operation
+    # may appear several times within a parallel element and these tasks are equal.
+    names_per_task = {}
+    names = {}
+    for client_id, tasks in enumerate(allocations):
+        for task_index, task in enumerate(tasks):
+            if isinstance(task, track.Task) and uses_shared_rate_limiter(task):
+                if id(task) not in names_per_task:
+                    names_per_task[id(task)] = "%d-%s" % (len(names_per_task), task.operation.name.replace(os.sep, "_"))
+                names.setdefault(client_id, {})[task_index] = names_per_task[id(task)]
+    return names
+
+
+def shared_rate_limiter_for(cfg, client_id, task_index, task):
+    """
+    Creates a rate limiter that is shared by all clients executing the provided task if the task requires one.
+
+    :param cfg: The current config object.
+    :param client_id: The id of the client that executes the task.
+    :param task_index: The index of the task in the client's allocations.
+    :param task: The task to execute.
+    :return: A ``SharedRateLimiter`` or ``None`` if each client should pace itself.
+    """
+    if task.params.get("rate-limiter", "client") != "shared":
+        return None
+    if not uses_shared_rate_limiter(task):
+        logger.warning("[%s] requests a shared rate limiter but defines no target throughput. Ignoring." % task)
+        return None
+    rate_limiter_host = cfg.opts("driver", "rate.limiter.host")
+    if rate_limiter_host != socket.gethostname():
+        raise exceptions.SystemSetupError("[%s] uses a shared rate limiter which requires all load generators to run on the same host "
+                                          "but load generator [%d] runs on [%s] instead of [%s]." %
+                                          (task, client_id, socket.gethostname(), rate_limiter_host))
+    name = cfg.opts("driver", "rate.limiter.names")[client_id][task_index]
+    burst = task.params.get("rate-limiter-burst", task.clients)
+    if task.warmup_time_period is None and task.time_period is None:
+        iterations = task.warmup_iterations + task.iterations
+    else:
+        iterations = None
+    rate_limiter = scheduler.SharedRateLimiter(os.path.join(cfg.opts("driver", "rate.limiter.dir"), name), task.schedule, task.params,
+                                               burst=burst, iterations=iterations)
+    logger.info("Pacing [%s] with [%s]." % (task, rate_limiter))
+    return rate_limiter
+
+
+def client_options_for(client_options, tasks):
+    """
+    Ensures that the connection pool of a client is large enough to serve all requests that it keeps in flight concurrently.
+
+    :param client_options: The client options as specified by the user.
+    :param tasks: All tasks that are executed by this client (may contain ``None`` or join points).
+    :return: The client options to use for this client.
+    """
+    in_flight = max([t.params.get("in-flight", 1) for t in tasks if isinstance(t, track.Task)], default=1)
+    if in_flight > LoadGenerator.DEFAULT_MAX_CONNECTIONS and "maxsize" not in client_options:
+        logger.info("Increasing connection pool size to [%d] to allow for [%d] requests in flight." % (in_flight, in_flight))
+        options = dict(client_options)
+        options["maxsize"] = in_flight
+        return options
+    return client_options
+
+
 class Sampler:
     """
     Encapsulates management of gathered samples.
@@ -597,9 +888,14 @@ class Sampler:
         self.start_timestamp = start_timestamp
         self.q = queue.Queue(maxsize=16384)
 
-    def add(self, sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, percent_completed):
+    def add(self, sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, percent_completed,
+            task=None):
+        """
+        :param task: The task to which this sample should be attributed. Only needed if it differs from the sampler's task (i.e. for
+        operations in a mix). Defaults to ``None``.
+        """
         try:
-            self.q.put_nowait(Sample(self.client_id, time.time(), time.perf_counter() - self.start_timestamp, self.task,
+            self.q.put_nowait(Sample(self.client_id, time.time(), time.perf_counter() - self.start_timestamp, task if task else self.task,
                                      sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period,
                                      percent_completed))
         except queue.Full:
@@ -791,52 +1087,45 @@ def calculate_global_throughput(samples, bucket_interval_secs=1):
         samples_per_task[k].append(sample)
 
     global_throughput = {}
-    # with open("raw_samples.csv", "w") as sample_log:
-    #    print("client_id,absolute_time,relative_time,operation,sample_type,total_ops,time_period", file=sample_log)
-    for k, v in samples_per_task.items():
-        task = k
-        if task not in global_throughput:
-            global_throughput[task] = []
-        # sort all samples by time
-        current_samples = sorted(v, key=lambda s: s.absolute_time)
-
-        total_count = 0
-        interval = 0
-        current_bucket = 0
-        current_sample_type = current_samples[0].sample_type
-        sample_count_for_current_sample_type = 0
-        start_time = current_samples[0].absolute_time - current_samples[0].time_period
-        for sample in current_samples:
-            # print("%d,%f,%f,%s,%s,%d,%f" %
-            # (sample.client_id, sample.absolute_time, sample.relative_time, sample.operation, sample.sample_type,
-            #  sample.total_ops, sample.time_period), file=sample_log)
-
-            # once we have seen a new sample type, we stick to it.
-            if current_sample_type < sample.sample_type:
-                current_sample_type = sample.sample_type
-                sample_count_for_current_sample_type = 0
-
-            total_count += sample.total_ops
-            interval = max(sample.absolute_time - start_time, interval)
-
-            # avoid division by zero
-            if interval > 0 and interval >= current_bucket:
-                sample_count_for_current_sample_type += 1
-                current_bucket = int(interval) + bucket_interval_secs
-                throughput = (total_count / interval)
-                # we calculate throughput per second
-                global_throughput[task].append(
-                    (sample.absolute_time, sample.relative_time, current_sample_type, throughput, "%s/s" % sample.total_ops_unit))
-        # also include the last sample if we don't have one for the current sample type, even if it is below the bucket interval
-        # (mainly needed to ensure we show throughput data in test mode)
-        if interval > 0 and sample_count_for_current_sample_type == 0:
-            throughput = (total_count / interval)
-            global_throughput[task].append(
-                (sample.absolute_time, sample.relative_time, current_sample_type, throughput, "%s/s" % sample.total_ops_unit))
-
+    for task, task_samples in samples_per_task.items():
+        global_throughput[task] = _global_throughput_of_task(task_samples, bucket_interval_secs)
     return global_throughput
 
 
+def _global_throughput_of_task(task_samples, bucket_interval_secs):
+    # Instead of iterating over all samples, we determine the running totals in bulk and then jump from bucket to bucket.
+    #
+    # sort all samples by time (the sort is stable so samples with identical timestamps keep their order)
+    current_samples = sorted(task_samples, key=operator.attrgetter("absolute_time"))
+    start_time = current_samples[0].absolute_time - current_samples[0].time_period
+    total_counts = list(itertools.accumulate(s.total_ops for s in current_samples))
+    # once we have seen a new sample type, we stick to it.
+    sample_types = list(itertools.accumulate((s.sample_type for s in current_samples), max))
+    intervals = list(itertools.accumulate(itertools.chain([0], (s.absolute_time - start_time for s in current_samples)), max))[1:]
+
+    throughput = []
+    last_bucket_sample = -1
+    # avoid division by zero
+    idx = bisect.bisect_right(intervals, 0)
+    while idx < len(current_samples):
+        throughput.append(_throughput_sample(current_samples[idx], sample_types[idx], total_counts[idx], intervals[idx]))
+        last_bucket_sample = idx
+        current_bucket = int(intervals[idx]) + bucket_interval_secs
+        idx = bisect.bisect_left(intervals, current_bucket, idx + 1)
+
+    # also include the last sample if we don't have one for the current sample type, even if it is below the bucket interval
+    # (mainly needed to ensure we show throughput data in test mode)
+    first_sample_of_current_type = bisect.bisect_left(sample_types, sample_types[-1])
+    if intervals[-1] > 0 and last_bucket_sample < first_sample_of_current_type:
+        throughput.append(_throughput_sample(current_samples[-1], sample_types[-1], total_counts[-1], intervals[-1]))
+    return throughput
+
+
+def _throughput_sample(sample, sample_type, total_count, interval):
+    # we calculate throughput per second
+    return sample.absolute_time, sample.relative_time, sample_type, total_count / interval, "%s/s" % sample.total_ops_unit
+
+
 class Profiler:
     def __init__(self, target, client_id, operation):
         """
@@ -871,7 +1160,7 @@ class Profiler:
 
 
 class Executor:
-    def __init__(self, task, schedule, es, sampler, cancel, complete):
+    def __init__(self, task, schedule, es, sampler, cancel, complete, rate_limiter=None):
         """
         Executes tasks according to the schedule for a given operation.
 
@@ -881,6 +1170,8 @@ class Executor:
         :param sampler: A container to store raw samples.
         :param cancel: A shared boolean that indicates we need to cancel execution.
         :param complete: A shared boolean that indicates we need to prematurely complete execution.
+        :param rate_limiter: An optional rate limiter that is shared with other clients of this task. If present, it determines when
+                             requests are issued instead of the schedule. It is closed after execution.
         """
         self.task = task
         self.op = task.operation
@@ -889,44 +1180,95 @@ class Executor:
         self.sampler = sampler
         self.cancel = cancel
         self.complete = complete
+        self.rate_limiter = rate_limiter
 
     def __call__(self, *args, **kwargs):
         total_start = time.perf_counter()
+        in_flight = self.task.params.get("in-flight", 1)
         # noinspection PyBroadException
         try:
-            for expected_scheduled_time, sample_type, percent_completed, runner, params in self.schedule:
-                if self.cancel.is_set():
-                    logger.info("User cancelled execution.")
-                    break
-                absolute_expected_schedule_time = total_start + expected_scheduled_time
-                throughput_throttled = expected_scheduled_time > 0
-                if throughput_throttled:
-                    rest = absolute_expected_schedule_time - time.perf_counter()
-                    if rest > 0:
-                        time.sleep(rest)
-                start = time.perf_counter()
-                total_ops, total_ops_unit, request_meta_data = execute_single(runner, self.es, params)
-                stop = time.perf_counter()
-
-                service_time = stop - start
-                # Do not calculate latency separately when we don't throttle throughput. This metric is just confusing then.
-                latency = stop - absolute_expected_schedule_time if throughput_throttled else service_time
-                # last sample should bump progress to 100% if externally completed.
-                completed = percent_completed if not self.complete.is_set() else 1.0
-                self.sampler.add(sample_type, request_meta_data, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time),
-                                 total_ops, total_ops_unit, (stop - total_start), completed)
-
-                if self.complete.is_set():
-                    logger.info("Task is considered completed due to external event.")
-                    break
+            if in_flight > 1:
+                self.execute_concurrently(total_start, in_flight)
+            else:
+                self.execute(total_start, iter(self.schedule))
         except BaseException:
             logger.exception("Could not execute schedule")
             raise
         finally:
+            if self.rate_limiter:
+                self.rate_limiter.close()
             # Actively set it if this task completes its parent
             if self.task.completes_parent:
                 self.complete.set()
 
+    def execute_concurrently(self, total_start, in_flight):
+        """
+        Keeps up to ``in_flight`` requests outstanding by letting several threads consume the same schedule. Each request is still
+        sampled individually, so latency and service time are measured per request.
+        """
+        logger.info("Executing [%s] with [%d] requests in flight." % (self.task, in_flight))
+        schedule = SynchronizedIterator(self.schedule)
+        aborted = threading.Event()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=in_flight) as pool:
+            futures = [pool.submit(self.execute, total_start, schedule, aborted) for _ in range(in_flight)]
+            for f in concurrent.futures.as_completed(futures):
+                if f.exception() is not None:
+                    aborted.set()
+            # raise the first error (if any)
+            for f in futures:
+                f.result()
+
+    def execute(self, total_start, schedule, aborted=None):
+        for expected_scheduled_time, sample_type, percent_completed, runner, params in schedule:
+            if self.cancel.is_set():
+                logger.info("User cancelled execution.")
+                break
+            if aborted is not None and aborted.is_set():
+                break
+            if self.rate_limiter:
+                absolute_expected_schedule_time = self.rate_limiter.reserve()
+                throughput_throttled = True
+            else:
+                absolute_expected_schedule_time = total_start + expected_scheduled_time
+                throughput_throttled = expected_scheduled_time > 0
+            if throughput_throttled:
+                rest = absolute_expected_schedule_time - time.perf_counter()
+                if rest > 0:
+                    time.sleep(rest)
+            start = time.perf_counter()
+            total_ops, total_ops_unit, request_meta_data = execute_single(runner, self.es, params)
+            stop = time.perf_counter()
+
+            service_time = stop - start
+            # Do not calculate latency separately when we don't throttle throughput. This metric is just confusing then.
+            latency = stop - absolute_expected_schedule_time if throughput_throttled else service_time
+            # last sample should bump progress to 100% if externally completed.
+            completed = percent_completed if not self.complete.is_set() else 1.0
+            # operations in a mix are attributed to their own task so we can report them separately
+            sample_task = runner.task if isinstance(runner, MixedTaskRunner) else None
+            self.sampler.add(sample_type, request_meta_data, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time),
+                             total_ops, total_ops_unit, (stop - total_start), completed, sample_task)
+
+            if self.complete.is_set():
+                logger.info("Task is considered completed due to external event.")
+                break
+
+
+class SynchronizedIterator:
+    """
+    Allows multiple threads to safely consume the same iterator.
+    """
+    def __init__(self, iterable):
+        self.it = iter(iterable)
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.lock:
+            return next(self.it)
+
 
 def execute_single(runner, es, params):
     """
@@ -1110,53 +1452,135 @@ class Allocator:
 
 # Runs a concrete schedule on one worker client
 # Needs to determine the runners and concrete iterations per client.
-def schedule_for(current_track, task, client_index):
+def schedule_for(current_track, task, client_index, rate_limiter=None):
     """
     Calculates a client's schedule for a given task.
 
     :param current_track: The current track.
     :param task: The task that should be executed.
     :param client_index: The current client index.  Must be in the range [0, `task.clients').
+    :param rate_limiter: An optional rate limiter that is shared by all clients of this task. If present, clients claim the task's
+                         iterations together instead of executing a fixed share of them.
     :return: A generator for the operations the given client needs to perform for this task.
     """
     op = task.operation
     num_clients = task.clients
     sched = scheduler.scheduler_for(task.schedule, task.params)
     logger.info("Choosing [%s] for [%s]." % (sched, task))
-    runner_for_op = runner.runner_for(op.type)
-    params_for_op = track.operation_parameters(current_track, op).partition(client_index, num_clients)
+    if isinstance(task, track.MixedTask):
+        invocations = mixed_invocations(current_track, task, client_index)
+    else:
+        runner_for_op = runner.runner_for(op.type)
+        params_for_op = track.operation_parameters(current_track, op).partition(client_index, num_clients)
+        invocations = SingleOperationInvocations(runner_for_op, params_for_op)
 
     if task.warmup_time_period is not None or task.time_period is not None:
         warmup_time_period = task.warmup_time_period if task.warmup_time_period else 0
         logger.info("Creating time-period based schedule with [%s] distribution for [%s] with a warmup period of [%s] seconds and a "
                     "time period of [%s] seconds." % (task.schedule, op, str(warmup_time_period), str(task.time_period)))
-        return time_period_based(sched, warmup_time_period, task.time_period, runner_for_op, params_for_op)
+        return time_period_based(sched, warmup_time_period, task.time_period, invocations)
+    elif rate_limiter:
+        logger.info("Creating shared iteration-count based schedule for [%s] with [%d] warmup iterations and [%d] iterations." %
+                    (op, task.warmup_iterations, task.iterations))
+        return shared_iteration_count_based(rate_limiter, task.warmup_iterations, task.iterations, invocations)
     else:
         logger.info("Creating iteration-count based schedule with [%s] distribution for [%s] with [%d] warmup iterations and "
                     "[%d] iterations." % (task.schedule, op, task.warmup_iterations, task.iterations))
-        return iteration_count_based(sched, task.warmup_iterations // num_clients, task.iterations // num_clients,
-                                     runner_for_op, params_for_op)
+        return iteration_count_based(sched, task.warmup_iterations // num_clients, task.iterations // num_clients, invocations)
 
 
-def time_period_based(sched, warmup_time_period, time_period, runner, params):
+def mixed_invocations(current_track, task, client_index):
+    seed = task.params.get("seed")
+    # each client draws its own (reproducible) sequence of operations if a seed is given
+    rand = random.Random("%s-%d" % (str(seed), client_index)) if seed is not None else random.Random()
+    runners = []
+    param_sources = []
+    for sub_task in task.tasks:
+        runners.append(MixedTaskRunner(sub_task, runner.runner_for(sub_task.operation.type)))
+        param_sources.append(track.operation_parameters(current_track, sub_task.operation).partition(client_index, task.clients))
+    return WeightedInvocations(runners, param_sources, task.weights, rand)
+
+
+class SingleOperationInvocations:
+    """
+    Provides the runner and parameters for a task that always executes the same operation.
+    """
+    def __init__(self, runner, params):
+        self.runner = runner
+        self.params = params
+
+    def size(self):
+        return self.params.size()
+
+    def next(self):
+        return self.runner, self.params.params()
+
+
+class WeightedInvocations:
+    """
+    Provides the runner and parameters for a task that executes a weighted mix of operations. The next operation is chosen randomly
+    according to the provided weights.
+    """
+    def __init__(self, runners, param_sources, weights, rand):
+        self.runners = runners
+        self.param_sources = param_sources
+        self.rand = rand
+        self.cumulative_weights = []
+        total = 0
+        for weight in weights:
+            total += weight
+            self.cumulative_weights.append(total)
+        self.total_weight = total
+
+    def size(self):
+        return sum([p.size() for p in self.param_sources])
+
+    def next(self):
+        idx = min(bisect.bisect_right(self.cumulative_weights, self.rand.random() * self.total_weight), len(self.runners) - 1)
+        return self.runners[idx], self.param_sources[idx].params()
+
+
+class MixedTaskRunner:
+    """
+    Wraps the runner of an operation that is part of a mix so the executor can attribute samples to the operation's (sub-)task.
+    """
+    def __init__(self, task, delegate):
+        self.task = task
+        self.delegate = delegate
+
+    def __enter__(self):
+        self.delegate.__enter__()
+        return self
+
+    def __call__(self, *args):
+        return self.delegate(*args)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.delegate.__exit__(exc_type, exc_val, exc_tb)
+
+    def __repr__(self, *args, **kwargs):
+        return repr(self.delegate)
+
+
+def time_period_based(sched, warmup_time_period, time_period, invocations):
     """
     Calculates the necessary schedule for time period based operations.
 
     :param sched: The scheduler for this task. Must not be None.
     :param warmup_time_period: The time period in seconds that is considered for warmup. Must not be None; provide zero instead.
     :param time_period: The time period in seconds that is considered for measurement. May be None.
-    :param runner: The runner for a given operation.
-    :param params: The parameter source for a given operation.
+    :param invocations: Provides the runner and the parameters for each invocation.
     :return: A generator for the corresponding parameters.
     """
     next_scheduled = 0
     start = time.perf_counter()
     if time_period is None:
-        iterations = params.size()
+        iterations = invocations.size()
         for it in range(0, iterations):
             sample_type = metrics.SampleType.Warmup if time.perf_counter() - start < warmup_time_period else metrics.SampleType.Normal
             percent_completed = (it + 1) / iterations
-            yield (next_scheduled, sample_type, percent_completed, runner, params.params())
+            runner, params = invocations.next()
+            yield (next_scheduled, sample_type, percent_completed, runner, params)
             next_scheduled = sched.next(next_scheduled)
     else:
         end = start + warmup_time_period + time_period
@@ -1166,20 +1590,20 @@ def time_period_based(sched, warmup_time_period, time_period, runner, params):
             now = time.perf_counter()
             sample_type = metrics.SampleType.Warmup if now - start < warmup_time_period else metrics.SampleType.Normal
             percent_completed = (now - start) / (warmup_time_period + time_period)
-            yield (next_scheduled, sample_type, percent_completed, runner, params.params())
+            runner, params = invocations.next()
+            yield (next_scheduled, sample_type, percent_completed, runner, params)
             next_scheduled = sched.next(next_scheduled)
             it += 1
 
 
-def iteration_count_based(sched, warmup_iterations, iterations, runner, params):
+def iteration_count_based(sched, warmup_iterations, iterations, invocations):
     """
     Calculates the necessary schedule based on a given number of iterations.
 
     :param sched: The scheduler for this task. Must not be None.
     :param warmup_iterations: The number of warmup iterations to run. 0 if no warmup should be performed.
     :param iterations: The number of measurement iterations to run.
-    :param runner: The runner for a given operation.
-    :param params: The parameter source for a given operation.
+    :param invocations: Provides the runner and the parameters for each invocation.
     :return: A generator for the corresponding parameters.
     """
     next_scheduled = 0
@@ -1189,5 +1613,31 @@ def iteration_count_based(sched, warmup_iterations, iterations, runner, params):
     for it in range(0, total_iterations):
         sample_type = metrics.SampleType.Warmup if it < warmup_iterations else metrics.SampleType.Normal
         percent_completed = (it + 1) / total_iterations
-        yield (next_scheduled, sample_type, percent_completed, runner, params.params())
+        runner, params = invocations.next()
+        yield (next_scheduled, sample_type, percent_completed, runner, params)
         next_scheduled = sched.next(next_scheduled)
+
+
+def shared_iteration_count_based(rate_limiter, warmup_iterations, iterations, invocations):
+    """
+    Calculates the schedule for a given number of iterations that all clients of a task execute together. Each client claims the next
+    iteration from the shared rate limiter until all of them are claimed. Hence, faster clients execute more iterations than slower ones.
+
+    :param rate_limiter: The rate limiter that is shared by all clients of the task. It also determines when requests are issued.
+    :param warmup_iterations: The number of warmup iterations of all clients. 0 if no warmup should be performed.
+    :param iterations: The number of measurement iterations of all clients.
+    :param invocations: Provides the runner and the parameters for each invocation.
+    :return: A generator for the corresponding parameters.
+    """
+    total_iterations = warmup_iterations + iterations
+    if total_iterations == 0:
+        raise exceptions.RallyAssertionError("Operation must run at least for one iteration.")
+    while True:
+        it = rate_limiter.claim_iteration()
+        if it is None:
+            break
+        sample_type = metrics.SampleType.Warmup if it < warmup_iterations else metrics.SampleType.Normal
+        percent_completed = (it + 1) / total_iterations
+        runner, params = invocations.next()
+        # the rate limiter determines when the request is issued
+        yield (0, sample_type, percent_completed, runner, params)
@@ -0,0 +1,265 @@
+"""
+Provides a live view of a running benchmark. The coordinator aggregates samples incrementally as they arrive from the load generators
+and ``ProgressServer`` exposes the current state via HTTP:
+
+* ``GET /progress``: A JSON document with throughput, latency percentiles, error rate and progress per task.
+* ``GET /stream``: The same document as a stream of server-sent events (one event per interval) until the benchmark is finished.
+"""
+
+import collections
+import http.server
+import json
+import logging
+import socketserver
+import threading
+
+from esrally import exceptions, metrics
+
+logger = logging.getLogger("rally.driver")
+
+# number of the most recent samples per task that we consider for percentiles and current throughput
+WINDOW_SIZE = 10000
+PERCENTILES = [50, 90, 99, 100]
+
+
+class TaskStats:
+    """
+    Aggregated statistics of all samples of a single task.
+    """
+    def __init__(self, task, window_size):
+        self.task = task
+        self.sample_type = None
+        self.requests = 0
+        self.errors = 0
+        self.total_ops = 0
+        self.total_ops_unit = None
+        self.start_time = None
+        self.end_time = None
+        self.finished = False
+        self.percent_completed_per_client = {}
+        # tuples of (absolute time, total ops, latency, service time)
+        self.window = collections.deque(maxlen=window_size)
+
+    def add(self, sample):
+        if self.start_time is None:
+            self.start_time = sample.absolute_time - sample.time_period
+        # samples of different clients may arrive slightly out of order
+        self.end_time = sample.absolute_time if self.end_time is None else max(self.end_time, sample.absolute_time)
+        if self.sample_type is None or self.sample_type < sample.sample_type:
+            self.sample_type = sample.sample_type
+        self.requests += 1
+        if sample.request_meta_data and not sample.request_meta_data.get("success", True):
+            self.errors += 1
+        self.total_ops += sample.total_ops
+        self.total_ops_unit = sample.total_ops_unit
+        self.percent_completed_per_client[sample.client_id] = sample.percent_completed
+        self.window.append((sample.absolute_time, sample.total_ops, sample.latency_ms, sample.service_time_ms))
+
+    def as_dict(self):
+        throughput_unit = "%s/s" % self.total_ops_unit
+        if self.finished:
+            percent_completed = 1.0
+        else:
+            percent_completed = sum(self.percent_completed_per_client.values()) / max(len(self.percent_completed_per_client), 1)
+        return {
+            "operation": self.task.operation.name,
+            "operation-type": _type_name(self.task.operation.type),
+            "sample-type": self.sample_type.name.lower() if self.sample_type else None,
+            "progress": percent_completed,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error-rate": self.errors / self.requests if self.requests > 0 else 0.0,
+            "throughput": {
+                "mean": self._rate(self.total_ops, self.start_time, self.end_time),
+                "current": self._current_throughput(),
+                "unit": throughput_unit
+            },
+            "latency": self._percentiles(2),
+            "service-time": self._percentiles(3)
+        }
+
+    def _current_throughput(self):
+        if len(self.window) < 2:
+            return None
+        # the oldest sample only marks the start of the window
+        ops = sum(s[1] for s in self.window) - self.window[0][1]
+        return self._rate(ops, self.window[0][0], self.end_time)
+
+    @staticmethod
+    def _rate(ops, start, end):
+        if start is None or end is None or end <= start:
+            return None
+        return ops / (end - start)
+
+    def _percentiles(self, column):
+        result = collections.OrderedDict()
+        if self.window:
+            sorted_values = sorted(s[column] for s in self.window)
+            for percentile in PERCENTILES:
+                result[str(float(percentile))] = metrics.InMemoryMetricsStore.percentile_value(sorted_values, percentile)
+        result["unit"] = "ms"
+        return result
+
+
+class LiveStats:
+    """
+    Incrementally aggregates samples for the live view of a benchmark. All methods are thread-safe.
+    """
+    def __init__(self, lap=None, window_size=WINDOW_SIZE):
+        self.lap = lap
+        self.window_size = window_size
+        self.current_step = -1
+        self.number_of_steps = 0
+        self.is_finished = False
+        self.tasks = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, number_of_steps):
+        with self._lock:
+            self.number_of_steps = number_of_steps
+
+    def add(self, samples):
+        """
+        :param samples: A list of ``Sample`` objects that the coordinator has just received.
+        """
+        with self._lock:
+            for sample in samples:
+                k = sample.task
+                if k not in self.tasks:
+                    self.tasks[k] = TaskStats(sample.task, self.window_size)
+                self.tasks[k].add(sample)
+
+    def step_completed(self, step):
+        """
+        Marks all tasks that have been running so far as finished and advances to the next step.
+
+        :param step: The step that is about to start.
+        """
+        with self._lock:
+            for task_stats in self.tasks.values():
+                task_stats.finished = True
+            self.current_step = step
+
+    def finish(self):
+        with self._lock:
+            for task_stats in self.tasks.values():
+                task_stats.finished = True
+            self.is_finished = True
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "status": "finished" if self.is_finished else "running",
+                "lap": self.lap,
+                "step": max(self.current_step, 0),
+                "steps": self.number_of_steps,
+                "tasks": [task_stats.as_dict() for task_stats in self.tasks.values()]
+            }
+
+
+class ProgressServer:
+    """
+    Serves the live view of a benchmark via HTTP in a background thread.
+    """
+    def __init__(self, stats, host="localhost", port=0, stream_interval=1):
+        """
+        :param stats: A ``LiveStats`` instance.
+        :param host: The host name or IP address to bind to.
+        :param port: The port to bind to. With ``0`` the operating system picks a free port.
+        :param stream_interval: The interval in seconds between two events on ``/stream``.
+        """
+        self.stats = stats
+        self.host = host
+        self.port = port
+        self.stream_interval = stream_interval
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        try:
+            self.server = _HttpServer((self.host, self.port), _ProgressRequestHandler)
+        except OSError as e:
+            raise exceptions.SystemSetupError("Cannot expose live progress on [%s:%s]: %s" % (self.host, self.port, str(e)))
+        self.server.stats = self.stats
+        self.server.stream_interval = self.stream_interval
+        self.thread = threading.Thread(target=self.server.serve_forever, name="rally-progress-server", daemon=True)
+        self.thread.start()
+        logger.info("Exposing live progress on [http://%s:%d/progress]." % self.address)
+        return self
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def stop(self):
+        if self.server:
+            self.server.stopped.set()
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+            self.thread = None
+
+
+def parse_endpoint(endpoint):
+    """
+    :param endpoint: Either a port or ``host:port``.
+    :return: A tuple (host, port).
+    """
+    host, _, port = endpoint.rpartition(":")
+    try:
+        return (host if host else "localhost"), int(port)
+    except ValueError:
+        raise exceptions.SystemSetupError("Invalid progress endpoint [%s]. Please specify it as port or host:port." % endpoint)
+
+
+def _type_name(operation_type):
+    return operation_type if isinstance(operation_type, str) else operation_type.name
+
+
+class _HttpServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler):
+        super().__init__(server_address, handler)
+        self.stopped = threading.Event()
+        self.stats = None
+        self.stream_interval = 1
+
+
+class _ProgressRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path in ["", "/progress"]:
+            body = json.dumps(self.server.stats.as_dict()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/stream":
+            self.stream()
+        else:
+            self.send_error(404, "Unknown path [%s]. Use /progress or /stream." % self.path)
+
+    def stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        stopped = False
+        try:
+            while True:
+                progress = self.server.stats.as_dict()
+                self.wfile.write(("data: %s\n\n" % json.dumps(progress)).encode("utf-8"))
+                self.wfile.flush()
+                # when the server is stopped we still send the final state once
+                if progress["status"] == "finished" or stopped:
+                    break
+                stopped = self.server.stopped.wait(self.server.stream_interval)
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Client [%s] has closed the progress stream." % str(self.client_address))
+
+    def log_message(self, format, *args):
+        logger.debug("Progress endpoint: %s" % (format % args))
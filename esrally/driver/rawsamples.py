@@ -0,0 +1,215 @@
+"""
+Stores raw request samples in a compact, columnar binary file. The file starts with a header (magic bytes and a format version),
+followed by a sequence of records. Each record starts with a single byte that denotes its type:
+
+* ``O`` (operation): Assigns a numeric id to an operation name and its type. Samples refer to operations by their id.
+* ``S`` (samples): A batch of samples of one lap. The values of each column are stored consecutively.
+
+All numbers are stored in little-endian byte order.
+"""
+
+import array
+import collections
+import logging
+import struct
+
+from esrally import exceptions
+from esrally.utils import io
+
+logger = logging.getLogger("rally.driver")
+
+MAGIC = b"RALLYRAW"
+VERSION = 1
+
+OPERATION_RECORD = b"O"
+SAMPLES_RECORD = b"S"
+
+# column name and struct format character; the order determines the layout of a samples record
+COLUMNS = [
+    ("client_id", "I"),
+    ("operation", "H"),
+    ("sample_type", "B"),
+    ("success", "B"),
+    ("absolute_time", "d"),
+    ("relative_time", "d"),
+    ("latency_ms", "d"),
+    ("service_time_ms", "d")
+]
+
+RawSample = collections.namedtuple("RawSample", ["lap", "client_id", "operation", "operation_type", "sample_type", "success",
+                                                 "absolute_time", "relative_time", "latency_ms", "service_time_ms"])
+
+
+class RawSampleWriter:
+    """
+    Appends raw samples to a file while the benchmark is running.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.operation_ids = {}
+        self.f = None
+
+    def open(self):
+        io.ensure_dir(io.dirname(self.path))
+        self.f = open(self.path, "ab")
+        if self.f.tell() == 0:
+            self.f.write(MAGIC)
+            self.f.write(struct.pack("<B", VERSION))
+        else:
+            raw_samples, end = _read(self.path)
+            # operation ids are only valid within one file so we need to restore them when we append (e.g. for subsequent laps)
+            self.operation_ids = {(name, operation_type): op_id for op_id, (name, operation_type) in enumerate(raw_samples.operations)}
+            if end < self.f.tell():
+                # otherwise the incomplete record would corrupt all records that we append
+                logger.warning("Removing incomplete record at the end of raw samples file [%s]." % self.path)
+                self.f.truncate(end)
+        return self
+
+    def write(self, samples, lap):
+        """
+        :param samples: A list of ``Sample`` objects.
+        :param lap: The current lap.
+        """
+        if not samples:
+            return
+        columns = {name: array.array(fmt) for name, fmt in COLUMNS}
+        for sample in samples:
+            request_meta_data = sample.request_meta_data or {}
+            columns["client_id"].append(sample.client_id)
+            columns["operation"].append(self._operation_id(sample.operation.name, sample.operation.type))
+            columns["sample_type"].append(int(sample.sample_type))
+            columns["success"].append(1 if request_meta_data.get("success", True) else 0)
+            columns["absolute_time"].append(sample.absolute_time)
+            columns["relative_time"].append(sample.relative_time)
+            columns["latency_ms"].append(sample.latency_ms)
+            columns["service_time_ms"].append(sample.service_time_ms)
+
+        self.f.write(SAMPLES_RECORD)
+        self.f.write(struct.pack("<HI", lap, len(samples)))
+        for name, fmt in COLUMNS:
+            self.f.write(struct.pack("<%d%s" % (len(samples), fmt), *columns[name]))
+        self.f.flush()
+
+    def _operation_id(self, name, operation_type):
+        # built-in operation types are stored by their name
+        if not isinstance(operation_type, str):
+            operation_type = operation_type.name
+        key = (name, operation_type)
+        if key not in self.operation_ids:
+            op_id = len(self.operation_ids)
+            self.operation_ids[key] = op_id
+            encoded_name = name.encode("utf-8")
+            encoded_type = operation_type.encode("utf-8")
+            self.f.write(OPERATION_RECORD)
+            self.f.write(struct.pack("<HH", op_id, len(encoded_name)))
+            self.f.write(encoded_name)
+            self.f.write(struct.pack("<H", len(encoded_type)))
+            self.f.write(encoded_type)
+        return self.operation_ids[key]
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.f = None
+
+
+class RawSamples:
+    """
+    All raw samples of a file. Each column is available as an attribute, e.g. ``latency_ms``, and holds one value per sample.
+    """
+    def __init__(self, operations, lap, columns):
+        """
+        :param operations: A list of tuples (operation name, operation type). The ``operation`` column refers to its indices.
+        :param lap: An array with the lap of each sample.
+        :param columns: A dict of column name to an array of values.
+        """
+        self.operations = operations
+        self.lap = lap
+        for name, _ in COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.lap)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            name, operation_type = self.operations[self.operation[i]]
+            yield RawSample(self.lap[i], self.client_id[i], name, operation_type, self.sample_type[i], self.success[i] == 1,
+                            self.absolute_time[i], self.relative_time[i], self.latency_ms[i], self.service_time_ms[i])
+
+
+class _TruncatedRecord(Exception):
+    pass
+
+
+def read(path):
+    """
+    Reads a raw samples file.
+
+    :param path: The path to a file that has been written by ``RawSampleWriter``.
+    :return: A ``RawSamples`` instance.
+    """
+    return _read(path)[0]
+
+
+def _read(path):
+    """
+    :return: A tuple (``RawSamples`` instance, offset after the last complete record).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise exceptions.DataError("[%s] is not a raw samples file." % path)
+    version = data[len(MAGIC)]
+    if version != VERSION:
+        raise exceptions.DataError("Raw samples file [%s] has version [%d] but only version [%d] is supported." % (path, version, VERSION))
+
+    operations = []
+    lap = array.array("H")
+    columns = {name: array.array(fmt) for name, fmt in COLUMNS}
+    offset = len(MAGIC) + 1
+    end = offset
+
+    def take(length):
+        if offset + length > len(data):
+            raise _TruncatedRecord()
+        return data[offset:offset + length]
+
+    try:
+        while offset < len(data):
+            record_type = data[offset:offset + 1]
+            offset += 1
+            if record_type == OPERATION_RECORD:
+                op_id, name_length = struct.unpack_from("<HH", data, offset)
+                offset += 4
+                name = take(name_length).decode("utf-8")
+                offset += name_length
+                type_length, = struct.unpack_from("<H", data, offset)
+                offset += 2
+                operation_type = take(type_length).decode("utf-8")
+                offset += type_length
+                if op_id != len(operations):
+                    raise exceptions.DataError("Raw samples file [%s] is corrupt. Unexpected operation id [%d]." % (path, op_id))
+                operations.append((name, operation_type))
+            elif record_type == SAMPLES_RECORD:
+                record_lap, count = struct.unpack_from("<HI", data, offset)
+                offset += 6
+                # parse the whole record first so we do not add a partial record
+                values = []
+                for _, fmt in COLUMNS:
+                    column_format = "<%d%s" % (count, fmt)
+                    values.append(struct.unpack_from(column_format, data, offset))
+                    offset += struct.calcsize(column_format)
+                lap.extend([record_lap] * count)
+                for (name, _), column_values in zip(COLUMNS, values):
+                    columns[name].extend(column_values)
+            else:
+                raise exceptions.DataError("Raw samples file [%s] is corrupt. Unknown record type [%s] at offset [%d]." %
+                                           (path, record_type, offset - 1))
+            end = offset
+    except (struct.error, _TruncatedRecord):
+        # the benchmark might have been interrupted while writing
+        logger.warning("Raw samples file [%s] is truncated. Ignoring the incomplete record at the end." % path)
+    except UnicodeDecodeError:
+        raise exceptions.DataError("Raw samples file [%s] is corrupt. Invalid operation name at offset [%d]." % (path, offset))
+    return RawSamples(operations, lap, columns), end
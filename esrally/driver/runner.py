@@ -1,6 +1,7 @@
 import sys
 import types
 import logging
+import threading
 from collections import Counter, OrderedDict
 
 from esrally import exceptions, track
@@ -418,8 +419,24 @@ class Query(Runner):
     """
 
     def __init__(self):
-        self.scroll_id = None
-        self.es = None
+        # runners are shared by all requests of a client, which may be in flight concurrently. Hence, scroll state is per thread.
+        self.scroll_state = threading.local()
+
+    @property
+    def scroll_id(self):
+        return getattr(self.scroll_state, "scroll_id", None)
+
+    @scroll_id.setter
+    def scroll_id(self, scroll_id):
+        self.scroll_state.scroll_id = scroll_id
+
+    @property
+    def es(self):
+        return getattr(self.scroll_state, "es", None)
+
+    @es.setter
+    def es(self, es):
+        self.scroll_state.es = es
 
     def __call__(self, es, params):
         if "pages" in params and "items_per_page" in params:
@@ -1,6 +1,12 @@
+import fcntl
 import logging
-import types
+import mmap
+import os
 import random
+import struct
+import threading
+import time
+import types
 from esrally import exceptions
 
 logger = logging.getLogger("rally.driver")
@@ -123,5 +129,103 @@ class PoissonScheduler(Scheduler):
         return "Poisson scheduler"
 
 
+class SharedRateLimiter:
+    """
+    Paces all clients of a task together so that they achieve the target throughput in aggregate. Instead of following its own schedule,
+    each client reserves the next free slot from a shared timeline when it is ready to issue a request. Hence, clients that are idle
+    pick up work that slower clients cannot take on. For iteration-based tasks, clients also claim iterations from a shared counter so
+    faster clients execute more of the task's iterations.
+
+    The timeline behaves like a token bucket: slots are spaced according to the task's scheduler (e.g. deterministic or Poisson) for the
+    aggregate target throughput but if clients fall behind (e.g. after a stall), at most ``burst`` requests are issued immediately to
+    catch up. All further slots are spaced regularly again.
+
+    The shared state is stored in a memory-mapped file so it can be shared by all threads and processes on this machine that open the
+    same path.
+    """
+    # The shared state consists of the point in time of the next free slot (0 if no slot has been reserved yet) and the number of
+    # iterations that have been claimed so far.
+    STATE = struct.Struct("dq")
+
+    def __init__(self, path, name, params, burst=1, iterations=None, clock=time.perf_counter):
+        """
+        :param path: Path to the file that holds the shared state. All participating rate limiters need to use the same path.
+        :param name: The name of the scheduler that determines the distance between two slots.
+        :param params: The task's parameters. ``target-throughput`` or ``target-interval`` apply to all clients together.
+        :param burst: The maximum number of requests that may be issued immediately after clients have fallen behind schedule.
+        :param iterations: The total number of iterations of all clients or ``None`` if the task is not iteration-based.
+        :param clock: A function returning the current (system-wide monotonic) time in seconds.
+        """
+        aggregate_params = dict(params)
+        aggregate_params["clients"] = 1
+        self.sched = scheduler_for(name, aggregate_params)
+        self.burst = burst
+        # how far the next slot may lag behind the current time
+        self.max_lag = (burst - 1) * _calculate_wait_time(aggregate_params)
+        self.iterations = iterations
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            if os.fstat(self.fd).st_size < SharedRateLimiter.STATE.size:
+                os.ftruncate(self.fd, SharedRateLimiter.STATE.size)
+        self.state = mmap.mmap(self.fd, SharedRateLimiter.STATE.size)
+
+    def _locked(self):
+        return _FileLock(self.lock, self.fd)
+
+    def reserve(self):
+        """
+        Reserves the next free slot.
+
+        :return: The point in time (according to ``clock``) at which the caller may issue its request. It lags at most ``burst - 1``
+                 slots behind the current time.
+        """
+        with self._locked():
+            next_free, claimed = SharedRateLimiter.STATE.unpack_from(self.state)
+            now = self.clock()
+            # the first request is issued immediately; afterwards we allow to catch up with at most burst requests
+            slot = max(next_free, now - self.max_lag) if next_free > 0 else now
+            SharedRateLimiter.STATE.pack_into(self.state, 0, self.sched.next(slot), claimed)
+            return slot
+
+    def claim_iteration(self):
+        """
+        Claims the next iteration of the task.
+
+        :return: The (zero-based) index of the claimed iteration or ``None`` if all iterations have been claimed by now.
+        """
+        with self._locked():
+            next_free, claimed = SharedRateLimiter.STATE.unpack_from(self.state)
+            if claimed >= self.iterations:
+                return None
+            SharedRateLimiter.STATE.pack_into(self.state, 0, next_free, claimed + 1)
+            return claimed
+
+    def close(self):
+        self.state.close()
+        os.close(self.fd)
+
+    def __str__(self):
+        return "shared rate limiter with %s and a burst of [%d]" % (self.sched, self.burst)
+
+
+class _FileLock:
+    def __init__(self, lock, fd):
+        self.lock = lock
+        self.fd = fd
+
+    def __enter__(self):
+        # flock does not provide mutual exclusion between threads using the same file descriptor, hence we need both locks.
+        self.lock.acquire()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
+        return False
+
+
 register_scheduler("deterministic", DeterministicScheduler)
 register_scheduler("poisson", PoissonScheduler)
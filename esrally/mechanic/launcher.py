@@ -1,3 +1,4 @@
+import concurrent.futures
 import logging
 import os
 import signal
@@ -30,6 +31,22 @@ def wait_for_rest_layer(es, max_attempts=10):
     return False
 
 
+def telemetry_params(cfg):
+    return cfg.opts("mechanic", "telemetry.params", mandatory=False, default_value={})
+
+
+def cpu_sample_interval(cfg):
+    return telemetry_params(cfg).get("cpu-sample-interval", telemetry.CpuUsage.DEFAULT_SAMPLE_INTERVAL_SECONDS)
+
+
+def disk_io_sample_interval(cfg):
+    return telemetry_params(cfg).get("disk-io-sample-interval", telemetry.DiskIoSampler.DEFAULT_SAMPLE_INTERVAL_SECONDS)
+
+
+def merge_parts_sample_interval(cfg):
+    return telemetry_params(cfg).get("merge-parts-sample-interval")
+
+
 class ClusterLauncher:
     def __init__(self, cfg, metrics_store, client_factory_class=client.EsClientFactory):
         self.cfg = cfg
@@ -41,11 +58,16 @@ class ClusterLauncher:
         client_options = self.cfg.opts("client", "options")
         es = self.client_factory(hosts, client_options).create()
 
-        t = telemetry.Telemetry(devices=[
+        enabled_devices = self.cfg.opts("mechanic", "telemetry.devices")
+        node_stats_sample_interval = telemetry_params(self.cfg).get("node-stats-sample-interval",
+                                                                    telemetry.NodeStatsSampler.DEFAULT_SAMPLE_INTERVAL_SECONDS)
+
+        t = telemetry.Telemetry(enabled_devices, devices=[
             telemetry.ClusterMetaDataInfo(es),
             telemetry.ClusterEnvironmentInfo(es, self.metrics_store),
             telemetry.NodeStats(es, self.metrics_store),
-            telemetry.IndexStats(es, self.metrics_store)
+            telemetry.IndexStats(es, self.metrics_store),
+            telemetry.NodeStatsSampler(es, self.metrics_store, node_stats_sample_interval)
         ])
 
         # The list of nodes will be populated by ClusterMetaDataInfo, so no need to do it here
@@ -80,7 +102,7 @@ class DockerLauncher:
 
     def start(self, node_configurations):
         nodes = []
-        for node_configuration in node_configurations:
+        for i, node_configuration in enumerate(node_configurations):
 
             node_name = node_configuration.node_name
             host_name = node_configuration.ip
@@ -91,7 +113,7 @@ class DockerLauncher:
             # only support a subset of telemetry for Docker hosts (specifically, we do not allow users to enable any devices)
             node_telemetry = [
                 telemetry.DiskIo(self.metrics_store, len(node_configurations)),
-                telemetry.CpuUsage(self.metrics_store),
+                telemetry.CpuUsage(self.metrics_store, cpu_sample_interval(self.cfg), machine_stats=i == 0),
                 telemetry.NodeEnvironmentInfo(self.metrics_store)
             ]
             t = telemetry.Telemetry(devices=node_telemetry)
@@ -184,6 +206,7 @@ class InProcessLauncher:
     Launcher is responsible for starting and stopping the benchmark candidate.
     """
     PROCESS_WAIT_TIMEOUT_SECONDS = 90.0
+    ABORT_CHECK_INTERVAL_SECONDS = 0.5
 
     def __init__(self, cfg, metrics_store, races_root_dir, challenge_root_dir, clock=time.Clock):
         self.cfg = cfg
@@ -202,9 +225,36 @@ class InProcessLauncher:
         logger.info("Detected Java major version [%s]." % java_major_version)
 
         node_count_on_host = len(node_configurations)
-        return [self._start_node(node_configuration, node_count_on_host, java_major_version) for node_configuration in node_configurations]
+        if node_count_on_host == 0:
+            return []
+        # Start all nodes concurrently so bringing up a cluster on this host takes roughly as long as starting one node. As soon as one
+        # node fails to start, we abort starting all other nodes.
+        abort = threading.Event()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=node_count_on_host) as pool:
+            # machine-wide metrics are the same for all nodes on this host, hence only the first node samples them
+            futures = [pool.submit(self._start_node, node_configuration, node_count_on_host, i == 0, java_major_version, abort)
+                       for i, node_configuration in enumerate(node_configurations)]
+            concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+            if any([f.done() and f.exception() for f in futures]):
+                abort.set()
+                concurrent.futures.wait(futures)
+
+        failures = [f.exception() for f in futures if f.exception()]
+        if failures:
+            # don't leave a partially started cluster behind
+            for node in [f.result() for f in futures if not f.exception()]:
+                logger.info("Terminating node [%s] because other nodes could not be started." % node.node_name)
+                try:
+                    node.telemetry.detach_from_node(node, running=True)
+                finally:
+                    node.process.terminate()
+                node.telemetry.detach_from_node(node, running=False)
+            msg = "Could not start [%d] out of [%d] nodes:\n%s" % (len(failures), node_count_on_host,
+                                                                    "\n".join(["* %s" % str(f) for f in failures]))
+            raise exceptions.LaunchError(msg)
+        return [f.result() for f in futures]
 
-    def _start_node(self, node_configuration, node_count_on_host, java_major_version):
+    def _start_node(self, node_configuration, node_count_on_host, first_node_on_host, java_major_version, abort):
         host_name = node_configuration.ip
         node_name = node_configuration.node_name
         car = node_configuration.car
@@ -221,16 +271,17 @@ class InProcessLauncher:
             telemetry.Gc(node_telemetry_dir, java_major_version),
             telemetry.PerfStat(node_telemetry_dir),
             telemetry.DiskIo(self.metrics_store, node_count_on_host),
-            telemetry.CpuUsage(self.metrics_store),
+            telemetry.DiskIoSampler(data_paths, self.metrics_store, disk_io_sample_interval(self.cfg)),
+            telemetry.CpuUsage(self.metrics_store, cpu_sample_interval(self.cfg), machine_stats=first_node_on_host),
             telemetry.NodeEnvironmentInfo(self.metrics_store),
             telemetry.IndexSize(data_paths, self.metrics_store),
-            telemetry.MergeParts(self.metrics_store, node_configuration.log_path),
+            telemetry.MergeParts(self.metrics_store, node_configuration.log_path, merge_parts_sample_interval(self.cfg)),
         ]
 
         t = telemetry.Telemetry(enabled_devices, devices=node_telemetry)
 
         env = self._prepare_env(car, node_name, t)
-        node_process = self._start_process(env, node_name, binary_path)
+        node_process = self._start_process(env, node_name, binary_path, abort)
         node = cluster.Node(node_process, host_name, node_name, t)
         logger.info("Node [%s] has successfully started. Attaching telemetry devices." % node_name)
         t.attach_to_node(node)
@@ -268,17 +319,18 @@ class InProcessLauncher:
             else:  # merge
                 env[k] = v + separator + env[k]
 
-    def _start_process(self, env, node_name, binary_path):
+    def _start_process(self, env, node_name, binary_path, abort):
         if os.geteuid() == 0:
             raise exceptions.LaunchError("Cannot launch Elasticsearch as root. Please run Rally as a non-root user.")
-        os.chdir(binary_path)
         startup_event = threading.Event()
         cmd = ["bin/elasticsearch"]
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, env=env)
+        # nodes are started concurrently, so we must not change the working directory of the Rally process.
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, env=env,
+                                   cwd=binary_path)
         t = threading.Thread(target=self._read_output, args=(node_name, process, startup_event))
         t.setDaemon(True)
         t.start()
-        if startup_event.wait(timeout=InProcessLauncher.PROCESS_WAIT_TIMEOUT_SECONDS):
+        if self._wait_for_startup(startup_event, abort):
             process.poll()
             # has the process terminated?
             if process.returncode:
@@ -288,6 +340,11 @@ class InProcessLauncher:
             else:
                 logger.info("Started node [%s] with PID [%s]" % (node_name, process.pid))
                 return process
+        elif abort.is_set():
+            msg = "Aborted start of node [%s] because another node could not be started." % node_name
+            logger.error(msg)
+            process.terminate()
+            raise exceptions.LaunchError(msg)
         else:
             msg = "Could not start node [%s] within timeout period of [%s] seconds." % (
                 node_name, InProcessLauncher.PROCESS_WAIT_TIMEOUT_SECONDS)
@@ -300,6 +357,22 @@ class InProcessLauncher:
             logger.error(msg)
             raise exceptions.LaunchError(msg)
 
+    def _wait_for_startup(self, startup_event, abort):
+        """
+        Waits until the node has signalled startup, the timeout has expired or the start of all nodes has been aborted.
+
+        :return: True iff the node has signalled startup.
+        """
+        stop_watch = self._clock.stop_watch()
+        stop_watch.start()
+        while not abort.is_set():
+            remaining = InProcessLauncher.PROCESS_WAIT_TIMEOUT_SECONDS - stop_watch.split_time()
+            if remaining <= 0:
+                return False
+            if startup_event.wait(timeout=min(remaining, InProcessLauncher.ABORT_CHECK_INTERVAL_SECONDS)):
+                return True
+        return False
+
     def _read_output(self, node_name, server, startup_event):
         """
         Reads the output from the ES (node) subprocess.
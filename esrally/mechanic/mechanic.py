@@ -82,7 +82,11 @@ class EngineStarted:
 
 
 class StopEngine:
-    pass
+    def __init__(self, benchmark_complete=False):
+        """
+        :param benchmark_complete: True iff the benchmark has completed successfully.
+        """
+        self.benchmark_complete = benchmark_complete
 
 
 class EngineStopped:
@@ -148,7 +152,8 @@ class NodesStarted:
 
 
 class StopNodes:
-    pass
+    def __init__(self, benchmark_complete=False):
+        self.benchmark_complete = benchmark_complete
 
 
 class NodesStopped:
@@ -245,7 +250,8 @@ class MechanicActor(actor.RallyActor):
                 # detach from cluster and gather all system metrics
                 self.cluster_launcher.stop(self.cluster)
                 # we might have experienced a launch error, hence we need to allow to stop the cluster also after a launch
-                self.send_to_children_and_transition(sender, StopNodes(), ["nodes_started", "benchmark_stopped"], "cluster_stopping")
+                self.send_to_children_and_transition(sender, StopNodes(msg.benchmark_complete), ["nodes_started", "benchmark_stopped"],
+                                                     "cluster_stopping")
             elif isinstance(msg, NodesStopped):
                 self.metrics_store.bulk_add(msg.system_metrics)
                 self.transition_when_all_children_responded(sender, msg, "cluster_stopping", "cluster_stopped", self.on_all_nodes_stopped)
@@ -491,7 +497,7 @@ class NodeMechanicActor(actor.RallyActor):
                 self.send(sender, BenchmarkStopped(self.metrics_store.to_externalizable(clear=True)))
             elif isinstance(msg, StopNodes):
                 logger.info("Stopping nodes %s." % self.mechanic.nodes)
-                self.mechanic.stop_engine()
+                self.mechanic.stop_engine(msg.benchmark_complete)
                 self.send(sender, NodesStopped(self.metrics_store.to_externalizable()))
                 # clear all state as the mechanic might get reused later
                 self.running = False
@@ -530,6 +536,9 @@ def create(cfg, metrics_store, all_node_ips, cluster_settings=None, sources=Fals
         car = team.load_car(repo, cfg.opts("mechanic", "car.name"))
         plugins = team.load_plugins(repo, cfg.opts("mechanic", "car.plugins"))
 
+    if cfg.opts("mechanic", "cluster.snapshot.name", mandatory=False) and not distribution:
+        raise exceptions.SystemSetupError("Cluster snapshots are only supported for the pipeline from-distribution.")
+
     if sources:
         try:
             src_dir = cfg.opts("source", "local.src.dir")
@@ -547,7 +556,8 @@ def create(cfg, metrics_store, all_node_ips, cluster_settings=None, sources=Fals
             raise exceptions.RallyError("Source builds of plugins are not supported yet. For more details, please "
                                         "check https://github.com/elastic/rally/issues/309 and upgrade Rally in case support has been "
                                         "added in the meantime.")
-        s = lambda: supplier.from_sources(remote_url, src_dir, revision, gradle, java_home, challenge_root_path, build)
+        cache = supplier.artefact_cache(cfg)
+        s = lambda: supplier.from_sources(remote_url, src_dir, revision, gradle, java_home, challenge_root_path, build, cache)
         p = []
         for node_id in node_ids:
             p.append(provisioner.local_provisioner(cfg, car, plugins, cluster_settings, all_node_ips, challenge_root_path, node_id))
@@ -557,12 +567,15 @@ def create(cfg, metrics_store, all_node_ips, cluster_settings=None, sources=Fals
         repo_name = cfg.opts("mechanic", "distribution.repository")
         distributions_root = "%s/%s" % (cfg.opts("node", "root.dir"), cfg.opts("source", "distribution.dir"))
         distribution_cfg = cfg.all_opts("distributions")
+        snapshot = provisioner.cluster_snapshot(cfg, car, plugins, all_node_ips)
+        cache = supplier.artefact_cache(cfg)
 
         s = lambda: supplier.from_distribution(version=version, repo_name=repo_name, distribution_config=distribution_cfg,
-                                               distributions_root=distributions_root, plugins=plugins)
+                                               distributions_root=distributions_root, plugins=plugins, cache=cache)
         p = []
         for node_id in node_ids:
-            p.append(provisioner.local_provisioner(cfg, car, plugins, cluster_settings, all_node_ips, challenge_root_path, node_id))
+            p.append(provisioner.local_provisioner(cfg, car, plugins, cluster_settings, all_node_ips, challenge_root_path, node_id,
+                                                   snapshot))
         l = launcher.InProcessLauncher(cfg, metrics_store, races_root, challenge_root_path)
     elif external:
         if cluster_settings:
@@ -619,8 +632,8 @@ class Mechanic:
         for node in self.nodes:
             node.on_benchmark_stop()
 
-    def stop_engine(self):
+    def stop_engine(self, benchmark_complete=False):
         self.launcher.stop(self.nodes)
         self.nodes = []
         for p in self.provisioners:
-            p.cleanup()
+            p.cleanup(benchmark_complete)
@@ -1,18 +1,20 @@
 import os
 import glob
+import json
 import shutil
+import hashlib
 import logging
 from enum import Enum
 
 import jinja2
 
-from esrally import exceptions
+from esrally import exceptions, paths
 from esrally.utils import io, console, process, modules
 
 logger = logging.getLogger("rally.provisioner")
 
 
-def local_provisioner(cfg, car, plugins, cluster_settings, all_node_ips, target_root, node_id):
+def local_provisioner(cfg, car, plugins, cluster_settings, all_node_ips, target_root, node_id, snapshot=None):
     ip = cfg.opts("provisioning", "node.ip")
     http_port = cfg.opts("provisioning", "node.http.port")
     node_name_prefix = cfg.opts("provisioning", "node.name.prefix")
@@ -25,7 +27,34 @@ def local_provisioner(cfg, car, plugins, cluster_settings, all_node_ips, target_
     es_installer = ElasticsearchInstaller(car, node_name, node_root_dir, data_root_paths, all_node_ips, ip, http_port)
     plugin_installers = [PluginInstaller(plugin) for plugin in plugins]
 
-    return BareProvisioner(cluster_settings, es_installer, plugin_installers, preserve)
+    return BareProvisioner(cluster_settings, es_installer, plugin_installers, preserve, snapshot=snapshot)
+
+
+def cluster_snapshot(cfg, car, plugins, all_node_ips):
+    """
+    Creates a ``ClusterSnapshot`` if the user has requested to store or to restore a cluster snapshot.
+
+    :param cfg: The config object.
+    :param car: The car that is benchmarked.
+    :param plugins: A list of plugins that are installed.
+    :param all_node_ips: The IPs of all nodes in the cluster.
+    :return: A ``ClusterSnapshot`` or ``None`` if cluster snapshots are not used.
+    """
+    name = cfg.opts("mechanic", "cluster.snapshot.name", mandatory=False)
+    if not name:
+        return None
+    mode = cfg.opts("mechanic", "cluster.snapshot.mode")
+    # The configuration files of each node are rendered for each race so we only need to include everything in the fingerprint that
+    # determines the binary and the contents of the data directories.
+    fingerprint = {
+        "track": cfg.opts("track", "track.name"),
+        "distribution-version": cfg.opts("mechanic", "distribution.version"),
+        "car": car.name,
+        "plugins": sorted([plugin.name for plugin in plugins]),
+        "node-ips": sorted(all_node_ips),
+        "data-paths": cfg.opts("mechanic", "node.datapaths")
+    }
+    return ClusterSnapshot(paths.cluster_snapshots_root(cfg), name, fingerprint, mode)
 
 
 def no_op_provisioner():
@@ -97,6 +126,130 @@ def cleanup(preserve, install_dir, data_paths):
                 logger.exception("Could not delete [%s]. Skipping..." % install_dir)
 
 
+def link_or_copy_tree(source_root_path, target_root_path):
+    """
+    Copies a data directory of an Elasticsearch node. Lucene never modifies a file once it is written so index files are hard-linked
+    to avoid copying several GB. All other files (e.g. the translog) are modified in place by Elasticsearch and are copied.
+
+    :param source_root_path: The data directory to copy.
+    :param target_root_path: The target directory. It is created if it does not exist.
+    """
+    for root, dirs, files in os.walk(source_root_path):
+        relative_root = root[len(source_root_path) + 1:]
+        absolute_target_root = os.path.join(target_root_path, relative_root)
+        io.ensure_dir(absolute_target_root)
+        immutable = "index" in relative_root.split(os.sep)
+        for name in files:
+            source_file = os.path.join(root, name)
+            target_file = os.path.join(absolute_target_root, name)
+            # the lock file of an index must not be shared between two nodes
+            if immutable and name != "write.lock":
+                try:
+                    os.link(source_file, target_file)
+                    continue
+                except OSError:
+                    # e.g. source and target are on different file systems
+                    logger.debug("Could not link [%s] to [%s]. Copying it instead." % (source_file, target_file))
+            shutil.copy2(source_file, target_file)
+
+
+class ClusterSnapshot:
+    """
+    A cluster snapshot contains the provisioned installation directory and the data directories of all nodes on this host after a
+    successful race. Later races with the same fingerprint (i.e. the same track, car, distribution version, plugins and nodes) can
+    restore it instead of installing Elasticsearch and indexing all documents again.
+    """
+    COMPLETED_MARKER = ".completed"
+
+    def __init__(self, root_path, name, fingerprint, mode):
+        """
+        :param root_path: The root directory for all cluster snapshots.
+        :param name: A user-defined name of this snapshot.
+        :param fingerprint: A dict describing the cluster. Snapshots are only restored if the fingerprint matches.
+        :param mode: Either "store" or "restore".
+        """
+        if mode not in ["store", "restore"]:
+            raise exceptions.SystemSetupError("Unknown cluster snapshot mode [%s]. Valid modes are: store, restore." % mode)
+        self.name = name
+        self.fingerprint = fingerprint
+        self.mode = mode
+        fingerprint_hash = hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()
+        self.path = os.path.join(root_path, name, fingerprint_hash)
+
+    def node_path(self, node_name, staging=False):
+        node_path = os.path.join(self.path, node_name)
+        # a new snapshot is assembled next to the current one so a failed store does not destroy the last good snapshot
+        return "%s.staging" % node_path if staging else node_path
+
+    def install_path(self, node_name, staging=False):
+        return os.path.join(self.node_path(node_name, staging), "install")
+
+    def data_path(self, node_name, index, staging=False):
+        return os.path.join(self.node_path(node_name, staging), "data", str(index))
+
+    def exists(self, node_name):
+        return os.path.isfile(os.path.join(self.node_path(node_name), ClusterSnapshot.COMPLETED_MARKER))
+
+    def store_install(self, node_name, es_home_path):
+        staging_path = self.node_path(node_name, staging=True)
+        if os.path.exists(staging_path):
+            logger.info("Removing incomplete cluster snapshot at [%s]." % staging_path)
+            shutil.rmtree(staging_path)
+        target_path = os.path.join(self.install_path(node_name, staging=True), io.basename(es_home_path))
+        logger.info("Storing installation directory [%s] of node [%s] in cluster snapshot at [%s]." %
+                    (es_home_path, node_name, target_path))
+        shutil.copytree(es_home_path, target_path, symlinks=True)
+
+    def store_data(self, node_name, data_paths):
+        staging_path = self.node_path(node_name, staging=True)
+        for index, data_path in enumerate(data_paths):
+            target_path = self.data_path(node_name, index, staging=True)
+            logger.info("Storing data directory [%s] of node [%s] in cluster snapshot at [%s]." % (data_path, node_name, target_path))
+            link_or_copy_tree(data_path, target_path)
+        with open(os.path.join(staging_path, ClusterSnapshot.COMPLETED_MARKER), "wt") as f:
+            f.write(json.dumps(self.fingerprint, indent=2, sort_keys=True))
+        # only replace the previous snapshot now that the new one is complete
+        node_path = self.node_path(node_name)
+        previous_path = "%s.previous" % node_path
+        if os.path.exists(previous_path):
+            shutil.rmtree(previous_path)
+        if os.path.exists(node_path):
+            os.rename(node_path, previous_path)
+        os.rename(staging_path, node_path)
+        if os.path.exists(previous_path):
+            logger.info("Removing previous cluster snapshot at [%s]." % previous_path)
+            shutil.rmtree(previous_path)
+        console.info("Stored cluster snapshot [%s] for node [%s]." % (self.name, node_name), logger=logger)
+
+    def restore_install(self, node_name, install_dir):
+        """
+        Restores the installation directory of the provided node.
+
+        :param node_name: The name of the node.
+        :param install_dir: The directory into which Elasticsearch should be restored.
+        :return: The restored Elasticsearch home directory.
+        """
+        if not self.exists(node_name):
+            raise exceptions.SystemSetupError("No cluster snapshot [%s] exists for node [%s] with track [%s], car [%s] and distribution "
+                                              "version [%s]. Please store one first with --store-cluster-snapshot." %
+                                              (self.name, node_name, self.fingerprint["track"], self.fingerprint["car"],
+                                               self.fingerprint["distribution-version"]))
+        source_path = glob.glob("%s/elasticsearch*" % self.install_path(node_name))[0]
+        es_home_path = os.path.join(install_dir, io.basename(source_path))
+        logger.info("Restoring installation directory of node [%s] from [%s] to [%s]." % (node_name, source_path, es_home_path))
+        shutil.copytree(source_path, es_home_path, symlinks=True)
+        return es_home_path
+
+    def restore_data(self, node_name, data_paths):
+        for index, data_path in enumerate(data_paths):
+            source_data_path = self.data_path(node_name, index)
+            logger.info("Restoring data directory of node [%s] from [%s] to [%s]." % (node_name, source_data_path, data_path))
+            link_or_copy_tree(source_data_path, data_path)
+
+    def __str__(self):
+        return self.name
+
+
 class ProvisioningPhase(Enum):
     post_install = 10
 
@@ -139,18 +292,27 @@ class BareProvisioner:
     of the benchmark candidate to the appropriate place.
     """
 
-    def __init__(self, cluster_settings, es_installer, plugin_installers, preserve, apply_config=_apply_config):
+    def __init__(self, cluster_settings, es_installer, plugin_installers, preserve, apply_config=_apply_config, snapshot=None):
         self.preserve = preserve
         self._cluster_settings = cluster_settings
         self.es_installer = es_installer
         self.plugin_installers = plugin_installers
         self.apply_config = apply_config
+        self.snapshot = snapshot
 
     def prepare(self, binary):
-        self._install_binary(binary)
+        if self.snapshot and self.snapshot.mode == "restore":
+            self.es_installer.restore(self.snapshot)
+        else:
+            self._install_binary(binary)
+            if self.snapshot:
+                self.snapshot.store_install(self.es_installer.node_name, self.es_installer.es_home_path)
         return self._configure()
 
-    def cleanup(self):
+    def cleanup(self, benchmark_complete=False):
+        # only store data that are the result of a complete benchmark
+        if benchmark_complete and self.snapshot and self.snapshot.mode == "store":
+            self.snapshot.store_data(self.es_installer.node_name, self.es_installer.data_paths)
         self.es_installer.cleanup(self.preserve)
 
     def _install_binary(self, binaries):
@@ -229,6 +391,14 @@ class ElasticsearchInstaller:
         self.es_home_path = glob.glob("%s/elasticsearch*" % self.install_dir)[0]
         self.data_paths = self._data_paths()
 
+    def restore(self, snapshot):
+        logger.info("Restoring candidate from cluster snapshot [%s] in [%s]." % (snapshot, self.install_dir))
+        io.ensure_dir(self.install_dir)
+        io.ensure_dir(self.node_log_dir)
+        self.es_home_path = snapshot.restore_install(self.node_name, self.install_dir)
+        self.data_paths = self._data_paths()
+        snapshot.restore_data(self.node_name, self.data_paths)
+
     def delete_pre_bundled_configuration(self):
         config_path = os.path.join(self.es_home_path, "config")
         logger.info("Deleting pre-bundled Elasticsearch configuration at [%s]" % config_path)
@@ -371,7 +541,7 @@ class NoOpProvisioner:
     def prepare(self, *args):
         return None
 
-    def cleanup(self):
+    def cleanup(self, *args):
         pass
 
 
@@ -456,7 +626,7 @@ class DockerProvisioner:
         return NodeConfiguration(self.car, self.node_ip, self.node_name, self.node_root_dir, self.binary_path,
                                  self.node_log_dir, self.data_paths)
 
-    def cleanup(self):
+    def cleanup(self, benchmark_complete=False):
         cleanup(self.preserve, self.install_dir, self.data_paths)
 
     def docker_vars(self, mounts):
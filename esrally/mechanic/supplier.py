@@ -1,25 +1,44 @@
 import os
+import re
 import glob
+import shutil
+import hashlib
 import logging
+import tempfile
+import threading
 import urllib.error
+import concurrent.futures
 
-from esrally import exceptions
+from esrally import config, exceptions, paths
 from esrally.utils import git, console, io, process, net, versions, convert
 from esrally.exceptions import BuildError, SystemSetupError
 
 logger = logging.getLogger("rally.supplier")
 
 
-def from_sources(remote_url, src_dir, revision, gradle, java_home, log_dir, build=True):
+def artefact_cache(cfg):
+    """
+    :param cfg: The config object.
+    :return: An ``ArtefactCache`` or ``None`` if the user has disabled it by setting its maximum size to zero.
+    """
+    max_size_gb = float(cfg.opts("source", "artefact.cache.max.size.gb", default_value=ArtefactCache.DEFAULT_MAX_SIZE_GB,
+                                 mandatory=False))
+    if max_size_gb <= 0:
+        logger.info("Artefact cache is disabled.")
+        return None
+    return ArtefactCache(paths.artefacts_root(cfg), int(max_size_gb * 1024 * 1024 * 1024))
+
+
+def from_sources(remote_url, src_dir, revision, gradle, java_home, log_dir, build=True, cache=None):
     if build:
         console.info("Preparing for race ...", end="", flush=True)
     try:
-        SourceRepository(remote_url, src_dir).fetch(revision)
+        git_revision = SourceRepository(remote_url, src_dir).fetch(revision)
 
-        builder = Builder(src_dir, gradle, java_home, log_dir)
+        builder = Builder(src_dir, gradle, java_home, log_dir, cache)
 
         if build:
-            builder.build()
+            builder.build(git_revision)
             console.println(" [OK]")
         return {"elasticsearch": builder.binary}
     except BaseException:
@@ -28,7 +47,70 @@ def from_sources(remote_url, src_dir, revision, gradle, java_home, log_dir, buil
         raise
 
 
-def from_distribution(version, repo_name, distribution_config, distributions_root, plugins):
+def prebuild(cfg):
+    """
+    Builds several revisions in parallel, each one in a separate git worktree, and adds the binaries to the artefact cache. Later races
+    for these revisions will skip the build.
+
+    :param cfg: The config object.
+    """
+    revisions = cfg.opts("build", "revisions")
+    if len(revisions) == 0:
+        raise exceptions.SystemSetupError("Please specify at least one revision to build with --revisions.")
+    cache = artefact_cache(cfg)
+    if cache is None:
+        raise exceptions.SystemSetupError("Building revisions ahead of time requires the artefact cache but it is disabled. Please set "
+                                          "artefact.cache.max.size.gb in the source section of your Rally config file to a "
+                                          "positive value.")
+    try:
+        src_dir = cfg.opts("source", "local.src.dir")
+    except config.ConfigError:
+        logger.exception("Cannot determine source directory")
+        raise exceptions.SystemSetupError("You cannot build Elasticsearch from sources. Did you install Gradle? Please install"
+                                          " all prerequisites and reconfigure Rally.")
+    remote_url = cfg.opts("source", "remote.repo.url")
+    gradle = cfg.opts("build", "gradle.bin")
+    java_home = cfg.opts("runtime", "java8.home")
+    worktrees_root = paths.worktrees_root(cfg)
+
+    repo = SourceRepository(remote_url, src_dir)
+    repo.fetch_remote()
+    # git does not support modifying worktrees of the same repository concurrently
+    worktree_lock = threading.Lock()
+
+    def build(revision):
+        name = re.sub(r"[^\w.-]", "_", revision)
+        worktree_dir = os.path.join(worktrees_root, name)
+        with worktree_lock:
+            git.remove_worktree(src_dir, worktree_dir)
+            git.add_worktree(src_dir, worktree_dir, repo.revision_spec(revision))
+        try:
+            git_revision = git.head_revision(worktree_dir)
+            builder = Builder(worktree_dir, gradle, java_home, os.path.join(worktrees_root, "logs", name), cache)
+            builder.build(git_revision)
+            return git_revision, builder.binary
+        finally:
+            with worktree_lock:
+                git.remove_worktree(src_dir, worktree_dir)
+
+    workers = min(cfg.opts("build", "workers"), len(revisions))
+    console.info("Building %d revision(s) with %d worker(s) ..." % (len(revisions), workers), logger=logger)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(build, revision) for revision in revisions]
+    failures = []
+    for revision, future in zip(revisions, futures):
+        if future.exception():
+            logger.error("Could not build revision [%s]." % revision, exc_info=future.exception())
+            failures.append("* %s: %s" % (revision, str(future.exception())))
+        else:
+            git_revision, binary = future.result()
+            console.info("Built revision [%s] (git revision [%s]): [%s]" % (revision, git_revision, binary), logger=logger)
+    if failures:
+        raise exceptions.BuildError("Could not build [%d] out of [%d] revisions:\n%s" % (len(failures), len(revisions),
+                                                                                        "\n".join(failures)))
+
+
+def from_distribution(version, repo_name, distribution_config, distributions_root, plugins, cache=None):
     if version.strip() == "":
         raise exceptions.SystemSetupError("Could not determine version. Please specify the Elasticsearch distribution "
                                           "to download with the command line parameter --distribution-version. "
@@ -61,11 +143,111 @@ def from_distribution(version, repo_name, distribution_config, distributions_roo
         # key-value pair this is ok.
         plugin_url = repo.plugin_download_url(plugin.name)
         if plugin_url:
-            binaries[plugin.name] = plugin_url
+            # snapshot builds of plugins may change at any time
+            if cache and repo.cache:
+                binaries[plugin.name] = _cached_plugin(cache, plugin.name, plugin_url)
+            else:
+                binaries[plugin.name] = plugin_url
 
     return binaries
 
 
+def _cached_plugin(cache, plugin_name, plugin_url):
+    if plugin_url.startswith("file:"):
+        return plugin_url
+    # the URL contains the version so it uniquely identifies the plugin binary
+    key = "plugin-%s-%s" % (plugin_name, plugin_url)
+    plugin_path = cache.get(key)
+    if plugin_path:
+        logger.info("Using cached plugin [%s] at [%s]." % (plugin_name, plugin_path))
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="rally-plugin-")
+        try:
+            download_path = os.path.join(tmp_dir, io.basename(plugin_url))
+            logger.info("Downloading plugin [%s] from [%s]." % (plugin_name, plugin_url))
+            net.download(plugin_url, download_path)
+            plugin_path = cache.put(key, download_path, move=True)
+        except BaseException:
+            # let the plugin installer retry and report a meaningful error
+            logger.exception("Could not download plugin [%s] from [%s]. Not caching it." % (plugin_name, plugin_url))
+            return plugin_url
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return "file://%s" % plugin_path
+
+
+class ArtefactCache:
+    """
+    Caches artefacts like Elasticsearch binaries that have been built from sources or plugin archives. Each artefact is stored under
+    a key that uniquely identifies its contents (e.g. a git revision or a versioned download URL). If the cache grows beyond its
+    maximum size, the least recently used artefacts are evicted.
+    """
+    DEFAULT_MAX_SIZE_GB = 10
+
+    def __init__(self, root_path, max_size_in_bytes):
+        self.root_path = root_path
+        self.max_size_in_bytes = max_size_in_bytes
+
+    def _entry_path(self, key):
+        return os.path.join(self.root_path, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        """
+        :param key: The key of the artefact.
+        :return: The path to the cached artefact or ``None`` if it is not cached.
+        """
+        entry_path = self._entry_path(key)
+        if not os.path.isdir(entry_path):
+            return None
+        files = os.listdir(entry_path)
+        if len(files) != 1:
+            logger.warning("Ignoring corrupt cache entry [%s] for [%s]." % (entry_path, key))
+            return None
+        # the modification time of an entry tracks when it has been used last
+        os.utime(entry_path)
+        return os.path.join(entry_path, files[0])
+
+    def put(self, key, source_path, move=False):
+        """
+        Adds an artefact to the cache and evicts least recently used artefacts if necessary.
+
+        :param key: The key of the artefact.
+        :param source_path: The path to the artefact.
+        :param move: Whether the artefact should be moved to the cache instead of being copied (default: ``False``).
+        :return: The path to the cached artefact.
+        """
+        io.ensure_dir(self.root_path)
+        entry_path = self._entry_path(key)
+        # populate the entry in a temporary directory first so concurrent readers never see a partially written artefact.
+        tmp_entry_path = tempfile.mkdtemp(prefix=".tmp-", dir=self.root_path)
+        target_path = os.path.join(tmp_entry_path, io.basename(source_path))
+        if move:
+            shutil.move(source_path, target_path)
+        else:
+            shutil.copy2(source_path, target_path)
+        if os.path.exists(entry_path):
+            shutil.rmtree(entry_path)
+        os.rename(tmp_entry_path, entry_path)
+        logger.info("Added [%s] to artefact cache at [%s]." % (key, entry_path))
+        self.evict(keep=entry_path)
+        return os.path.join(entry_path, io.basename(source_path))
+
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.root_path):
+            entry_path = os.path.join(self.root_path, name)
+            if not name.startswith(".") and os.path.isdir(entry_path):
+                entries.append((os.path.getmtime(entry_path), io.get_size(entry_path), entry_path))
+        total_size = sum([size for _, size, _ in entries])
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size_in_bytes:
+                break
+            if entry_path != keep:
+                logger.info("Evicting [%s] from artefact cache." % entry_path)
+                shutil.rmtree(entry_path, ignore_errors=True)
+                total_size -= size
+
+
 class SourceRepository:
     """
     Supplier fetches the benchmark candidate source tree from the remote repository.
@@ -76,9 +258,34 @@ class SourceRepository:
         self.src_dir = src_dir
 
     def fetch(self, revision):
+        """
+        :param revision: The revision as specified by the user.
+        :return: The resulting git revision.
+        """
         # assume fetching of latest version for now
         self._try_init()
-        self._update(revision)
+        return self._update(revision)
+
+    def fetch_remote(self):
+        """
+        Fetches all revisions from the remote repository without changing the working copy.
+        """
+        self._try_init()
+        git.fetch(self.src_dir)
+
+    def revision_spec(self, revision):
+        """
+        :param revision: The revision as specified by the user.
+        :return: A corresponding revision specification that git understands.
+        """
+        if revision == "latest":
+            return "origin/master"
+        elif revision == "current":
+            return "HEAD"
+        elif revision.startswith("@"):
+            return "`git -C %s rev-list -n 1 --before=\"%s\" --date=iso8601 origin/master`" % (self.src_dir, revision[1:])
+        else:
+            return revision
 
     def _try_init(self):
         if not git.is_working_copy(self.src_dir):
@@ -98,6 +305,7 @@ class SourceRepository:
             git.pull_revision(self.src_dir, revision)
         git_revision = git.head_revision(self.src_dir)
         logger.info("Specified revision [%s] on command line results in git revision [%s]" % (revision, git_revision))
+        return git_revision
 
 
 class Builder:
@@ -107,18 +315,64 @@ class Builder:
     It is not intended to be used directly but should be triggered by its mechanic.
     """
 
-    def __init__(self, src_dir, gradle=None, java_home=None, log_dir=None):
+    def __init__(self, src_dir, gradle=None, java_home=None, log_dir=None, cache=None):
         self.src_dir = src_dir
         self.gradle = gradle
         self.java_home = java_home
         self.log_dir = log_dir
-
-    def build(self):
-        self.run("clean")
+        self.cache = cache
+        self.cached_binary = None
+
+    def build(self, revision=None):
+        """
+        Builds a tar.gz distribution. If an artefact cache is available, a binary that has been built previously for the same (unmodified)
+        revision is reused instead.
+
+        :param revision: The git revision of the source tree (optional).
+        """
+        key = self._cache_key(revision)
+        if key:
+            self.cached_binary = self.cache.get(key)
+            if self.cached_binary:
+                logger.info("Skipping build of revision [%s]. Using cached binary [%s]." % (revision, self.cached_binary))
+                return
+        # Gradle only rebuilds what has changed since the last build so we only need a clean build if we build another revision.
+        if revision is not None and revision == self._last_built_revision():
+            logger.info("Building revision [%s] again. Skipping clean build." % revision)
+        else:
+            self.run("clean")
         self.run(":distribution:tar:assemble")
+        if revision is not None:
+            io.ensure_dir(io.dirname(self._revision_marker_path))
+            with open(self._revision_marker_path, "wt") as f:
+                f.write(revision)
+        if key:
+            self.cached_binary = self.cache.put(key, self.binary)
+
+    @property
+    def _revision_marker_path(self):
+        # this is inside the build directory so "gradle clean" removes it
+        return os.path.join(self.src_dir, "build", "rally-build-revision")
+
+    def _last_built_revision(self):
+        try:
+            with open(self._revision_marker_path, "rt") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _cache_key(self, revision):
+        if self.cache is None or revision is None:
+            return None
+        if git.has_local_changes(self.src_dir):
+            logger.info("Not using artefact cache for [%s] because it contains local changes." % self.src_dir)
+            return None
+        return "elasticsearch-src-%s" % revision
 
     @property
     def binary(self):
+        if self.cached_binary:
+            return self.cached_binary
         try:
             return glob.glob("%s/distribution/tar/build/distributions/*.tar.gz" % self.src_dir)[0]
         except IndexError:
@@ -10,9 +10,12 @@ from esrally.utils import console, git, versions, io
 
 logger = logging.getLogger("rally.team")
 
+# listing cars and plugins does not fetch from the remote team repository if it has been fetched within this period (in seconds)
+LIST_MAX_FETCH_AGE_SECONDS = 60 * 60
+
 
 def list_cars(cfg):
-    cars = CarLoader(team_repo(cfg)).car_names()
+    cars = CarLoader(team_repo(cfg, max_fetch_age=LIST_MAX_FETCH_AGE_SECONDS)).car_names()
     console.println("Available cars:\n")
     console.println(tabulate.tabulate([[str(c)] for c in cars], headers=["Name"]))
 
@@ -22,7 +25,7 @@ def load_car(repo, name):
 
 
 def list_plugins(cfg):
-    plugins = PluginLoader(team_repo(cfg)).plugins()
+    plugins = PluginLoader(team_repo(cfg, max_fetch_age=LIST_MAX_FETCH_AGE_SECONDS)).plugins()
     if plugins:
         console.println("Available Elasticsearch plugins:\n")
         console.println(tabulate.tabulate([[p.name, p.config] for p in plugins], headers=["Name", "Configuration"]))
@@ -55,9 +58,9 @@ def load_plugins(repo, plugin_names):
     return plugins
 
 
-def team_repo(cfg, update=True):
+def team_repo(cfg, update=True, max_fetch_age=None):
     distribution_version = cfg.opts("mechanic", "distribution.version", mandatory=False)
-    repo = TeamRepository(cfg)
+    repo = TeamRepository(cfg, max_fetch_age=max_fetch_age)
     if update:
         repo.update(distribution_version)
     return repo
@@ -69,7 +72,12 @@ class TeamRepository:
     Manages teams (consisting of cars and their plugins).
     """
 
-    def __init__(self, cfg, fetch=True):
+    def __init__(self, cfg, fetch=True, max_fetch_age=None):
+        """
+        :param cfg: The config object.
+        :param fetch: Whether to fetch from the remote repository (default: True).
+        :param max_fetch_age: If set, fetching is skipped if the last fetch has happened less than this number of seconds ago.
+        """
         self.cfg = cfg
         self.name = cfg.opts("mechanic", "repository.name")
         self.offline = cfg.opts("system", "offline.mode")
@@ -83,6 +91,9 @@ class TeamRepository:
             # a normal git repo with a remote
             if not git.is_working_copy(self.teams_dir):
                 git.clone(src=self.teams_dir, remote=self.url)
+            elif max_fetch_age is not None and git.fetched_within(self.teams_dir, max_fetch_age):
+                logger.info("Skipping fetch of [%s] because it has been fetched within the last [%d] seconds." %
+                            (self.teams_dir, max_fetch_age))
             else:
                 try:
                     git.fetch(src=self.teams_dir)
@@ -1,12 +1,17 @@
+import bz2
+import concurrent.futures
+import gzip
 import logging
 import os
 import re
 import signal
 import subprocess
+import tarfile
 import threading
+import zipfile
 
 import tabulate
-from esrally import metrics, time
+from esrally import exceptions, metrics, time
 from esrally.utils import io, sysstats, process, console, versions, jvm
 
 logger = logging.getLogger("rally.telemetry")
@@ -14,7 +19,8 @@ logger = logging.getLogger("rally.telemetry")
 
 def list_telemetry():
     console.println("Available telemetry devices:\n")
-    devices = [[device.command, device.human_name, device.help] for device in [JitCompiler, Gc, FlightRecorder, PerfStat]]
+    devices = [[device.command, device.human_name, device.help]
+               for device in [JitCompiler, Gc, FlightRecorder, PerfStat, NodeStatsSampler, DiskIoSampler]]
     console.println(tabulate.tabulate(devices, ["Command", "Name", "Description"]))
     console.println("\nKeep in mind that each telemetry device may incur a runtime overhead which can skew results.")
 
@@ -232,41 +238,59 @@ class MergeParts(InternalTelemetryDevice):
     """
     MERGE_TIME_LINE = re.compile(r": (\d+) msec to merge ([a-z ]+) \[(\d+) docs\]")
 
-    def __init__(self, metrics_store, node_log_dir):
+    def __init__(self, metrics_store, node_log_dir, sample_interval=None):
         super().__init__()
+        if sample_interval is not None and sample_interval <= 0:
+            raise exceptions.SystemSetupError("The telemetry parameter 'merge-parts-sample-interval' must be positive but was [%s]."
+                                              % str(sample_interval))
         self.node_log_dir = node_log_dir
         self.metrics_store = metrics_store
+        self.sample_interval = sample_interval
+        self.sampler = None
         self._t = None
         self.node = None
 
     def attach_to_node(self, node):
         self.node = node
 
+    def on_benchmark_start(self):
+        if self.node and self.sample_interval:
+            self.sampler = SampleMergeParts(self.node, self.metrics_store, self.node_log_dir, self.sample_interval)
+            self.sampler.setDaemon(True)
+            self.sampler.start()
+
     def on_benchmark_stop(self):
+        if self.sampler:
+            self.sampler.finish()
         logger.info("Analyzing merge times.")
-        # first decompress all logs. They have unique names so it's safe to do that. It's easier to first decompress everything
-        for log_file in os.listdir(self.node_log_dir):
-            log_path = "%s/%s" % (self.node_log_dir, log_file)
-            if io.is_archive(log_path):
-                logger.info("Decompressing [%s] to analyze merge times..." % log_path)
-                io.decompress(log_path, self.node_log_dir)
-
+        log_paths = [os.path.join(self.node_log_dir, log_file) for log_file in os.listdir(self.node_log_dir)]
         # we need to add up times from all files
         merge_times = {}
-        for log_file in os.listdir(self.node_log_dir):
-            log_path = "%s/%s" % (self.node_log_dir, log_file)
-            if not io.is_archive(log_file):
-                logger.debug("Analyzing merge times in [%s]" % log_path)
-                with open(log_path) as f:
-                    self._extract_merge_times(f, merge_times)
-            else:
-                logger.debug("Skipping archived logs in [%s]." % log_path)
+        if log_paths:
+            # rotated logs are read directly from their archive so we can analyze all of them independently
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(log_paths), os.cpu_count() or 1)) as pool:
+                for file_merge_times in pool.map(self._analyze, log_paths):
+                    for part, (duration_ms, num_docs) in file_merge_times.items():
+                        if part not in merge_times:
+                            merge_times[part] = [0, 0]
+                        merge_times[part][0] += duration_ms
+                        merge_times[part][1] += num_docs
         if merge_times:
             self._store_merge_times(merge_times)
         logger.info("Finished analyzing merge times. Extracted [%s] different merge time components." % len(merge_times))
 
-    def _extract_merge_times(self, file, merge_times):
-        for line in file.readlines():
+    def _analyze(self, log_path):
+        merge_times = {}
+        logger.debug("Analyzing merge times in [%s]" % log_path)
+        # noinspection PyBroadException
+        try:
+            self._extract_merge_times(log_lines(log_path), merge_times)
+        except BaseException:
+            logger.exception("Could not analyze merge times in [%s]." % log_path)
+        return merge_times
+
+    def _extract_merge_times(self, lines, merge_times):
+        for line in lines:
             match = MergeParts.MERGE_TIME_LINE.search(line)
             if match is not None:
                 duration_ms, part, num_docs = match.groups()
@@ -283,6 +307,164 @@ class MergeParts(InternalTelemetryDevice):
             self.metrics_store.put_count_node_level(self.node.node_name, "merge_parts_total_docs_%s" % metric_suffix, v[1])
 
 
+def log_lines(log_path):
+    """
+    Reads a (possibly compressed) log file line by line without extracting it first.
+
+    :param log_path: Path to a plain text log file or a rotated log file that is compressed as ``.gz``, ``.bz2`` or ``.zip`` or that is
+                     a (compressed) tar archive.
+    :return: A generator over all lines of the log file.
+    """
+    if log_path.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2")):
+        # stream mode reads the archive sequentially and decompresses transparently
+        with tarfile.open(log_path, mode="r|*") as archive:
+            for member in archive:
+                if member.isfile():
+                    for line in archive.extractfile(member):
+                        yield line.decode("utf-8", errors="replace")
+    elif log_path.endswith(".gz"):
+        with gzip.open(log_path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+    elif log_path.endswith(".bz2"):
+        with bz2.open(log_path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+    elif log_path.endswith(".zip"):
+        with zipfile.ZipFile(log_path) as archive:
+            for name in archive.namelist():
+                with archive.open(name) as member:
+                    for line in member:
+                        yield line.decode("utf-8", errors="replace")
+    else:
+        with open(log_path, "rt", encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+class PeriodicSampler(threading.Thread):
+    """
+    Takes samples at a fixed rate in a background thread until ``finish()`` is called, i.e. the time needed to take a sample does not
+    shift subsequent samples. Subclasses implement ``sample()`` and may override ``on_start()`` and ``on_stop()``.
+    """
+    # logged if sampling fails
+    failure_message = "Could not take sample"
+
+    def __init__(self, metrics_store, sample_interval, clock=time.Clock):
+        threading.Thread.__init__(self)
+        self.stop = threading.Event()
+        self.metrics_store = metrics_store
+        self.sample_interval = sample_interval
+        self.clock = clock
+        # only used to pace samples and to determine the elapsed time between them. Records use the relative time of the metrics store.
+        self.stop_watch = clock.stop_watch()
+
+    def finish(self):
+        self.stop.set()
+        self.join()
+
+    def run(self):
+        # noinspection PyBroadException
+        try:
+            self.stop_watch.start()
+            self.on_start()
+            samples = 0
+            while not self.stop.wait(max((samples + 1) * self.sample_interval - self.stop_watch.split_time(), 0)):
+                self.sample()
+                samples += 1
+            self.on_stop()
+        except BaseException:
+            logger.exception(self.failure_message)
+
+    def on_start(self):
+        pass
+
+    def sample(self):
+        raise NotImplementedError("abstract method")
+
+    def on_stop(self):
+        pass
+
+
+class SampleMergeParts(PeriodicSampler):
+    """
+    Follows the logs of a node during the benchmark and attributes merge parts times to the sample interval in which they have been
+    logged. Only complete lines that have been appended since the last sample are analyzed. Read positions are tracked per inode, so
+    a log that is renamed on rotation is not read again from the start and a log that is truncated is detected by its shrinking size.
+    """
+    failure_message = "Could not sample merge parts times"
+
+    def __init__(self, node, metrics_store, node_log_dir, sample_interval, clock=time.Clock):
+        super().__init__(metrics_store, sample_interval, clock)
+        self.node = node
+        self.node_log_dir = node_log_dir
+        # inode -> (position, incomplete trailing line)
+        self.positions = {}
+
+    def on_start(self):
+        # we are only interested in merges that happen during the benchmark
+        for log_path in self.active_logs():
+            stat = os.stat(log_path)
+            self.positions[stat.st_ino] = (stat.st_size, b"")
+
+    def on_stop(self):
+        # also attribute what has been logged since the last sample
+        self.sample()
+
+    def active_logs(self):
+        return [os.path.join(self.node_log_dir, f) for f in os.listdir(self.node_log_dir) if f.endswith(".log")]
+
+    def sample(self):
+        merge_times = {}
+        inodes = set()
+        for log_path in self.active_logs():
+            inode = self.read_new_lines(log_path, merge_times)
+            if inode is not None:
+                inodes.add(inode)
+        # forget logs that have been removed, their inode might be reused
+        for inode in set(self.positions) - inodes:
+            del self.positions[inode]
+        absolute_time = self.clock.now()
+        # use the same time base as all other metrics records
+        relative_time = self.metrics_store.relative_time()
+        for part, (duration_ms, num_docs) in merge_times.items():
+            metric_suffix = part.replace(" ", "_")
+            self.metrics_store.put_value_node_level(node_name=self.node.node_name, name="merge_parts_time_%s" % metric_suffix,
+                                                    value=duration_ms, unit="ms", absolute_time=absolute_time, relative_time=relative_time)
+            self.metrics_store.put_count_node_level(node_name=self.node.node_name, name="merge_parts_docs_%s" % metric_suffix,
+                                                    count=num_docs, absolute_time=absolute_time, relative_time=relative_time)
+
+    def read_new_lines(self, log_path, merge_times):
+        """
+        Adds merge times from all lines that have been appended to the provided log since the last sample to ``merge_times``.
+
+        :return: The inode of the log or ``None`` if the log has been removed in the meantime.
+        """
+        try:
+            with open(log_path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                inode = stat.st_ino
+                # logs that we have not seen before have been created during the benchmark
+                position, remainder = self.positions.get(inode, (0, b""))
+                if stat.st_size < position:
+                    # the log has been truncated
+                    position, remainder = 0, b""
+                f.seek(position)
+                data = remainder + f.read()
+                position = f.tell()
+        except FileNotFoundError:
+            return None
+        lines = data.split(b"\n")
+        # keep an incomplete last line for the next sample
+        self.positions[inode] = (position, lines.pop())
+        for line in lines:
+            match = MergeParts.MERGE_TIME_LINE.search(line.decode("utf-8", errors="replace"))
+            if match is not None:
+                duration_ms, part, num_docs = match.groups()
+                if part not in merge_times:
+                    merge_times[part] = [0, 0]
+                merge_times[part][0] += int(duration_ms)
+                merge_times[part][1] += int(num_docs)
+        return inode
+
+
 class DiskIo(InternalTelemetryDevice):
     """
     Gathers disk I/O stats.
@@ -342,13 +524,129 @@ class DiskIo(InternalTelemetryDevice):
                 logger.exception("Could not determine I/O stats at benchmark end.")
 
 
+class DiskIoSampler(TelemetryDevice):
+    """
+    Regularly samples the I/O counters of all block devices that back the data paths of a node.
+    """
+    internal = False
+    command = "disk-io"
+    human_name = "Disk I/O Sampler"
+    help = "Regularly samples I/O throughput, IOPS, queue depth and latency of the disks backing each node's data paths"
+
+    DEFAULT_SAMPLE_INTERVAL_SECONDS = 1
+
+    def __init__(self, data_paths, metrics_store, sample_interval=DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        super().__init__()
+        if sample_interval <= 0:
+            raise exceptions.SystemSetupError("The telemetry parameter 'disk-io-sample-interval' must be positive but was [%s]."
+                                              % str(sample_interval))
+        self.data_paths = data_paths
+        self.metrics_store = metrics_store
+        self.sample_interval = sample_interval
+        self.sampler = None
+        self.node = None
+
+    def attach_to_node(self, node):
+        self.node = node
+
+    def on_benchmark_start(self):
+        if self.node and self.data_paths:
+            devices = set()
+            for data_path in self.data_paths:
+                device = sysstats.block_device(data_path)
+                if device:
+                    devices.add(device)
+                else:
+                    logger.warning("Could not determine block device for data path [%s]. Not sampling its I/O statistics." % data_path)
+            if devices:
+                console.info("%s: Sampling I/O statistics of %s every [%s] seconds." %
+                             (self.human_name, sorted(devices), str(self.sample_interval)), logger=logger)
+                self.sampler = SampleDiskIo(self.node, self.metrics_store, sorted(devices), self.sample_interval)
+                self.sampler.setDaemon(True)
+                self.sampler.start()
+
+    def on_benchmark_stop(self):
+        if self.sampler:
+            self.sampler.finish()
+
+
+class SampleDiskIo(PeriodicSampler):
+    """
+    Samples I/O counters of block devices at a fixed interval and stores per-device rates. As these are device counters, they include
+    I/O of all processes that use the device. The device is stored in the meta-data property ``device``.
+    """
+    failure_message = "Could not determine disk I/O statistics"
+
+    def __init__(self, node, metrics_store, devices, sample_interval, clock=time.Clock):
+        super().__init__(metrics_store, sample_interval, clock)
+        self.node = node
+        self.devices = devices
+        self.previous = None
+
+    def on_start(self):
+        self.previous = (0, sysstats.disk_io_stats())
+
+    def sample(self):
+        current = (self.stop_watch.split_time(), sysstats.disk_io_stats())
+        self.record(self.previous, current, self.clock.now(), self.metrics_store.relative_time())
+        self.previous = current
+
+    def record(self, previous, current, absolute_time, relative_time):
+        previous_time, previous_stats = previous
+        current_time, stats = current
+        elapsed = current_time - previous_time
+        if elapsed <= 0:
+            return
+        for device in self.devices:
+            if device not in previous_stats or device not in stats:
+                continue
+            p = previous_stats[device]
+            c = stats[device]
+            meta_data = {"device": device}
+            reads = max(c.read_count - p.read_count, 0)
+            writes = max(c.write_count - p.write_count, 0)
+            self.add("disk_io_read_rate", max(c.read_bytes - p.read_bytes, 0) / elapsed, "byte/s", absolute_time, relative_time, meta_data)
+            self.add("disk_io_write_rate", max(c.write_bytes - p.write_bytes, 0) / elapsed, "byte/s", absolute_time, relative_time,
+                     meta_data)
+            self.add("disk_io_read_iops", reads / elapsed, "1/s", absolute_time, relative_time, meta_data)
+            self.add("disk_io_write_iops", writes / elapsed, "1/s", absolute_time, relative_time, meta_data)
+            if reads + writes > 0:
+                # average time for an I/O request to be served including the time spent in the queue (see "await" in iostat)
+                io_time = max(c.read_time - p.read_time, 0) + max(c.write_time - p.write_time, 0)
+                self.add("disk_io_await", io_time / (reads + writes), "ms", absolute_time, relative_time, meta_data)
+            # counters are in milliseconds whereas elapsed time is in seconds
+            if c.weighted_time is not None and p.weighted_time is not None:
+                self.add("disk_io_queue_depth", max(c.weighted_time - p.weighted_time, 0) / (1000 * elapsed), None, absolute_time,
+                         relative_time, meta_data)
+            if c.busy_time is not None and p.busy_time is not None:
+                self.add("disk_io_utilization", min(100 * max(c.busy_time - p.busy_time, 0) / (1000 * elapsed), 100), "%", absolute_time,
+                         relative_time, meta_data)
+
+    def add(self, name, value, unit, absolute_time, relative_time, meta_data=None):
+        self.metrics_store.put_value_node_level(node_name=self.node.node_name, name=name, value=value, unit=unit,
+                                                absolute_time=absolute_time, relative_time=relative_time, meta_data=meta_data)
+
+
 class CpuUsage(InternalTelemetryDevice):
     """
     Gathers CPU usage statistics.
     """
-    def __init__(self, metrics_store):
+    DEFAULT_SAMPLE_INTERVAL_SECONDS = 1
+
+    def __init__(self, metrics_store, sample_interval=DEFAULT_SAMPLE_INTERVAL_SECONDS, machine_stats=True):
+        """
+        :param metrics_store: The metrics store to use.
+        :param sample_interval: The sample interval in seconds.
+        :param machine_stats: ``True`` iff machine-wide metrics (per-core utilization, context switches and run queue length) should be
+                              sampled as well. Only one node per host should sample them.
+        """
         super().__init__()
+        if sample_interval <= 0:
+            raise exceptions.SystemSetupError("The telemetry parameter 'cpu-sample-interval' must be positive but was [%s]."
+                                              % str(sample_interval))
         self.metrics_store = metrics_store
+        self.sample_interval = sample_interval
+        self.machine_stats = machine_stats
         self.sampler = None
         self.node = None
 
@@ -357,7 +655,7 @@ class CpuUsage(InternalTelemetryDevice):
 
     def on_benchmark_start(self):
         if self.node:
-            self.sampler = SampleCpuUsage(self.node, self.metrics_store)
+            self.sampler = SampleCpuUsage(self.node, self.metrics_store, self.sample_interval, self.machine_stats)
             self.sampler.setDaemon(True)
             self.sampler.start()
 
@@ -366,26 +664,60 @@ class CpuUsage(InternalTelemetryDevice):
             self.sampler.finish()
 
 
-class SampleCpuUsage(threading.Thread):
-    def __init__(self, node, metrics_store):
-        threading.Thread.__init__(self)
-        self.stop = False
+class SampleCpuUsage(PeriodicSampler):
+    """
+    Samples CPU usage of a node and optionally of the machine it runs on at a fixed interval. All values are calculated from cumulative
+    counters so we only need to read them once per interval.
+    """
+    failure_message = "Could not determine CPU utilization"
+
+    def __init__(self, node, metrics_store, sample_interval, machine_stats=True, clock=time.Clock):
+        super().__init__(metrics_store, sample_interval, clock)
         self.node = node
         self.process = sysstats.setup_process_stats(node.process.pid)
-        self.metrics_store = metrics_store
+        self.machine_stats = machine_stats
+        self.previous = None
 
-    def finish(self):
-        self.stop = True
-        self.join()
+    def on_start(self):
+        self.previous = self.snapshot(0)
 
-    def run(self):
-        # noinspection PyBroadException
-        try:
-            while not self.stop:
-                self.metrics_store.put_value_node_level(node_name=self.node.node_name, name="cpu_utilization_1s",
-                                                        value=sysstats.cpu_utilization(self.process), unit="%")
-        except BaseException:
-            logger.exception("Could not determine CPU utilization")
+    def snapshot(self, sample_time):
+        if self.machine_stats:
+            per_core, context_switches, run_queue_length = sysstats.system_cpu_stats()
+        else:
+            per_core, context_switches, run_queue_length = [], None, None
+        return sample_time, sysstats.process_cpu_times(self.process), per_core, context_switches, run_queue_length
+
+    def sample(self):
+        current = self.snapshot(self.stop_watch.split_time())
+        self.record(self.previous, current, self.clock.now(), self.metrics_store.relative_time())
+        self.previous = current
+
+    def record(self, previous, current, absolute_time, relative_time):
+        previous_time, (previous_user, previous_system), previous_per_core, previous_context_switches, _ = previous
+        current_time, (user, system), per_core, context_switches, run_queue_length = current
+        elapsed = current_time - previous_time
+        if elapsed <= 0:
+            return
+        user_time = max(user - previous_user, 0)
+        system_time = max(system - previous_system, 0)
+        # for backwards-compatibility we keep the metric name also if the sample interval is not one second
+        self.add("cpu_utilization_1s", 100 * (user_time + system_time) / elapsed, "%", absolute_time, relative_time)
+        self.add("cpu_user_time", 1000 * user_time, "ms", absolute_time, relative_time)
+        self.add("cpu_system_time", 1000 * system_time, "ms", absolute_time, relative_time)
+        for core, ((previous_busy, previous_total), (busy, total)) in enumerate(zip(previous_per_core, per_core)):
+            if total > previous_total:
+                self.add("cpu_core_utilization", 100 * max(busy - previous_busy, 0) / (total - previous_total), "%",
+                         absolute_time, relative_time, meta_data={"core": core})
+        if previous_context_switches is not None and context_switches is not None:
+            self.add("context_switch_rate", max(context_switches - previous_context_switches, 0) / elapsed, "1/s",
+                     absolute_time, relative_time)
+        if run_queue_length is not None:
+            self.add("run_queue_length", run_queue_length, None, absolute_time, relative_time)
+
+    def add(self, name, value, unit, absolute_time, relative_time, meta_data=None):
+        self.metrics_store.put_value_node_level(node_name=self.node.node_name, name=name, value=value, unit=unit,
+                                                absolute_time=absolute_time, relative_time=relative_time, meta_data=meta_data)
 
 
 def store_node_attribute_metadata(metrics_store, nodes_info):
@@ -715,10 +1047,134 @@ class IndexStats(InternalTelemetryDevice):
             return default_value
 
 
+class NodeStatsSampler(TelemetryDevice):
+    """
+    Regularly samples the nodes stats API during the benchmark and stores a time series of node level metrics.
+    """
+    internal = False
+    command = "node-stats"
+    human_name = "Node Stats Sampler"
+    help = "Regularly samples GC, indexing, merge, refresh and flush statistics of all nodes during the benchmark"
+
+    DEFAULT_SAMPLE_INTERVAL_SECONDS = 10
+
+    def __init__(self, client, metrics_store, sample_interval=DEFAULT_SAMPLE_INTERVAL_SECONDS):
+        super().__init__()
+        if sample_interval <= 0:
+            raise exceptions.SystemSetupError("The telemetry parameter 'node-stats-sample-interval' must be positive but was [%s]."
+                                              % str(sample_interval))
+        self.client = client
+        self.metrics_store = metrics_store
+        self.sample_interval = sample_interval
+        self.sampler = None
+
+    def on_benchmark_start(self):
+        console.info("%s: Sampling node stats every [%s] seconds." % (self.human_name, str(self.sample_interval)), logger=logger)
+        self.sampler = SampleNodeStats(self.client, self.metrics_store, self.sample_interval)
+        self.sampler.setDaemon(True)
+        self.sampler.start()
+
+    def on_benchmark_stop(self):
+        if self.sampler:
+            self.sampler.finish()
+            self.sampler = None
+
+
+class SampleNodeStats(PeriodicSampler):
+    # metric name, path in the nodes stats response, unit. These are cumulative counters; we store the increase per sample interval.
+    COUNTERS = [
+        ("node_stats_young_gen_gc_time", ["jvm", "gc", "collectors", "young", "collection_time_in_millis"], "ms"),
+        ("node_stats_old_gen_gc_time", ["jvm", "gc", "collectors", "old", "collection_time_in_millis"], "ms"),
+        ("node_stats_indexing_time", ["indices", "indexing", "index_time_in_millis"], "ms"),
+        ("node_stats_merges_time", ["indices", "merges", "total_time_in_millis"], "ms"),
+        ("node_stats_merges_throttled_time", ["indices", "merges", "total_throttled_time_in_millis"], "ms"),
+        ("node_stats_refresh_time", ["indices", "refresh", "total_time_in_millis"], "ms"),
+        ("node_stats_flush_time", ["indices", "flush", "total_time_in_millis"], "ms")
+    ]
+    # metric name, path in the nodes stats response, unit. These are cumulative counters; we store the rate per second.
+    RATES = [
+        ("node_stats_indexing_throughput", ["indices", "indexing", "index_total"], "docs/s"),
+        ("node_stats_search_throughput", ["indices", "search", "query_total"], "ops/s")
+    ]
+    # metric name, path in the nodes stats response, unit. These are stored as is.
+    GAUGES = [
+        ("node_stats_heap_used", ["jvm", "mem", "heap_used_in_bytes"], "byte"),
+        ("node_stats_segments_count", ["indices", "segments", "count"], None),
+        ("node_stats_store_size", ["indices", "store", "size_in_bytes"], "byte")
+    ]
+
+    failure_message = "Could not sample node stats"
+
+    def __init__(self, client, metrics_store, sample_interval, clock=time.Clock):
+        super().__init__(metrics_store, sample_interval, clock)
+        self.client = client
+        # we only keep the counters of the most recent sample per node
+        self.previous_counters = {}
+
+    def on_start(self):
+        # the first sample serves as baseline
+        self.sample()
+
+    def sample(self):
+        import elasticsearch
+        try:
+            # only retrieve the metrics we need to keep the overhead on the cluster low
+            stats = self.client.nodes.stats(metric="jvm,indices")
+        except elasticsearch.TransportError:
+            logger.exception("Could not retrieve node stats.")
+            return
+        absolute_time = self.clock.now()
+        # use the same time base as all other metrics records
+        relative_time = self.metrics_store.relative_time()
+        sample_time = self.stop_watch.split_time()
+        for node in stats["nodes"].values():
+            node_name = node["name"]
+            counters = {}
+            for name, path, _ in SampleNodeStats.COUNTERS + SampleNodeStats.RATES:
+                counters[name] = self.value_at(node, path)
+            previous = self.previous_counters.get(node_name)
+            self.previous_counters[node_name] = (sample_time, counters)
+
+            for name, path, unit in SampleNodeStats.GAUGES:
+                self.put(node_name, name, self.value_at(node, path), unit, absolute_time, relative_time)
+            if previous:
+                previous_time, previous_counters = previous
+                elapsed = sample_time - previous_time
+                for name, _, unit in SampleNodeStats.COUNTERS:
+                    self.put(node_name, name, self.delta(previous_counters[name], counters[name]), unit, absolute_time, relative_time)
+                for name, _, unit in SampleNodeStats.RATES:
+                    delta = self.delta(previous_counters[name], counters[name])
+                    rate = delta / elapsed if delta is not None and elapsed > 0 else None
+                    self.put(node_name, name, rate, unit, absolute_time, relative_time)
+
+    def value_at(self, node, path):
+        # not all metrics are available in all versions of Elasticsearch. We don't warn to avoid flooding the log on each sample.
+        value = node
+        try:
+            for k in path:
+                value = value[k]
+            return value
+        except KeyError:
+            return None
+
+    def delta(self, previous, current):
+        if previous is None or current is None:
+            return None
+        # counters may be reset, e.g. if a node restarts
+        return max(current - previous, 0)
+
+    def put(self, node_name, name, value, unit, absolute_time, relative_time):
+        if value is not None:
+            self.metrics_store.put_value_node_level(node_name, name, value, unit, absolute_time=absolute_time, relative_time=relative_time)
+
+
 class IndexSize(InternalTelemetryDevice):
     """
     Measures the final size of the index
     """
+    # the number of directories (e.g. shards) per data path that are scanned concurrently
+    SCAN_WORKERS_PER_DATA_PATH = 4
+
     def __init__(self, data_paths, metrics_store):
         super().__init__()
         self.data_paths = data_paths
@@ -732,8 +1188,12 @@ class IndexSize(InternalTelemetryDevice):
         # we need to gather the file size after the node has terminated so we can be sure that it has written all its buffers.
         if not running and self.attached and self.data_paths:
             self.attached = False
-            index_size_bytes = 0
-            for data_path in self.data_paths:
-                index_size_bytes += io.get_size(data_path)
-                process.run_subprocess_with_logging("find %s -ls" % data_path, header="index files:")
+            # data paths are usually on different disks so we scan them concurrently as well
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.data_paths)) as pool:
+                index_size_bytes = sum(pool.map(lambda data_path: io.get_size(data_path, max_workers=IndexSize.SCAN_WORKERS_PER_DATA_PATH),
+                                                self.data_paths))
+            # listing all index files is expensive for large indices and only needed for debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                for data_path in self.data_paths:
+                    process.run_subprocess_with_logging("find %s -ls" % data_path, header="index files:")
             self.metrics_store.put_count_node_level(node.node_name, "final_index_size_bytes", index_size_bytes, "byte")
@@ -1,6 +1,7 @@
 import collections
 import logging
 import math
+import os
 import pickle
 import statistics
 import sys
@@ -208,6 +209,11 @@ class MetricsStore:
             }
         else:
             self._meta_info = meta_info
+        # Meta info and shared meta data are merged once and stored only once for all documents that refer to them by their index.
+        # Documents only contain their own meta data. Hence, the meta data of a document need to be resolved before it is exposed.
+        self._shared_meta = []
+        # (level, level key, id of the shared meta data dict) -> (shared meta data dict, index in _shared_meta)
+        self._shared_meta_refs = {}
         self._clock = clock
         self._stop_watch = self._clock.stop_watch()
 
@@ -261,6 +267,13 @@ class MetricsStore:
     def lap(self, lap):
         self._lap = lap
 
+    def relative_time(self):
+        """
+        :return: The time in seconds since this metrics store has been opened. It is the relative time of all metrics records that are
+                 stored without an explicit relative time.
+        """
+        return self._stop_watch.split_time()
+
     def flush(self):
         """
         Explicitly flushes buffered metrics to the metric store. It is not required to flush before closing the metrics store.
@@ -288,6 +301,7 @@ class MetricsStore:
         :param key: The key of the meta information.
         :param value: The value of the meta information.
         """
+        self._invalidate_meta_cache()
         if scope == MetaInfoScope.cluster:
             self._meta_info[MetaInfoScope.cluster][key] = value
         elif scope == MetaInfoScope.node:
@@ -301,6 +315,7 @@ class MetricsStore:
         """
         Clears all internally stored meta-info. This is considered Rally internal API and not intended for normal client consumption.
         """
+        self._invalidate_meta_cache()
         self._meta_info = {
             MetaInfoScope.cluster: {},
             MetaInfoScope.node: {}
@@ -312,6 +327,7 @@ class MetricsStore:
 
         :param to_merge: A meta info representation that should be merged with the current one.
         """
+        self._invalidate_meta_cache()
         if MetaInfoScope.cluster in to_merge:
             self._meta_info[MetaInfoScope.cluster].update(to_merge[MetaInfoScope.cluster])
         if MetaInfoScope.node in to_merge:
@@ -326,8 +342,13 @@ class MetricsStore:
 
     @meta_info.setter
     def meta_info(self, meta_info):
+        self._invalidate_meta_cache()
         self._meta_info = meta_info
 
+    def _invalidate_meta_cache(self):
+        # documents that have been stored so far keep referring to the previous meta data
+        self._shared_meta_refs = {}
+
     @property
     def open_context(self):
         return {
@@ -338,7 +359,7 @@ class MetricsStore:
         }
 
     def put_count_cluster_level(self, name, count, unit=None, operation=None, operation_type=None, sample_type=SampleType.Normal,
-                                absolute_time=None, relative_time=None, meta_data=None):
+                                absolute_time=None, relative_time=None, meta_data=None, shared_meta_data=None):
         """
         Adds a new cluster level counter metric.
 
@@ -353,12 +374,15 @@ class MetricsStore:
         :param relative_time The relative timestamp in seconds since the start of the benchmark when this metric record is stored.
                Defaults to None. The metrics store will derive the timestamp automatically.
         :param meta_data: A dict, containing additional key-value pairs. Defaults to None.
+        :param shared_meta_data: A dict, containing additional key-value pairs that are shared by many metrics records, e.g. all samples
+               of a task. It is stored only once per dict instance so callers must neither modify it nor create a new dict per record.
+               Values in ``meta_data`` take precedence. Defaults to None.
         """
         self._put(MetaInfoScope.cluster, None, name, count, unit, operation, operation_type, sample_type, absolute_time, relative_time,
-                  meta_data)
+                  meta_data, shared_meta_data)
 
     def put_count_node_level(self, node_name, name, count, unit=None, operation=None, operation_type=None, sample_type=SampleType.Normal,
-                             absolute_time=None, relative_time=None, meta_data=None):
+                             absolute_time=None, relative_time=None, meta_data=None, shared_meta_data=None):
         """
         Adds a new node level counter metric.
 
@@ -374,13 +398,16 @@ class MetricsStore:
         :param relative_time The relative timestamp in seconds since the start of the benchmark when this metric record is stored.
                Defaults to None. The metrics store will derive the timestamp automatically.
         :param meta_data: A dict, containing additional key-value pairs. Defaults to None.
+        :param shared_meta_data: A dict, containing additional key-value pairs that are shared by many metrics records, e.g. all samples
+               of a task. It is stored only once per dict instance so callers must neither modify it nor create a new dict per record.
+               Values in ``meta_data`` take precedence. Defaults to None.
         """
         self._put(MetaInfoScope.node, node_name, name, count, unit, operation, operation_type, sample_type, absolute_time, relative_time,
-                  meta_data)
+                  meta_data, shared_meta_data)
 
     # should be a float
     def put_value_cluster_level(self, name, value, unit, operation=None, operation_type=None, sample_type=SampleType.Normal,
-                                absolute_time=None, relative_time=None, meta_data=None):
+                                absolute_time=None, relative_time=None, meta_data=None, shared_meta_data=None):
         """
         Adds a new cluster level value metric.
 
@@ -394,13 +421,16 @@ class MetricsStore:
                store will derive the timestamp automatically.
         :param relative_time The relative timestamp in seconds since the start of the benchmark when this metric record is stored.
                Defaults to None. The metrics store will derive the timestamp automatically.
-       :param meta_data: A dict, containing additional key-value pairs. Defaults to None.
+        :param meta_data: A dict, containing additional key-value pairs. Defaults to None.
+        :param shared_meta_data: A dict, containing additional key-value pairs that are shared by many metrics records, e.g. all samples
+               of a task. It is stored only once per dict instance so callers must neither modify it nor create a new dict per record.
+               Values in ``meta_data`` take precedence. Defaults to None.
         """
         self._put(MetaInfoScope.cluster, None, name, value, unit, operation, operation_type, sample_type, absolute_time, relative_time,
-                  meta_data)
+                  meta_data, shared_meta_data)
 
     def put_value_node_level(self, node_name, name, value, unit, operation=None, operation_type=None, sample_type=SampleType.Normal,
-                             absolute_time=None, relative_time=None, meta_data=None):
+                             absolute_time=None, relative_time=None, meta_data=None, shared_meta_data=None):
         """
         Adds a new node level value metric.
 
@@ -416,22 +446,16 @@ class MetricsStore:
         :param relative_time The relative timestamp in seconds since the start of the benchmark when this metric record is stored.
                Defaults to None. The metrics store will derive the timestamp automatically.
         :param meta_data: A dict, containing additional key-value pairs. Defaults to None.
+        :param shared_meta_data: A dict, containing additional key-value pairs that are shared by many metrics records, e.g. all samples
+               of a task. It is stored only once per dict instance so callers must neither modify it nor create a new dict per record.
+               Values in ``meta_data`` take precedence. Defaults to None.
         """
         self._put(MetaInfoScope.node, node_name, name, value, unit, operation, operation_type, sample_type, absolute_time, relative_time,
-                  meta_data)
+                  meta_data, shared_meta_data)
 
     def _put(self, level, level_key, name, value, unit, operation, operation_type, sample_type, absolute_time=None, relative_time=None,
-             meta_data=None):
-        if level == MetaInfoScope.cluster:
-            meta = self._meta_info[MetaInfoScope.cluster].copy()
-        elif level == MetaInfoScope.node:
-            meta = self._meta_info[MetaInfoScope.cluster].copy()
-            if level_key in self._meta_info[MetaInfoScope.node]:
-                meta.update(self._meta_info[MetaInfoScope.node][level_key])
-        else:
-            raise exceptions.SystemSetupError("Unknown meta info level [%s] for metric [%s]" % (level, name))
-        if meta_data:
-            meta.update(meta_data)
+             meta_data=None, shared_meta_data=None):
+        meta_ref = self._shared_meta_ref(level, level_key, name, shared_meta_data)
 
         if absolute_time is None:
             absolute_time = self._clock.now()
@@ -451,8 +475,10 @@ class MetricsStore:
             "value": value,
             "unit": unit,
             "sample-type": sample_type.name.lower(),
-            "meta": meta
+            "meta-ref": meta_ref
         }
+        if meta_data:
+            doc["meta"] = meta_data
         if operation:
             doc["operation"] = operation
         if operation_type:
@@ -461,6 +487,61 @@ class MetricsStore:
         assert self.lap is not None, "Attempting to store [%s] without a lap." % doc
         self._add(doc)
 
+    def _shared_meta_ref(self, level, level_key, name, shared_meta_data):
+        # callers reuse the same dict for all records that share it, so we can avoid comparing its contents
+        key = (level, level_key, id(shared_meta_data))
+        ref = self._shared_meta_refs.get(key)
+        if ref is None:
+            if level == MetaInfoScope.cluster:
+                meta = self._meta_info[MetaInfoScope.cluster].copy()
+            elif level == MetaInfoScope.node:
+                meta = self._meta_info[MetaInfoScope.cluster].copy()
+                if level_key in self._meta_info[MetaInfoScope.node]:
+                    meta.update(self._meta_info[MetaInfoScope.node][level_key])
+            else:
+                raise exceptions.SystemSetupError("Unknown meta info level [%s] for metric [%s]" % (level, name))
+            if shared_meta_data:
+                meta.update(shared_meta_data)
+            # we keep a reference to the dict so its id cannot be reused by another one while it is a cache key
+            ref = (shared_meta_data, len(self._shared_meta))
+            self._shared_meta.append(meta)
+            self._shared_meta_refs[key] = ref
+        return ref[1]
+
+    def _meta(self, doc):
+        """
+        :return: The complete meta data of a document as it has been stored.
+        """
+        shared_meta = self._shared_meta[doc["meta-ref"]]
+        meta = doc.get("meta")
+        if not meta:
+            return shared_meta
+        resolved = shared_meta.copy()
+        resolved.update(meta)
+        return resolved
+
+    def _meta_value(self, doc, key):
+        meta = doc.get("meta")
+        if meta and key in meta:
+            return meta[key]
+        return self._shared_meta[doc["meta-ref"]].get(key)
+
+    def _resolve(self, doc):
+        """
+        :return: A copy of the provided document that contains its complete meta data instead of a reference.
+        """
+        resolved = doc.copy()
+        del resolved["meta-ref"]
+        resolved["meta"] = self._meta(doc)
+        return resolved
+
+    def _externalize(self, docs):
+        # all documents refer to shared meta data by index so they need to be transferred together
+        return {
+            "meta": self._shared_meta,
+            "docs": docs
+        }
+
     def bulk_add(self, memento):
         """
         Adds raw metrics store documents previously created with #to_externalizable()
@@ -472,20 +553,26 @@ class MetricsStore:
         approach, param = memento
         if approach == "mem":
             logger.info("Restoring in-memory representation of metrics store.")
-            for doc in pickle.loads(zlib.decompress(param)):
-                self._add(doc)
+            self._add_externalized(pickle.loads(zlib.decompress(param)))
         elif approach == "file":
             logger.info("Restoring file representation of metrics store from [%s]." % param)
             try:
                 with open(param, mode="rt", encoding="UTF-8") as f:
-                    for doc in json.load(f):
-                        self._add(doc)
+                    self._add_externalized(json.load(f))
             except IOError:
                 logger.exception("Could not restore metrics from [%s]." % param)
                 raise exceptions.DataError("Could not transfer metrics.")
         else:
             raise ValueError("Unrecognized externalization approach [%s]" % approach)
 
+    def _add_externalized(self, externalized):
+        # shared meta data are appended to ours, hence references need to be shifted
+        offset = len(self._shared_meta)
+        self._shared_meta.extend(externalized["meta"])
+        for doc in externalized["docs"]:
+            doc["meta-ref"] += offset
+            self._add(doc)
+
     def _add(self, doc):
         """
         Adds a new document to the metrics store
@@ -596,6 +683,23 @@ class MetricsStore:
         """
         raise NotImplementedError("abstract method")
 
+    def get_time_series(self, name, interval, operation=None, operation_type=None, sample_type=None, lap=None, percentiles=None):
+        """
+        Retrieves statistics of the given metric per time interval, based on the time since the start of the benchmark.
+
+        :param name: The metric name to query.
+        :param interval: The length of each time interval in seconds.
+        :param operation The operation name to query. Optional.
+        :param operation_type The operation type to query. Optional.
+        :param sample_type The sample type to query. Optional. By default, all samples are considered.
+        :param lap The lap to query. Optional. By default, all laps are considered.
+        :param percentiles: An optional list of percentiles to determine per interval. By default, no percentiles are determined.
+        :return: A list of dicts in ascending order of time. Each dict contains the start of the interval in seconds (``relative_time``),
+        the number of samples (``count``), their mean (``mean``) and an ordered dictionary of the requested ``percentiles``. Intervals
+        without samples are omitted.
+        """
+        raise NotImplementedError("abstract method")
+
     def get_median(self, name, operation=None, operation_type=None, sample_type=None, lap=None):
         """
         Retrieves median value of the given metric.
@@ -663,10 +767,14 @@ class EsMetricsStore(MetricsStore):
         return self._index_template_provider.metrics_template()
 
     def flush(self):
-        self._client.bulk_index(index=self._index, doc_type=EsMetricsStore.METRICS_DOC_TYPE, items=self._docs)
+        # documents in Elasticsearch contain their complete meta data as queries and dashboards filter on them
+        docs = [self._resolve(doc) for doc in self._docs]
+        self._client.bulk_index(index=self._index, doc_type=EsMetricsStore.METRICS_DOC_TYPE, items=docs)
         logger.info("Successfully added %d metrics documents for invocation=[%s], track=[%s], challenge=[%s], car=[%s]." %
                     (len(self._docs), self._invocation, self._track, self._challenge, self._car))
         self._docs = []
+        self._shared_meta = []
+        self._invalidate_meta_cache()
         # ensure we can search immediately after flushing
         self._client.refresh(index=self._index)
 
@@ -768,6 +876,56 @@ class EsMetricsStore(MetricsStore):
         else:
             return None
 
+    def get_time_series(self, name, interval, operation=None, operation_type=None, sample_type=None, lap=None, percentiles=None):
+        if percentiles is None:
+            percentiles = []
+        aggs = {
+            "metric_stats": {
+                "stats": {
+                    "field": "value"
+                }
+            }
+        }
+        if percentiles:
+            aggs["percentile_stats"] = {
+                "percentiles": {
+                    "field": "value",
+                    "percents": percentiles
+                }
+            }
+        query = {
+            "query": self._query_by_name(name, operation, operation_type, sample_type, lap),
+            "size": 0,
+            "aggs": {
+                "time_series": {
+                    "histogram": {
+                        # relative time is stored in microseconds
+                        "field": "relative-time",
+                        "interval": int(interval * 1000 * 1000),
+                        "min_doc_count": 1
+                    },
+                    "aggs": aggs
+                }
+            }
+        }
+        logger.debug("Issuing get_time_series against index=[%s], doc_type=[%s], query=[%s]" %
+                     (self._index, EsMetricsStore.METRICS_DOC_TYPE, query))
+        result = self._client.search(index=self._index, doc_type=EsMetricsStore.METRICS_DOC_TYPE, body=query)
+        time_series = []
+        for bucket in result["aggregations"]["time_series"]["buckets"]:
+            if percentiles:
+                raw = bucket["percentile_stats"]["values"]
+                bucket_percentiles = collections.OrderedDict(sorted(raw.items(), key=lambda t: float(t[0])))
+            else:
+                bucket_percentiles = collections.OrderedDict()
+            time_series.append({
+                "relative_time": bucket["key"] / (1000 * 1000),
+                "count": bucket["metric_stats"]["count"],
+                "mean": bucket["metric_stats"]["avg"],
+                "percentiles": bucket_percentiles
+            })
+        return time_series
+
     def _query_by_name(self, name, operation, operation_type, sample_type, lap):
         q = {
             "bool": {
@@ -860,8 +1018,11 @@ class InMemoryMetricsStore(MetricsStore):
 
     def to_externalizable(self, clear=False, spill_to_disk=False):
         docs = self.docs
+        externalized = self._externalize(docs)
         if clear:
             self.docs = []
+            self._shared_meta = []
+            self._invalidate_meta_cache()
         if spill_to_disk:
             import os
             import json
@@ -870,10 +1031,10 @@ class InMemoryMetricsStore(MetricsStore):
             path = os.path.join(tempfile.mkdtemp(prefix="rally"), "metrics.json")
             logger.info("Writing [%d] metrics records temporarily to [%s]." % (len(docs), path))
             with open(path, "wt", encoding="UTF-8") as f:
-                json.dump(docs, f)
+                json.dump(externalized, f)
             return "file", path
         else:
-            compressed = zlib.compress(pickle.dumps(docs))
+            compressed = zlib.compress(pickle.dumps(externalized))
             logger.info("Compression changed size of metric store from [%d] bytes to [%d] bytes" %
                         (sys.getsizeof(docs), sys.getsizeof(compressed)))
             return "mem", compressed
@@ -928,7 +1089,7 @@ class InMemoryMetricsStore(MetricsStore):
                     (sample_type is None or doc["sample-type"] == sample_type.name.lower()) and \
                     (lap is None or doc["lap"] == lap):
                 total_count += 1
-                if doc["meta"]["success"] is False:
+                if self._meta_value(doc, "success") is False:
                     error += 1
         if total_count > 0:
             return error / total_count
@@ -949,15 +1110,41 @@ class InMemoryMetricsStore(MetricsStore):
         else:
             return None
 
+    def get_time_series(self, name, interval, operation=None, operation_type=None, sample_type=None, lap=None, percentiles=None):
+        if percentiles is None:
+            percentiles = []
+        interval_micros = interval * 1000 * 1000
+        # determine all buckets in a single pass over the samples
+        buckets = {}
+        for doc in self.docs:
+            if self._matches(doc, name, operation, operation_type, sample_type, lap):
+                bucket = int(doc["relative-time"] // interval_micros)
+                if bucket not in buckets:
+                    buckets[bucket] = []
+                buckets[bucket].append(doc["value"])
+        time_series = []
+        for bucket in sorted(buckets.keys()):
+            values = sorted(buckets[bucket])
+            bucket_percentiles = collections.OrderedDict()
+            for percentile in percentiles:
+                bucket_percentiles[percentile] = self.percentile_value(values, percentile)
+            time_series.append({
+                "relative_time": bucket * interval,
+                "count": len(values),
+                "mean": statistics.mean(values),
+                "percentiles": bucket_percentiles
+            })
+        return time_series
+
     def _get(self, name, operation, operation_type, sample_type, lap, mapper):
-        return [mapper(doc)
-                for doc in self.docs
-                if doc["name"] == name and
-                (operation is None or doc["operation"] == operation) and
-                (operation_type is None or doc["operation-type"] == operation_type.name) and
-                (sample_type is None or doc["sample-type"] == sample_type.name.lower()) and
-                (lap is None or doc["lap"] == lap)
-                ]
+        return [mapper(doc) for doc in self.docs if self._matches(doc, name, operation, operation_type, sample_type, lap)]
+
+    def _matches(self, doc, name, operation, operation_type, sample_type, lap):
+        return doc["name"] == name and \
+               (operation is None or doc["operation"] == operation) and \
+               (operation_type is None or doc["operation-type"] == operation_type.name) and \
+               (sample_type is None or doc["sample-type"] == sample_type.name.lower()) and \
+               (lap is None or doc["lap"] == lap)
 
 
 def race_store(cfg):
@@ -975,6 +1162,8 @@ def race_store(cfg):
 
 
 def list_races(cfg):
+    if cfg.opts("system", "list.races.rebuild.index", mandatory=False, default_value=False):
+        rebuild_race_index(cfg)
     races = []
     for race in race_store(cfg).list():
         races.append([time.to_iso8601(race.trial_timestamp), race.track, race.challenge, race.car, race.user_tag])
@@ -987,6 +1176,11 @@ def list_races(cfg):
         console.println("No recent races found.")
 
 
+def rebuild_race_index(cfg):
+    race_count = FileRaceStore(cfg).rebuild_index()
+    console.info("Rebuilt the local race index with [%d] races." % race_count, logger=logger)
+
+
 def create_race(cfg, track, challenge):
     car = cfg.opts("mechanic", "car.name")
     environment_name = cfg.opts("system", "env.name")
@@ -1047,7 +1241,7 @@ class Race:
         """
         :return: A dict representation suitable for persisting this race instance as JSON.
         """
-        return {
+        d = {
             "rally-version": self.rally_version,
             "environment": self.environment_name,
             "trial-timestamp": time.to_iso8601(self.trial_timestamp),
@@ -1060,6 +1254,10 @@ class Race:
             "cluster": self.cluster.as_dict(),
             "results": self.results.as_dict()
         }
+        # results per lap are needed to determine whether differences between races are statistically significant
+        if self.lap_results:
+            d["lap-results"] = [r.as_dict() for r in self.lap_results]
+        return d
 
     def to_result_dicts(self):
         """
@@ -1099,7 +1297,7 @@ class Race:
         # Don't restore a few properties like cluster because they (a) cannot be reconstructed easily without knowledge of other modules
         # and (b) it is not necessary for this use case.
         return Race(d["rally-version"], d["environment"], time.from_is8601(d["trial-timestamp"]), d["pipeline"], d["user-tag"],
-                    d["track"], d["challenge"], d["car"], d["total-laps"], results=d["results"])
+                    d["track"], d["challenge"], d["car"], d["total-laps"], lap_results=d.get("lap-results"), results=d["results"])
 
 
 class RaceStore:
@@ -1115,6 +1313,19 @@ class RaceStore:
     def list(self):
         raise NotImplementedError("abstract method")
 
+    def find_by_configuration(self, track=None, challenge=None, car=None, user_tag=None, max_results=None):
+        """
+        Finds races with the provided properties.
+
+        :param track: Only return races of this track (optional).
+        :param challenge: Only return races of this challenge (optional).
+        :param car: Only return races with this car (optional).
+        :param user_tag: Only return races with this user tag (optional).
+        :param max_results: The maximum number of races to return (optional).
+        :return: A list of races, the most recent race first.
+        """
+        raise NotImplementedError("abstract method")
+
     def store_race(self, race):
         self._store(race.as_dict())
 
@@ -1148,6 +1359,9 @@ class CompositeRaceStore:
     def list(self):
         return self.es_store.list()
 
+    def find_by_configuration(self, track=None, challenge=None, car=None, user_tag=None, max_results=None):
+        return self.es_store.find_by_configuration(track, challenge, car, user_tag, max_results)
+
 
 class FileRaceStore(RaceStore):
     def __init__(self, cfg):
@@ -1155,13 +1369,19 @@ class FileRaceStore(RaceStore):
         self.user_provided_start_timestamp = self.cfg.opts("system", "time.start.user_provided", mandatory=False, default_value=False)
         self.races_path = paths.races_root(self.cfg)
         self.race_path = paths.race_root(self.cfg)
+        self.race_index = FileRaceIndex(self.races_path)
 
     def _store(self, doc):
         import json
         io.ensure_dir(self.race_path)
+        race_file = self._output_file_name(doc)
         # if the user has overridden the effective start date we guarantee a unique file name but do not let them use them for tournaments.
-        with open(self._output_file_name(doc), mode="w", encoding="UTF-8") as f:
+        with open(race_file, mode="w", encoding="UTF-8") as f:
             f.write(json.dumps(doc, indent=True))
+        if not self.user_provided_start_timestamp:
+            # the index is created lazily on the next read if it is missing so we only need to update an existing one
+            if self.race_index.exists():
+                self.race_index.add(doc, race_file)
 
     def _output_file_name(self, doc):
         if self.user_provided_start_timestamp:
@@ -1170,13 +1390,38 @@ class FileRaceStore(RaceStore):
             suffix = ""
         return "%s/race%s.json" % (self.race_path, suffix)
 
-    def list(self):
+    def rebuild_index(self):
+        """
+        Recreates the race index from all race files in the races directory.
+
+        :return: The number of indexed races.
+        """
         import glob
-        results = glob.glob("%s/*/race.json" % self.races_path)
-        all_races = self._to_races(results)
-        return all_races[:self._max_results()]
+        import json
+        docs = []
+        for race_file in glob.glob("%s/*/race.json" % self.races_path):
+            # noinspection PyBroadException
+            try:
+                with open(race_file) as f:
+                    docs.append((json.loads(f.read()), race_file))
+            except BaseException:
+                logger.exception("Could not load race file [%s] (incompatible format?) Skipping..." % race_file)
+        self.race_index.rebuild(docs)
+        return len(docs)
+
+    def list(self):
+        return self.find_by_configuration(max_results=self._max_results())
+
+    def find_by_configuration(self, track=None, challenge=None, car=None, user_tag=None, max_results=None):
+        # we only load the race files of matching races
+        if not self.race_index.exists():
+            logger.info("Race index [%s] does not exist yet. Creating it." % self.race_index.index_path)
+            self.rebuild_index()
+        race_files = self.race_index.find(track=track, challenge=challenge, car=car, user_tag=user_tag, max_results=max_results)
+        return self._to_races(race_files)
 
     def find_by_timestamp(self, timestamp):
+        # the location of a race file is derived from the timestamp so we do not need to consult the index
         race_file = "%s/race.json" % paths.race_root(cfg=self.cfg, start=time.from_is8601(timestamp))
         if io.exists(race_file):
             races = self._to_races([race_file])
@@ -1197,9 +1442,93 @@ class FileRaceStore(RaceStore):
         return sorted(races, key=lambda r: r.trial_timestamp, reverse=True)
 
 
+class FileRaceIndex:
+    """
+    An SQLite based catalogue of all races in the file race store. It allows to list and filter races without parsing every race file.
+    """
+    COLUMNS = ["trial_timestamp", "environment", "track", "challenge", "car", "user_tag", "path"]
+
+    def __init__(self, races_path):
+        self.races_path = races_path
+        self.index_path = "%s/races.db" % races_path
+
+    def exists(self):
+        return os.path.isfile(self.index_path)
+
+    def add(self, doc, race_file):
+        with self._connect() as conn:
+            conn.execute(self._insert_statement(), self._row(doc, race_file))
+
+    def rebuild(self, docs):
+        """
+        Replaces the contents of the index.
+
+        :param docs: A list of tuples (race doc, path to race file).
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM races")
+            conn.executemany(self._insert_statement(), [self._row(doc, race_file) for doc, race_file in docs])
+
+    def find(self, track=None, challenge=None, car=None, user_tag=None, max_results=None):
+        """
+        :return: A list of paths to matching race files, the most recent race first.
+        """
+        conditions = []
+        params = []
+        for column, value in [("track", track), ("challenge", challenge), ("car", car), ("user_tag", user_tag)]:
+            if value is not None:
+                conditions.append("%s = ?" % column)
+                params.append(value)
+        query = "SELECT path FROM races"
+        if conditions:
+            query += " WHERE %s" % " AND ".join(conditions)
+        # ISO 8601 timestamps in basic format sort chronologically
+        query += " ORDER BY trial_timestamp DESC"
+        if max_results is not None:
+            query += " LIMIT ?"
+            params.append(int(max_results))
+        with self._connect() as conn:
+            return [os.path.join(self.races_path, row[0]) for row in conn.execute(query, params)]
+
+    def _connect(self):
+        import sqlite3
+        io.ensure_dir(self.races_path)
+        conn = sqlite3.connect(self.index_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS races (trial_timestamp TEXT PRIMARY KEY, environment TEXT, track TEXT, challenge TEXT, "
+                     "car TEXT, user_tag TEXT, path TEXT)")
+        conn.execute("CREATE INDEX IF NOT EXISTS races_by_configuration ON races (track, challenge, car, trial_timestamp)")
+        return _ClosingConnection(conn)
+
+    def _insert_statement(self):
+        columns = FileRaceIndex.COLUMNS
+        return "INSERT OR REPLACE INTO races (%s) VALUES (%s)" % (", ".join(columns), ", ".join(["?"] * len(columns)))
+
+    def _row(self, doc, race_file):
+        # paths are relative so the races directory can be moved
+        return (doc["trial-timestamp"], doc.get("environment"), doc.get("track"), doc.get("challenge"), doc.get("car"),
+                doc.get("user-tag"), os.path.relpath(race_file, self.races_path))
+
+
+class _ClosingConnection:
+    # sqlite3 connections commit (or roll back) in their context manager but do not close the connection
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            return self.conn.__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            self.conn.close()
+
+
 class EsRaceStore(RaceStore):
     INDEX_PREFIX = "rally-races-"
     RACE_DOC_TYPE = "races"
+    # corresponds to the default of index.max_result_window
+    MAX_RESULTS = 10000
 
     def __init__(self, cfg, client_factory_class=EsClientFactory, index_template_provider_class=IndexTemplateProvider):
         """
@@ -1249,6 +1578,39 @@ class EsRaceStore(RaceStore):
         else:
             return []
 
+    def find_by_configuration(self, track=None, challenge=None, car=None, user_tag=None, max_results=None):
+        filters = [{
+            "term": {
+                "environment": self.environment_name
+            }
+        }]
+        for field, value in [("track", track), ("challenge", challenge), ("car", car), ("user-tag", user_tag)]:
+            if value is not None:
+                filters.append({
+                    "term": {
+                        field: value
+                    }
+                })
+
+        # race documents also contain the results so we retrieve everything with one request
+        query = {
+            "query": {
+                "bool": {
+                    "filter": filters
+                }
+            },
+            "size": max_results if max_results is not None else EsRaceStore.MAX_RESULTS,
+            "sort": [
+                {
+                    "trial-timestamp": {
+                        "order": "desc"
+                    }
+                }
+            ]
+        }
+        result = self.client.search(index="%s*" % EsRaceStore.INDEX_PREFIX, doc_type=EsRaceStore.RACE_DOC_TYPE, body=query)
+        return [Race.from_dict(v["_source"]) for v in result["hits"]["hits"]]
+
     def find_by_timestamp(self, timestamp):
         filters = [{
             "term": {
@@ -15,3 +15,14 @@ def race_root(cfg=None, start=None):
     ts = "%04d-%02d-%02d-%02d-%02d-%02d" % (start.year, start.month, start.day, start.hour, start.minute, start.second)
     return "%s/%s" % (races_root(cfg), ts)
 
+
+def cluster_snapshots_root(cfg):
+    return "%s/snapshots" % cfg.opts("node", "root.dir")
+
+
+def artefacts_root(cfg):
+    return "%s/artefacts" % cfg.opts("node", "root.dir")
+
+
+def worktrees_root(cfg):
+    return "%s/worktrees" % cfg.opts("node", "root.dir")
@@ -177,7 +177,10 @@ class Benchmark:
             logger.info("Flushing done")
         # may happen if one of the load generators has detected that the user has cancelled the benchmark.
         elif isinstance(result, driver.BenchmarkCancelled):
-            logger.info("User has cancelled the benchmark.")
+            if result.reason:
+                console.error("Benchmark has been aborted: %s" % result.reason, logger=logger)
+            else:
+                logger.info("User has cancelled the benchmark.")
             return False
         elif isinstance(result, driver.BenchmarkFailure):
             logger.info("Driver has reported a benchmark failure.")
@@ -188,7 +191,7 @@ class Benchmark:
 
     def teardown(self, cancelled=False, error=False):
         logger.info("Asking mechanic to stop the engine.")
-        result = self.actor_system.ask(self.mechanic, mechanic.StopEngine())
+        result = self.actor_system.ask(self.mechanic, mechanic.StopEngine(benchmark_complete=not cancelled and not error))
         if isinstance(result, mechanic.EngineStopped):
             logger.info("Mechanic has stopped engine successfully.")
             logger.info("Bulk adding system metrics to metrics store.")
@@ -204,7 +207,8 @@ class Benchmark:
 
         self.metrics_store.flush()
         if not cancelled and not error:
-            final_results = reporter.calculate_results(self.metrics_store, self.race)
+            final_results = reporter.calculate_results(self.metrics_store, self.race,
+                                                       time_series_interval=reporter.time_series_interval(self.cfg))
             self.race.add_final_results(final_results)
             reporter.summarize(self.race, self.cfg)
             self.race_store.store_race(self.race)
@@ -235,7 +239,8 @@ class LapCounter:
             lap_time = self.lap_timer.split_time() - self.lap_times
             self.lap_times += lap_time
             hl, ml, sl = convert.seconds_to_hour_minute_seconds(lap_time)
-            lap_results = reporter.calculate_results(self.metrics_store, self.race, lap)
+            lap_results = reporter.calculate_results(self.metrics_store, self.race, lap,
+                                                     time_series_interval=reporter.time_series_interval(self.cfg))
             self.race.add_lap_results(lap_results)
             reporter.summarize(self.race, self.cfg, lap=lap)
             console.println("")
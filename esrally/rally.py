@@ -9,13 +9,12 @@ import time
 import faulthandler
 import signal
 
-from esrally import version, actor, config, paths, racecontrol, reporter, metrics, track, exceptions, time as rtime
+# Only import modules here that every subcommand needs. Others (e.g. the actor system, the Elasticsearch client or track rendering) are
+# comparatively expensive to import and thus imported where they are needed to keep startup fast.
+from esrally import version, config, paths, exceptions, time as rtime
 from esrally import PROGRAM_NAME, DOC_LINK, BANNER, SKULL, check_python_version
-from esrally.mechanic import team, telemetry
 from esrally.utils import io, convert, process, console, net
 
-from elasticsearch.client import _normalize_hosts
-
 logger = logging.getLogger("rally.main")
 
 DEFAULT_CLIENT_OPTIONS = "timeout:60000,request_timeout:60000"
@@ -84,6 +83,18 @@ def parse_args():
             raise argparse.ArgumentTypeError("must be positive but was %s" % value)
         return value
 
+    def non_negative_float(v):
+        value = float(v)
+        if value < 0:
+            raise argparse.ArgumentTypeError("must not be negative but was %s" % value)
+        return value
+
+    def probability(v):
+        value = float(v)
+        if not 0 < value < 1:
+            raise argparse.ArgumentTypeError("must be between 0 and 1 (exclusive) but was %s" % value)
+        return value
+
     # try to preload configurable defaults, but this does not work together with `--configuration-name` (which is undocumented anyway)
     cfg = config.Config()
     if cfg.config_present():
@@ -130,6 +141,11 @@ def parse_args():
         help="Limit the number of search results for recent races (default: 10).",
         default=10,
     )
+    list_parser.add_argument(
+        "--rebuild-index",
+        help="Rebuild the index of locally stored races before listing them (default: false).",
+        default=False,
+        action="store_true")
 
     compare_parser = subparsers.add_parser("compare", help="Compare two races")
     compare_parser.add_argument(
@@ -140,16 +156,80 @@ def parse_args():
         "--contender",
         help="Race timestamp of the contender (see %s list races)" % PROGRAM_NAME,
         default="")
+    compare_parser.add_argument(
+        "--significance-level",
+        help="If both races have run multiple laps, only highlight differences that are statistically significant at this level "
+             "(default: 0.05).",
+        type=probability,
+        default=0.05)
+    compare_parser.add_argument(
+        "--threshold",
+        help="Only highlight differences of at least this many percent (default: 0).",
+        type=non_negative_float,
+        default=0.0)
     compare_parser.add_argument(
         "--report-format",
         help="define the output format for the command line report (default: markdown).",
-        choices=["markdown", "csv"],
+        choices=["markdown", "csv", "json"],
         default="markdown")
     compare_parser.add_argument(
         "--report-file",
         help="write the command line report also to the provided file",
         default="")
 
+    trend_parser = subparsers.add_parser("trend", help="Analyze the trend of several races and detect regressions")
+    trend_parser.add_argument(
+        "--track",
+        help="Analyze races of this track (default: geonames).",
+        default="geonames")
+    trend_parser.add_argument(
+        "--challenge",
+        help="Analyze races of this challenge (default: the challenge of the most recent race).")
+    trend_parser.add_argument(
+        "--car",
+        help="Analyze races with this car (default: defaults).",
+        default="defaults")
+    trend_parser.add_argument(
+        "--races",
+        help="The maximum number of recent races to analyze (default: 20).",
+        type=positive_number,
+        default=20)
+    trend_parser.add_argument(
+        "--window",
+        help="The number of preceding races that form the rolling baseline of the latest race (default: 5).",
+        type=positive_number,
+        default=5)
+    trend_parser.add_argument(
+        "--significance-level",
+        help="Only consider level shifts that are statistically significant at this level as change points (default: 0.05).",
+        type=probability,
+        default=0.05)
+    trend_parser.add_argument(
+        "--threshold",
+        help="Only report change points of at least this many percent as regressions (default: 0).",
+        type=non_negative_float,
+        default=0.0)
+    trend_parser.add_argument(
+        "--report-format",
+        help="define the output format for the command line report (default: markdown).",
+        choices=["markdown", "csv", "json"],
+        default="markdown")
+    trend_parser.add_argument(
+        "--report-file",
+        help="write the command line report also to the provided file",
+        default="")
+
+    build_parser = subparsers.add_parser("build", help="Build several revisions of Elasticsearch from sources in parallel ahead of races")
+    build_parser.add_argument(
+        "--revisions",
+        help="a comma-separated list of source code revisions to build. Supports the same values as --revision.",
+        default="")
+    build_parser.add_argument(
+        "--workers",
+        help="the maximum number of revisions that are built concurrently (default: 2).",
+        type=positive_number,
+        default=2)
+
     config_parser = subparsers.add_parser("configure", help="Write the configuration file or reconfigure Rally")
     for p in [parser, config_parser]:
         p.add_argument(
@@ -173,11 +253,27 @@ def parse_args():
             "--preserve-install",
             help="keep the benchmark candidate and its index. (default: %s)" % str(preserve_install).lower(),
             default=preserve_install)
+        cluster_snapshot_group = p.add_mutually_exclusive_group()
+        cluster_snapshot_group.add_argument(
+            "--store-cluster-snapshot",
+            help="store the installation and the data directories of all nodes under the provided name after the race has finished. "
+                 "Only supported by the pipeline from-distribution.",
+            default=None)
+        cluster_snapshot_group.add_argument(
+            "--restore-cluster-snapshot",
+            help="start the race on a cluster that is restored from the snapshot with the provided name instead of an empty cluster. "
+                 "Rally will neither delete nor recreate the indices of the track.",
+            default=None)
         p.add_argument(
             "--telemetry",
             help="enable the provided telemetry devices, provided as a comma-separated list. List possible telemetry devices "
                  "with `%s list telemetry`" % PROGRAM_NAME,
             default="")
+        p.add_argument(
+            "--telemetry-params",
+            help="define a comma-separated list of key:value pairs that are passed to telemetry devices, "
+                 "e.g. \"node-stats-sample-interval:5\"",
+            default="")
         p.add_argument(
             "--revision",
             help="define the source code revision for building the benchmark candidate. 'current' uses the source tree as is,"
@@ -223,12 +319,18 @@ def parse_args():
         p.add_argument(
             "--report-format",
             help="define the output format for the command line report (default: markdown).",
-            choices=["markdown", "csv"],
+            choices=["markdown", "csv", "json"],
             default="markdown")
         p.add_argument(
             "--report-file",
             help="write the command line report also to the provided file",
             default="")
+        p.add_argument(
+            "--time-series-interval",
+            help="also report throughput and latency percentiles of each operation per time interval of this many seconds. "
+                 "By default, no time series are reported.",
+            type=positive_number,
+            default=None)
         p.add_argument(
             "--quiet",
             help="suppress as much as output as possible (default: false).",
@@ -268,11 +370,30 @@ def parse_args():
             help="assume that Rally has no connection to the Internet (default: false)",
             default=False,
             action="store_true")
+        p.add_argument(
+            "--export-raw-samples",
+            help="Also write latency and service time of each request to a compact binary file in the race directory (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--progress-endpoint",
+            help="Expose live progress of the benchmark via HTTP on the given port or host:port, e.g. 8787 (default: disabled).",
+            default=None)
+        p.add_argument(
+            "--abort-on",
+            help="Abort the benchmark early if a task violates any of these conditions, e.g. error-rate:0.5,latency-p99:2000 "
+                 "(default: never abort).",
+            default="")
         p.add_argument(
             "--enable-driver-profiling",
             help="Enables a profiler for analyzing the performance of calls in Rally's driver (default: false)",
             default=False,
             action="store_true")
+        p.add_argument(
+            "--task-start-delay",
+            type=non_negative_float,
+            help="Delay in seconds after which all clients start the next task once they have finished the previous one (default: 1.0)",
+            default=1.0)
 
     ###############################################################################
     #
@@ -354,16 +475,22 @@ def ensure_configuration_present(cfg, args, sub_command):
 def list(cfg):
     what = cfg.opts("system", "list.config.option")
     if what == "telemetry":
+        from esrally.mechanic import telemetry
         telemetry.list_telemetry()
     elif what == "tracks":
+        from esrally import track
         track.list_tracks(cfg)
     elif what == "pipelines":
+        from esrally import racecontrol
         racecontrol.list_pipelines()
     elif what == "races":
+        from esrally import metrics
         metrics.list_races(cfg)
     elif what == "cars":
+        from esrally.mechanic import team
         team.list_cars(cfg)
     elif what == "elasticsearch-plugins":
+        from esrally.mechanic import team
         team.list_plugins(cfg)
     else:
         raise exceptions.SystemSetupError("Cannot list unknown configuration option [%s]" % what)
@@ -381,10 +508,12 @@ def print_help_on_errors():
 
 
 def race(cfg):
+    from esrally import racecontrol
     with_actor_system(lambda c: racecontrol.run(c), cfg)
 
 
 def with_actor_system(runnable, cfg):
+    from esrally import actor
     already_running = actor.actor_system_already_running()
     logger.info("Actor system already running locally? [%s]" % str(already_running))
     try:
@@ -443,11 +572,18 @@ def with_actor_system(runnable, cfg):
 def dispatch_sub_command(cfg, sub_command):
     try:
         if sub_command == "compare":
+            from esrally import reporter
             reporter.compare(cfg)
         elif sub_command == "list":
             list(cfg)
         elif sub_command == "race":
             race(cfg)
+        elif sub_command == "trend":
+            from esrally import reporter
+            reporter.trend(cfg)
+        elif sub_command == "build":
+            from esrally.mechanic import supplier
+            supplier.prebuild(cfg)
         else:
             raise exceptions.SystemSetupError("Unknown subcommand [%s]" % sub_command)
         return True
@@ -564,6 +700,13 @@ def main():
     cfg.add(config.Scope.applicationOverride, "mechanic", "node.datapaths", csv_to_list(args.data_paths))
     cfg.add(config.Scope.applicationOverride, "mechanic", "preserve.install", convert.to_bool(args.preserve_install))
     cfg.add(config.Scope.applicationOverride, "mechanic", "telemetry.devices", csv_to_list(args.telemetry))
+    cfg.add(config.Scope.applicationOverride, "mechanic", "telemetry.params", kv_to_map(csv_to_list(args.telemetry_params)))
+    if args.store_cluster_snapshot:
+        cfg.add(config.Scope.applicationOverride, "mechanic", "cluster.snapshot.name", args.store_cluster_snapshot)
+        cfg.add(config.Scope.applicationOverride, "mechanic", "cluster.snapshot.mode", "store")
+    elif args.restore_cluster_snapshot:
+        cfg.add(config.Scope.applicationOverride, "mechanic", "cluster.snapshot.name", args.restore_cluster_snapshot)
+        cfg.add(config.Scope.applicationOverride, "mechanic", "cluster.snapshot.mode", "restore")
     if args.override_src_dir is not None:
         cfg.add(config.Scope.applicationOverride, "source", "local.src.dir", args.override_src_dir)
 
@@ -575,20 +718,41 @@ def main():
     cfg.add(config.Scope.applicationOverride, "track", "track.name", args.track)
     cfg.add(config.Scope.applicationOverride, "track", "challenge.name", args.challenge)
     cfg.add(config.Scope.applicationOverride, "track", "test.mode.enabled", args.test_mode)
-    cfg.add(config.Scope.applicationOverride, "track", "auto_manage_indices", to_bool(args.auto_manage_indices))
+    auto_manage_indices = to_bool(args.auto_manage_indices)
+    if auto_manage_indices is None and args.restore_cluster_snapshot:
+        # we must not delete the indices that have just been restored
+        auto_manage_indices = False
+    cfg.add(config.Scope.applicationOverride, "track", "auto_manage_indices", auto_manage_indices)
 
     cfg.add(config.Scope.applicationOverride, "reporting", "format", args.report_format)
     cfg.add(config.Scope.applicationOverride, "reporting", "output.path", args.report_file)
+    if args.time_series_interval:
+        cfg.add(config.Scope.applicationOverride, "reporting", "time.series.interval", args.time_series_interval)
     if sub_command == "compare":
         cfg.add(config.Scope.applicationOverride, "reporting", "baseline.timestamp", args.baseline)
         cfg.add(config.Scope.applicationOverride, "reporting", "contender.timestamp", args.contender)
+        cfg.add(config.Scope.applicationOverride, "reporting", "comparison.significance.level", args.significance_level)
+        cfg.add(config.Scope.applicationOverride, "reporting", "comparison.threshold", args.threshold)
+    if sub_command == "trend":
+        cfg.add(config.Scope.applicationOverride, "reporting", "trend.races", args.races)
+        cfg.add(config.Scope.applicationOverride, "reporting", "trend.window", args.window)
+        cfg.add(config.Scope.applicationOverride, "reporting", "trend.significance.level", args.significance_level)
+        cfg.add(config.Scope.applicationOverride, "reporting", "trend.threshold", args.threshold)
+    if sub_command == "build":
+        cfg.add(config.Scope.applicationOverride, "build", "revisions", csv_to_list(args.revisions))
+        cfg.add(config.Scope.applicationOverride, "build", "workers", args.workers)
 
     ################################
     # new section name: driver
     ################################
     cfg.add(config.Scope.applicationOverride, "benchmarks", "cluster.health", args.cluster_health)
     cfg.add(config.Scope.applicationOverride, "driver", "profiling", args.enable_driver_profiling)
+    cfg.add(config.Scope.applicationOverride, "driver", "raw.samples.export", args.export_raw_samples)
+    cfg.add(config.Scope.applicationOverride, "driver", "progress.endpoint", args.progress_endpoint)
+    cfg.add(config.Scope.applicationOverride, "driver", "abort.on", kv_to_map(csv_to_list(args.abort_on)))
+    cfg.add(config.Scope.applicationOverride, "driver", "task.start.delay", args.task_start_delay)
     if sub_command != "list":
+        from elasticsearch.client import _normalize_hosts
         # Also needed by mechanic (-> telemetry) - duplicate by module?
         cfg.add(config.Scope.applicationOverride, "client", "hosts", _normalize_hosts(csv_to_list(args.target_hosts)))
         client_options = kv_to_map(csv_to_list(args.client_options))
@@ -600,6 +764,7 @@ def main():
     if sub_command == "list":
         cfg.add(config.Scope.applicationOverride, "system", "list.config.option", args.configuration)
         cfg.add(config.Scope.applicationOverride, "system", "list.races.max_results", args.limit)
+        cfg.add(config.Scope.applicationOverride, "system", "list.races.rebuild.index", args.rebuild_index)
 
     configure_logging(cfg)
     logger.info("OS [%s]" % str(os.uname()))
@@ -1,20 +1,29 @@
 import collections
 import csv
 import io
+import json
 import logging
+import statistics
 
 import tabulate
-from esrally import metrics, exceptions
-from esrally.utils import convert, io as rio, console
+from esrally import metrics, exceptions, track, time
+from esrally.utils import convert, io as rio, console, stats
 
 logger = logging.getLogger("rally.reporting")
 
 
-def calculate_results(metrics_store, race, lap=None):
-    calc = StatsCalculator(metrics_store, race.challenge, lap)
+def calculate_results(metrics_store, race, lap=None, time_series_interval=None):
+    calc = StatsCalculator(metrics_store, race.challenge, lap, time_series_interval)
     return calc()
 
 
+def time_series_interval(cfg):
+    """
+    :return: The length in seconds of each interval of the per-operation time series or ``None`` if time series are disabled.
+    """
+    return cfg.opts("reporting", "time.series.interval", mandatory=False)
+
+
 def summarize(race, cfg, lap=None):
     logger.info("Summarizing results.")
     results = race.results_of_lap_number(lap) if lap else race.results
@@ -33,6 +42,27 @@ def compare(cfg):
         race_store.find_by_timestamp(contender_ts))
 
 
+def trend(cfg):
+    track_name = cfg.opts("track", "track.name")
+    challenge_name = cfg.opts("track", "challenge.name", mandatory=False)
+    car_name = cfg.opts("mechanic", "car.name")
+    max_races = cfg.opts("reporting", "trend.races", mandatory=False, default_value=TrendReporter.DEFAULT_RACES)
+
+    race_store = metrics.race_store(cfg)
+    if not challenge_name:
+        # analyze the challenge that has been run most recently
+        latest = race_store.find_by_configuration(track=track_name, car=car_name, max_results=1)
+        if latest:
+            challenge_name = latest[0].challenge_name
+    races = race_store.find_by_configuration(track=track_name, challenge=challenge_name, car=car_name, max_results=max_races)
+    if len(races) < 2:
+        raise exceptions.SystemSetupError("Trend analysis needs at least two races but found [%d] for track [%s], challenge [%s] and "
+                                          "car [%s]. List the available races with 'esrally list races'." %
+                                          (len(races), track_name, challenge_name, car_name))
+    # oldest race first
+    TrendReporter(cfg).report(list(reversed(races)))
+
+
 def print_internal(message):
     console.println(message, logger=logger.info)
 
@@ -46,6 +76,8 @@ def write_single_report(report_file, report_format, cwd, headers, data_plain, da
         formatter = format_as_markdown
     elif report_format == "csv":
         formatter = format_as_csv
+    elif report_format == "json":
+        formatter = format_as_json
     else:
         raise exceptions.SystemSetupError("Unknown report format '%s'" % report_format)
 
@@ -80,26 +112,37 @@ def format_as_csv(headers, data, write_header=True):
         return out.getvalue()
 
 
+def format_as_json(headers, data, write_header=True):
+    # one JSON document per line so subsequent reports (e.g. of each lap) can be appended to the same file
+    return "".join(["%s\n" % json.dumps(collections.OrderedDict(zip(headers, metric_record))) for metric_record in data])
+
+
 class StatsCalculator:
-    def __init__(self, store, challenge, lap=None):
+    TIME_SERIES_PERCENTILES = [50, 90, 99, 100]
+
+    def __init__(self, store, challenge, lap=None, time_series_interval=None):
         self.store = store
         self.challenge = challenge
         self.lap = lap
+        self.time_series_interval = time_series_interval
 
     def __call__(self):
         result = Stats()
 
         for tasks in self.challenge.schedule:
             for task in tasks:
-                op = task.operation.name
-                logger.debug("Gathering request metrics for [%s]." % op)
-                result.add_op_metrics(
-                    op,
-                    self.summary_stats("throughput", op),
-                    self.single_latency(op),
-                    self.single_latency(op, metric_name="service_time"),
-                    self.error_rate(op)
-                )
+                # each operation in a mix is reported separately
+                for leaf_task in (task.tasks if isinstance(task, track.MixedTask) else [task]):
+                    op = leaf_task.operation.name
+                    logger.debug("Gathering request metrics for [%s]." % op)
+                    result.add_op_metrics(
+                        op,
+                        self.summary_stats("throughput", op),
+                        self.single_latency(op),
+                        self.single_latency(op, metric_name="service_time"),
+                        self.error_rate(op),
+                        self.time_series(op) if self.time_series_interval else None
+                    )
 
         logger.debug("Gathering indexing metrics.")
         result.total_time = self.sum("indexing_total_time")
@@ -194,7 +237,30 @@ class StatsCalculator:
         else:
             return {}
 
-    def safe_float_key(self, k):
+    def time_series(self, operation):
+        # we also consider warmup samples here as the time series should reveal how long it takes until the system is warmed up
+        buckets = collections.OrderedDict()
+        for metric_name in ["throughput", "latency", "service_time"]:
+            percentiles = [] if metric_name == "throughput" else StatsCalculator.TIME_SERIES_PERCENTILES
+            for bucket in self.store.get_time_series(metric_name, self.time_series_interval, operation=operation, lap=self.lap,
+                                                     percentiles=percentiles):
+                t = bucket["relative_time"]
+                if t not in buckets:
+                    buckets[t] = {"relative_time": t, "throughput": None, "latency": {}, "service_time": {}}
+                if metric_name == "throughput":
+                    buckets[t]["throughput"] = bucket["mean"]
+                else:
+                    # metrics stores return either the requested percentiles or their string representation (e.g. "50.0") as keys
+                    buckets[t][metric_name] = collections.OrderedDict(
+                        [(self.safe_float_key(float(k)), v) for k, v in bucket["percentiles"].items()])
+        return {
+            "interval": self.time_series_interval,
+            "unit": self.store.get_unit("throughput", operation=operation),
+            "buckets": sorted(buckets.values(), key=lambda b: b["relative_time"])
+        }
+
+    @staticmethod
+    def safe_float_key(k):
         return str(k).replace(".", "_")
 
     def percentiles_for_sample_size(self, sample_size):
@@ -278,14 +344,17 @@ class Stats:
     def v(self, d, k, default=None):
         return d.get(k, default) if d else default
 
-    def add_op_metrics(self, operation, throughput, latency, service_time, error_rate):
-        self.op_metrics.append({
+    def add_op_metrics(self, operation, throughput, latency, service_time, error_rate, time_series=None):
+        op_metrics = {
             "operation": operation,
             "throughput": throughput,
             "latency": latency,
             "service_time": service_time,
             "error_rate": error_rate
-        })
+        }
+        if time_series:
+            op_metrics["time_series"] = time_series
+        self.op_metrics.append(op_metrics)
 
     def operations(self):
         return [v["operation"] for v in self.op_metrics]
@@ -362,6 +431,7 @@ class SummaryReporter:
         warnings = []
         metrics_table = []
         meta_info_table = []
+        time_series_table = []
         metrics_table += self.report_total_times(stats)
         metrics_table += self.report_merge_part_times(stats)
 
@@ -378,11 +448,14 @@ class SummaryReporter:
             metrics_table += self.report_latency(record, operation)
             metrics_table += self.report_service_time(record, operation)
             metrics_table += self.report_error_rate(record, operation)
+            time_series_table += self.report_time_series(record, operation)
             self.add_warnings(warnings, record, operation)
 
         meta_info_table += self.report_meta_info()
 
         self.write_report(metrics_table, meta_info_table)
+        if time_series_table:
+            self.write_time_series_report(time_series_table)
 
         if warnings:
             for warning in warnings:
@@ -408,6 +481,30 @@ class SummaryReporter:
             write_single_report("%s.meta" % report_file, report_format, cwd, headers=["Name", "Value"], data_plain=meta_info_table,
                                 data_rich=meta_info_table, show_also_in_console=False)
 
+    def write_time_series_report(self, time_series_table):
+        report_file = self._config.opts("reporting", "output.path")
+        report_format = self._config.opts("reporting", "format")
+        cwd = self._config.opts("node", "rally.cwd")
+        print_internal("")
+        print_header("Time series per operation")
+        print_internal("")
+        percentile_headers = ["%sth percentile %s [ms]" % (p, m) for m in ["latency", "service time"]
+                              for p in StatsCalculator.TIME_SERIES_PERCENTILES]
+        write_single_report("%s.timeseries" % report_file if len(report_file) > 0 else "", report_format, cwd,
+                            headers=["Lap", "Operation", "Time [s]", "Throughput", "Unit"] + percentile_headers,
+                            data_plain=time_series_table, data_rich=time_series_table, write_header=self.needs_header())
+
+    def report_time_series(self, values, operation):
+        time_series = values.get("time_series")
+        if not time_series:
+            return []
+        lines = []
+        keys = [StatsCalculator.safe_float_key(float(p)) for p in StatsCalculator.TIME_SERIES_PERCENTILES]
+        for bucket in time_series["buckets"]:
+            lines.append([self.lap, operation, bucket["relative_time"], bucket["throughput"], time_series["unit"]] +
+                         [bucket["latency"].get(k) for k in keys] + [bucket["service_time"].get(k) for k in keys])
+        return lines
+
     def report_throughput(self, values, operation):
         min = values["throughput"]["min"]
         median = values["throughput"]["median"]
@@ -518,9 +615,19 @@ class SummaryReporter:
 
 
 class ComparisonReporter:
+    DEFAULT_SIGNIFICANCE_LEVEL = 0.05
+    DEFAULT_THRESHOLD = 0.0
+
     def __init__(self, config):
         self._config = config
         self.plain = False
+        self.significance_level = config.opts("reporting", "comparison.significance.level", mandatory=False,
+                                              default_value=ComparisonReporter.DEFAULT_SIGNIFICANCE_LEVEL)
+        # in percent
+        self.threshold = config.opts("reporting", "comparison.threshold", mandatory=False,
+                                     default_value=ComparisonReporter.DEFAULT_THRESHOLD)
+        # (metric, operation) -> (baseline values per lap, contender values per lap); None if we cannot determine significance
+        self.samples = None
 
     def report(self, r1, r2):
         logger.info("Generating comparison report for baseline (invocation=[%s], track=[%s], challenge=[%s], car=[%s]) and "
@@ -530,6 +637,7 @@ class ComparisonReporter:
         # we don't verify anything about the races as it is possible that the user benchmarks two different tracks intentionally
         baseline_stats = Stats(r1.results)
         contender_stats = Stats(r2.results)
+        self.samples = self.lap_samples(r1, r2)
 
         print_internal("")
         print_internal("Comparing baseline")
@@ -550,6 +658,16 @@ class ComparisonReporter:
         print_header("/_/   /_/_/ /_/\__,_/_/   /____/\___/\____/_/   \___/ ")
         print_header("------------------------------------------------------")
         print_internal("")
+        if self.samples is not None:
+            print_internal("Highlighting differences of at least [%s%%] that are significant at level [%s] based on [%d] baseline and [%d] "
+                           "contender laps." % (str(self.threshold), str(self.significance_level), len(r1.lap_results),
+                                                len(r2.lap_results)))
+            print_internal("")
+        elif len(r1.lap_results or []) >= 2 and len(r2.lap_results or []) >= 2:
+            print_internal("No difference can be significant at level [%s] with [%d] baseline and [%d] contender laps. Highlighting all "
+                           "differences of at least [%s%%]." % (str(self.significance_level), len(r1.lap_results), len(r2.lap_results),
+                                                               str(self.threshold)))
+            print_internal("")
 
         metric_table_plain = self.metrics_table(baseline_stats, contender_stats, plain=True)
         metric_table_rich = self.metrics_table(baseline_stats, contender_stats, plain=False)
@@ -575,16 +693,43 @@ class ComparisonReporter:
                 metrics_table += self.report_error_rate(baseline_stats, contender_stats, op)
         return metrics_table
 
+    def lap_samples(self, r1, r2):
+        """
+        :return: The values of each metric per lap for baseline and contender or ``None`` if the races do not have enough laps to
+                 determine whether a difference is significant.
+        """
+        baseline_laps = [l if isinstance(l, Stats) else Stats(l) for l in (r1.lap_results or [])]
+        contender_laps = [l if isinstance(l, Stats) else Stats(l) for l in (r2.lap_results or [])]
+        if not self.can_be_significant(len(baseline_laps), len(contender_laps)):
+            return None
+        # we reuse the logic that determines the report lines to extract the (formatted) value of each metric in each lap
+        self.samples = None
+        samples = {}
+        for index, laps in enumerate([baseline_laps, contender_laps]):
+            for lap in laps:
+                for row in self.metrics_table(lap, lap, plain=True):
+                    key = (row[0], row[1])
+                    if key not in samples:
+                        samples[key] = ([], [])
+                    samples[key][index].append(row[2])
+        return samples
+
+    def headers(self):
+        headers = ["Metric", "Operation", "Baseline", "Contender", "Diff", "Unit"]
+        if self.samples is not None:
+            headers += ["Diff CI (%d%%)" % round(100 * (1 - self.significance_level)), "p-value", "Effect size"]
+        return headers
+
     def format_as_table(self, table):
         return tabulate.tabulate(table,
-                                 headers=["Metric", "Operation", "Baseline", "Contender", "Diff", "Unit"],
+                                 headers=self.headers(),
                                  tablefmt="pipe", numalign="right", stralign="right")
 
     def write_report(self, metrics_table, metrics_table_console):
         report_file = self._config.opts("reporting", "output.path")
         report_format = self._config.opts("reporting", "format")
         cwd = self._config.opts("node", "rally.cwd")
-        write_single_report(report_file, report_format, cwd, headers=["Metric", "Operation", "Baseline", "Contender", "Diff", "Unit"],
+        write_single_report(report_file, report_format, cwd, headers=self.headers(),
                             data_plain=metrics_table, data_rich=metrics_table_console, write_header=True)
 
     def report_throughput(self, baseline_stats, contender_stats, operation):
@@ -739,12 +884,48 @@ class ComparisonReporter:
 
     def line(self, metric, baseline, contender, operation, unit, treat_increase_as_improvement, formatter=lambda x: x):
         if baseline is not None and contender is not None:
-            return [metric, str(operation), formatter(baseline), formatter(contender),
-                    self.diff(baseline, contender, treat_increase_as_improvement, formatter), unit]
+            key = (metric, str(operation))
+            baseline_samples, contender_samples = self.samples.get(key, ([], [])) if self.samples is not None else ([], [])
+            significant = self.significant(formatter(baseline), formatter(contender), baseline_samples, contender_samples)
+            line = [metric, str(operation), formatter(baseline), formatter(contender),
+                    self.diff(baseline, contender, treat_increase_as_improvement, formatter, significant), unit]
+            if self.samples is not None:
+                line += self.significance_columns(baseline_samples, contender_samples)
+            return line
         else:
             return []
 
-    def diff(self, baseline, contender, treat_increase_as_improvement, formatter=lambda x: x):
+    def significant(self, baseline, contender, baseline_samples, contender_samples):
+        """
+        :return: ``True`` iff the difference between baseline and contender is large enough to be highlighted. If there are per lap results
+                 for both races, the difference also needs to be statistically significant.
+        """
+        if baseline != 0:
+            relative_change = 100 * abs(contender - baseline) / abs(baseline)
+        else:
+            relative_change = float("inf") if contender != baseline else 0
+        if relative_change < self.threshold:
+            return False
+        if self.can_be_significant(len(baseline_samples), len(contender_samples)):
+            _, p_value = stats.mann_whitney_u(baseline_samples, contender_samples)
+            return p_value < self.significance_level
+        return True
+
+    def can_be_significant(self, baseline_size, contender_size):
+        """
+        :return: ``True`` iff a difference between samples of the provided sizes can be significant at all. E.g. with three laps each,
+                 the smallest possible p-value is 0.1.
+        """
+        return baseline_size >= 2 and contender_size >= 2 and stats.min_p_value(baseline_size, contender_size) < self.significance_level
+
+    def significance_columns(self, baseline_samples, contender_samples):
+        if len(baseline_samples) < 2 or len(contender_samples) < 2:
+            return ["", "", ""]
+        lower, upper = stats.bootstrap_ci(baseline_samples, contender_samples, confidence=1 - self.significance_level)
+        _, p_value = stats.mann_whitney_u(baseline_samples, contender_samples)
+        return ["[%+.5f, %+.5f]" % (lower, upper), "%.5f" % p_value, "%.2f" % stats.cliffs_delta(baseline_samples, contender_samples)]
+
+    def diff(self, baseline, contender, treat_increase_as_improvement, formatter=lambda x: x, significant=True):
         def identity(x):
             return x
 
@@ -753,6 +934,10 @@ class ComparisonReporter:
             color_greater = identity
             color_smaller = identity
             color_neutral = identity
+        elif not significant:
+            color_greater = console.format.neutral
+            color_smaller = console.format.neutral
+            color_neutral = console.format.neutral
         elif treat_increase_as_improvement:
             color_greater = console.format.green
             color_smaller = console.format.red
@@ -769,3 +954,116 @@ class ComparisonReporter:
         else:
             # tabulate needs this to align all values correctly
             return color_neutral("%.5f" % diff)
+
+
+class TrendReporter:
+    DEFAULT_RACES = 20
+    DEFAULT_WINDOW = 5
+    DEFAULT_SIGNIFICANCE_LEVEL = 0.05
+    DEFAULT_THRESHOLD = 0.0
+
+    def __init__(self, config):
+        self._config = config
+        # number of preceding races that form the rolling baseline
+        self.window = config.opts("reporting", "trend.window", mandatory=False, default_value=TrendReporter.DEFAULT_WINDOW)
+        self.significance_level = config.opts("reporting", "trend.significance.level", mandatory=False,
+                                              default_value=TrendReporter.DEFAULT_SIGNIFICANCE_LEVEL)
+        # in percent
+        self.threshold = config.opts("reporting", "trend.threshold", mandatory=False, default_value=TrendReporter.DEFAULT_THRESHOLD)
+
+    def report(self, races):
+        """
+        :param races: Races of the same track, challenge and car, the oldest race first.
+        """
+        latest = races[-1]
+        logger.info("Generating trend report for [%d] races of track=[%s], challenge=[%s], car=[%s]." %
+                    (len(races), latest.track, latest.challenge, latest.car))
+        trend_table = self.trend_table(races)
+        regressions = [row for row in trend_table if row[-1]]
+
+        print_internal("")
+        print_internal("Analyzing trend of [%d] races" % len(races))
+        print_internal("  Track: %s" % latest.track)
+        print_internal("  Challenge: %s" % latest.challenge_name)
+        print_internal("  Car: %s" % latest.car)
+        print_internal("  First race: %s" % time.to_iso8601(races[0].trial_timestamp))
+        print_internal("  Latest race: %s" % time.to_iso8601(latest.trial_timestamp))
+        print_internal("")
+        self.write_report(trend_table)
+        print_internal("")
+        if regressions:
+            print_header("Detected [%d] regressions." % len(regressions))
+        else:
+            print_internal("No regressions detected.")
+
+    def trend_table(self, races):
+        """
+        :param races: Races of the same track, challenge and car, the oldest race first.
+        :return: A list of report rows, one per metric of each operation of the latest race.
+        """
+        all_stats = [Stats(r.results) for r in races]
+        timestamps = [time.to_iso8601(r.trial_timestamp) for r in races]
+        table = []
+        for op in all_stats[-1].operations():
+            for metric, unit, treat_increase_as_improvement, extractor in self.op_metrics(all_stats[-1], op):
+                series = []
+                for race_stats, timestamp in zip(all_stats, timestamps):
+                    if op in race_stats.operations():
+                        value = extractor(race_stats.metrics(op))
+                        if value is not None:
+                            series.append((timestamp, value))
+                if len(series) >= 2:
+                    table.append(self.line(metric, op, unit, series, treat_increase_as_improvement))
+        return table
+
+    def op_metrics(self, latest_stats, op):
+        op_metrics = latest_stats.metrics(op)
+        throughput = op_metrics.get("throughput") or {}
+        result = [("Median Throughput", throughput.get("unit"), True, lambda m: (m.get("throughput") or {}).get("median"))]
+        for metric_key, metric_name in [("latency", "latency"), ("service_time", "service time")]:
+            for percentile in (op_metrics.get(metric_key) or {}).keys():
+                result.append(("%sth percentile %s" % (percentile.replace("_", "."), metric_name), "ms", False,
+                               lambda m, k=metric_key, p=percentile: (m.get(k) or {}).get(p)))
+        return result
+
+    def line(self, metric, operation, unit, series, treat_increase_as_improvement):
+        values = [v for _, v in series]
+        latest = values[-1]
+        # the rolling baseline is the median of the races immediately preceding the latest one
+        baseline = statistics.median(values[-self.window - 1:-1])
+        change_timestamp = ""
+        change = ""
+        p_value = ""
+        regression = False
+        points = stats.change_points(values, significance_level=self.significance_level)
+        if points:
+            # only the most recent change point is relevant for the current state
+            index, p = points[-1]
+            previous_start = points[-2][0] if len(points) > 1 else 0
+            before = statistics.median(values[previous_start:index])
+            after = statistics.median(values[index:])
+            relative_change = self.relative_change(before, after)
+            change_timestamp = series[index][0]
+            change = "%+.2f" % relative_change
+            p_value = "%.5f" % p
+            worse = relative_change < 0 if treat_increase_as_improvement else relative_change > 0
+            regression = worse and abs(relative_change) >= self.threshold
+        return [metric, str(operation), unit, len(values), baseline, latest, "%+.2f" % self.relative_change(baseline, latest),
+                change_timestamp, change, p_value, regression]
+
+    def relative_change(self, baseline, contender):
+        if baseline != 0:
+            return 100 * (contender - baseline) / abs(baseline)
+        else:
+            return 0.0 if contender == baseline else float("inf")
+
+    def headers(self):
+        return ["Metric", "Operation", "Unit", "Races", "Rolling baseline", "Latest", "Diff [%]", "Change point", "Change [%]", "p-value",
+                "Regression"]
+
+    def write_report(self, trend_table):
+        report_file = self._config.opts("reporting", "output.path")
+        report_format = self._config.opts("reporting", "format")
+        cwd = self._config.opts("node", "rally.cwd")
+        write_single_report(report_file, report_format, cwd, headers=self.headers(), data_plain=trend_table, data_rich=trend_table,
+                            write_header=True)
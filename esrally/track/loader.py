@@ -4,6 +4,7 @@ import os
 import sys
 import glob
 import urllib.error
+import concurrent.futures
 
 import jinja2
 import jinja2.exceptions
@@ -15,6 +16,9 @@ from esrally.utils import io, convert, net, git, versions, console, modules
 
 logger = logging.getLogger("rally.track")
 
+# listing tracks does not fetch from the remote track repository if it has been fetched within this period (in seconds)
+LIST_MAX_FETCH_AGE_SECONDS = 60 * 60
+
 
 class TrackSyntaxError(exceptions.InvalidSyntax):
     """
@@ -32,7 +36,10 @@ def tracks(cfg):
     :param cfg: The config object.
     :return: A list of tracks that are available for the provided distribution version or else for the master version.
     """
-    repo = TrackRepository(cfg)
+    return _read_tracks(cfg, TrackRepository(cfg))
+
+
+def _read_tracks(cfg, repo):
     reader = TrackFileReader(cfg)
     distribution_version = cfg.opts("mechanic", "distribution.version", mandatory=False)
     data_root = cfg.opts("benchmarks", "local.dataset.cache")
@@ -45,13 +52,39 @@ def tracks(cfg):
             for track_name in repo.track_names(distribution_version)]
 
 
+def track_summaries(cfg):
+    """
+    Summarizes all known tracks. As rendering and parsing all tracks is expensive, summaries are cached per revision of the track
+    repository.
+
+    :param cfg: The config object.
+    :return: A list of dicts, one per track, with the keys ``name``, ``description``, ``documents``, ``compressed-bytes``,
+    ``uncompressed-bytes``, ``default-challenge`` and ``challenges``.
+    """
+    def summarize():
+        return [{
+            "name": t.name,
+            "description": t.short_description,
+            "documents": t.number_of_documents,
+            "compressed-bytes": t.compressed_size_in_bytes,
+            "uncompressed-bytes": t.uncompressed_size_in_bytes,
+            "default-challenge": str(t.default_challenge) if t.default_challenge else None,
+            "challenges": [str(c) for c in t.challenges]
+        } for t in _read_tracks(cfg, repo)]
+
+    repo = TrackRepository(cfg, max_fetch_age=LIST_MAX_FETCH_AGE_SECONDS)
+    # check out the matching branch first so the revision of the working copy is the one that we list tracks from
+    repo.update(cfg.opts("mechanic", "distribution.version", mandatory=False))
+    return RevisionCache(repo.tracks_dir, "track-summaries").get(summarize)
+
+
 def list_tracks(cfg):
     console.println("Available tracks:\n")
     console.println(tabulate.tabulate(
         tabular_data=[
-            [t.name, t.short_description, t.number_of_documents, convert.bytes_to_human_string(t.compressed_size_in_bytes),
-             convert.bytes_to_human_string(t.uncompressed_size_in_bytes), t.default_challenge,
-             ",".join(map(str, t.challenges))] for t in tracks(cfg)
+            [t["name"], t["description"], t["documents"], convert.bytes_to_human_string(t["compressed-bytes"]),
+             convert.bytes_to_human_string(t["uncompressed-bytes"]), t["default-challenge"],
+             ",".join(t["challenges"])] for t in track_summaries(cfg)
         ],
         headers=["Name", "Description", "Documents", "Compressed Size", "Uncompressed Size", "Default Challenge", "All Challenges"]))
 
@@ -105,6 +138,10 @@ def operation_parameters(t, op):
         return params.param_source_for_operation(op.type, t.indices, op.params)
 
 
+# maximum number of data files of a track that are downloaded concurrently
+MAX_CONCURRENT_DOWNLOADS = 4
+
+
 def prepare_track(track, cfg):
     """
     Ensures that all track data are available for running the benchmark.
@@ -113,7 +150,7 @@ def prepare_track(track, cfg):
     :param cfg: The config object.
     """
 
-    def download(cfg, url, local_path, size_in_bytes):
+    def download(cfg, url, local_path, size_in_bytes, progress):
         offline = cfg.opts("system", "offline.mode")
         file_exists = os.path.isfile(local_path)
 
@@ -132,10 +169,7 @@ def prepare_track(track, cfg):
                 else:
                     logger.info("Downloading data from [%s] to [%s]." % (url, local_path))
 
-                # we want to have a bit more accurate download progress as these files are typically very large
-                progress = net.Progress("[INFO] Downloading data for track %s" % track.name, accuracy=1)
-                net.download(url, local_path, size_in_bytes, progress_indicator=progress)
-                progress.finish()
+                net.download(url, local_path, size_in_bytes, progress_indicator=progress.for_download(url))
                 logger.info("Downloaded data from [%s] to [%s]." % (url, local_path))
             except urllib.error.URLError:
                 logger.exception("Could not download [%s] to [%s]." % (url, local_path))
@@ -182,12 +216,30 @@ def prepare_track(track, cfg):
     if not track.source_root_url:
         logger.info("Track [%s] does not specify a source root URL. Assuming data are available locally." % track.name)
 
+    if track.source_root_url:
+        downloads = []
+        for index in track.indices:
+            for type in index.types:
+                if type.document_archive:
+                    data_url = "%s/%s" % (track.source_root_url, os.path.basename(type.document_archive))
+                    downloads.append((data_url, type.document_archive, type.compressed_size_in_bytes))
+        if downloads:
+            # we want to have a bit more accurate download progress as these files are typically very large
+            progress = net.Progress("[INFO] Downloading data for track %s" % track.name, accuracy=1)
+            aggregated_progress = net.AggregatedProgress(progress)
+            # download the data of all types concurrently
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(downloads), MAX_CONCURRENT_DOWNLOADS)) as pool:
+                futures = [pool.submit(download, cfg, url, local_path, size_in_bytes, aggregated_progress)
+                           for url, local_path, size_in_bytes in downloads]
+            if any([not f.exception() and f.result() for f in futures]):
+                progress.finish()
+            for f in futures:
+                # raise the first error (if any)
+                f.result()
+
     for index in track.indices:
         for type in index.types:
             if type.document_archive:
-                if track.source_root_url:
-                    data_url = "%s/%s" % (track.source_root_url, os.path.basename(type.document_archive))
-                    download(cfg, data_url, type.document_archive, type.compressed_size_in_bytes)
                 if not os.path.exists(type.document_archive):
                     if cfg.opts("track", "test.mode.enabled"):
                         logger.error("[%s] does not exist so assuming that track [%s] does not support test mode." %
@@ -205,12 +257,65 @@ def prepare_track(track, cfg):
                             (type.name, index.name))
 
 
+class RevisionCache:
+    """
+    Caches data that is derived from the contents of a git working copy (e.g. track summaries) in a JSON file inside its ``.git``
+    directory. The cached data are only valid for the revision that they have been created for and the cache is bypassed if the
+    working copy contains local changes.
+    """
+    def __init__(self, src_dir, name):
+        """
+        :param src_dir: A git working copy.
+        :param name: The name of the cached data.
+        """
+        self.src_dir = src_dir
+        self.cache_file = os.path.join(src_dir, ".git", "rally-%s.json" % name)
+
+    def _revision(self):
+        if git.has_local_changes(self.src_dir, include_untracked=True):
+            logger.info("Not using cache [%s] because [%s] contains local changes." % (self.cache_file, self.src_dir))
+            return None
+        try:
+            return git.head_revision(self.src_dir)
+        except IndexError:
+            # there are no commits yet
+            return None
+
+    def get(self, compute):
+        """
+        :param compute: A function without parameters that computes the data if they are not cached. The result must be JSON-serializable.
+        :return: The cached or computed data.
+        """
+        revision = self._revision()
+        if revision is None:
+            return compute()
+        try:
+            with open(self.cache_file, "rt", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("revision") == revision:
+                logger.info("Using cached data in [%s] for revision [%s]." % (self.cache_file, revision))
+                return cached["data"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError):
+            logger.warning("Ignoring corrupt cache [%s]." % self.cache_file)
+        data = compute()
+        with open(self.cache_file, "wt", encoding="utf-8") as f:
+            json.dump({"revision": revision, "data": data}, f)
+        return data
+
+
 class TrackRepository:
     """
     Manages track specifications.
     """
 
-    def __init__(self, cfg, fetch=True):
+    def __init__(self, cfg, fetch=True, max_fetch_age=None):
+        """
+        :param cfg: The config object.
+        :param fetch: Whether to fetch from the remote repository (default: True).
+        :param max_fetch_age: If set, fetching is skipped if the last fetch has happened less than this number of seconds ago.
+        """
         self.cfg = cfg
         self.name = cfg.opts("track", "repository.name")
         self.offline = cfg.opts("system", "offline.mode")
@@ -224,6 +329,9 @@ class TrackRepository:
             # a normal git repo with a remote
             if not git.is_working_copy(self.tracks_dir):
                 git.clone(src=self.tracks_dir, remote=self.url)
+            elif max_fetch_age is not None and git.fetched_within(self.tracks_dir, max_fetch_age):
+                logger.info("Skipping fetch of [%s] because it has been fetched within the last [%d] seconds." %
+                            (self.tracks_dir, max_fetch_age))
             else:
                 try:
                     git.fetch(src=self.tracks_dir)
@@ -235,7 +343,7 @@ class TrackRepository:
                                                   .format(src=self.tracks_dir))
 
     def track_names(self, distribution_version):
-        self._update(distribution_version)
+        self.update(distribution_version)
         return filter(self._is_track, next(os.walk(self.tracks_dir))[1])
 
     def _is_track(self, path):
@@ -249,10 +357,10 @@ class TrackRepository:
 
     def track_file(self, distribution_version, track_name, needs_update=True):
         if needs_update:
-            self._update(distribution_version)
+            self.update(distribution_version)
         return self._track_file(track_name)
 
-    def _update(self, distribution_version):
+    def update(self, distribution_version):
         try:
             if self.remote and not self.offline:
                 branch = versions.best_match(git.branches(self.tracks_dir, remote=self.remote), distribution_version)
@@ -506,7 +614,11 @@ class TrackSpecificationReader:
     def _create_template(self, tpl_spec, mapping_dir):
         name = self._r(tpl_spec, "name")
         index_pattern = self._r(tpl_spec, "index-pattern")
-        delete_matching_indices = self._r(tpl_spec, "delete-matching-indices", mandatory=False, default_value=True)
+        if self.override_auto_manage_indices is False:
+            logger.info("User explicitly disabled auto-managed indices on the command line. Keeping indices matching [%s]." % index_pattern)
+            delete_matching_indices = False
+        else:
+            delete_matching_indices = self._r(tpl_spec, "delete-matching-indices", mandatory=False, default_value=True)
         template_file = "%s/%s" % (mapping_dir, self._r(tpl_spec, "template"))
         return track.IndexTemplate(name, index_pattern, template_file, delete_matching_indices)
 
@@ -560,6 +672,8 @@ class TrackSpecificationReader:
             for op in self._r(challenge, "schedule", error_ctx=name):
                 if "parallel" in op:
                     task = self.parse_parallel(op["parallel"], ops, name)
+                elif "mix" in op:
+                    task = self.parse_mix(op["mix"], ops, name)
                 else:
                     task = self.parse_task(op, ops, name)
                 schedule.append(task)
@@ -589,12 +703,13 @@ class TrackSpecificationReader:
         default_time_period = self._r(ops_spec, "time-period", error_ctx="parallel", mandatory=False)
         clients = self._r(ops_spec, "clients", error_ctx="parallel", mandatory=False)
         completed_by = self._r(ops_spec, "completed-by", error_ctx="parallel", mandatory=False)
+        default_abort_on = self._r(ops_spec, "abort-on", error_ctx="parallel", mandatory=False)
 
         # now descent to each operation
         tasks = []
         for task in self._r(ops_spec, "tasks", error_ctx="parallel"):
             tasks.append(self.parse_task(task, ops, challenge_name, default_warmup_iterations, default_iterations,
-                                         default_warmup_time_period, default_time_period, completed_by))
+                                         default_warmup_time_period, default_time_period, completed_by, default_abort_on))
         if completed_by:
             completion_task = None
             for task in tasks:
@@ -608,8 +723,63 @@ class TrackSpecificationReader:
                             "this name exists." % (challenge_name, completed_by))
         return track.Parallel(tasks, clients)
 
+    def parse_mix(self, mix_spec, ops, challenge_name):
+        mix_name = self._r(mix_spec, "name", error_ctx="mix", mandatory=False, default_value="mix")
+        warmup_iterations = self._r(mix_spec, "warmup-iterations", error_ctx=mix_name, mandatory=False, default_value=0)
+        iterations = self._r(mix_spec, "iterations", error_ctx=mix_name, mandatory=False, default_value=1)
+        warmup_time_period = self._r(mix_spec, "warmup-time-period", error_ctx=mix_name, mandatory=False)
+        time_period = self._r(mix_spec, "time-period", error_ctx=mix_name, mandatory=False)
+        clients = self._r(mix_spec, "clients", error_ctx=mix_name, mandatory=False, default_value=1)
+        mix_meta_data = self._r(mix_spec, "meta", error_ctx=mix_name, mandatory=False, default_value={})
+        abort_on = self._r(mix_spec, "abort-on", error_ctx=mix_name, mandatory=False)
+
+        tasks = []
+        weights = []
+        for op_spec in self._r(mix_spec, "operations", error_ctx=mix_name):
+            op_name = self._r(op_spec, "operation", error_ctx=mix_name)
+            if op_name not in ops:
+                self._error("'mix' for challenge '%s' contains a non-existing operation '%s'. "
+                            "Please add an operation '%s' to the 'operations' block." % (challenge_name, op_name, op_name))
+            weight = self._r(op_spec, "weight", error_ctx=op_name)
+            meta_data = dict(mix_meta_data)
+            meta_data.update(self._r(op_spec, "meta", error_ctx=op_name, mandatory=False, default_value={}))
+            if weight <= 0:
+                self._error("Operation '%s' in the 'mix' for challenge '%s' must have a positive weight but has weight '%s'."
+                            % (op_name, challenge_name, str(weight)))
+            # all operations in the mix share the mix' iterations and time periods. Samples are recorded per operation though.
+            tasks.append(track.Task(operation=ops[op_name],
+                                    meta_data=meta_data,
+                                    warmup_iterations=warmup_iterations,
+                                    iterations=iterations,
+                                    warmup_time_period=warmup_time_period,
+                                    time_period=time_period,
+                                    clients=clients,
+                                    params=op_spec,
+                                    abort_on=abort_on))
+            weights.append(weight)
+
+        if warmup_iterations > 0 and time_period is not None:
+            self._error("Mix '%s' in challenge '%s' defines '%d' warmup iterations and a time period of '%d' seconds. Please do not "
+                        "mix time periods and iterations." % (mix_name, challenge_name, warmup_iterations, time_period))
+        elif warmup_time_period is not None and iterations != 1:
+            self._error("Mix '%s' in challenge '%s' defines a warmup time period of '%d' seconds and '%d' iterations. Please do not "
+                        "mix time periods and iterations." % (mix_name, challenge_name, warmup_time_period, iterations))
+
+        return track.MixedTask(name=mix_name,
+                               tasks=tasks,
+                               weights=weights,
+                               meta_data=mix_meta_data,
+                               warmup_iterations=warmup_iterations,
+                               iterations=iterations,
+                               warmup_time_period=warmup_time_period,
+                               time_period=time_period,
+                               clients=clients,
+                               schedule=self._r(mix_spec, "schedule", error_ctx=mix_name, mandatory=False, default_value="deterministic"),
+                               params=mix_spec,
+                               abort_on=abort_on)
+
     def parse_task(self, task_spec, ops, challenge_name, default_warmup_iterations=0, default_iterations=1,
-                   default_warmup_time_period=None, default_time_period=None, completed_by_name=None):
+                   default_warmup_time_period=None, default_time_period=None, completed_by_name=None, default_abort_on=None):
         op_name = task_spec["operation"]
         if op_name not in ops:
             self._error("'schedule' for challenge '%s' contains a non-existing operation '%s'. "
@@ -629,7 +799,8 @@ class TrackSpecificationReader:
                           # this will work because op_name must always be set, i.e. it is never `None`.
                           completes_parent=(op_name == completed_by_name),
                           schedule=schedule,
-                          params=task_spec)
+                          params=task_spec,
+                          abort_on=self._r(task_spec, "abort-on", error_ctx=op_name, mandatory=False, default_value=default_abort_on))
         if task.warmup_iterations != default_warmup_iterations and task.time_period is not None:
             self._error("Operation '%s' in challenge '%s' defines '%d' warmup iterations and a time period of '%d' seconds. Please do not "
                         "mix time periods and iterations." % (op_name, challenge_name, task.warmup_iterations, task.time_period))
@@ -1,5 +1,9 @@
+import bisect
+import copy
+import json
 import logging
 import random
+import re
 import time
 import types
 from enum import Enum
@@ -152,6 +156,153 @@ class SearchParamSource(ParamSource):
         return self.query_params
 
 
+class TemplatedSearchParamSource(SearchParamSource):
+    """
+    A parameter source for searches whose query body contains placeholders (``${name}``) that are filled with randomly drawn values on each
+    invocation of ``#params()``. Each placeholder is defined in the ``placeholders`` element of the operation and draws its values either
+    from a list of terms (uniformly or zipfian distributed) or from a uniform numeric range.
+
+    The query body is compiled only once into a list of literal fragments and placeholder slots. Generating a query body is then reduced
+    to joining strings and the body is handed to the runner as a (JSON) string.
+    """
+
+    PLACEHOLDER_PATTERN = re.compile(r'"\$\{([\w.-]+)\}"|\$\{([\w.-]+)\}')
+
+    def __init__(self, indices, params, source=io.FileSource):
+        super().__init__(indices, params)
+        self.seed = params.get("seed", None)
+        placeholder_specs = params.get("placeholders", {})
+        if not placeholder_specs:
+            raise exceptions.InvalidSyntax("'placeholders' is mandatory for a templated search")
+        self.value_sources = {}
+        for name, spec in placeholder_specs.items():
+            self.value_sources[name] = value_source_for(name, spec, source)
+        self.fragments, self.slots = compile_template(json.dumps(self.query_params["body"]), self.value_sources.keys())
+        self.rand = random.Random(self.seed)
+
+    def partition(self, partition_index, total_partitions):
+        # Each client draws its own (reproducible) sequence of values if a seed is given
+        if self.seed is not None:
+            seeded = copy.copy(self)
+            seeded.rand = random.Random("%s-%d" % (str(self.seed), partition_index))
+            return seeded
+        else:
+            return self
+
+    def params(self):
+        values = {name: value_source.next(self.rand) for name, value_source in self.value_sources.items()}
+        body = self.fragments[:]
+        for position, name, quoted in self.slots:
+            value = values[name]
+            if quoted:
+                body[position] = json.dumps(value)
+            else:
+                # the placeholder is embedded in a string so we need to escape the value but must not emit surrounding quotes
+                body[position] = json.dumps(str(value))[1:-1]
+        p = self.query_params.copy()
+        p["body"] = "".join(body)
+        return p
+
+
+def compile_template(template, placeholder_names):
+    """
+    Splits a template into its literal fragments and placeholder slots.
+
+    :param template: A JSON string which may contain placeholders of the form ``${name}``.
+    :param placeholder_names: The names of all placeholders that are defined.
+    :return: A tuple of a list of fragments (with empty entries for each placeholder) and a list of slots. Each slot is a tuple of the
+    position of the placeholder in the fragment list, its name and whether it stood for a complete JSON string (``True``) or was
+    embedded in a longer string (``False``).
+    """
+    fragments = []
+    slots = []
+    last_end = 0
+    for match in TemplatedSearchParamSource.PLACEHOLDER_PATTERN.finditer(template):
+        quoted_name, embedded_name = match.groups()
+        name = quoted_name if quoted_name else embedded_name
+        if name not in placeholder_names:
+            raise exceptions.InvalidSyntax("Placeholder [%s] is used in the query body but is not defined in 'placeholders'." % name)
+        fragments.append(template[last_end:match.start()])
+        slots.append((len(fragments), name, quoted_name is not None))
+        fragments.append("")
+        last_end = match.end()
+    fragments.append(template[last_end:])
+    if not slots:
+        raise exceptions.InvalidSyntax("The query body does not contain any placeholders.")
+    return fragments, slots
+
+
+def value_source_for(name, spec, source=io.FileSource):
+    value_type = spec.get("type", "terms")
+    if value_type == "terms":
+        if "values" in spec:
+            terms = spec["values"]
+        elif "file" in spec:
+            with source(io.normalize_path(spec["file"]), "rt") as f:
+                terms = [line.strip() for line in f.read().splitlines() if line.strip()]
+        else:
+            raise exceptions.InvalidSyntax("Placeholder [%s] of type 'terms' requires either 'values' or 'file'." % name)
+        if not terms:
+            raise exceptions.InvalidSyntax("Placeholder [%s] does not define any terms." % name)
+        distribution = spec.get("distribution", "uniform")
+        if distribution == "uniform":
+            return UniformTerms(terms)
+        elif distribution == "zipfian":
+            return ZipfianTerms(terms, spec.get("exponent", 1.0))
+        else:
+            raise exceptions.InvalidSyntax("Unknown distribution [%s] for placeholder [%s]." % (distribution, name))
+    elif value_type == "uniform":
+        try:
+            return UniformRange(spec["min"], spec["max"])
+        except KeyError as e:
+            raise exceptions.InvalidSyntax("Placeholder [%s] of type 'uniform' requires %s." % (name, str(e)))
+    else:
+        raise exceptions.InvalidSyntax("Unknown placeholder type [%s] for placeholder [%s]." % (value_type, name))
+
+
+class UniformTerms:
+    def __init__(self, terms):
+        self.terms = terms
+
+    def next(self, rand):
+        return self.terms[int(rand.random() * len(self.terms))]
+
+
+class ZipfianTerms:
+    """
+    Chooses terms according to a `Zipf distribution <https://en.wikipedia.org/wiki/Zipf%27s_law>`_ where the probability of a term is
+    inversely proportional to its rank (i.e. its position in the list of terms) raised to the power of ``exponent``.
+    """
+    def __init__(self, terms, exponent):
+        self.terms = terms
+        self.cumulative_weights = []
+        total = 0
+        for rank in range(1, len(terms) + 1):
+            total += 1 / (rank ** exponent)
+            self.cumulative_weights.append(total)
+        self.total_weight = total
+
+    def next(self, rand):
+        idx = bisect.bisect_left(self.cumulative_weights, rand.random() * self.total_weight)
+        # guard against floating point imprecision at the upper bound
+        return self.terms[min(idx, len(self.terms) - 1)]
+
+
+class UniformRange:
+    def __init__(self, lower, upper):
+        if lower > upper:
+            raise exceptions.InvalidSyntax("'min' [%s] must not be greater than 'max' [%s]." % (str(lower), str(upper)))
+        self.lower = lower
+        self.upper = upper
+        self.integral = isinstance(lower, int) and isinstance(upper, int)
+
+    def next(self, rand):
+        if self.integral:
+            return rand.randint(self.lower, self.upper)
+        else:
+            return rand.uniform(self.lower, self.upper)
+
+
 class IndexIdConflict(Enum):
     """
     Determines which id conflicts to simulate during indexing.
@@ -573,3 +724,4 @@ register_param_source_for_operation(track.OperationType.Search, SearchParamSourc
 
 # Also register by name, so users can use it too
 register_param_source_for_name("file-reader", BulkIndexParamSource)
+register_param_source_for_name("templated-search", TemplatedSearchParamSource)
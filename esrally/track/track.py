@@ -353,7 +353,7 @@ class Parallel:
 
 class Task:
     def __init__(self, operation, meta_data=None, warmup_iterations=0, iterations=1, warmup_time_period=None, time_period=None, clients=1,
-                 completes_parent=False, schedule="deterministic", params=None):
+                 completes_parent=False, schedule="deterministic", params=None, abort_on=None):
         self.operation = operation
         self.meta_data = meta_data if meta_data else {}
         self.warmup_iterations = warmup_iterations
@@ -364,14 +364,15 @@ class Task:
         self.completes_parent = completes_parent
         self.schedule = schedule
         self.params = params if params else {}
+        self.abort_on = abort_on if abort_on else {}
 
     def __hash__(self):
-        # Note that we do not include `params` in __hash__ and __eq__ (the other attributes suffice to uniquely define a task)
+        # Note that we do not include `params` and `abort_on` in __hash__ and __eq__ (the other attributes define a task uniquely)
         return hash(self.operation) ^ hash(self.warmup_iterations) ^ hash(self.iterations) ^ hash(self.warmup_time_period) ^ \
                hash(self.time_period) ^ hash(self.clients) ^ hash(self.schedule) ^ hash(self.completes_parent)
 
     def __eq__(self, other):
-        # Note that we do not include `params` in __hash__ and __eq__ (the other attributes suffice to uniquely define a task)
+        # Note that we do not include `params` and `abort_on` in __hash__ and __eq__ (the other attributes define a task uniquely)
         return isinstance(other, type(self)) and (self.operation, self.warmup_iterations, self.iterations, self.warmup_time_period, 
                                                   self.time_period, self.clients, self.schedule, self.completes_parent) == \
                                                  (other.operation, other.warmup_iterations, other.iterations, other.warmup_time_period,
@@ -390,6 +391,33 @@ class Task:
         return ", ".join(r)
 
 
+class MixedTask(Task):
+    """
+    A task that executes a weighted mix of operations. Each client draws the operation to execute next randomly according to the provided
+    weights. Throughput throttling and the time period / iterations apply to the mix as a whole.
+    """
+    def __init__(self, name, tasks, weights, meta_data=None, warmup_iterations=0, iterations=1, warmup_time_period=None, time_period=None,
+                 clients=1, completes_parent=False, schedule="deterministic", params=None, abort_on=None):
+        """
+        :param name: The name of this mix.
+        :param tasks: A list of tasks, one for each operation in the mix. Samples will be recorded per task.
+        :param weights: A list of weights (one for each task). Weights do not need to sum up to any specific value.
+        """
+        super().__init__(Operation(name, "mix"), meta_data, warmup_iterations, iterations, warmup_time_period, time_period, clients,
+                         completes_parent, schedule, params, abort_on)
+        self.tasks = tasks
+        self.weights = weights
+
+    def __hash__(self):
+        return super().__hash__() ^ hash(tuple(self.tasks))
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.tasks == other.tasks and self.weights == other.weights
+
+    def __str__(self, *args, **kwargs):
+        return "Task for mix [%s]" % ",".join([t.operation.name for t in self.tasks])
+
+
 class Operation:
     def __init__(self, name, operation_type, meta_data=None, params=None, param_source=None):
         if params is None:
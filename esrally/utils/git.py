@@ -1,5 +1,7 @@
 import os
+import shutil
 import logging
+import time
 
 from esrally import exceptions
 from esrally.utils import io, process
@@ -35,6 +37,17 @@ def clone(src, remote):
         raise exceptions.SupplyError("Could not clone from '%s' to '%s'" % (remote, src))
 
 
+def fetched_within(src, seconds):
+    """
+    :param src: A git working copy.
+    :param seconds: A period in seconds.
+    :return: True iff the working copy has been fetched from a remote within the given period.
+    """
+    # git updates FETCH_HEAD on every fetch
+    fetch_head = os.path.join(src, ".git", "FETCH_HEAD")
+    return os.path.exists(fetch_head) and time.time() - os.path.getmtime(fetch_head) < seconds
+
+
 @probed
 def fetch(src, remote="origin"):
     # Don't swallow output but silence git at least a bit... (--quiet)
@@ -83,6 +96,32 @@ def head_revision(src_dir):
     return process.run_subprocess_with_output("git -C {0} rev-parse --short HEAD".format(src_dir))[0].strip()
 
 
+@probed
+def add_worktree(src_dir, worktree_dir, revision):
+    if process.run_subprocess("git -C {0} worktree add --detach {1} {2}".format(src_dir, worktree_dir, revision)):
+        raise exceptions.SupplyError("Could not create worktree for revision %s in '%s'" % (revision, worktree_dir))
+
+
+@probed
+def remove_worktree(src_dir, worktree_dir):
+    shutil.rmtree(worktree_dir, ignore_errors=True)
+    if process.run_subprocess("git -C {0} worktree prune".format(src_dir)):
+        raise exceptions.SupplyError("Could not remove worktree '%s'" % worktree_dir)
+
+
+@probed
+def has_local_changes(src_dir, include_untracked=False):
+    """
+    :param src_dir: A git working copy.
+    :param include_untracked: Whether untracked files should be considered as local changes (default: False).
+    :return: True iff any tracked file in the working copy has been modified (or any untracked file exists if ``include_untracked``
+    is ``True``).
+    """
+    untracked_files = "normal" if include_untracked else "no"
+    changes = process.run_subprocess_with_output("git -C {0} status --porcelain --untracked-files={1}".format(src_dir, untracked_files))
+    return len(changes) > 0
+
+
 @probed
 def branches(src_dir, remote=True):
     if remote:
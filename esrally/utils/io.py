@@ -310,13 +310,72 @@ def skip_lines(data_file_path, data_file, number_of_lines_to_skip):
             data_file.readline()
 
 
-def get_size(start_path="."):
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(start_path):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            total_size += os.path.getsize(fp)
-    return total_size
+def get_size(start_path=".", max_workers=1):
+    """
+    Determines the total size of all files below a directory. Symlinks to directories are not followed.
+
+    :param start_path: The directory to inspect.
+    :param max_workers: The number of directories that are scanned concurrently (default: 1). Scanning concurrently pays off for large
+                        directory trees, e.g. Elasticsearch data directories with many shards and segment files.
+    :return: The total size of all files in bytes.
+    """
+    if max_workers <= 1:
+        total_size = 0
+        pending = [start_path]
+        while pending:
+            size, sub_directories = _scan(pending.pop())
+            total_size += size
+            pending.extend(sub_directories)
+        return total_size
+    else:
+        import concurrent.futures
+        total_size = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {pool.submit(_scan, start_path)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for f in done:
+                    size, sub_directories = f.result()
+                    total_size += size
+                    pending.update([pool.submit(_scan, d) for d in sub_directories])
+        return total_size
+
+
+def _scan(path):
+    """
+    :return: A tuple of the total size of all files directly in ``path`` and a list of its sub-directories.
+    """
+    size = 0
+    sub_directories = []
+    try:
+        # scandir avoids an additional stat call per entry to determine its type (Python 3.5+)
+        if hasattr(os, "scandir"):
+            for entry in os.scandir(path):
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        sub_directories.append(entry.path)
+                else:
+                    size += _file_size(entry.stat)
+        else:
+            for name in os.listdir(path):
+                entry_path = os.path.join(path, name)
+                if os.path.isdir(entry_path):
+                    if not os.path.islink(entry_path):
+                        sub_directories.append(entry_path)
+                else:
+                    size += _file_size(lambda: os.stat(entry_path))
+    except (FileNotFoundError, NotADirectoryError):
+        # the directory has vanished in the meantime or is not a directory (os.walk ignores both cases as well)
+        pass
+    return size, sub_directories
+
+
+def _file_size(stat):
+    try:
+        return stat().st_size
+    except FileNotFoundError:
+        # the file has been deleted concurrently (or is a dangling symlink)
+        return 0
 
 
 def _run(args, fallback=None, only_first_line=False):
@@ -1,5 +1,8 @@
+import json
 import logging
 import os
+import threading
+import concurrent.futures
 
 import certifi
 import urllib3
@@ -42,18 +45,86 @@ class Progress:
         self.p.finish()
 
 
-def download(url, local_path, expected_size_in_bytes=None, progress_indicator=None):
+class AggregatedProgress:
+    """
+    Reports the combined progress of several concurrent downloads to one progress indicator.
+    """
+    def __init__(self, progress_indicator):
+        self.progress_indicator = progress_indicator
+        self.downloads = {}
+        self.lock = threading.Lock()
+
+    def for_download(self, key):
+        """
+        :param key: A key that uniquely identifies a download, e.g. its URL.
+        :return: A progress indicator for this download that can be passed to ``download``.
+        """
+        def report(bytes_read, bytes_total):
+            with self.lock:
+                self.downloads[key] = (bytes_read, bytes_total)
+                self.progress_indicator(sum([r for r, _ in self.downloads.values()]), sum([t for _, t in self.downloads.values()]))
+        return report
+
+
+# size of the parts of a file that are downloaded concurrently and that are remembered in order to resume a download
+DOWNLOAD_PART_SIZE_BYTES = 8 * 1024 * 1024
+DOWNLOAD_WORKERS = 4
+# how often we retry to download one part of a file before giving up
+DOWNLOAD_PART_RETRIES = 5
+
+
+def download(url, local_path, expected_size_in_bytes=None, progress_indicator=None, max_workers=DOWNLOAD_WORKERS):
     """
     Downloads a single file from a URL to the provided local path.
 
+    If the server supports range requests, the file is downloaded in parts by up to ``max_workers`` concurrent requests. Failed parts
+    are retried and an interrupted download is resumed on the next invocation. Otherwise, the file is downloaded with a single request.
+
     :param url: The remote URL specifying one file that should be downloaded. May be either a HTTP or HTTPS URL.
     :param local_path: The local file name of the file that should be downloaded.
     :param expected_size_in_bytes: The expected file size in bytes if known. It will be used to verify that all data have been downloaded.
     :param progress_indicator A callable that can be use to report progress to the user. It is expected to take two parameters 
     ``bytes_read`` and ``total_bytes``. If not provided, no progress is shown. Note that ``total_bytes`` is derived from 
     the ``Content-Length`` header and not from the parameter ``expected_size_in_bytes``.
+    :param max_workers: The maximum number of concurrent requests for this file (default: 4).
     """
     tmp_data_set_path = local_path + ".tmp"
+    size_in_bytes, supports_ranges = _probe(url)
+    if supports_ranges and size_in_bytes is not None:
+        _download_parts(url, tmp_data_set_path, size_in_bytes, progress_indicator, max_workers)
+    else:
+        _download_stream(url, tmp_data_set_path, progress_indicator)
+
+    download_size = os.path.getsize(tmp_data_set_path)
+    if expected_size_in_bytes is not None and download_size != expected_size_in_bytes:
+        if os.path.isfile(tmp_data_set_path):
+            os.remove(tmp_data_set_path)
+        raise exceptions.DataError("Download of [%s] is corrupt. Downloaded [%d] bytes but [%d] bytes are expected. Please retry." %
+                                   (local_path, download_size, expected_size_in_bytes))
+    os.rename(tmp_data_set_path, local_path)
+
+
+def _probe(url):
+    """
+    :return: A tuple of the size of the remote file in bytes (``None`` if unknown) and whether the server supports range requests.
+    """
+    try:
+        r = __http().request("HEAD", url, retries=10, timeout=urllib3.Timeout(connect=45, read=240))
+    except BaseException:
+        logger.exception("Could not determine whether [%s] can be downloaded in parts." % url)
+        return None, False
+    if r.status != 200:
+        logger.info("Server has responded with HTTP status [%d] for HEAD [%s]. Downloading with one request." % (r.status, url))
+        return None, False
+    # noinspection PyBroadException
+    try:
+        size_in_bytes = int(r.getheader("Content-Length"))
+    except BaseException:
+        size_in_bytes = None
+    return size_in_bytes, r.getheader("Accept-Ranges") == "bytes"
+
+
+def _download_stream(url, tmp_data_set_path, progress_indicator):
     try:
         with __http().request("GET", url, preload_content=False, retries=10,
                               timeout=urllib3.Timeout(connect=45, read=240)) as r, open(tmp_data_set_path, "wb") as out_file:
@@ -77,14 +148,98 @@ def download(url, local_path, expected_size_in_bytes=None, progress_indicator=No
         if os.path.isfile(tmp_data_set_path):
             os.remove(tmp_data_set_path)
         raise
+
+
+def _download_parts(url, tmp_data_set_path, size_in_bytes, progress_indicator, max_workers):
+    # remembers which parts have been downloaded completely so we can resume an interrupted download.
+    state_path = tmp_data_set_path + ".state"
+    parts = [(start, min(start + DOWNLOAD_PART_SIZE_BYTES, size_in_bytes) - 1)
+             for start in range(0, size_in_bytes, DOWNLOAD_PART_SIZE_BYTES)]
+    completed = _completed_parts(state_path, tmp_data_set_path, url, size_in_bytes)
+    if completed:
+        logger.info("Resuming download of [%s]. [%d] out of [%d] parts are already downloaded." % (url, len(completed), len(parts)))
     else:
-        download_size = os.path.getsize(tmp_data_set_path)
-        if expected_size_in_bytes is not None and download_size != expected_size_in_bytes:
-            if os.path.isfile(tmp_data_set_path):
-                os.remove(tmp_data_set_path)
-            raise exceptions.DataError("Download of [%s] is corrupt. Downloaded [%d] bytes but [%d] bytes are expected. Please retry." %
-                                       (local_path, download_size, expected_size_in_bytes))
-        os.rename(tmp_data_set_path, local_path)
+        with open(tmp_data_set_path, "wb") as f:
+            f.truncate(size_in_bytes)
+
+    lock = threading.Lock()
+    aborted = threading.Event()
+    bytes_read = [sum([parts[i][1] - parts[i][0] + 1 for i in completed])]
+
+    def report(n):
+        with lock:
+            bytes_read[0] += n
+            if progress_indicator:
+                progress_indicator(bytes_read[0], size_in_bytes)
+
+    def part_completed(index):
+        with lock:
+            completed.add(index)
+            with open(state_path + ".tmp", "wt") as f:
+                json.dump({"url": url, "size": size_in_bytes, "completed": sorted(completed)}, f)
+            os.replace(state_path + ".tmp", state_path)
+
+    def download_part(index):
+        start, end = parts[index]
+        position = start
+        attempt = 0
+        with open(tmp_data_set_path, "r+b") as out_file:
+            while position <= end and not aborted.is_set():
+                try:
+                    with __http().request("GET", url, headers={"Range": "bytes=%d-%d" % (position, end)}, preload_content=False,
+                                          retries=10, timeout=urllib3.Timeout(connect=45, read=240)) as r:
+                        if r.status != 206:
+                            raise exceptions.DataError("Could not download bytes [%d-%d] of [%s]. Expected HTTP status 206 but got [%d]."
+                                                       % (position, end, url, r.status))
+                        out_file.seek(position)
+                        while not aborted.is_set():
+                            chunk = r.read(16 * 1024)
+                            if not chunk:
+                                break
+                            out_file.write(chunk)
+                            position += len(chunk)
+                            report(len(chunk))
+                    if position <= end and not aborted.is_set():
+                        raise IOError("Connection closed after [%d] out of [%d] bytes." % (position - start, end - start + 1))
+                except exceptions.DataError:
+                    raise
+                except Exception as e:
+                    attempt += 1
+                    if attempt > DOWNLOAD_PART_RETRIES:
+                        raise
+                    logger.warning("Could not download bytes [%d-%d] of [%s] (%s). Retrying (attempt [%d/%d])." %
+                                   (position, end, url, e, attempt, DOWNLOAD_PART_RETRIES))
+        if not aborted.is_set():
+            part_completed(index)
+
+    pending = [index for index in range(len(parts)) if index not in completed]
+    if pending:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as pool:
+            futures = [pool.submit(download_part, index) for index in pending]
+            concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+            aborted.set()
+        for f in futures:
+            if f.exception():
+                # we keep the temporary file and its state to resume the download later
+                raise f.exception()
+    if os.path.isfile(state_path):
+        os.remove(state_path)
+
+
+def _completed_parts(state_path, tmp_data_set_path, url, size_in_bytes):
+    if not os.path.isfile(state_path) or not os.path.isfile(tmp_data_set_path) or os.path.getsize(tmp_data_set_path) != size_in_bytes:
+        return set()
+    # noinspection PyBroadException
+    try:
+        with open(state_path, "rt") as f:
+            state = json.load(f)
+    except BaseException:
+        logger.exception("Could not read download state from [%s]. Restarting download." % state_path)
+        return set()
+    if state.get("url") != url or state.get("size") != size_in_bytes:
+        logger.info("Remote file [%s] has changed since the last download attempt. Restarting download." % url)
+        return set()
+    return set(state["completed"])
 
 
 def retrieve_content_as_string(url):
@@ -0,0 +1,181 @@
+import math
+import random
+import statistics
+
+
+def bootstrap_ci(baseline, contender, confidence=0.95, resamples=1000, seed=0):
+    """
+    Determines a bootstrap percentile confidence interval for the difference of means (contender - baseline) of two samples.
+
+    :param baseline: Sample of the baseline. Must not be empty.
+    :param contender: Sample of the contender. Must not be empty.
+    :param confidence: The confidence level (default: 0.95).
+    :param resamples: The number of bootstrap resamples (default: 1000).
+    :param seed: Seed for the random number generator. We use a fixed seed by default so reports are reproducible.
+    :return: A tuple (lower bound, upper bound).
+    """
+    rand = random.Random(seed)
+    diffs = []
+    for _ in range(resamples):
+        b = [rand.choice(baseline) for _ in baseline]
+        c = [rand.choice(contender) for _ in contender]
+        diffs.append(statistics.mean(c) - statistics.mean(b))
+    diffs.sort()
+    alpha = 1 - confidence
+    lower = diffs[int(math.floor(alpha / 2 * (resamples - 1)))]
+    upper = diffs[int(math.ceil((1 - alpha / 2) * (resamples - 1)))]
+    return lower, upper
+
+
+def mann_whitney_u(baseline, contender):
+    """
+    Performs a two-sided Mann-Whitney U test. It does not assume that samples are normally distributed which makes it suitable for
+    benchmark results. For small samples without ties, the p-value is exact, otherwise it is based on the normal approximation with
+    tie correction.
+
+    Note that the smallest possible p-value depends on the sample sizes. With four samples each, it is ~0.029, with three samples each
+    it is 0.1 (see ``min_p_value``).
+
+    :param baseline: Sample of the baseline. Must not be empty.
+    :param contender: Sample of the contender. Must not be empty.
+    :return: A tuple (U statistic of the contender, p-value).
+    """
+    n1 = len(baseline)
+    n2 = len(contender)
+    ranks = _ranks(baseline + contender)
+    u = sum(ranks[n1:]) - n2 * (n2 + 1) / 2
+    ties = _tie_groups(baseline + contender)
+    if not ties and n1 + n2 <= 20:
+        frequencies = _u_frequencies(n1, n2)
+        total = sum(frequencies)
+        u = int(u)
+        lower_tail = sum(frequencies[:u + 1]) / total
+        upper_tail = sum(frequencies[u:]) / total
+        return u, min(1.0, 2 * min(lower_tail, upper_tail))
+    else:
+        n = n1 + n2
+        mean_u = n1 * n2 / 2
+        variance = n1 * n2 / 12 * ((n + 1) - sum([t ** 3 - t for t in ties]) / (n * (n - 1)))
+        if variance <= 0:
+            # all values are identical
+            return u, 1.0
+        # continuity correction
+        z = (abs(u - mean_u) - 0.5) / math.sqrt(variance)
+        return u, min(1.0, 2 * (1 - _normal_cdf(max(z, 0))))
+
+
+def min_p_value(n1, n2):
+    """
+    Determines the smallest p-value that the exact two-sided Mann-Whitney U test can produce, i.e. if the two samples do not overlap at
+    all. If it is not below the significance level, no difference between samples of these sizes can be significant.
+
+    :param n1: The size of the first sample. Must be positive.
+    :param n2: The size of the second sample. Must be positive.
+    :return: The smallest possible p-value.
+    """
+    frequencies = _u_frequencies(n1, n2)
+    return min(1.0, 2 * frequencies[0] / sum(frequencies))
+
+
+def cliffs_delta(baseline, contender):
+    """
+    Determines Cliff's delta, a non-parametric effect size. It is the probability that a value of the contender is larger than a value of
+    the baseline minus the probability of the opposite.
+
+    :return: A value in the range [-1, 1]. 0 means that the samples overlap completely, 1 (-1) means that all values of the contender
+             are larger (smaller) than all values of the baseline.
+    """
+    greater = 0
+    smaller = 0
+    for c in contender:
+        for b in baseline:
+            if c > b:
+                greater += 1
+            elif c < b:
+                smaller += 1
+    return (greater - smaller) / (len(baseline) * len(contender))
+
+
+def change_points(values, significance_level=0.05, min_size=3):
+    """
+    Detects points in a series of values where its level shifts with binary segmentation: It splits the series at the point that
+    explains most of its variance and keeps the split if a Mann-Whitney U test shows that the values before and after differ
+    significantly. Then it repeats this for both parts. The p-value of each split is Bonferroni-corrected for the number of possible
+    splits.
+
+    :param values: A series of values, e.g. the results of consecutive races.
+    :param significance_level: The significance level at which a split is considered a change point (default: 0.05).
+    :param min_size: The minimum number of values on each side of a change point (default: 3).
+    :return: A sorted list of tuples (index of the first value after the change point, corrected p-value).
+    """
+    result = []
+    _segment(values, 0, len(values), significance_level, min_size, result)
+    return sorted(result)
+
+
+def _segment(values, start, end, significance_level, min_size, result):
+    candidates = range(start + min_size, end - min_size + 1)
+    best_split = None
+    best_score = None
+    for split in candidates:
+        n1 = split - start
+        n2 = end - split
+        # weighted squared difference of means, i.e. the reduction of the sum of squared deviations by this split
+        score = n1 * n2 / (n1 + n2) * (statistics.mean(values[split:end]) - statistics.mean(values[start:split])) ** 2
+        if best_score is None or score > best_score:
+            best_split = split
+            best_score = score
+    if best_split is not None:
+        _, p = mann_whitney_u(values[start:best_split], values[best_split:end])
+        corrected_p = min(1.0, p * len(candidates))
+        if corrected_p < significance_level:
+            result.append((best_split, corrected_p))
+            _segment(values, start, best_split, significance_level, min_size, result)
+            _segment(values, best_split, end, significance_level, min_size, result)
+
+
+def _ranks(values):
+    # ranks start at 1; tied values get the average of their ranks
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return ranks
+
+
+def _tie_groups(values):
+    counts = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+    return [c for c in counts.values() if c > 1]
+
+
+def _u_frequencies(n1, n2):
+    # frequencies[u] is the number of arrangements of n1 + n2 values that result in a U statistic of u for the second sample.
+    # Based on the recurrence f(n1, n2, u) = f(n1 - 1, n2, u - n2) + f(n1, n2 - 1, u).
+    table = {}
+
+    def f(a, b):
+        if (a, b) not in table:
+            if a == 0 or b == 0:
+                table[(a, b)] = [1]
+            else:
+                result = [0] * (a * b + 1)
+                for u, count in enumerate(f(a - 1, b)):
+                    result[u] += count
+                for u, count in enumerate(f(a, b - 1)):
+                    result[u + a] += count
+                table[(a, b)] = result
+        return table[(a, b)]
+
+    return f(n1, n2)
+
+
+def _normal_cdf(x):
+    return (1 + math.erf(x / math.sqrt(2))) / 2
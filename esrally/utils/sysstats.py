@@ -1,3 +1,5 @@
+import collections
+import os
 import platform
 import psutil
 
@@ -83,3 +85,139 @@ def cpu_utilization(handle, interval=1.0):
     :return: The CPU usage in percent.
     """
     return handle.cpu_percent(interval=interval)
+
+
+def process_cpu_times(handle, proc_root="/proc"):
+    """
+    Determines the CPU time that the provided process has consumed so far. On Linux, this reads the corresponding counters directly from
+    ``/proc`` which is considerably cheaper than going through psutil.
+
+    :param handle: handle retrieved by calling setup_process_stats(pid).
+    :param proc_root: The mount point of the proc filesystem. Only intended for testing.
+    :return: A tuple (user time, system time) in seconds.
+    """
+    try:
+        with open("%s/%d/stat" % (proc_root, handle.pid), "rt") as f:
+            stat = f.read()
+    except OSError:
+        cpu_times = handle.cpu_times()
+        return cpu_times.user, cpu_times.system
+    # the process name may contain spaces and parentheses, hence we only look at the fields after it.
+    fields = stat[stat.rfind(")") + 2:].split()
+    # utime and stime are fields 14 and 15 (see man 5 proc). We've stripped the first two fields.
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    return int(fields[11]) / clock_ticks, int(fields[12]) / clock_ticks
+
+
+def system_cpu_stats(proc_root="/proc"):
+    """
+    Determines per core CPU times as well as scheduler statistics of this machine. On Linux, this reads the corresponding counters
+    directly from ``/proc/stat``.
+
+    :param proc_root: The mount point of the proc filesystem. Only intended for testing.
+    :return: A tuple (per core CPU times, context switches, run queue length). Per core CPU times is a list of tuples (busy time,
+             total time) in seconds. Context switches is the total number of context switches since system boot. The run queue length is
+             the number of currently runnable processes and ``None`` if it cannot be determined.
+    """
+    try:
+        with open("%s/stat" % proc_root, "rt") as f:
+            lines = f.readlines()
+    except OSError:
+        per_core = []
+        for cpu_times in psutil.cpu_times(percpu=True):
+            total = sum(cpu_times)
+            per_core.append((total - cpu_times.idle, total))
+        return per_core, psutil.cpu_stats().ctx_switches, None
+
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    per_core = []
+    context_switches = None
+    run_queue_length = None
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        key = fields[0]
+        # the line "cpu" contains the total of all cores; individual cores are "cpu0", "cpu1", ...
+        if key.startswith("cpu") and len(key) > 3:
+            # user nice system idle iowait irq softirq steal (guest times are already included in user and nice)
+            times = [int(v) for v in fields[1:9]]
+            total = sum(times)
+            idle = times[3] + (times[4] if len(times) > 4 else 0)
+            per_core.append(((total - idle) / clock_ticks, total / clock_ticks))
+        elif key == "ctxt":
+            context_switches = int(fields[1])
+        elif key == "procs_running":
+            run_queue_length = int(fields[1])
+    return per_core, context_switches, run_queue_length
+
+
+DiskIoStats = collections.namedtuple("DiskIoStats", ["read_count", "write_count", "read_bytes", "write_bytes", "read_time", "write_time",
+                                                     "busy_time", "weighted_time", "in_flight"])
+DiskIoStats.__doc__ = """
+Cumulative I/O counters of a block device. All times are in milliseconds. ``weighted_time`` and ``in_flight`` are ``None`` if they cannot
+be determined on this platform.
+"""
+
+# /proc/diskstats always counts in sectors of 512 bytes, regardless of the actual sector size of the device
+DISKSTATS_SECTOR_SIZE_BYTES = 512
+
+
+def disk_io_stats(proc_root="/proc"):
+    """
+    Determines the I/O counters of all block devices of this machine. On Linux, this reads the corresponding counters directly from
+    ``/proc/diskstats``.
+
+    :param proc_root: The mount point of the proc filesystem. Only intended for testing.
+    :return: A dict of device name (e.g. ``sda1``) to ``DiskIoStats``.
+    """
+    try:
+        with open("%s/diskstats" % proc_root, "rt") as f:
+            lines = f.readlines()
+    except OSError:
+        stats = {}
+        for name, c in psutil.disk_io_counters(perdisk=True).items():
+            stats[name] = DiskIoStats(c.read_count, c.write_count, c.read_bytes, c.write_bytes, c.read_time, c.write_time,
+                                      getattr(c, "busy_time", None), None, None)
+        return stats
+
+    stats = {}
+    for line in lines:
+        fields = line.split()
+        # see https://www.kernel.org/doc/Documentation/iostats.txt. Older kernels report fewer fields for partitions.
+        if len(fields) < 14:
+            continue
+        reads, _, sectors_read, read_time, writes, _, sectors_written, write_time, in_flight, busy_time, weighted_time = \
+            [int(v) for v in fields[3:14]]
+        stats[fields[2]] = DiskIoStats(reads, writes, sectors_read * DISKSTATS_SECTOR_SIZE_BYTES,
+                                       sectors_written * DISKSTATS_SECTOR_SIZE_BYTES, read_time, write_time, busy_time, weighted_time,
+                                       in_flight)
+    return stats
+
+
+def block_device(path, proc_root="/proc"):
+    """
+    Determines the block device that backs the provided path.
+
+    :param path: A path on the file system. If it does not exist (yet), its closest existing parent directory is considered.
+    :param proc_root: The mount point of the proc filesystem. Only intended for testing.
+    :return: The name of the block device (e.g. ``sda1``) or ``None`` if it cannot be determined (e.g. for network file systems).
+    """
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and path != os.path.dirname(path):
+        path = os.path.dirname(path)
+    st_dev = os.stat(path).st_dev
+    device_number = (os.major(st_dev), os.minor(st_dev))
+    try:
+        with open("%s/diskstats" % proc_root, "rt") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and (int(fields[0]), int(fields[1])) == device_number:
+                    return fields[2]
+    except OSError:
+        pass
+    # fall back to the partition with the longest mount point that contains the path
+    candidates = [p for p in disks() if path == p.mountpoint or path.startswith(p.mountpoint.rstrip(os.sep) + os.sep)]
+    if candidates:
+        return os.path.basename(max(candidates, key=lambda p: len(p.mountpoint)).device)
+    return None
@@ -1,3 +1,5 @@
+import functools
+
 import pkg_resources
 
 from esrally import paths
@@ -6,6 +8,8 @@ from esrally.utils import git, io
 __version__ = pkg_resources.require("esrally")[0].version
 
 
+# determining the git revision requires several git invocations so we only do it once
+@functools.lru_cache(maxsize=1)
 def version():
     release = __version__
     # noinspection PyBroadException
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from esrally import metrics, track, exceptions
+from esrally.driver import driver, abort
+
+
+class AbortPolicyTests(TestCase):
+    def test_no_conditions_by_default(self):
+        policy = abort.AbortPolicy.from_spec(None)
+        self.assertFalse(policy.enabled)
+        self.assertEqual(abort.DEFAULT_WINDOW, policy.window)
+
+    def test_task_conditions_take_precedence(self):
+        task = track.Task(track.Operation("index-append", track.OperationType.Index), abort_on={"error-rate": 0.1, "window": 10})
+        policy = abort.AbortPolicy.for_task(task, {"error-rate": 0.5, "red-cluster": True})
+        self.assertEqual(0.1, policy.max_error_rate)
+        self.assertEqual(10, policy.window)
+        self.assertTrue(policy.red_cluster)
+        self.assertIsNone(policy.max_latency_p99)
+        self.assertTrue(policy.checks_samples)
+
+    def test_rejects_unknown_condition(self):
+        with self.assertRaisesRegex(exceptions.SystemSetupError, r"Unknown abort conditions \['latency-p90'\]"):
+            abort.AbortPolicy.from_spec({"latency-p90": 100})
+
+    def test_rejects_invalid_error_rate(self):
+        with self.assertRaisesRegex(exceptions.SystemSetupError, "error-rate must be between 0 and 1"):
+            abort.AbortPolicy.from_spec({"error-rate": 50})
+
+
+class SampleMonitorTests(TestCase):
+    def setUp(self):
+        self.task = track.Task(track.Operation("index-append", track.OperationType.Index))
+
+    def sample(self, latency=10, success=True):
+        return driver.Sample(0, 1470838595, 1, self.task, metrics.SampleType.Normal, {"success": success}, latency, latency, 1000, "docs",
+                             1, 0.5)
+
+    def test_checks_only_full_windows(self):
+        monitor = abort.SampleMonitor(self.task, abort.AbortPolicy(max_error_rate=0.5, window=4))
+        self.assertIsNone(monitor.update([self.sample(success=False)] * 3))
+        self.assertEqual("Error rate of task [index-append] is [75.00%] for the last [4] requests but at most [50.00%] are allowed.",
+                         monitor.update([self.sample()]))
+
+    def test_error_rate_recovers(self):
+        monitor = abort.SampleMonitor(self.task, abort.AbortPolicy(max_error_rate=0.5, window=4))
+        self.assertIsNone(monitor.update([self.sample(success=False)] * 2 + [self.sample()] * 2))
+        self.assertIsNone(monitor.update([self.sample()] * 2))
+
+    def test_latency(self):
+        monitor = abort.SampleMonitor(self.task, abort.AbortPolicy(max_latency_p99=100, window=100))
+        self.assertIsNone(monitor.update([self.sample(latency=50)] * 99 + [self.sample(latency=200)]))
+        self.assertEqual("99th percentile latency of task [index-append] is [200.00 ms] for the last [100] requests but at most "
+                         "[100.00 ms] is allowed.", monitor.update([self.sample(latency=200)]))
@@ -1,9 +1,12 @@
 import unittest.mock as mock
 import threading
+import time
 import collections
+import pickle
+import socket
 from unittest import TestCase
 
-from esrally import metrics, track, exceptions
+from esrally import config, metrics, track, exceptions
 from esrally.driver import driver
 from esrally.track import params
 from esrally.utils import io
@@ -39,6 +42,156 @@ class ScheduleTestCase(TestCase):
             idx += 1
 
 
+class DriverTests(TestCase):
+    class Target:
+        def __init__(self):
+            self.drive_at_calls = []
+            self.abort_reasons = []
+
+        def drive_at(self, driver, client_start_timestamp):
+            self.drive_at_calls.append((driver, client_start_timestamp))
+
+        def on_benchmark_aborted(self, reason):
+            self.abort_reasons.append(reason)
+
+    def setUp(self):
+        self.cfg = config.Config()
+        self.cfg.add(config.Scope.application, "system", "quiet.mode", True)
+        self.cfg.add(config.Scope.application, "track", "test.mode.enabled", False)
+        self.target = DriverTests.Target()
+
+    def reach_join_point(self, d):
+        d.drivers = ["client-0", "client-1"]
+        d.number_of_steps = 2
+        d.joinpoint_reached(0, 100, driver.JoinPoint(id=0))
+        d.joinpoint_reached(1, 200, driver.JoinPoint(id=0))
+
+    def assert_start_delay(self, expected_delay):
+        self.assertEqual(2, len(self.target.drive_at_calls))
+        client_0, client_0_start = self.target.drive_at_calls[0]
+        client_1, client_1_start = self.target.drive_at_calls[1]
+        self.assertEqual("client-0", client_0)
+        self.assertEqual("client-1", client_1)
+        # allow some tolerance as the coordinator receives both join point notifications at slightly different times
+        self.assertAlmostEqual(100 + expected_delay, client_0_start, delta=0.5)
+        self.assertAlmostEqual(200 + expected_delay, client_1_start, delta=0.5)
+
+    def test_start_next_task_after_default_delay(self):
+        d = driver.Driver(self.target, self.cfg)
+        self.reach_join_point(d)
+        self.assert_start_delay(driver.Driver.DEFAULT_TASK_START_DELAY_SECONDS)
+
+    def test_start_next_task_after_configured_delay(self):
+        self.cfg.add(config.Scope.application, "driver", "task.start.delay", 0.2)
+        d = driver.Driver(self.target, self.cfg)
+        self.reach_join_point(d)
+        self.assert_start_delay(0.2)
+
+    def test_abort_on_error_rate(self):
+        self.cfg.add(config.Scope.application, "driver", "abort.on", {"error-rate": 0.5, "window": 2})
+        d = driver.Driver(self.target, self.cfg)
+        d.abort_on = self.cfg.opts("driver", "abort.on")
+        task = track.Task(track.Operation("index-append", track.OperationType.Index))
+
+        def sample(success):
+            return driver.Sample(0, 1470838595, 1, task, metrics.SampleType.Normal, {"success": success}, 10, 9, 1000, "docs", 1, 0.5)
+
+        d.update_samples([sample(True), sample(False)])
+        self.assertFalse(d.aborted)
+        d.update_samples([sample(False)])
+        self.assertTrue(d.aborted)
+        self.assertEqual(["Error rate of task [index-append] is [100.00%] for the last [2] requests but at most [50.00%] are allowed."],
+                         self.target.abort_reasons)
+        # we do not abort twice
+        d.update_samples([sample(False)])
+        self.assertEqual(1, len(self.target.abort_reasons))
+
+    def test_abort_on_error_rate_across_pickled_batches(self):
+        d = driver.Driver(self.target, self.cfg)
+        d.abort_on = {}
+        task = track.Task(track.Operation("index-append", track.OperationType.Index), abort_on={"error-rate": 0.5, "window": 10})
+
+        def sample(client_id, success):
+            return driver.Sample(client_id, 1470838595, 1, task, metrics.SampleType.Normal, {"success": success}, 10, 9, 1000, "docs", 1,
+                                 0.5)
+
+        # each batch arrives in its own message and thus contains its own copy of the task but all of them need to fill the same window
+        for client_id in range(4):
+            d.update_samples(pickle.loads(pickle.dumps([sample(client_id, False), sample(client_id, False)])))
+        self.assertFalse(d.aborted)
+        d.update_samples(pickle.loads(pickle.dumps([sample(0, False), sample(0, False)])))
+        self.assertTrue(d.aborted)
+        self.assertEqual(["Error rate of task [index-append] is [100.00%] for the last [10] requests but at most [50.00%] are allowed."],
+                         self.target.abort_reasons)
+
+    def test_stores_static_meta_data_once_per_task(self):
+        d = driver.Driver(self.target, self.cfg)
+        d.track = track.Track(name="unittest", short_description="", meta_data={"track-meta": "a"})
+        d.challenge = track.Challenge(name="default", description="", meta_data={"challenge-meta": "b"})
+        d.metrics_store = mock.create_autospec(metrics.InMemoryMetricsStore)
+        op = track.Operation("index-append", track.OperationType.Index)
+        # these tasks are equal but differ in their meta data
+        bulk_1000 = track.Task(op, meta_data={"bulk-size": 1000})
+        bulk_5000 = track.Task(op, meta_data={"bulk-size": 5000})
+
+        def sample(task, relative_time):
+            return driver.Sample(0, 1470838595, relative_time, task, metrics.SampleType.Normal, {"success": True}, 10, 9, 1000, "docs",
+                                 1, 0.5)
+
+        # samples of different batches contain equal copies of the same task
+        d.raw_samples = pickle.loads(pickle.dumps([sample(bulk_1000, 1), sample(bulk_1000, 2)])) + \
+            pickle.loads(pickle.dumps([sample(bulk_1000, 3)])) + [sample(bulk_5000, 4)]
+        d.post_process_samples()
+
+        latencies = [c[1] for c in d.metrics_store.put_value_cluster_level.call_args_list if c[1]["name"] == "latency"]
+        self.assertEqual([{"success": True}] * 4, [c["meta_data"] for c in latencies])
+        shared_meta_data = [c["shared_meta_data"] for c in latencies]
+        self.assertEqual({"track-meta": "a", "challenge-meta": "b", "bulk-size": 1000}, shared_meta_data[0])
+        self.assertIs(shared_meta_data[0], shared_meta_data[1])
+        self.assertIs(shared_meta_data[0], shared_meta_data[2])
+        self.assertEqual({"track-meta": "a", "challenge-meta": "b", "bulk-size": 5000}, shared_meta_data[3])
+
+    def test_abort_on_red_cluster(self):
+        d = driver.Driver(self.target, self.cfg)
+        d.abort_on = {}
+        d.es = mock.Mock()
+        d.es.cluster.health.return_value = {"status": "red"}
+        task = track.Task(track.Operation("index-append", track.OperationType.Index), abort_on={"red-cluster": True})
+        d.update_samples([driver.Sample(0, 1470838595, 1, task, metrics.SampleType.Normal, None, 10, 9, 1000, "docs", 1, 0.5)])
+
+        d.check_cluster_health()
+        self.assertTrue(d.aborted)
+        self.assertEqual(["Cluster health is [red] while running task [index-append]."], self.target.abort_reasons)
+        d.es.cluster.health.assert_called_once_with(request_timeout=driver.Driver.CLUSTER_HEALTH_CHECK_TIMEOUT_SECONDS)
+
+    def test_abort_policy_considers_abort_conditions_of_equal_tasks(self):
+        d = driver.Driver(self.target, self.cfg)
+        d.abort_on = {}
+        op = track.Operation("index-append", track.OperationType.Index)
+        lenient = track.Task(op, abort_on={"error-rate": 0.9})
+        strict = track.Task(op, abort_on={"error-rate": 0.1})
+
+        self.assertEqual(0.9, d.abort_policy(lenient).max_error_rate)
+        self.assertEqual(0.1, d.abort_policy(strict).max_error_rate)
+        self.assertIsNot(d.sample_monitor(lenient), d.sample_monitor(strict))
+
+    def test_resets_sample_monitors_in_next_step(self):
+        d = driver.Driver(self.target, self.cfg)
+        d.abort_on = {}
+        task = track.Task(track.Operation("index-append", track.OperationType.Index), abort_on={"error-rate": 0.5, "window": 2})
+
+        def sample(success):
+            return driver.Sample(0, 1470838595, 1, task, metrics.SampleType.Normal, {"success": success}, 10, 9, 1000, "docs", 1, 0.5)
+
+        d.update_samples([sample(False)])
+        # the next step runs an equal task
+        self.reach_join_point(d)
+        d.update_samples([sample(False)])
+        self.assertFalse(d.aborted)
+        d.update_samples([sample(False)])
+        self.assertTrue(d.aborted)
+
+
 class AllocatorTests(TestCase):
     def setUp(self):
         params.register_param_source_for_name("driver-test-param-source", DriverTestParamSource)
@@ -308,6 +461,27 @@ class MetricsAggregationTests(TestCase):
         self.assertEqual((1470838600, 26, metrics.SampleType.Normal, 6666.666666666667, "docs/s"), throughput[5])
         # self.assertEqual((1470838600.5, 26.5, metrics.SampleType.Normal, 10000), throughput[6])
 
+    def test_aggregates_samples_of_pickled_batches(self):
+        task = track.Task(track.Operation("index", track.OperationType.Index, param_source="driver-test-param-source"))
+        batches = [
+            [driver.Sample(0, 1470838595, 21, task, metrics.SampleType.Normal, None, -1, -1, 5000, "docs", 1, 1 / 4),
+             driver.Sample(0, 1470838596, 22, task, metrics.SampleType.Normal, None, -1, -1, 5000, "docs", 2, 2 / 4)],
+            [driver.Sample(1, 1470838595, 21, task, metrics.SampleType.Normal, None, -1, -1, 5000, "docs", 1, 1 / 4),
+             driver.Sample(1, 1470838596, 22, task, metrics.SampleType.Normal, None, -1, -1, 5000, "docs", 2, 2 / 4)]
+        ]
+        # each batch arrives in its own message and thus contains its own copy of the task
+        samples = [sample for batch in batches for sample in pickle.loads(pickle.dumps(batch))]
+        self.assertIsNot(samples[0].task, samples[2].task)
+
+        aggregated = driver.calculate_global_throughput(samples)
+
+        self.assertEqual([task], list(aggregated.keys()))
+        # throughput considers the samples of both clients
+        self.assertEqual([
+            (1470838595, 21, metrics.SampleType.Normal, 5000, "docs/s"),
+            (1470838596, 22, metrics.SampleType.Normal, 7500, "docs/s")
+        ], aggregated[task])
+
 
 class SchedulerTests(ScheduleTestCase):
     def setUp(self):
@@ -349,6 +523,28 @@ class SchedulerTests(ScheduleTestCase):
         ]
         self.assert_schedule(expected_schedule, schedule)
 
+    def test_search_task_with_shared_rate_limiter(self):
+        class StaticRateLimiter:
+            def __init__(self, claimed):
+                self.claimed = claimed
+
+            def claim_iteration(self):
+                # other clients claim every second iteration
+                it = self.claimed
+                self.claimed += 2
+                return it if it < 6 else None
+
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, param_source="driver-test-param-source"),
+                          warmup_iterations=2, iterations=4, clients=2, params={"target-throughput": 10, "rate-limiter": "shared"})
+        schedule = driver.schedule_for(self.test_track, task, 0, StaticRateLimiter(claimed=1))
+
+        expected_schedule = [
+            (0, metrics.SampleType.Warmup, 2 / 6, {}),
+            (0, metrics.SampleType.Normal, 4 / 6, {}),
+            (0, metrics.SampleType.Normal, 6 / 6, {}),
+        ]
+        self.assert_schedule(expected_schedule, schedule)
+
     def test_schedule_for_warmup_time_based(self):
         task = track.Task(track.Operation("time-based", track.OperationType.Index.name, params={"body": ["a"], "size": 11},
                                           param_source="driver-test-param-source"),
@@ -394,6 +590,32 @@ class SchedulerTests(ScheduleTestCase):
             self.assertIsNotNone(runner, "runner must be defined")
             self.assertEqual({"body": ["a"], "size": 11}, params)
 
+    def test_schedule_for_mixed_task(self):
+        search = track.Task(track.Operation("search", track.OperationType.Search.name, params={"op": "search"},
+                                            param_source="driver-test-param-source"), iterations=1000, clients=2)
+        index = track.Task(track.Operation("index", track.OperationType.Index.name, params={"op": "index"},
+                                           param_source="driver-test-param-source"), iterations=1000, clients=2)
+        task = track.MixedTask("mix", [search, index], [3, 1], iterations=1000, clients=2,
+                               params={"target-throughput": 10, "clients": 2, "seed": 42})
+
+        invocations = list(driver.schedule_for(self.test_track, task, 0))
+        self.assertEqual(500, len(invocations))
+
+        chosen_tasks = collections.Counter()
+        for idx, (invocation_time, sample_type, progress_percent, runner, params) in enumerate(invocations):
+            # the target throughput applies to the mix as a whole
+            self.assertAlmostEqual(idx * 0.2, invocation_time)
+            self.assertIsInstance(runner, driver.MixedTaskRunner)
+            self.assertEqual(runner.task.operation.name, params["op"])
+            chosen_tasks[runner.task] += 1
+        # roughly 3:1
+        self.assertTrue(325 < chosen_tasks[search] < 425, "search was chosen %d times" % chosen_tasks[search])
+        self.assertEqual(500, chosen_tasks[search] + chosen_tasks[index])
+
+        # the same seed leads to the same sequence of operations
+        same_invocations = list(driver.schedule_for(self.test_track, task, 0))
+        self.assertEqual([i[4] for i in invocations], [i[4] for i in same_invocations])
+
 
 class ExecutorTests(TestCase):
     class NoopContextManager:
@@ -542,6 +764,29 @@ class ExecutorTests(TestCase):
             sample_size = len(samples)
             self.assertEqual(0, sample_size)
 
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_mixed_schedule_attributes_samples_per_operation(self, es):
+        search_task = track.Task(track.Operation("search", track.OperationType.Search.name, params={}))
+        index_task = track.Task(track.Operation("index", track.OperationType.Index.name, params={}))
+        mix = track.MixedTask("mix", [search_task, index_task], [1, 1], iterations=2)
+
+        search = mock.Mock(return_value=(1, "ops"))
+        index = mock.Mock(return_value=(100, "docs"))
+        schedule = [
+            (0, metrics.SampleType.Normal, 0.5, driver.MixedTaskRunner(search_task, self.context_managed(search)), {}),
+            (0, metrics.SampleType.Normal, 1.0, driver.MixedTaskRunner(index_task, self.context_managed(index)), {})
+        ]
+        sampler = driver.Sampler(client_id=0, task=mix, start_timestamp=0)
+        execute_schedule = driver.Executor(mix, schedule, es, sampler, threading.Event(), threading.Event())
+        execute_schedule()
+
+        samples = sampler.samples
+        self.assertEqual(2, len(samples))
+        self.assertEqual(search_task, samples[0].task)
+        self.assertEqual("ops", samples[0].total_ops_unit)
+        self.assertEqual(index_task, samples[1].task)
+        self.assertEqual("docs", samples[1].total_ops_unit)
+
     @mock.patch("elasticsearch.Elasticsearch")
     def test_execute_schedule_aborts_on_error(self, es):
         class ExpectedUnitTestException(Exception):
@@ -566,6 +811,84 @@ class ExecutorTests(TestCase):
 
         es.assert_not_called()
 
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_schedule_with_requests_in_flight(self, es):
+        all_in_flight = threading.Barrier(3, timeout=5)
+
+        def run(*args, **kwargs):
+            # only succeeds if all three requests are outstanding at the same time
+            all_in_flight.wait()
+            return 1, "ops"
+
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, params={}), iterations=3,
+                          params={"in-flight": 3})
+        schedule = [(0, metrics.SampleType.Normal, (i + 1) / 3, self.context_managed(run), {}) for i in range(3)]
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+        execute_schedule = driver.Executor(task, schedule, es, sampler, threading.Event(), threading.Event())
+        execute_schedule()
+
+        samples = sampler.samples
+        self.assertEqual(3, len(samples))
+        for sample in samples:
+            self.assertEqual(task, sample.task)
+            self.assertEqual(1, sample.total_ops)
+            self.assertEqual(sample.latency_ms, sample.service_time_ms)
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_schedule_with_requests_in_flight_aborts_on_error(self, es):
+        class ExpectedUnitTestException(Exception):
+            pass
+
+        def run(*args, **kwargs):
+            raise ExpectedUnitTestException()
+
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, params={}), iterations=100,
+                          params={"in-flight": 4}, completes_parent=True)
+        schedule = [(0, metrics.SampleType.Normal, (i + 1) / 100, self.context_managed(run), {}) for i in range(100)]
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+        complete = threading.Event()
+        execute_schedule = driver.Executor(task, schedule, es, sampler, threading.Event(), complete)
+
+        with self.assertRaises(ExpectedUnitTestException):
+            execute_schedule()
+
+        self.assertEqual(0, len(sampler.samples))
+        self.assertTrue(complete.is_set())
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_schedule_paced_by_shared_rate_limiter(self, es):
+        class StaticRateLimiter:
+            def __init__(self):
+                self.slots = 0
+                self.closed = False
+
+            def reserve(self):
+                self.slots += 1
+                # pretend that this client is one second behind the shared schedule
+                return time.perf_counter() - 1
+
+            def close(self):
+                self.closed = True
+
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, params={}), iterations=3,
+                          params={"target-throughput": 10, "rate-limiter": "shared"})
+        # the client's own schedule is ignored when a shared rate limiter is present
+        schedule = [(0, metrics.SampleType.Normal, (i + 1) / 3, self.context_managed(mock.Mock(return_value=(1, "ops"))), {})
+                    for i in range(3)]
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+        rate_limiter = StaticRateLimiter()
+        execute_schedule = driver.Executor(task, schedule, es, sampler, threading.Event(), threading.Event(), rate_limiter)
+        execute_schedule()
+
+        self.assertEqual(3, rate_limiter.slots)
+        self.assertTrue(rate_limiter.closed)
+        samples = sampler.samples
+        self.assertEqual(3, len(samples))
+        for sample in samples:
+            # latency includes the time this client has been behind the schedule
+            self.assertGreaterEqual(sample.latency_ms, 1000)
+            self.assertLess(sample.service_time_ms, sample.latency_ms)
+
     def test_execute_single_no_return_value(self):
         es = None
         params = None
@@ -665,6 +988,87 @@ class ExecutorTests(TestCase):
             ctx.exception.args[0])
 
 
+class ClientOptionsTests(TestCase):
+    def test_keeps_client_options_without_requests_in_flight(self):
+        tasks = [track.Task(track.Operation("search", track.OperationType.Search.name)), None]
+        options = {"timeout": 60}
+        self.assertIs(options, driver.client_options_for(options, tasks))
+
+    def test_increases_connection_pool_for_requests_in_flight(self):
+        tasks = [track.Task(track.Operation("search", track.OperationType.Search.name), params={"in-flight": 32}),
+                 driver.JoinPoint(id=0)]
+        options = {"timeout": 60}
+        self.assertEqual({"timeout": 60, "maxsize": 32}, driver.client_options_for(options, tasks))
+        # we must not modify the user's options
+        self.assertEqual({"timeout": 60}, options)
+
+    def test_respects_user_specified_connection_pool_size(self):
+        tasks = [track.Task(track.Operation("search", track.OperationType.Search.name), params={"in-flight": 32})]
+        options = {"maxsize": 16}
+        self.assertEqual({"maxsize": 16}, driver.client_options_for(options, tasks))
+
+
+class SharedRateLimiterTests(TestCase):
+    def setUp(self):
+        self.cfg = config.Config()
+        self.cfg.add(config.Scope.application, "driver", "rate.limiter.dir", "/tmp")
+        self.cfg.add(config.Scope.application, "driver", "rate.limiter.names", {0: {1: "3-search"}})
+        self.cfg.add(config.Scope.application, "driver", "rate.limiter.host", socket.gethostname())
+
+    def test_no_shared_rate_limiter_by_default(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name), params={"target-throughput": 10})
+        self.assertIsNone(driver.shared_rate_limiter_for(self.cfg, 0, 1, task))
+
+    def test_no_shared_rate_limiter_without_target_throughput(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name), params={"rate-limiter": "shared"})
+        self.assertIsNone(driver.shared_rate_limiter_for(self.cfg, 0, 1, task))
+
+    @mock.patch("esrally.driver.scheduler.SharedRateLimiter")
+    def test_shared_rate_limiter_for_iteration_based_task(self, rate_limiter):
+        params = {"target-throughput": 10, "rate-limiter": "shared"}
+        task = track.Task(track.Operation("search", track.OperationType.Search.name), params=params, schedule="poisson",
+                          warmup_iterations=100, iterations=400, clients=4)
+        driver.shared_rate_limiter_for(self.cfg, 0, 1, task)
+        rate_limiter.assert_called_once_with("/tmp/3-search", "poisson", params, burst=4, iterations=500)
+
+    @mock.patch("esrally.driver.scheduler.SharedRateLimiter")
+    def test_shared_rate_limiter_for_time_period_based_task(self, rate_limiter):
+        params = {"target-throughput": 10, "rate-limiter": "shared", "rate-limiter-burst": 2}
+        task = track.Task(track.Operation("search", track.OperationType.Search.name), params=params, schedule="poisson",
+                          time_period=60, clients=4)
+        driver.shared_rate_limiter_for(self.cfg, 0, 1, task)
+        rate_limiter.assert_called_once_with("/tmp/3-search", "poisson", params, burst=2, iterations=None)
+
+    def test_rejects_shared_rate_limiter_on_other_host(self):
+        self.cfg.add(config.Scope.application, "driver", "rate.limiter.host", "coordinator.example.org")
+        task = track.Task(track.Operation("search", track.OperationType.Search.name),
+                          params={"target-throughput": 10, "rate-limiter": "shared"})
+        with self.assertRaisesRegex(exceptions.SystemSetupError, "requires all load generators to run on the same host"):
+            driver.shared_rate_limiter_for(self.cfg, 0, 1, task)
+
+    def test_assigns_distinct_names_to_equal_tasks(self):
+        params = {"target-throughput": 10, "rate-limiter": "shared"}
+        search_1 = track.Task(track.Operation("search", track.OperationType.Search.name), params=params, clients=2)
+        search_2 = track.Task(track.Operation("search", track.OperationType.Search.name), params=params, clients=2)
+        index = track.Task(track.Operation("index", track.OperationType.Index.name), clients=1)
+        self.assertEqual(search_1, search_2)
+        allocator = driver.Allocator([track.Parallel([search_1, search_2, index])])
+
+        names = driver.shared_rate_limiter_names(allocator.allocations)
+
+        self.assertEqual({
+            0: {1: "0-search"},
+            1: {1: "0-search"},
+            2: {1: "1-search"},
+            3: {1: "1-search"}
+        }, names)
+
+    def test_no_names_without_shared_rate_limiters(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search.name), params={"target-throughput": 10}, clients=2)
+        allocator = driver.Allocator([task])
+        self.assertEqual({}, driver.shared_rate_limiter_names(allocator.allocations))
+
+
 class ProfilerTests(TestCase):
     def test_profiler_is_a_transparent_wrapper(self):
         import time
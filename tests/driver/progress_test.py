@@ -0,0 +1,130 @@
+import json
+import pickle
+import urllib.error
+import urllib.request
+from unittest import TestCase
+
+from esrally import metrics, track, exceptions
+from esrally.driver import driver, progress
+
+
+class LiveStatsTests(TestCase):
+    def setUp(self):
+        self.index = track.Task(track.Operation("index-append", track.OperationType.Index))
+        self.search = track.Task(track.Operation("term", "custom-query"))
+
+    def sample(self, client_id, relative_time, task, latency, sample_type=metrics.SampleType.Normal, success=True, percent_completed=0.5):
+        return driver.Sample(client_id, 1470838595 + relative_time, relative_time, task, sample_type, {"success": success},
+                             latency, latency - 1, 1000, "docs", 1, percent_completed)
+
+    def test_aggregates_samples_per_task(self):
+        stats = progress.LiveStats(lap=1)
+        stats.start(number_of_steps=2)
+        stats.add([
+            self.sample(0, 1, self.index, 10, sample_type=metrics.SampleType.Warmup, percent_completed=0.25),
+            self.sample(1, 2, self.index, 20, percent_completed=0.75),
+            self.sample(0, 2, self.search, 5, success=False)
+        ])
+        stats.add([self.sample(0, 3, self.index, 30, percent_completed=0.5)])
+
+        result = stats.as_dict()
+        self.assertEqual("running", result["status"])
+        self.assertEqual(1, result["lap"])
+        self.assertEqual(2, result["steps"])
+        self.assertEqual(2, len(result["tasks"]))
+
+        index = result["tasks"][0]
+        self.assertEqual("index-append", index["operation"])
+        self.assertEqual("Index", index["operation-type"])
+        self.assertEqual("normal", index["sample-type"])
+        self.assertEqual(0.625, index["progress"])
+        self.assertEqual(3, index["requests"])
+        self.assertEqual(0, index["errors"])
+        # 3000 docs within 3 seconds (the first sample started one second before it has been taken)
+        self.assertEqual(1000, index["throughput"]["mean"])
+        # 2000 docs between the first and the last sample in the window
+        self.assertEqual(1000, index["throughput"]["current"])
+        self.assertEqual("docs/s", index["throughput"]["unit"])
+        self.assertEqual(20, index["latency"]["50.0"])
+        self.assertEqual(30, index["latency"]["100.0"])
+        self.assertEqual(19, index["service-time"]["50.0"])
+
+        search = result["tasks"][1]
+        self.assertEqual(1, search["errors"])
+        self.assertEqual(1.0, search["error-rate"])
+        self.assertIsNone(search["throughput"]["current"])
+
+    def test_aggregates_pickled_batches_per_task(self):
+        stats = progress.LiveStats()
+        # each batch arrives in its own message and thus contains its own copy of the task
+        for t in range(1, 6):
+            stats.add(pickle.loads(pickle.dumps([self.sample(0, t, self.index, 10), self.sample(1, t, self.index, 20)])))
+
+        result = stats.as_dict()
+        self.assertEqual(1, len(result["tasks"]))
+        self.assertEqual(10, result["tasks"][0]["requests"])
+        self.assertEqual(20, result["tasks"][0]["latency"]["100.0"])
+
+    def test_percentiles_consider_only_recent_samples(self):
+        stats = progress.LiveStats(window_size=2)
+        stats.add([self.sample(0, t, self.index, latency) for t, latency in enumerate([100, 10, 20], start=1)])
+
+        self.assertEqual(20, stats.as_dict()["tasks"][0]["latency"]["100.0"])
+        self.assertEqual(3, stats.as_dict()["tasks"][0]["requests"])
+
+    def test_marks_tasks_as_finished(self):
+        stats = progress.LiveStats()
+        stats.add([self.sample(0, 1, self.index, 10, percent_completed=0.5)])
+        stats.step_completed(1)
+        self.assertEqual(1.0, stats.as_dict()["tasks"][0]["progress"])
+        self.assertEqual(1, stats.as_dict()["step"])
+
+        stats.finish()
+        self.assertEqual("finished", stats.as_dict()["status"])
+
+
+class ProgressServerTests(TestCase):
+    def setUp(self):
+        self.stats = progress.LiveStats(lap=1)
+        self.stats.add([driver.Sample(0, 1470838596, 1, track.Task(track.Operation("index-append", track.OperationType.Index)),
+                                      metrics.SampleType.Normal, None, 10, 9, 1000, "docs", 1, 0.5)])
+        self.server = progress.ProgressServer(self.stats, host="127.0.0.1", port=0, stream_interval=0.01).start()
+        host, port = self.server.address
+        self.url = "http://%s:%d" % (host, port)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_serves_progress(self):
+        with urllib.request.urlopen("%s/progress" % self.url) as response:
+            self.assertEqual("application/json", response.headers["Content-Type"])
+            result = json.loads(response.read().decode("utf-8"))
+        self.assertEqual("running", result["status"])
+        self.assertEqual("index-append", result["tasks"][0]["operation"])
+
+    def test_streams_progress_until_finished(self):
+        with urllib.request.urlopen("%s/stream" % self.url) as response:
+            self.assertEqual("text/event-stream", response.headers["Content-Type"])
+            first_event = response.readline().decode("utf-8")
+            self.stats.finish()
+            events = [first_event] + [line.decode("utf-8") for line in response.readlines()]
+        events = [json.loads(e[len("data: "):]) for e in events if e.startswith("data: ")]
+        self.assertEqual("running", events[0]["status"])
+        self.assertEqual("finished", events[-1]["status"])
+
+    def test_rejects_unknown_path(self):
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            urllib.request.urlopen("%s/unknown" % self.url)
+        self.assertEqual(404, ctx.exception.code)
+
+
+class ParseEndpointTests(TestCase):
+    def test_parse_port(self):
+        self.assertEqual(("localhost", 8787), progress.parse_endpoint("8787"))
+
+    def test_parse_host_and_port(self):
+        self.assertEqual(("0.0.0.0", 8787), progress.parse_endpoint("0.0.0.0:8787"))
+
+    def test_rejects_invalid_endpoint(self):
+        with self.assertRaisesRegex(exceptions.SystemSetupError, "Invalid progress endpoint"):
+            progress.parse_endpoint("localhost")
@@ -0,0 +1,111 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from esrally import metrics, track, exceptions
+from esrally.driver import driver, rawsamples
+
+
+class RawSamplesTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "race", "raw-samples.bin")
+        self.index = track.Task(track.Operation("index-append", track.OperationType.Index))
+        self.search = track.Task(track.Operation("term", "custom-query"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def sample(self, client_id, relative_time, task, latency, sample_type=metrics.SampleType.Normal, success=True):
+        return driver.Sample(client_id, 1470838595 + relative_time, relative_time, task, sample_type, {"success": success},
+                             latency, latency - 1, 1000, "docs", 1, 0.5)
+
+    def test_write_and_read_samples(self):
+        writer = rawsamples.RawSampleWriter(self.path).open()
+        writer.write([
+            self.sample(0, 1.5, self.index, 20.5, sample_type=metrics.SampleType.Warmup),
+            self.sample(1, 1.75, self.index, 22.0)
+        ], lap=1)
+        writer.write([], lap=1)
+        writer.write([
+            self.sample(0, 2.5, self.search, 3.25, success=False)
+        ], lap=1)
+        writer.close()
+
+        samples = rawsamples.read(self.path)
+
+        self.assertEqual(3, len(samples))
+        self.assertEqual([("index-append", "Index"), ("term", "custom-query")], samples.operations)
+        self.assertEqual([20.5, 22.0, 3.25], list(samples.latency_ms))
+        self.assertEqual([19.5, 21.0, 2.25], list(samples.service_time_ms))
+        self.assertEqual([0, 1, 0], list(samples.client_id))
+
+        first, second, third = list(samples)
+        self.assertEqual(rawsamples.RawSample(lap=1, client_id=0, operation="index-append", operation_type="Index",
+                                              sample_type=metrics.SampleType.Warmup, success=True, absolute_time=1470838596.5,
+                                              relative_time=1.5, latency_ms=20.5, service_time_ms=19.5), first)
+        self.assertEqual(metrics.SampleType.Normal, second.sample_type)
+        self.assertEqual("term", third.operation)
+        self.assertFalse(third.success)
+
+    def test_append_samples_of_subsequent_laps(self):
+        writer = rawsamples.RawSampleWriter(self.path).open()
+        writer.write([self.sample(0, 1.5, self.index, 20.5)], lap=1)
+        writer.close()
+
+        writer = rawsamples.RawSampleWriter(self.path).open()
+        writer.write([self.sample(0, 1.5, self.search, 3.0), self.sample(0, 1.6, self.index, 21.5)], lap=2)
+        writer.close()
+
+        samples = rawsamples.read(self.path)
+        self.assertEqual([1, 2, 2], list(samples.lap))
+        self.assertEqual(["index-append", "term", "index-append"], [s.operation for s in samples])
+
+    def test_ignores_truncated_record(self):
+        writer = rawsamples.RawSampleWriter(self.path).open()
+        writer.write([self.sample(0, 1.5, self.index, 20.5)], lap=1)
+        writer.write([self.sample(0, 2.5, self.index, 21.5)], lap=1)
+        writer.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 10)
+
+        samples = rawsamples.read(self.path)
+        self.assertEqual([20.5], list(samples.latency_ms))
+
+    def test_ignores_truncated_operation_record(self):
+        writer = rawsamples.RawSampleWriter(self.path).open()
+        writer.write([self.sample(0, 1.5, self.index, 20.5)], lap=1)
+        size = os.path.getsize(self.path)
+        writer.write([self.sample(0, 2.5, track.Task(track.Operation("größe", "custom-query")), 3.0)], lap=1)
+        writer.close()
+        with open(self.path, "r+b") as f:
+            # cut off the operation name of the second operation within a multi-byte character
+            f.truncate(size + 1 + 4 + 3)
+
+        samples = rawsamples.read(self.path)
+        self.assertEqual([("index-append", "Index")], samples.operations)
+        self.assertEqual([20.5], list(samples.latency_ms))
+
+    def test_removes_truncated_record_before_appending(self):
+        writer = rawsamples.RawSampleWriter(self.path).open()
+        writer.write([self.sample(0, 1.5, self.index, 20.5)], lap=1)
+        writer.write([self.sample(0, 2.5, self.index, 21.5)], lap=1)
+        writer.close()
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 10)
+
+        writer = rawsamples.RawSampleWriter(self.path).open()
+        writer.write([self.sample(0, 1.5, self.search, 3.0)], lap=2)
+        writer.close()
+
+        samples = rawsamples.read(self.path)
+        self.assertEqual([1, 2], list(samples.lap))
+        self.assertEqual(["index-append", "term"], [s.operation for s in samples])
+
+    def test_rejects_unknown_files(self):
+        path = os.path.join(self.tmp_dir.name, "metrics.json")
+        with open(path, "wb") as f:
+            f.write(b"{\"foo\": \"bar\"}")
+
+        with self.assertRaisesRegex(exceptions.DataError, "is not a raw samples file"):
+            rawsamples.read(path)
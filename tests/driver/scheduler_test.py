@@ -1,4 +1,8 @@
+import multiprocessing
+import os
 import random
+import tempfile
+import threading
 from unittest import TestCase
 
 from esrally import exceptions
@@ -83,3 +87,105 @@ class PoissonSchedulerTests(SchedulerTestCase):
         # no params -> no limit
         s = scheduler.PoissonScheduler({})
         self.assertRateEquals(s, 0)
+
+
+def reserve_slots(path, count, slots):
+    rate_limiter = scheduler.SharedRateLimiter(path, "deterministic", {"target-throughput": 10})
+    try:
+        for _ in range(count):
+            slots.put(rate_limiter.reserve())
+    finally:
+        rate_limiter.close()
+
+
+class SharedRateLimiterTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "limiter")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_spaces_slots_according_to_aggregate_target_throughput(self):
+        # the number of clients must not matter as the target throughput is reached by all clients together
+        rate_limiter = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-throughput": 4, "clients": 8},
+                                                   clock=lambda: 100)
+        self.assertEqual([100, 100.25, 100.5, 100.75], [rate_limiter.reserve() for _ in range(4)])
+        rate_limiter.close()
+
+    def test_rate_limiters_with_the_same_path_share_slots(self):
+        first = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-interval": 2}, clock=lambda: 10)
+        second = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-interval": 2}, clock=lambda: 11)
+
+        self.assertEqual(10, first.reserve())
+        self.assertEqual(12, second.reserve())
+        self.assertEqual(14, second.reserve())
+        self.assertEqual(16, first.reserve())
+        first.close()
+        second.close()
+
+    def test_catches_up_with_at_most_burst_requests(self):
+        now = [100]
+        rate_limiter = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-throughput": 10}, burst=3, clock=lambda: now[0])
+        self.assertEqual(100, rate_limiter.reserve())
+        self.assertAlmostEqual(100.1, rate_limiter.reserve())
+        # clients have stalled for a while
+        now[0] = 200
+        self.assertAlmostEqual(199.8, rate_limiter.reserve())
+        self.assertAlmostEqual(199.9, rate_limiter.reserve())
+        self.assertAlmostEqual(200.0, rate_limiter.reserve())
+        self.assertAlmostEqual(200.1, rate_limiter.reserve())
+        rate_limiter.close()
+
+    def test_does_not_catch_up_without_burst(self):
+        now = [10]
+        rate_limiter = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-interval": 1}, clock=lambda: now[0])
+        self.assertEqual(10, rate_limiter.reserve())
+        now[0] = 20
+        self.assertEqual(20, rate_limiter.reserve())
+        self.assertEqual(21, rate_limiter.reserve())
+        rate_limiter.close()
+
+    def test_rate_limiters_with_the_same_path_share_iterations(self):
+        first = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-interval": 2}, iterations=3)
+        second = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-interval": 2}, iterations=3)
+
+        self.assertEqual(0, first.claim_iteration())
+        self.assertEqual(1, first.claim_iteration())
+        self.assertEqual(2, second.claim_iteration())
+        self.assertIsNone(first.claim_iteration())
+        self.assertIsNone(second.claim_iteration())
+        first.close()
+        second.close()
+
+    def test_threads_reserve_distinct_slots(self):
+        rate_limiter = scheduler.SharedRateLimiter(self.path, "deterministic", {"target-throughput": 100}, clock=lambda: 0)
+        slots = []
+
+        def reserve():
+            for _ in range(250):
+                slot = rate_limiter.reserve()
+                slots.append(slot)
+
+        threads = [threading.Thread(target=reserve) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        rate_limiter.close()
+
+        self.assertEqual(1000, len(set(slots)))
+        self.assertAlmostEqual(9.99, max(slots))
+
+    def test_processes_reserve_distinct_slots(self):
+        slots = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=reserve_slots, args=(self.path, 50, slots)) for _ in range(2)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+
+        reserved = sorted([slots.get(timeout=5) for _ in range(100)])
+        self.assertEqual(100, len(set(reserved)))
+        for previous, current in zip(reserved, reserved[1:]):
+            self.assertAlmostEqual(0.1, current - previous)
@@ -1,6 +1,7 @@
-from unittest import TestCase
+import threading
+from unittest import TestCase, mock
 
-from esrally import config
+from esrally import config, exceptions
 from esrally.mechanic import launcher
 
 
@@ -92,3 +93,83 @@ class ExternalLauncherTests(TestCase):
         m.start()
         # did not change user defined value
         self.assertEqual(cfg.opts("mechanic", "distribution.version"), "2.3.3")
+
+
+class InProcessLauncherTests(TestCase):
+    class MockProcess:
+        def __init__(self):
+            self.terminated = False
+
+        def terminate(self):
+            self.terminated = True
+
+    class MockTelemetry:
+        def __init__(self, process):
+            self.process = process
+            # whether the process was still running when telemetry has been detached
+            self.detached = []
+
+        def detach_from_node(self, node, running):
+            self.detached.append((running, not self.process.terminated))
+
+    class MockNode:
+        def __init__(self, node_name):
+            self.node_name = node_name
+            self.process = InProcessLauncherTests.MockProcess()
+            self.telemetry = InProcessLauncherTests.MockTelemetry(self.process)
+
+    def create_launcher(self, start_node):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "runtime", "java8.home", "/usr/lib/java8")
+        l = launcher.InProcessLauncher(cfg, MockMetricsStore(), races_root_dir="/home/user/.rally/benchmarks/races",
+                                       challenge_root_dir="/home/user/.rally/benchmarks/races/unittest")
+        l._start_node = start_node
+        return l
+
+    @mock.patch("esrally.utils.jvm.major_version")
+    @mock.patch("esrally.utils.process.kill_running_es_instances")
+    def test_starts_nodes_concurrently(self, kill_running_es_instances, major_version):
+        major_version.return_value = 8
+        all_nodes_starting = threading.Barrier(3, timeout=5)
+        first_nodes_on_host = []
+
+        def start_node(node_configuration, node_count_on_host, first_node_on_host, java_major_version, abort):
+            # would time out if nodes were started one after another
+            all_nodes_starting.wait()
+            if first_node_on_host:
+                first_nodes_on_host.append(node_configuration)
+            return InProcessLauncherTests.MockNode(node_configuration)
+
+        nodes = self.create_launcher(start_node).start(["rally-node-0", "rally-node-1", "rally-node-2"])
+
+        self.assertEqual(["rally-node-0", "rally-node-1", "rally-node-2"], [n.node_name for n in nodes])
+        self.assertEqual(["rally-node-0"], first_nodes_on_host)
+        kill_running_es_instances.assert_called_once_with("/home/user/.rally/benchmarks/races")
+
+    @mock.patch("esrally.utils.jvm.major_version")
+    @mock.patch("esrally.utils.process.kill_running_es_instances")
+    def test_aborts_start_of_all_nodes_if_one_fails(self, kill_running_es_instances, major_version):
+        major_version.return_value = 8
+        started_nodes = []
+
+        def start_node(node_configuration, node_count_on_host, first_node_on_host, java_major_version, abort):
+            if node_configuration == "rally-node-1":
+                raise exceptions.LaunchError("Could not start node [rally-node-1].")
+            elif node_configuration == "rally-node-2":
+                # pretend this node takes forever to start until it is aborted
+                if not abort.wait(timeout=5):
+                    self.fail("Start of [rally-node-2] has not been aborted")
+                raise exceptions.LaunchError("Aborted start of node [rally-node-2].")
+            node = InProcessLauncherTests.MockNode(node_configuration)
+            started_nodes.append(node)
+            return node
+
+        with self.assertRaises(exceptions.LaunchError) as ctx:
+            self.create_launcher(start_node).start(["rally-node-0", "rally-node-1", "rally-node-2"])
+
+        self.assertEqual("Could not start [2] out of [3] nodes:\n"
+                         "* Could not start node [rally-node-1].\n"
+                         "* Aborted start of node [rally-node-2].", ctx.exception.args[0])
+        self.assertEqual(1, len(started_nodes))
+        self.assertTrue(started_nodes[0].process.terminated)
+        self.assertEqual([(True, True), (False, False)], started_nodes[0].telemetry.detached)
@@ -69,6 +69,167 @@ class BareProvisionerTests(TestCase):
         }, config_vars)
 
 
+    @mock.patch("glob.glob", lambda p: ["/opt/elasticsearch-5.0.0"])
+    @mock.patch("esrally.utils.io.decompress")
+    @mock.patch("esrally.utils.io.ensure_dir")
+    @mock.patch("shutil.rmtree")
+    def test_prepare_stores_snapshot(self, mock_rm, mock_ensure_dir, mock_decompress):
+        installer = provisioner.ElasticsearchInstaller(car=team.Car("defaults", ["/tmp"]),
+                                                       node_name="rally-node-0",
+                                                       node_root_dir="~/.rally/benchmarks/races/unittest",
+                                                       data_root_paths=["/var/elasticsearch"],
+                                                       all_node_ips=["10.17.22.23"],
+                                                       ip="10.17.22.23",
+                                                       http_port=9200)
+        snapshot = mock.create_autospec(provisioner.ClusterSnapshot)
+        snapshot.mode = "store"
+
+        p = provisioner.BareProvisioner(cluster_settings={}, es_installer=installer, plugin_installers=[], preserve=True,
+                                        apply_config=lambda source_root_path, target_root_path, config_vars: None, snapshot=snapshot)
+
+        p.prepare({"elasticsearch": "/opt/elasticsearch-5.0.0.tar.gz"})
+        snapshot.store_install.assert_called_once_with("rally-node-0", "/opt/elasticsearch-5.0.0")
+
+        p.cleanup(benchmark_complete=False)
+        snapshot.store_data.assert_not_called()
+
+        p.cleanup(benchmark_complete=True)
+        snapshot.store_data.assert_called_once_with("rally-node-0", ["/var/elasticsearch/data"])
+
+    @mock.patch("esrally.utils.io.decompress")
+    @mock.patch("esrally.utils.io.ensure_dir")
+    @mock.patch("shutil.rmtree")
+    def test_prepare_restores_snapshot(self, mock_rm, mock_ensure_dir, mock_decompress):
+        installer = provisioner.ElasticsearchInstaller(car=team.Car("defaults", ["/tmp"]),
+                                                       node_name="rally-node-0",
+                                                       node_root_dir="~/.rally/benchmarks/races/unittest",
+                                                       data_root_paths=None,
+                                                       all_node_ips=["10.17.22.23"],
+                                                       ip="10.17.22.23",
+                                                       http_port=9200)
+        snapshot = mock.create_autospec(provisioner.ClusterSnapshot)
+        snapshot.mode = "restore"
+        snapshot.restore_install.return_value = "~/.rally/benchmarks/races/unittest/install/elasticsearch-5.0.0"
+
+        p = provisioner.BareProvisioner(cluster_settings={}, es_installer=installer, plugin_installers=[], preserve=True,
+                                        apply_config=lambda source_root_path, target_root_path, config_vars: None, snapshot=snapshot)
+
+        node_config = p.prepare({"elasticsearch": "/opt/elasticsearch-5.0.0.tar.gz"})
+
+        self.assertEqual("~/.rally/benchmarks/races/unittest/install/elasticsearch-5.0.0", node_config.binary_path)
+        mock_decompress.assert_not_called()
+        snapshot.restore_install.assert_called_once_with("rally-node-0", "~/.rally/benchmarks/races/unittest/install")
+        snapshot.restore_data.assert_called_once_with("rally-node-0",
+                                                      ["~/.rally/benchmarks/races/unittest/install/elasticsearch-5.0.0/data"])
+        # restored data are never stored again
+        p.cleanup(benchmark_complete=True)
+        snapshot.store_data.assert_not_called()
+
+
+class ClusterSnapshotTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wt") as f:
+            f.write(content)
+
+    def read(self, path):
+        with open(path, "rt") as f:
+            return f.read()
+
+    def snapshot(self, mode, car="defaults"):
+        fingerprint = {
+            "track": "geonames",
+            "distribution-version": "5.4.0",
+            "car": car,
+            "plugins": [],
+            "node-ips": ["127.0.0.1"],
+            "data-paths": None
+        }
+        return provisioner.ClusterSnapshot(os.path.join(self.root, "snapshots"), "indexed", fingerprint, mode)
+
+    def test_rejects_unknown_mode(self):
+        with self.assertRaises(exceptions.SystemSetupError) as ctx:
+            self.snapshot("update")
+        self.assertEqual("Unknown cluster snapshot mode [update]. Valid modes are: store, restore.", ctx.exception.args[0])
+
+    def test_store_and_restore(self):
+        es_home = os.path.join(self.root, "race-1", "install", "elasticsearch-5.4.0")
+        data_path = os.path.join(es_home, "data")
+        segment_file = os.path.join("nodes", "0", "indices", "abc", "0", "index", "_0.cfs")
+        translog_file = os.path.join("nodes", "0", "indices", "abc", "0", "translog", "translog-1.tlog")
+        self.write(os.path.join(es_home, "bin", "elasticsearch"), "#!/bin/bash")
+
+        snapshot = self.snapshot("store")
+        self.assertFalse(snapshot.exists("rally-node-0"))
+        snapshot.store_install("rally-node-0", es_home)
+        self.write(os.path.join(data_path, segment_file), "segment")
+        self.write(os.path.join(data_path, translog_file), "translog")
+        # data are written after the install directory has been stored
+        self.assertFalse(snapshot.exists("rally-node-0"))
+        snapshot.store_data("rally-node-0", [data_path])
+        self.assertTrue(snapshot.exists("rally-node-0"))
+
+        # a different fingerprint does not match
+        with self.assertRaises(exceptions.SystemSetupError):
+            self.snapshot("restore", car="4gheap").restore_install("rally-node-0", os.path.join(self.root, "race-2", "install"))
+
+        snapshot = self.snapshot("restore")
+        restored_es_home = snapshot.restore_install("rally-node-0", os.path.join(self.root, "race-2", "install"))
+        self.assertEqual(os.path.join(self.root, "race-2", "install", "elasticsearch-5.4.0"), restored_es_home)
+        self.assertEqual("#!/bin/bash", self.read(os.path.join(restored_es_home, "bin", "elasticsearch")))
+        self.assertFalse(os.path.exists(os.path.join(restored_es_home, "data")))
+
+        restored_data_path = os.path.join(restored_es_home, "data")
+        snapshot.restore_data("rally-node-0", [restored_data_path])
+        self.assertEqual("segment", self.read(os.path.join(restored_data_path, segment_file)))
+        self.assertEqual("translog", self.read(os.path.join(restored_data_path, translog_file)))
+        # immutable index files are linked ...
+        self.assertTrue(os.path.samefile(os.path.join(data_path, segment_file), os.path.join(restored_data_path, segment_file)))
+        # ... but all other files are copied
+        self.assertFalse(os.path.samefile(os.path.join(data_path, translog_file), os.path.join(restored_data_path, translog_file)))
+
+
+    def test_failed_store_keeps_previous_snapshot(self):
+        es_home = os.path.join(self.root, "race-1", "install", "elasticsearch-5.4.0")
+        data_path = os.path.join(es_home, "data")
+        self.write(os.path.join(es_home, "bin", "elasticsearch"), "#!/bin/bash")
+        self.write(os.path.join(data_path, "state"), "race-1")
+        snapshot = self.snapshot("store")
+        snapshot.store_install("rally-node-0", es_home)
+        snapshot.store_data("rally-node-0", [data_path])
+
+        # the next race stores its installation directory but does not complete
+        self.write(os.path.join(data_path, "state"), "race-2")
+        snapshot = self.snapshot("store")
+        snapshot.store_install("rally-node-0", es_home)
+        self.assertTrue(snapshot.exists("rally-node-0"))
+        with mock.patch("esrally.mechanic.provisioner.link_or_copy_tree", side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                snapshot.store_data("rally-node-0", [data_path])
+        self.assertTrue(snapshot.exists("rally-node-0"))
+
+        restored_data_path = os.path.join(self.root, "race-3", "data")
+        self.snapshot("restore").restore_data("rally-node-0", [restored_data_path])
+        self.assertEqual("race-1", self.read(os.path.join(restored_data_path, "state")))
+
+        # a complete store replaces the previous snapshot
+        snapshot = self.snapshot("store")
+        snapshot.store_install("rally-node-0", es_home)
+        snapshot.store_data("rally-node-0", [data_path])
+        self.assertTrue(snapshot.exists("rally-node-0"))
+        self.assertEqual(["rally-node-0"], os.listdir(snapshot.path))
+        restored_data_path = os.path.join(self.root, "race-4", "data")
+        self.snapshot("restore").restore_data("rally-node-0", [restored_data_path])
+        self.assertEqual("race-2", self.read(os.path.join(restored_data_path, "state")))
+
+
 class ElasticsearchInstallerTests(TestCase):
     @mock.patch("shutil.rmtree")
     @mock.patch("os.path.exists")
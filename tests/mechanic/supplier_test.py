@@ -1,7 +1,9 @@
+import os
+import tempfile
 from unittest import TestCase
 import unittest.mock as mock
 
-from esrally import exceptions
+from esrally import config, exceptions
 from esrally.mechanic import supplier
 
 
@@ -85,12 +87,195 @@ class BuilderTests(TestCase):
 
         mock_run_subprocess.assert_has_calls(calls)
 
+    @mock.patch("esrally.utils.git.has_local_changes")
+    @mock.patch("esrally.utils.process.run_subprocess")
+    def test_reuses_cached_build(self, mock_run_subprocess, mock_has_local_changes):
+        mock_has_local_changes.return_value = False
+        cache = mock.create_autospec(supplier.ArtefactCache)
+        cache.get.return_value = "/rally/artefacts/abc/elasticsearch-6.0.0-SNAPSHOT.tar.gz"
+
+        b = supplier.Builder(src_dir="/src", gradle="/usr/local/gradle", java_home="/opt/jdk8", log_dir="logs", cache=cache)
+        b.build(revision="3694a07")
+
+        self.assertEqual("/rally/artefacts/abc/elasticsearch-6.0.0-SNAPSHOT.tar.gz", b.binary)
+        cache.get.assert_called_once_with("elasticsearch-src-3694a07")
+        mock_run_subprocess.assert_not_called()
+
+    @mock.patch("esrally.utils.git.has_local_changes")
+    @mock.patch("esrally.utils.process.run_subprocess")
+    def test_caches_build(self, mock_run_subprocess, mock_has_local_changes):
+        mock_run_subprocess.return_value = False
+        mock_has_local_changes.return_value = False
+        cache = mock.create_autospec(supplier.ArtefactCache)
+        cache.get.return_value = None
+        cache.put.return_value = "/rally/artefacts/abc/elasticsearch-6.0.0-SNAPSHOT.tar.gz"
+
+        with tempfile.TemporaryDirectory() as src_dir:
+            binary = os.path.join(src_dir, "distribution", "tar", "build", "distributions", "elasticsearch-6.0.0-SNAPSHOT.tar.gz")
+            b = supplier.Builder(src_dir=src_dir, gradle="/usr/local/gradle", java_home="/opt/jdk8", log_dir="logs", cache=cache)
+            with mock.patch("glob.glob", lambda p: [binary]):
+                b.build(revision="3694a07")
+
+        self.assertEqual(2, mock_run_subprocess.call_count)
+        cache.put.assert_called_once_with("elasticsearch-src-3694a07", binary)
+        self.assertEqual("/rally/artefacts/abc/elasticsearch-6.0.0-SNAPSHOT.tar.gz", b.binary)
+
+    @mock.patch("esrally.utils.git.has_local_changes")
+    @mock.patch("esrally.utils.process.run_subprocess")
+    def test_does_not_cache_build_with_local_changes(self, mock_run_subprocess, mock_has_local_changes):
+        mock_run_subprocess.return_value = False
+        mock_has_local_changes.return_value = True
+        cache = mock.create_autospec(supplier.ArtefactCache)
+
+        with tempfile.TemporaryDirectory() as src_dir:
+            b = supplier.Builder(src_dir=src_dir, gradle="/usr/local/gradle", java_home="/opt/jdk8", log_dir="logs", cache=cache)
+            b.build(revision="3694a07")
+
+        self.assertEqual(2, mock_run_subprocess.call_count)
+        cache.get.assert_not_called()
+        cache.put.assert_not_called()
+
+    @mock.patch("esrally.utils.process.run_subprocess")
+    def test_skips_clean_build_for_same_revision(self, mock_run_subprocess):
+        mock_run_subprocess.return_value = False
+
+        with tempfile.TemporaryDirectory() as src_dir:
+            b = supplier.Builder(src_dir=src_dir, gradle="/usr/local/gradle", java_home="/opt/jdk8", log_dir="logs")
+            b.build(revision="3694a07")
+            b.build(revision="3694a07")
+            b.build(revision="9a1f5b2")
+
+            clean = mock.call("export JAVA_HOME=/opt/jdk8; cd %s; /usr/local/gradle clean >> logs/build.log 2>&1" % src_dir)
+            assemble = mock.call("export JAVA_HOME=/opt/jdk8; cd %s; /usr/local/gradle :distribution:tar:assemble >> logs/build.log 2>&1"
+                                 % src_dir)
+            # the second build of the same revision is incremental
+            self.assertEqual([clean, assemble, assemble, clean, assemble], mock_run_subprocess.mock_calls)
+
     @mock.patch("glob.glob", lambda p: ["elasticsearch.zip"])
     def test_binary(self):
         b = supplier.Builder(src_dir="/src")
         self.assertEqual(b.binary, "elasticsearch.zip")
 
 
+class PrebuildTests(TestCase):
+    def create_config(self, revisions):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "node", "root.dir", "/rally")
+        cfg.add(config.Scope.application, "source", "local.src.dir", "/rally/src/elasticsearch")
+        cfg.add(config.Scope.application, "source", "remote.repo.url", "some-github-url")
+        cfg.add(config.Scope.application, "build", "gradle.bin", "/usr/local/gradle")
+        cfg.add(config.Scope.application, "runtime", "java8.home", "/opt/jdk8")
+        cfg.add(config.Scope.applicationOverride, "build", "revisions", revisions)
+        cfg.add(config.Scope.applicationOverride, "build", "workers", 2)
+        return cfg
+
+    @mock.patch("esrally.mechanic.supplier.Builder")
+    @mock.patch("esrally.utils.git.head_revision")
+    @mock.patch("esrally.utils.git.remove_worktree")
+    @mock.patch("esrally.utils.git.add_worktree")
+    @mock.patch("esrally.mechanic.supplier.SourceRepository.fetch_remote")
+    def test_builds_each_revision_in_worktree(self, fetch_remote, add_worktree, remove_worktree, head_revision, builder):
+        head_revision.side_effect = lambda worktree_dir: {
+            "/rally/worktrees/3694a07": "3694a07",
+            "/rally/worktrees/latest": "9a1f5b2"
+        }[worktree_dir]
+
+        supplier.prebuild(self.create_config(["3694a07", "latest"]))
+
+        fetch_remote.assert_called_once_with()
+        add_worktree.assert_has_calls([
+            mock.call("/rally/src/elasticsearch", "/rally/worktrees/3694a07", "3694a07"),
+            mock.call("/rally/src/elasticsearch", "/rally/worktrees/latest", "origin/master")
+        ], any_order=True)
+        # each worktree is removed before it is created and after the build
+        self.assertEqual(4, remove_worktree.call_count)
+        builder.assert_has_calls([
+            mock.call("/rally/worktrees/3694a07", "/usr/local/gradle", "/opt/jdk8", "/rally/worktrees/logs/3694a07", mock.ANY),
+            mock.call().build("3694a07"),
+            mock.call("/rally/worktrees/latest", "/usr/local/gradle", "/opt/jdk8", "/rally/worktrees/logs/latest", mock.ANY),
+            mock.call().build("9a1f5b2")
+        ], any_order=True)
+
+    @mock.patch("esrally.mechanic.supplier.Builder")
+    @mock.patch("esrally.utils.git.head_revision")
+    @mock.patch("esrally.utils.git.remove_worktree")
+    @mock.patch("esrally.utils.git.add_worktree")
+    @mock.patch("esrally.mechanic.supplier.SourceRepository.fetch_remote")
+    def test_reports_all_failed_builds(self, fetch_remote, add_worktree, remove_worktree, head_revision, builder):
+        head_revision.return_value = "3694a07"
+        add_worktree.side_effect = exceptions.SupplyError("Could not create worktree")
+
+        with self.assertRaises(exceptions.BuildError) as ctx:
+            supplier.prebuild(self.create_config(["3694a07", "9a1f5b2"]))
+        self.assertEqual("Could not build [2] out of [2] revisions:\n"
+                         "* 3694a07: Could not create worktree\n"
+                         "* 9a1f5b2: Could not create worktree", ctx.exception.args[0])
+
+    def test_requires_revisions(self):
+        with self.assertRaises(exceptions.SystemSetupError) as ctx:
+            supplier.prebuild(self.create_config([]))
+        self.assertEqual("Please specify at least one revision to build with --revisions.", ctx.exception.args[0])
+
+
+class ArtefactCacheTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_root = os.path.join(self.tmp_dir.name, "artefacts")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def artefact(self, name, size_in_bytes):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size_in_bytes)
+        return path
+
+    def test_get_and_put(self):
+        cache = supplier.ArtefactCache(self.cache_root, max_size_in_bytes=1024)
+        self.assertIsNone(cache.get("elasticsearch-src-3694a07"))
+
+        source = self.artefact("elasticsearch-6.0.0.tar.gz", 10)
+        cached = cache.put("elasticsearch-src-3694a07", source)
+
+        self.assertEqual(cached, cache.get("elasticsearch-src-3694a07"))
+        self.assertEqual("elasticsearch-6.0.0.tar.gz", os.path.basename(cached))
+        self.assertTrue(os.path.isfile(source))
+        self.assertIsNone(cache.get("elasticsearch-src-9a1f5b2"))
+
+    def test_move_into_cache(self):
+        cache = supplier.ArtefactCache(self.cache_root, max_size_in_bytes=1024)
+        source = self.artefact("analysis-icu-5.4.0.zip", 10)
+
+        cached = cache.put("plugin-analysis-icu", source, move=True)
+
+        self.assertTrue(os.path.isfile(cached))
+        self.assertFalse(os.path.exists(source))
+
+    def test_evicts_least_recently_used(self):
+        cache = supplier.ArtefactCache(self.cache_root, max_size_in_bytes=250)
+        cache.put("a", self.artefact("a.tar.gz", 100))
+        cache.put("b", self.artefact("b.tar.gz", 100))
+        os.utime(os.path.dirname(cache.get("a")), (0, 0))
+        os.utime(os.path.dirname(cache.get("b")), (100, 100))
+        # "a" is older than "b" but it has been used more recently
+        self.assertIsNotNone(cache.get("a"))
+
+        cache.put("c", self.artefact("c.tar.gz", 100))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_keeps_latest_artefact_even_if_too_large(self):
+        cache = supplier.ArtefactCache(self.cache_root, max_size_in_bytes=50)
+        cache.put("a", self.artefact("a.tar.gz", 10))
+        cached = cache.put("b", self.artefact("b.tar.gz", 100))
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cached, cache.get("b"))
+
+
 class DistributionRepositoryTests(TestCase):
     def test_release_repo_config_with_default_url(self):
         repo = supplier.DistributionRepository(name="release", distribution_config={
@@ -1,10 +1,18 @@
-import random
 import collections
+import gzip
+import io
+import os
+import random
+import tarfile
+import tempfile
+import threading
+import zipfile
 import unittest.mock as mock
 from unittest import TestCase
 
-from esrally import config, metrics
+from esrally import config, exceptions, metrics
 from esrally.mechanic import telemetry, team, cluster
+from esrally.utils import sysstats
 
 
 def create_config():
@@ -57,22 +65,33 @@ class TelemetryTests(TestCase):
 
 
 class MergePartsDeviceTests(TestCase):
+    LOG = """
+    INFO: System starting up
+    INFO: 100 msec to merge doc values [500 docs]
+    INFO: Something unrelated
+    INFO: 250 msec to merge doc values [1350 docs]
+    INFO: System shutting down
+    """
+
     def setUp(self):
         self.cfg = create_config()
         self.cfg.add(config.Scope.application, "launcher", "candidate.log.dir", "/unittests/var/log/elasticsearch")
+        self.log_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def write_log(self, name, content):
+        with open(os.path.join(self.log_dir.name, name), "wt") as f:
+            f.write(content)
 
     @mock.patch("esrally.metrics.EsMetricsStore.put_count_node_level")
     @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
-    @mock.patch("builtins.open")
-    @mock.patch("os.listdir")
-    def test_store_nothing_if_no_metrics_present(self, listdir_mock, open_mock, metrics_store_put_value, metrics_store_put_count):
-        listdir_mock.return_value = [open_mock]
-        open_mock.side_effect = [
-            mock.mock_open(read_data="no data to parse").return_value
-        ]
+    def test_store_nothing_if_no_metrics_present(self, metrics_store_put_value, metrics_store_put_count):
+        self.write_log("rally-benchmark.log", "no data to parse")
         metrics_store = metrics.EsMetricsStore(self.cfg)
         node = cluster.Node(None, "io", "rally0", None)
-        merge_parts_device = telemetry.MergeParts(self.cfg, metrics_store)
+        merge_parts_device = telemetry.MergeParts(metrics_store, node_log_dir=self.log_dir.name)
         merge_parts_device.attach_to_node(node)
         merge_parts_device.on_benchmark_stop()
 
@@ -81,29 +100,148 @@ class MergePartsDeviceTests(TestCase):
 
     @mock.patch("esrally.metrics.EsMetricsStore.put_count_node_level")
     @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
-    @mock.patch("builtins.open")
-    @mock.patch("os.listdir")
-    def test_store_calculated_metrics(self, listdir_mock, open_mock, metrics_store_put_value, metrics_store_put_count):
-        log_file = '''
-        INFO: System starting up
-        INFO: 100 msec to merge doc values [500 docs]
-        INFO: Something unrelated
-        INFO: 250 msec to merge doc values [1350 docs]
-        INFO: System shutting down
-        '''
-        listdir_mock.return_value = [open_mock]
-        open_mock.side_effect = [
-            mock.mock_open(read_data=log_file).return_value
-        ]
+    def test_store_calculated_metrics(self, metrics_store_put_value, metrics_store_put_count):
+        self.write_log("rally-benchmark.log", MergePartsDeviceTests.LOG)
         metrics_store = metrics.EsMetricsStore(self.cfg)
         node = cluster.Node(None, "io", "rally0", None)
-        merge_parts_device = telemetry.MergeParts(metrics_store, node_log_dir="/var/log")
+        merge_parts_device = telemetry.MergeParts(metrics_store, node_log_dir=self.log_dir.name)
         merge_parts_device.attach_to_node(node)
         merge_parts_device.on_benchmark_stop()
 
         metrics_store_put_value.assert_called_with("rally0", "merge_parts_total_time_doc_values", 350, "ms")
         metrics_store_put_count.assert_called_with("rally0", "merge_parts_total_docs_doc_values", 1850)
 
+    @mock.patch("esrally.metrics.EsMetricsStore.put_count_node_level")
+    @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
+    def test_reads_rotated_logs_without_extracting_them(self, metrics_store_put_value, metrics_store_put_count):
+        self.write_log("rally-benchmark.log", MergePartsDeviceTests.LOG)
+        with gzip.open(os.path.join(self.log_dir.name, "rally-benchmark-2017-01-01.log.gz"), "wt") as f:
+            f.write("INFO: 50 msec to merge doc values [150 docs]\n")
+        with zipfile.ZipFile(os.path.join(self.log_dir.name, "rally-benchmark-2017-01-02.log.zip"), "w") as f:
+            f.writestr("rally-benchmark-2017-01-02.log", "INFO: 25 msec to merge doc values [100 docs]\n")
+        tar_content = "INFO: 5 msec to merge doc values [50 docs]\n".encode("utf-8")
+        with tarfile.open(os.path.join(self.log_dir.name, "rally-benchmark-2017-01-03.log.tar.gz"), "w:gz") as f:
+            member = tarfile.TarInfo("rally-benchmark-2017-01-03.log")
+            member.size = len(tar_content)
+            f.addfile(member, io.BytesIO(tar_content))
+
+        metrics_store = metrics.EsMetricsStore(self.cfg)
+        node = cluster.Node(None, "io", "rally0", None)
+        merge_parts_device = telemetry.MergeParts(metrics_store, node_log_dir=self.log_dir.name)
+        merge_parts_device.attach_to_node(node)
+        merge_parts_device.on_benchmark_stop()
+
+        metrics_store_put_value.assert_called_with("rally0", "merge_parts_total_time_doc_values", 430, "ms")
+        metrics_store_put_count.assert_called_with("rally0", "merge_parts_total_docs_doc_values", 2150)
+        # nothing has been extracted
+        self.assertEqual(4, len(os.listdir(self.log_dir.name)))
+
+    def test_sample_interval_must_be_positive(self):
+        with self.assertRaises(exceptions.SystemSetupError) as ctx:
+            telemetry.MergeParts(None, node_log_dir=self.log_dir.name, sample_interval=0)
+        self.assertEqual("The telemetry parameter 'merge-parts-sample-interval' must be positive but was [0].", ctx.exception.args[0])
+
+
+class PeriodicSamplerTests(TestCase):
+    class CountingSampler(telemetry.PeriodicSampler):
+        def __init__(self):
+            super().__init__(metrics_store=None, sample_interval=0.01)
+            self.calls = []
+            self.sampled = threading.Event()
+
+        def on_start(self):
+            self.calls.append("start")
+
+        def sample(self):
+            self.calls.append("sample")
+            self.sampled.set()
+
+        def on_stop(self):
+            self.calls.append("stop")
+
+    def test_samples_until_finished(self):
+        sampler = PeriodicSamplerTests.CountingSampler()
+        sampler.start()
+        self.assertTrue(sampler.sampled.wait(timeout=5))
+        sampler.finish()
+
+        self.assertFalse(sampler.is_alive())
+        self.assertEqual("start", sampler.calls[0])
+        self.assertEqual("stop", sampler.calls[-1])
+        self.assertEqual({"sample"}, set(sampler.calls[1:-1]))
+
+
+class SampleMergePartsTests(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.log_dir.name, "rally-benchmark.log")
+        self.metrics_store = mock.create_autospec(metrics.EsMetricsStore)
+        node = cluster.Node(None, "io", "rally0", None)
+        self.sampler = telemetry.SampleMergeParts(node, self.metrics_store, self.log_dir.name, sample_interval=1)
+        self.sampler.stop_watch.start()
+
+    def tearDown(self):
+        self.log_dir.cleanup()
+
+    def append(self, content):
+        with open(self.log_path, "at") as f:
+            f.write(content)
+
+    def test_attributes_merge_times_to_sample_interval(self):
+        # logged before the benchmark has started
+        self.append("INFO: 100 msec to merge doc values [500 docs]\n")
+        self.sampler.on_start()
+
+        self.append("INFO: 20 msec to merge doc values [50 docs]\nINFO: 30 msec to merge doc")
+        self.sampler.sample()
+        self.append(" values [70 docs]\nINFO: 5 msec to merge norms [10 docs]\n")
+        self.sampler.sample()
+
+        puts = [(c[1]["name"], c[1].get("value", c[1].get("count"))) for c in
+                self.metrics_store.put_value_node_level.call_args_list + self.metrics_store.put_count_node_level.call_args_list]
+        self.assertEqual(sorted([
+            ("merge_parts_time_doc_values", 20),
+            ("merge_parts_time_doc_values", 30),
+            ("merge_parts_time_norms", 5),
+            ("merge_parts_docs_doc_values", 50),
+            ("merge_parts_docs_doc_values", 70),
+            ("merge_parts_docs_norms", 10),
+        ]), sorted(puts))
+
+    def test_reads_rotated_log_from_start(self):
+        self.append("INFO: 100 msec to merge doc values [500 docs]\n" * 10)
+        self.sampler.on_start()
+        os.remove(self.log_path)
+        self.append("INFO: 20 msec to merge doc values [50 docs]\n")
+
+        self.sampler.sample()
+
+        self.metrics_store.put_value_node_level.assert_called_once_with(node_name="rally0", name="merge_parts_time_doc_values", value=20,
+                                                                        unit="ms", absolute_time=mock.ANY, relative_time=mock.ANY)
+
+    def test_does_not_read_renamed_log_again(self):
+        self.append("INFO: 100 msec to merge doc values [500 docs]\n")
+        self.sampler.on_start()
+        self.append("INFO: 20 msec to merge doc values [50 docs]\n")
+        # the log is rotated during the benchmark
+        os.rename(self.log_path, os.path.join(self.log_dir.name, "rally-benchmark-2018-01-01.log"))
+        self.append("INFO: 5 msec to merge doc values [10 docs]\n")
+
+        self.sampler.sample()
+        self.sampler.sample()
+
+        self.assertEqual([25], [c[1]["value"] for c in self.metrics_store.put_value_node_level.call_args_list])
+        self.assertEqual([60], [c[1]["count"] for c in self.metrics_store.put_count_node_level.call_args_list])
+
+    def test_uses_relative_time_of_metrics_store(self):
+        self.metrics_store.relative_time.return_value = 42
+        self.append("INFO: 20 msec to merge doc values [50 docs]\n")
+
+        self.sampler.sample()
+
+        self.metrics_store.put_value_node_level.assert_called_once_with(node_name="rally0", name="merge_parts_time_doc_values", value=20,
+                                                                        unit="ms", absolute_time=mock.ANY, relative_time=42)
+
 
 class Client:
     def __init__(self, nodes=None, info=None, indices=None):
@@ -145,6 +283,91 @@ class GcTests(TestCase):
             env["ES_JAVA_OPTS"])
 
 
+class CpuUsageTests(TestCase):
+    class Process:
+        def __init__(self, pid):
+            self.pid = pid
+
+    @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
+    def test_records_cpu_usage_per_interval(self, metrics_store_node_level):
+        node = cluster.Node(process=CpuUsageTests.Process(os.getpid()), host_name="localhost", node_name="rally0", telemetry=None)
+        metrics_store = metrics.EsMetricsStore(create_config())
+        sampler = telemetry.SampleCpuUsage(node, metrics_store, sample_interval=2)
+
+        previous = (0, (10.0, 2.0), [(5.0, 10.0), (1.0, 10.0)], 1000, 1)
+        current = (2, (11.0, 2.5), [(6.5, 12.0), (1.5, 12.0)], 3000, 4)
+        sampler.record(previous, current, absolute_time=1453362707, relative_time=32)
+
+        def record(name, value, unit, meta_data=None):
+            return mock.call(node_name="rally0", name=name, value=value, unit=unit, absolute_time=1453362707, relative_time=32,
+                             meta_data=meta_data)
+
+        metrics_store_node_level.assert_has_calls([
+            record("cpu_utilization_1s", 75.0, "%"),
+            record("cpu_user_time", 1000.0, "ms"),
+            record("cpu_system_time", 500.0, "ms"),
+            record("cpu_core_utilization", 75.0, "%", meta_data={"core": 0}),
+            record("cpu_core_utilization", 25.0, "%", meta_data={"core": 1}),
+            record("context_switch_rate", 1000.0, "1/s"),
+            record("run_queue_length", 4, None)
+        ])
+
+    @mock.patch("esrally.utils.sysstats.system_cpu_stats")
+    @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
+    def test_skips_machine_stats_if_another_node_samples_them(self, metrics_store_node_level, system_cpu_stats):
+        node = cluster.Node(process=CpuUsageTests.Process(os.getpid()), host_name="localhost", node_name="rally1", telemetry=None)
+        metrics_store = metrics.EsMetricsStore(create_config())
+        sampler = telemetry.SampleCpuUsage(node, metrics_store, sample_interval=2, machine_stats=False)
+
+        previous = sampler.snapshot(0)
+        current = sampler.snapshot(2)
+        sampler.record(previous, current, absolute_time=1453362707, relative_time=2)
+
+        system_cpu_stats.assert_not_called()
+        self.assertEqual(["cpu_utilization_1s", "cpu_user_time", "cpu_system_time"],
+                         [c[1]["name"] for c in metrics_store_node_level.call_args_list])
+
+    def test_rejects_non_positive_sample_interval(self):
+        with self.assertRaises(exceptions.SystemSetupError):
+            telemetry.CpuUsage(metrics_store=None, sample_interval=-1)
+
+
+class DiskIoSamplerTests(TestCase):
+    @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
+    def test_records_disk_io_per_device_and_interval(self, metrics_store_node_level):
+        node = cluster.Node(process=None, host_name="localhost", node_name="rally0", telemetry=None)
+        metrics_store = metrics.EsMetricsStore(create_config())
+        sampler = telemetry.SampleDiskIo(node, metrics_store, devices=["sda1"], sample_interval=2)
+
+        previous = (0, {
+            "sda1": sysstats.DiskIoStats(100, 200, 1000, 8000, 50, 150, 1000, 3000, 0),
+            "sdb1": sysstats.DiskIoStats(0, 0, 0, 0, 0, 0, 0, 0, 0)
+        })
+        current = (2, {
+            "sda1": sysstats.DiskIoStats(110, 290, 5000, 16000, 60, 290, 2500, 7000, 4),
+            "sdb1": sysstats.DiskIoStats(100, 100, 100, 100, 100, 100, 100, 100, 0)
+        })
+        sampler.record(previous, current, absolute_time=1453362707, relative_time=32)
+
+        def record(name, value, unit):
+            return mock.call(node_name="rally0", name=name, value=value, unit=unit, absolute_time=1453362707, relative_time=32,
+                             meta_data={"device": "sda1"})
+
+        self.assertEqual([
+            record("disk_io_read_rate", 2000.0, "byte/s"),
+            record("disk_io_write_rate", 4000.0, "byte/s"),
+            record("disk_io_read_iops", 5.0, "1/s"),
+            record("disk_io_write_iops", 45.0, "1/s"),
+            record("disk_io_await", 1.5, "ms"),
+            record("disk_io_queue_depth", 2.0, None),
+            record("disk_io_utilization", 75.0, "%")
+        ], metrics_store_node_level.call_args_list)
+
+    def test_rejects_non_positive_sample_interval(self):
+        with self.assertRaises(exceptions.SystemSetupError):
+            telemetry.DiskIoSampler(data_paths=["/var/lib/es"], metrics_store=None, sample_interval=0)
+
+
 class ClusterEnvironmentInfoTests(TestCase):
     @mock.patch("esrally.metrics.EsMetricsStore.add_meta_info")
     def test_stores_cluster_level_metrics_on_attach(self, metrics_store_add_meta_info):
@@ -652,6 +875,109 @@ class NodeStatsTests(TestCase):
         ])
 
 
+class StaticClock:
+    NOW = 1453362707
+
+    @staticmethod
+    def now():
+        return StaticClock.NOW
+
+    @staticmethod
+    def stop_watch():
+        return StaticStopWatch()
+
+
+class StaticStopWatch:
+    def __init__(self):
+        self.split_times = [0, 10]
+
+    def start(self):
+        pass
+
+    def split_time(self):
+        return self.split_times.pop(0)
+
+
+class NodeStatsSamplerTests(TestCase):
+    def nodes_stats(self, young_gc_time, indexing_time, index_total, heap_used, store_size=None):
+        stats = {
+            "nodes": {
+                "FCFjozkeTiOpN-SI88YEcg": {
+                    "name": "rally0",
+                    "host": "127.0.0.1",
+                    "jvm": {
+                        "mem": {
+                            "heap_used_in_bytes": heap_used
+                        },
+                        "gc": {
+                            "collectors": {
+                                "young": {
+                                    "collection_time_in_millis": young_gc_time
+                                }
+                            }
+                        }
+                    },
+                    "indices": {
+                        "indexing": {
+                            "index_total": index_total,
+                            "index_time_in_millis": indexing_time
+                        }
+                    }
+                }
+            }
+        }
+        if store_size is not None:
+            stats["nodes"]["FCFjozkeTiOpN-SI88YEcg"]["indices"]["store"] = {"size_in_bytes": store_size}
+        return stats
+
+    @mock.patch("esrally.metrics.EsMetricsStore.relative_time")
+    @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
+    def test_stores_increase_per_interval(self, metrics_store_node_level, metrics_store_relative_time):
+        # the metrics store has been opened before the benchmark has started
+        metrics_store_relative_time.side_effect = [120, 130]
+        client = Client(nodes=SubClient(self.nodes_stats(young_gc_time=500, indexing_time=1000, index_total=2000, heap_used=1024)))
+        metrics_store = metrics.EsMetricsStore(create_config())
+        sampler = telemetry.SampleNodeStats(client, metrics_store, sample_interval=10, clock=StaticClock)
+
+        sampler.sample()
+        # the first sample is just the baseline for all counters
+        metrics_store_node_level.assert_called_once_with("rally0", "node_stats_heap_used", 1024, "byte",
+                                                         absolute_time=StaticClock.NOW, relative_time=120)
+        metrics_store_node_level.reset_mock()
+
+        client.nodes = SubClient(self.nodes_stats(young_gc_time=700, indexing_time=1500, index_total=7000, heap_used=2048))
+        sampler.sample()
+
+        metrics_store_node_level.assert_has_calls([
+            mock.call("rally0", "node_stats_heap_used", 2048, "byte", absolute_time=StaticClock.NOW, relative_time=130),
+            mock.call("rally0", "node_stats_young_gen_gc_time", 200, "ms", absolute_time=StaticClock.NOW, relative_time=130),
+            mock.call("rally0", "node_stats_indexing_time", 500, "ms", absolute_time=StaticClock.NOW, relative_time=130),
+            mock.call("rally0", "node_stats_indexing_throughput", 500, "docs/s", absolute_time=StaticClock.NOW, relative_time=130)
+        ])
+        # metrics that are not available are skipped
+        self.assertEqual(4, metrics_store_node_level.call_count)
+
+    @mock.patch("esrally.metrics.EsMetricsStore.relative_time")
+    @mock.patch("esrally.metrics.EsMetricsStore.put_value_node_level")
+    def test_stores_store_size_per_interval(self, metrics_store_node_level, metrics_store_relative_time):
+        metrics_store_relative_time.return_value = 0
+        client = Client(nodes=SubClient(self.nodes_stats(young_gc_time=500, indexing_time=1000, index_total=2000, heap_used=1024,
+                                                         store_size=4096)))
+        metrics_store = metrics.EsMetricsStore(create_config())
+        sampler = telemetry.SampleNodeStats(client, metrics_store, sample_interval=10, clock=StaticClock)
+
+        sampler.sample()
+
+        metrics_store_node_level.assert_has_calls([
+            mock.call("rally0", "node_stats_heap_used", 1024, "byte", absolute_time=StaticClock.NOW, relative_time=0),
+            mock.call("rally0", "node_stats_store_size", 4096, "byte", absolute_time=StaticClock.NOW, relative_time=0)
+        ])
+
+    def test_rejects_non_positive_sample_interval(self):
+        with self.assertRaises(exceptions.SystemSetupError):
+            telemetry.NodeStatsSampler(Client(), metrics_store=None, sample_interval=0)
+
+
 class IndexStatsTests(TestCase):
     @mock.patch("esrally.metrics.EsMetricsStore.put_value_cluster_level")
     @mock.patch("esrally.metrics.EsMetricsStore.put_count_cluster_level")
@@ -856,7 +1182,8 @@ class IndexSizeTests(TestCase):
     @mock.patch("esrally.metrics.EsMetricsStore.put_count_node_level")
     @mock.patch("esrally.utils.process.run_subprocess_with_logging")
     def test_stores_index_size_for_data_paths(self, run_subprocess, metrics_store_node_count, get_size):
-        get_size.side_effect = [2048, 16384]
+        sizes = {"/var/elasticsearch/data/1": 2048, "/var/elasticsearch/data/2": 16384}
+        get_size.side_effect = lambda data_path, max_workers: sizes[data_path]
 
         cfg = create_config()
         metrics_store = metrics.EsMetricsStore(cfg)
@@ -873,6 +1200,24 @@ class IndexSizeTests(TestCase):
             mock.call("rally-node-0", "final_index_size_bytes", 18432, "byte")
         ])
 
+        # index files are only listed if debug logging is enabled
+        run_subprocess.assert_not_called()
+
+    @mock.patch("esrally.utils.io.get_size")
+    @mock.patch("esrally.metrics.EsMetricsStore.put_count_node_level")
+    @mock.patch("esrally.utils.process.run_subprocess_with_logging")
+    def test_lists_index_files_on_debug_level(self, run_subprocess, metrics_store_node_count, get_size):
+        get_size.return_value = 2048
+
+        metrics_store = metrics.EsMetricsStore(create_config())
+        device = telemetry.IndexSize(["/var/elasticsearch/data/1", "/var/elasticsearch/data/2"], metrics_store)
+        t = telemetry.Telemetry(enabled_devices=[], devices=[device])
+        node = cluster.Node(process=None, host_name="localhost", node_name="rally-node-0", telemetry=t)
+        t.attach_to_node(node)
+        with mock.patch.object(telemetry.logger, "isEnabledFor", return_value=True):
+            t.detach_from_node(node, running=False)
+
+        metrics_store_node_count.assert_called_once_with("rally-node-0", "final_index_size_bytes", 4096, "byte")
         run_subprocess.assert_has_calls([
             mock.call("find /var/elasticsearch/data/1 -ls", header="index files:"),
             mock.call("find /var/elasticsearch/data/2 -ls", header="index files:")
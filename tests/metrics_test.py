@@ -5,7 +5,8 @@ import unittest.mock as mock
 from unittest import TestCase
 import elasticsearch.exceptions
 
-from esrally import config, metrics, track, exceptions
+from esrally import config, metrics, track, exceptions, paths, time
+from esrally.utils import io
 
 
 class MockClientFactory:
@@ -369,6 +370,68 @@ class EsMetricsTests(TestCase):
 
         self.assertEqual(median_throughput, actual_median_throughput)
 
+    def test_get_time_series(self):
+        search_result = {
+            "hits": {
+                "total": 3,
+            },
+            "aggregations": {
+                "time_series": {
+                    "buckets": [
+                        {
+                            "key": 0,
+                            "doc_count": 2,
+                            "metric_stats": {
+                                "count": 2,
+                                "avg": 150.0
+                            },
+                            "percentile_stats": {
+                                "values": {
+                                    "100.0": 200.0,
+                                    "50.0": 150.0
+                                }
+                            }
+                        },
+                        {
+                            "key": 20000000,
+                            "doc_count": 1,
+                            "metric_stats": {
+                                "count": 1,
+                                "avg": 300.0
+                            },
+                            "percentile_stats": {
+                                "values": {
+                                    "100.0": 300.0,
+                                    "50.0": 300.0
+                                }
+                            }
+                        }
+                    ]
+                }
+            }
+        }
+        self.es_mock.search = mock.MagicMock(return_value=search_result)
+
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults")
+
+        time_series = self.metrics_store.get_time_series("latency", 10, operation="index", percentiles=[50, 100])
+
+        query = self.es_mock.search.call_args[1]["body"]
+        self.assertEqual(0, query["size"])
+        self.assertEqual({
+            "field": "relative-time",
+            "interval": 10 * 1000 * 1000,
+            "min_doc_count": 1
+        }, query["aggs"]["time_series"]["histogram"])
+        self.assertEqual([50, 100], query["aggs"]["time_series"]["aggs"]["percentile_stats"]["percentiles"]["percents"])
+        self.assertIn({"term": {"operation": "index"}}, query["query"]["bool"]["filter"])
+
+        self.assertEqual([0, 20], [bucket["relative_time"] for bucket in time_series])
+        self.assertEqual([2, 1], [bucket["count"] for bucket in time_series])
+        self.assertEqual([150.0, 300.0], [bucket["mean"] for bucket in time_series])
+        # percentiles are sorted and use the keys of the percentiles aggregation
+        self.assertEqual([("50.0", 150.0), ("100.0", 200.0)], list(time_series[0]["percentiles"].items()))
+
     def test_get_error_rate_implicit_zero(self):
         self.assertEqual(0.0, self._get_error_rate(buckets=[
             {
@@ -628,6 +691,56 @@ class EsRaceStoreTests(TestCase):
         }
         self.es_mock.index.assert_called_with(index="rally-races-2016-01", doc_type="races", item=expected_doc)
 
+    def test_find_by_configuration(self):
+        self.es_mock.search.return_value = {
+            "hits": {
+                "total": 1,
+                "hits": [
+                    {
+                        "_source": {
+                            "rally-version": "0.7.3",
+                            "environment": "unittest-env",
+                            "trial-timestamp": "20160131T000000Z",
+                            "pipeline": "from-sources",
+                            "user-tag": "",
+                            "track": "geonames",
+                            "challenge": "append-no-conflicts",
+                            "car": "defaults",
+                            "total-laps": 1,
+                            "results": {
+                                "op_metrics": []
+                            }
+                        }
+                    }
+                ]
+            }
+        }
+
+        races = self.race_store.find_by_configuration(track="geonames", car="defaults", max_results=20)
+
+        self.assertEqual(1, len(races))
+        self.assertEqual("geonames", races[0].track)
+        self.assertEqual({"op_metrics": []}, races[0].results)
+        self.es_mock.search.assert_called_with(index="rally-races-*", doc_type="races", body={
+            "query": {
+                "bool": {
+                    "filter": [
+                        {"term": {"environment": "unittest-env"}},
+                        {"term": {"track": "geonames"}},
+                        {"term": {"car": "defaults"}}
+                    ]
+                }
+            },
+            "size": 20,
+            "sort": [
+                {
+                    "trial-timestamp": {
+                        "order": "desc"
+                    }
+                }
+            ]
+        })
+
 
 class EsResultsStoreTests(TestCase):
     TRIAL_TIMESTAMP = datetime.datetime(2016, 1, 31)
@@ -810,6 +923,29 @@ class InMemoryMetricsStoreTests(TestCase):
             self.assertAlmostEqual(expected_percentiles[percentile], actual_percentile_value, places=1,
                                    msg=str(percentile) + "th percentile differs")
 
+    def test_get_time_series(self):
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
+        self.metrics_store.lap = 1
+        for i in range(0, 30):
+            self.metrics_store.put_value_cluster_level("latency", float(i), "ms", operation="index", relative_time=i)
+        # a gap without any samples
+        self.metrics_store.put_value_cluster_level("latency", 100.0, "ms", operation="index", relative_time=45)
+        self.metrics_store.put_value_cluster_level("latency", 500.0, "ms", operation="search", relative_time=5)
+
+        self.metrics_store.close()
+
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults")
+
+        time_series = self.metrics_store.get_time_series("latency", 10, operation="index", percentiles=[50, 100])
+        self.assertEqual([0, 10, 20, 40], [bucket["relative_time"] for bucket in time_series])
+        self.assertEqual([10, 10, 10, 1], [bucket["count"] for bucket in time_series])
+        self.assertAlmostEqual(14.5, time_series[1]["mean"])
+        self.assertAlmostEqual(14.5, time_series[1]["percentiles"][50])
+        self.assertAlmostEqual(19.0, time_series[1]["percentiles"][100])
+        self.assertAlmostEqual(100.0, time_series[3]["percentiles"][100])
+
+        self.assertEqual([], self.metrics_store.get_time_series("latency", 10, operation="index", lap=2))
+
     def test_externalize_and_bulk_add(self):
         self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
         self.metrics_store.lap = 1
@@ -845,12 +981,63 @@ class InMemoryMetricsStoreTests(TestCase):
         self.assertEqual({
             "cluster-name": "test",
             "fs-block-size-bytes": 512
-        }, self.metrics_store.docs[0]["meta"])
+        }, self.metrics_store._resolve(self.metrics_store.docs[0])["meta"])
 
         self.assertEqual({
             "cluster-name": "test",
             "io-batch-size-kb": 4
-        }, self.metrics_store.docs[1]["meta"])
+        }, self.metrics_store._resolve(self.metrics_store.docs[1])["meta"])
+
+    def test_stores_shared_meta_data_once(self):
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
+        self.metrics_store.lap = 1
+        self.metrics_store.add_meta_info(metrics.MetaInfoScope.cluster, None, "cluster-name", "test")
+        task_meta_data = {"query-type": "term", "success": True}
+
+        self.metrics_store.put_value_cluster_level("latency", 3.0, "ms", meta_data={"success": False}, shared_meta_data=task_meta_data)
+        self.metrics_store.put_value_cluster_level("latency", 2.0, "ms", meta_data={"success": True}, shared_meta_data=task_meta_data)
+        self.metrics_store.put_count_cluster_level("final_index_size", 1000, "GB")
+        self.metrics_store.put_count_cluster_level("final_bytes_written", 1, "TB")
+        # subsequent documents contain new meta info
+        self.metrics_store.add_meta_info(metrics.MetaInfoScope.cluster, None, "source_revision", "abc123")
+        self.metrics_store.put_value_cluster_level("latency", 4.0, "ms", shared_meta_data=task_meta_data)
+
+        docs = self.metrics_store.docs
+        self.assertEqual([0, 0, 1, 1, 2], [doc["meta-ref"] for doc in docs])
+        # only per document meta data are stored with each document
+        self.assertEqual({"success": False}, docs[0]["meta"])
+        self.assertNotIn("meta", docs[2])
+        self.assertEqual([
+            {"cluster-name": "test", "query-type": "term", "success": False},
+            {"cluster-name": "test", "query-type": "term", "success": True},
+            {"cluster-name": "test"},
+            {"cluster-name": "test"},
+            {"cluster-name": "test", "source_revision": "abc123", "query-type": "term", "success": True}
+        ], [self.metrics_store._resolve(doc)["meta"] for doc in docs])
+
+    def test_externalizes_shared_meta_data_only_once(self):
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
+        self.metrics_store.lap = 1
+        self.metrics_store.add_meta_info(metrics.MetaInfoScope.cluster, None, "cluster-name", "test")
+        task_meta_data = {"query-type": "term"}
+        for i in range(10):
+            self.metrics_store.put_value_cluster_level("service_time", float(i), "ms", operation="term-query",
+                                                       meta_data={"success": i != 3}, shared_meta_data=task_meta_data)
+
+        memento = self.metrics_store.to_externalizable(clear=True, spill_to_disk=random.choice([True, False]))
+        self.assertEqual(0, len(self.metrics_store.docs))
+        self.metrics_store.close()
+
+        restored_store = metrics.InMemoryMetricsStore(self.cfg, clock=StaticClock)
+        restored_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
+        restored_store.lap = 1
+        restored_store.put_count_cluster_level("final_index_size", 1000, "GB", shared_meta_data={"disk": "ssd"})
+        restored_store.bulk_add(memento)
+        self.assertEqual(11, len(restored_store.docs))
+        self.assertEqual({"disk": "ssd"}, restored_store._resolve(restored_store.docs[0])["meta"])
+        self.assertEqual({"cluster-name": "test", "query-type": "term", "success": False},
+                         restored_store._resolve(restored_store.docs[4])["meta"])
+        self.assertEqual(0.1, restored_store.get_error_rate("term-query"))
 
     def test_get_error_rate_zero_without_samples(self):
         self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
@@ -965,3 +1152,57 @@ class FileRaceStoreTests(TestCase):
         retrieved_race = self.race_store.find_by_timestamp(timestamp=time.to_iso8601(FileRaceStoreTests.TRIAL_TIMESTAMP))
         self.assertEqual(race.trial_timestamp, retrieved_race.trial_timestamp)
         self.assertEqual(1, len(self.race_store.list()))
+
+    def store_race(self, trial_timestamp, track_name, car, user_tag=""):
+        self.cfg.add(config.Scope.application, "system", "time.start", trial_timestamp)
+        race_store = metrics.FileRaceStore(self.cfg)
+        race_store._store({
+            "rally-version": "0.7.3",
+            "environment": "unittest",
+            "trial-timestamp": time.to_iso8601(trial_timestamp),
+            "pipeline": "from-sources",
+            "user-tag": user_tag,
+            "track": track_name,
+            "challenge": "index",
+            "car": car,
+            "total-laps": 1,
+            "cluster": {"distribution-version": "5.0.0"},
+            "results": {}
+        })
+
+    def test_list_races_by_configuration(self):
+        self.store_race(datetime.datetime(2016, 1, 1), "geonames", "defaults")
+        self.store_race(datetime.datetime(2016, 1, 3), "pmc", "defaults")
+        # creates the index implicitly from existing race files
+        self.assertEqual(2, len(self.race_store.list()))
+
+        # subsequent races are added to the index
+        self.store_race(datetime.datetime(2016, 1, 2), "geonames", "4gheap", user_tag="intention:baseline")
+        self.store_race(datetime.datetime(2016, 1, 4), "geonames", "defaults")
+
+        races = self.race_store.list()
+        self.assertEqual([datetime.datetime(2016, 1, d) for d in [4, 3, 2, 1]], [r.trial_timestamp for r in races])
+
+        races = self.race_store.find_by_configuration(track="geonames", challenge="index", car="defaults")
+        self.assertEqual([datetime.datetime(2016, 1, 4), datetime.datetime(2016, 1, 1)], [r.trial_timestamp for r in races])
+        races = self.race_store.find_by_configuration(user_tag="intention:baseline")
+        self.assertEqual([datetime.datetime(2016, 1, 2)], [r.trial_timestamp for r in races])
+        races = self.race_store.find_by_configuration(track="geonames", max_results=1)
+        self.assertEqual([datetime.datetime(2016, 1, 4)], [r.trial_timestamp for r in races])
+        self.assertEqual([], self.race_store.find_by_configuration(track="nyc_taxis"))
+
+    def test_rebuild_index(self):
+        self.store_race(datetime.datetime(2016, 1, 1), "geonames", "defaults")
+        self.assertEqual(1, len(self.race_store.list()))
+
+        self.cfg.add(config.Scope.application, "system", "time.start", datetime.datetime(2016, 1, 2))
+        io.ensure_dir(paths.race_root(self.cfg))
+        with open("%s/race.json" % paths.race_root(self.cfg), "wt") as f:
+            f.write("{ this is not a valid race")
+        # a race that has been copied manually to the races directory
+        os.rename("%s/2016-01-01-00-00-00" % paths.races_root(self.cfg), "%s/2016-01-03-00-00-00" % paths.races_root(self.cfg))
+
+        self.assertEqual(1, self.race_store.rebuild_index())
+        races = self.race_store.list()
+        self.assertEqual(1, len(races))
+        self.assertEqual("geonames", races[0].track)
@@ -1,5 +1,6 @@
 import collections
 import datetime
+import unittest.mock as mock
 from unittest import TestCase
 
 from esrally import reporter, metrics, config, track
@@ -55,6 +56,70 @@ class StatsCalculatorTests(TestCase):
         self.assertAlmostEqual(0.3333333333333333, opm["error_rate"])
 
         self.assertEqual(6144, stats.index_size)
+        self.assertNotIn("time_series", opm)
+
+    def test_calculate_time_series(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+        cfg.add(config.Scope.application, "system", "time.start", datetime.datetime.now())
+        cfg.add(config.Scope.application, "reporting", "datastore.type", "in-memory")
+        cfg.add(config.Scope.application, "mechanic", "car.name", "unittest_car")
+        cfg.add(config.Scope.application, "race", "laps", 1)
+        cfg.add(config.Scope.application, "race", "user.tag", "")
+        cfg.add(config.Scope.application, "race", "pipeline", "from-sources-skip-build")
+
+        index = track.Task(operation=track.Operation(name="index", operation_type=track.OperationType.Index, params=None))
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[index], default=True)
+        t = track.Track("unittest", "unittest-track", challenges=[challenge])
+
+        store = metrics.metrics_store(cfg, read_only=False, track=t, challenge=challenge)
+        store.lap = 1
+
+        for relative_time, throughput in [(1, 500), (2, 700), (6, 1000)]:
+            store.put_value_cluster_level("throughput", throughput, unit="docs/s", operation="index",
+                                          operation_type=track.OperationType.Index, relative_time=relative_time)
+        for relative_time, latency in [(1, 200), (3, 300), (7, 250)]:
+            store.put_value_cluster_level("latency", latency, unit="ms", operation="index",
+                                          operation_type=track.OperationType.Index, relative_time=relative_time)
+            store.put_value_cluster_level("service_time", latency - 50, unit="ms", operation="index",
+                                          operation_type=track.OperationType.Index, relative_time=relative_time,
+                                          meta_data={"success": True})
+
+        stats = reporter.calculate_results(store, metrics.create_race(cfg, t, challenge), time_series_interval=5)
+
+        del store
+
+        time_series = stats.metrics("index")["time_series"]
+        self.assertEqual(5, time_series["interval"])
+        self.assertEqual("docs/s", time_series["unit"])
+        buckets = time_series["buckets"]
+        self.assertEqual([0, 5], [b["relative_time"] for b in buckets])
+        self.assertAlmostEqual(600, buckets[0]["throughput"])
+        self.assertAlmostEqual(1000, buckets[1]["throughput"])
+        self.assertAlmostEqual(300, buckets[0]["latency"]["100_0"])
+        self.assertAlmostEqual(200, buckets[1]["service_time"]["50_0"])
+
+
+    def test_time_series_keys_do_not_depend_on_metrics_store(self):
+        def get_time_series(name, interval, operation=None, lap=None, percentiles=None):
+            if name == "throughput":
+                return [{"relative_time": 0, "count": 1, "mean": 500, "percentiles": collections.OrderedDict()}]
+            # like the Elasticsearch metrics store, we use the keys of the percentiles aggregation here
+            return [{"relative_time": 0, "count": 1, "mean": 200,
+                     "percentiles": collections.OrderedDict([(str(float(p)), 200) for p in percentiles])}]
+
+        store = mock.create_autospec(metrics.EsMetricsStore)
+        store.get_unit.return_value = "docs/s"
+        store.get_time_series.side_effect = get_time_series
+
+        time_series = reporter.StatsCalculator(store, challenge=None, lap=1, time_series_interval=5).time_series("index")
+
+        self.assertEqual(["50_0", "90_0", "99_0", "100_0"], list(time_series["buckets"][0]["latency"].keys()))
+        self.assertEqual(["50_0", "90_0", "99_0", "100_0"], list(time_series["buckets"][0]["service_time"].keys()))
+
+        summary_reporter = reporter.SummaryReporter(results=None, config=None, revision=None, current_lap=1, total_laps=1)
+        self.assertEqual([["1", "index", 0, 500, "docs/s", 200, 200, 200, 200, 200, 200, 200, 200]],
+                         summary_reporter.report_time_series({"time_series": time_series}, "index"))
 
 
 def select(l, name, operation=None):
@@ -145,6 +210,13 @@ class StatsTests(TestCase):
         }, select(metric_list, "old_gc_time"))
 
 
+class FormatterTests(TestCase):
+    def test_format_as_json(self):
+        formatted = reporter.format_as_json(["Metric", "Value", "Unit"], [["Indexing time", 12.5, "min"], ["Segment count", 42, ""]])
+        self.assertEqual('{"Metric": "Indexing time", "Value": 12.5, "Unit": "min"}\n'
+                         '{"Metric": "Segment count", "Value": 42, "Unit": ""}\n', formatted)
+
+
 class ComparisonReporterTests(TestCase):
     def test_formats_table(self):
         cfg = config.Config()
@@ -164,3 +236,121 @@ class ComparisonReporterTests(TestCase):
         formatted = r.format_as_table(metrics_table)
         # 1 header line, 1 separation line + 3 data lines
         self.assertEqual(1 + 1 + 3, len(formatted.splitlines()))
+
+    def throughput_stats(self, median):
+        s = reporter.Stats()
+        s.add_op_metrics("index", {"min": median, "median": median, "max": median, "unit": "docs/s"}, {}, {}, 0)
+        return s
+
+    def race(self, medians):
+        laps = [self.throughput_stats(m).as_dict() for m in medians]
+        return metrics.Race("0.9.0", "unittest", datetime.datetime(2017, 1, 1), "benchmark-only", None, "geonames", "append",
+                            "defaults", total_laps=len(medians), lap_results=laps,
+                            results=self.throughput_stats(sum(medians) / len(medians)).as_dict())
+
+    def test_determines_significance_based_on_laps(self):
+        cfg = config.Config()
+        r = reporter.ComparisonReporter(cfg)
+        r.samples = r.lap_samples(self.race([1000, 1010, 990, 1005]), self.race([1100, 1120, 1090, 1110]))
+
+        self.assertEqual(([1000, 1010, 990, 1005], [1100, 1120, 1090, 1110]), r.samples[("Median Throughput", "index")])
+        line = r.line("Median Throughput", 1001.25, 1105, "index", "docs/s", treat_increase_as_improvement=True)
+        self.assertEqual(9, len(line))
+        self.assertEqual("0.02857", line[7])
+        self.assertEqual("1.00", line[8])
+        self.assertTrue(r.significant(1001.25, 1105, [1000, 1010, 990, 1005], [1100, 1120, 1090, 1110]))
+
+    def test_noise_is_not_significant(self):
+        cfg = config.Config()
+        r = reporter.ComparisonReporter(cfg)
+        r.samples = r.lap_samples(self.race([1000, 1100, 950, 1050]), self.race([1020, 980, 1090, 1060]))
+
+        self.assertFalse(r.significant(1025, 1037.5, *r.samples[("Median Throughput", "index")]))
+
+    def test_applies_threshold(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "reporting", "comparison.threshold", 5.0)
+        r = reporter.ComparisonReporter(cfg)
+
+        # without laps, only the threshold applies
+        self.assertIsNone(r.lap_samples(self.race([1000]), self.race([1040])))
+        self.assertFalse(r.significant(1000, 1040, [], []))
+        self.assertTrue(r.significant(1000, 1060, [], []))
+        self.assertEqual(["Metric", "Operation", "Baseline", "Contender", "Diff", "Unit"], r.headers())
+
+    def test_applies_only_threshold_if_laps_cannot_be_significant(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "reporting", "comparison.threshold", 5.0)
+        r = reporter.ComparisonReporter(cfg)
+
+        # with three laps each, the smallest possible p-value is 0.1
+        self.assertIsNone(r.lap_samples(self.race([1000, 1010, 990]), self.race([1100, 1120, 1090])))
+        self.assertTrue(r.significant(1000, 1103.3, [1000, 1010, 990], [1100, 1120, 1090]))
+        self.assertFalse(r.significant(1000, 1040, [1000, 1010, 990], [1030, 1050, 1040]))
+        self.assertEqual(["Metric", "Operation", "Baseline", "Contender", "Diff", "Unit"], r.headers())
+
+
+class TrendReporterTests(TestCase):
+    def setUp(self):
+        self.cfg = config.Config()
+        self.cfg.add(config.Scope.application, "reporting", "trend.window", 3)
+        self.cfg.add(config.Scope.application, "reporting", "trend.threshold", 5.0)
+        self.trend_reporter = reporter.TrendReporter(self.cfg)
+
+    def race(self, day, throughput, latency):
+        return metrics.Race(rally_version="0.7.3", environment_name="unittest", trial_timestamp=datetime.datetime(2017, 6, day),
+                            pipeline="from-sources", user_tag="", track="geonames", challenge="append-no-conflicts", car="defaults",
+                            total_laps=1, results={
+                                "op_metrics": [
+                                    {
+                                        "operation": "index",
+                                        "throughput": {"min": throughput, "median": throughput, "max": throughput, "unit": "docs/s"},
+                                        "latency": {"50": latency, "99_9": 2 * latency},
+                                        "service_time": {},
+                                        "error_rate": 0.0
+                                    }
+                                ]
+                            })
+
+    def test_detects_regression(self):
+        throughput = [1000, 1010, 990, 1005, 1000, 995, 1002, 900, 905, 895, 902, 898, 900, 903]
+        latency = [10, 11, 10, 12, 11, 10, 11, 10, 12, 11, 10, 11, 10, 12]
+        races = [self.race(day + 1, t, l) for day, (t, l) in enumerate(zip(throughput, latency))]
+
+        table = self.trend_reporter.trend_table(races)
+
+        self.assertEqual(["Median Throughput", "50th percentile latency", "99.9th percentile latency"], [row[0] for row in table])
+        metric, operation, unit, race_count, baseline, latest, diff, change_point, change, p_value, regression = table[0]
+        self.assertEqual("index", operation)
+        self.assertEqual("docs/s", unit)
+        self.assertEqual(14, race_count)
+        self.assertEqual(900, baseline)
+        self.assertEqual(903, latest)
+        self.assertEqual("20170608T000000Z", change_point)
+        self.assertEqual("-10.00", change)
+        self.assertTrue(regression)
+        # latency is just noise
+        self.assertEqual(["", "", False], table[1][7:9] + [table[1][10]])
+
+    def test_ignores_improvements_and_small_changes(self):
+        self.cfg.add(config.Scope.application, "reporting", "trend.threshold", 15.0)
+        self.trend_reporter = reporter.TrendReporter(self.cfg)
+        throughput = [1000, 1010, 990, 1005, 1000, 995, 1002, 900, 905, 895, 902, 898, 900, 903]
+        # latency improves
+        latency = [20, 21, 20, 22, 21, 20, 21, 10, 12, 11, 10, 11, 10, 12]
+        races = [self.race(day + 1, t, l) for day, (t, l) in enumerate(zip(throughput, latency))]
+
+        table = self.trend_reporter.trend_table(races)
+
+        self.assertEqual("-10.00", table[0][8])
+        self.assertFalse(table[0][10])
+        self.assertEqual("20170608T000000Z", table[1][7])
+        self.assertFalse(table[1][10])
+
+    def test_skips_races_without_operation(self):
+        races = [self.race(1, 1000, 10), self.race(2, 1000, 10), self.race(3, 1000, 10)]
+        races[1].results = {"op_metrics": []}
+
+        table = self.trend_reporter.trend_table(races)
+
+        self.assertEqual(2, table[0][3])
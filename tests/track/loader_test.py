@@ -1,9 +1,12 @@
+import os
 import re
+import tempfile
+import unittest.mock as mock
 from unittest import TestCase
 
 import jinja2
 
-from esrally.track import loader
+from esrally.track import loader, track
 
 
 def strip_ws(s):
@@ -22,6 +25,53 @@ class StaticClock:
         return None
 
 
+class RevisionCacheTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.mkdir(os.path.join(self.tmp_dir.name, ".git"))
+        self.cache = loader.RevisionCache(self.tmp_dir.name, "unit-test")
+        self.computations = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def compute(self):
+        self.computations += 1
+        return [{"name": "geonames", "computation": self.computations}]
+
+    @mock.patch("esrally.utils.git.head_revision")
+    @mock.patch("esrally.utils.git.has_local_changes")
+    def test_caches_per_revision(self, has_local_changes, head_revision):
+        has_local_changes.return_value = False
+        head_revision.return_value = "3694a07"
+        self.assertEqual([{"name": "geonames", "computation": 1}], self.cache.get(self.compute))
+        self.assertEqual([{"name": "geonames", "computation": 1}], self.cache.get(self.compute))
+        has_local_changes.assert_called_with(self.tmp_dir.name, include_untracked=True)
+
+        head_revision.return_value = "c2e4f9a"
+        self.assertEqual([{"name": "geonames", "computation": 2}], self.cache.get(self.compute))
+
+    @mock.patch("esrally.utils.git.head_revision")
+    @mock.patch("esrally.utils.git.has_local_changes")
+    def test_bypasses_cache_with_local_changes(self, has_local_changes, head_revision):
+        has_local_changes.return_value = True
+        head_revision.return_value = "3694a07"
+        self.cache.get(self.compute)
+        self.cache.get(self.compute)
+        self.assertEqual(2, self.computations)
+        self.assertFalse(os.path.exists(self.cache.cache_file))
+
+    @mock.patch("esrally.utils.git.head_revision")
+    @mock.patch("esrally.utils.git.has_local_changes")
+    def test_ignores_corrupt_cache(self, has_local_changes, head_revision):
+        has_local_changes.return_value = False
+        head_revision.return_value = "3694a07"
+        with open(self.cache.cache_file, "wt") as f:
+            f.write("{\"revision\": ")
+        self.assertEqual([{"name": "geonames", "computation": 1}], self.cache.get(self.compute))
+        self.assertEqual([{"name": "geonames", "computation": 1}], self.cache.get(self.compute))
+
+
 class TemplateRenderTests(TestCase):
     def test_render_simple_template(self):
         template = """
@@ -530,6 +580,26 @@ class TrackSpecificationReaderTests(TestCase):
         self.assertEqual("/mappings/default-template.json", resulting_track.templates[0].template_file)
         self.assertEqual(0, len(resulting_track.challenges))
 
+    def test_keeps_indices_matching_template_if_auto_management_is_disabled(self):
+        track_specification = {
+            "short-description": "short description for unit test",
+            "description": "longer description of this track for unit test",
+            "templates": [
+                {
+                    "name": "my-index-template",
+                    "index-pattern": "*",
+                    "template": "default-template.json",
+                    "delete-matching-indices": True
+                }
+            ],
+            "operations": [],
+            "challenges": []
+        }
+        reader = loader.TrackSpecificationReader(override_auto_manage_indices=False)
+        resulting_track = reader("unittest", track_specification, "/mappings", "/data")
+        self.assertEqual(1, len(resulting_track.templates))
+        self.assertFalse(resulting_track.templates[0].delete_matching_indices)
+
     def test_types_are_optional_for_user_managed_indices(self):
         track_specification = {
             "short-description": "short description for unit test",
@@ -1059,3 +1129,166 @@ class TrackSpecificationReaderTests(TestCase):
             reader("unittest", track_specification, "/mappings", "/data")
         self.assertEqual("Track 'unittest' is invalid. 'parallel' element for challenge 'default-challenge' contains multiple tasks with "
                          "the name 'index-1' which are marked with 'completed-by' but only task is allowed to match.", ctx.exception.args[0])
+
+    def test_parse_abort_conditions(self):
+        track_specification = {
+            "short-description": "short description for unit test",
+            "description": "longer description of this track for unit test",
+            "indices": [{"name": "test-index", "auto-managed": False}],
+            "operations": [
+                {
+                    "name": "index-1",
+                    "operation-type": "index"
+                },
+                {
+                    "name": "index-2",
+                    "operation-type": "index"
+                },
+                {
+                    "name": "search",
+                    "operation-type": "search"
+                }
+            ],
+            "challenges": [
+                {
+                    "name": "default-challenge",
+                    "description": "Default challenge",
+                    "schedule": [
+                        {
+                            "parallel": {
+                                "abort-on": {
+                                    "error-rate": 0.5
+                                },
+                                "tasks": [
+                                    {
+                                        "operation": "index-1"
+                                    },
+                                    {
+                                        "operation": "index-2",
+                                        "abort-on": {
+                                            "latency-p99": 2000,
+                                            "red-cluster": True
+                                        }
+                                    }
+                                ]
+                            }
+                        },
+                        {
+                            "operation": "search"
+                        }
+                    ]
+                }
+            ]
+        }
+        reader = loader.TrackSpecificationReader()
+        resulting_track = reader("unittest", track_specification, "/mappings", "/data")
+        schedule = resulting_track.challenges[0].schedule
+        self.assertEqual({"error-rate": 0.5}, schedule[0].tasks[0].abort_on)
+        self.assertEqual({"latency-p99": 2000, "red-cluster": True}, schedule[0].tasks[1].abort_on)
+        self.assertEqual({}, schedule[1].abort_on)
+
+    def test_mixed_tasks(self):
+        track_specification = {
+            "short-description": "short description for unit test",
+            "description": "longer description of this track for unit test",
+            "indices": [{"name": "test-index", "auto-managed": False}],
+            "operations": [
+                {
+                    "name": "search",
+                    "operation-type": "search"
+                },
+                {
+                    "name": "index",
+                    "operation-type": "index"
+                }
+            ],
+            "challenges": [
+                {
+                    "name": "default-challenge",
+                    "description": "Default challenge",
+                    "schedule": [
+                        {
+                            "mix": {
+                                "name": "search-and-index",
+                                "clients": 4,
+                                "warmup-time-period": 60,
+                                "time-period": 600,
+                                "target-throughput": 100,
+                                "meta": {
+                                    "workload": "mixed"
+                                },
+                                "operations": [
+                                    {
+                                        "operation": "search",
+                                        "weight": 70,
+                                        "meta": {
+                                            "kind": "read"
+                                        }
+                                    },
+                                    {
+                                        "operation": "index",
+                                        "weight": 30
+                                    }
+                                ]
+                            }
+                        }
+                    ]
+                }
+            ]
+        }
+        reader = loader.TrackSpecificationReader()
+        resulting_track = reader("unittest", track_specification, "/mappings", "/data")
+        mix = resulting_track.challenges[0].schedule[0]
+
+        self.assertIsInstance(mix, track.MixedTask)
+        self.assertEqual("search-and-index", mix.operation.name)
+        self.assertEqual(4, mix.clients)
+        self.assertEqual(60, mix.warmup_time_period)
+        self.assertEqual(600, mix.time_period)
+        self.assertEqual(100, mix.params["target-throughput"])
+        self.assertEqual([70, 30], mix.weights)
+
+        self.assertEqual(2, len(mix.tasks))
+        self.assertEqual("search", mix.tasks[0].operation.name)
+        self.assertEqual({"workload": "mixed", "kind": "read"}, mix.tasks[0].meta_data)
+        self.assertEqual(4, mix.tasks[0].clients)
+        self.assertEqual(600, mix.tasks[0].time_period)
+        self.assertEqual("index", mix.tasks[1].operation.name)
+        self.assertEqual({"workload": "mixed"}, mix.tasks[1].meta_data)
+
+    def test_mixed_tasks_with_non_positive_weight(self):
+        track_specification = {
+            "short-description": "short description for unit test",
+            "description": "longer description of this track for unit test",
+            "indices": [{"name": "test-index", "auto-managed": False}],
+            "operations": [
+                {
+                    "name": "search",
+                    "operation-type": "search"
+                }
+            ],
+            "challenges": [
+                {
+                    "name": "default-challenge",
+                    "description": "Default challenge",
+                    "schedule": [
+                        {
+                            "mix": {
+                                "operations": [
+                                    {
+                                        "operation": "search",
+                                        "weight": 0
+                                    }
+                                ]
+                            }
+                        }
+                    ]
+                }
+            ]
+        }
+        reader = loader.TrackSpecificationReader()
+
+        with self.assertRaises(loader.TrackSyntaxError) as ctx:
+            reader("unittest", track_specification, "/mappings", "/data")
+        self.assertEqual("Track 'unittest' is invalid. Operation 'search' in the 'mix' for challenge 'default-challenge' must have a "
+                         "positive weight but has weight '0'.", ctx.exception.args[0])
@@ -1,3 +1,6 @@
+import json
+import random
+from collections import Counter
 from unittest import TestCase
 
 from esrally import exceptions
@@ -697,3 +700,112 @@ class SearchParamSourceTests(TestCase):
                 "match_all": {}
             }
         }, p["body"])
+
+
+class TemplatedSearchParamSourceTests(TestCase):
+    def setUp(self):
+        type1 = track.Type("type1", mapping_file="", number_of_documents=3)
+        self.indices = [track.Index(name="index1", auto_managed=True, types=[type1])]
+
+    def test_fills_placeholders(self):
+        source = params.TemplatedSearchParamSource(indices=self.indices, params={
+            "seed": 42,
+            "body": {
+                "query": {
+                    "match": {
+                        "body": "job ${profession}"
+                    }
+                },
+                "size": "${size}"
+            },
+            "placeholders": {
+                "profession": {
+                    "values": ["mechanic", "physician", "nurse"]
+                },
+                "size": {
+                    "type": "uniform",
+                    "min": 1,
+                    "max": 10
+                }
+            }
+        })
+        p = source.partition(0, 1).params()
+
+        self.assertEqual("index1", p["index"])
+        self.assertEqual("type1", p["type"])
+        self.assertFalse(p["use_request_cache"])
+        body = json.loads(p["body"])
+        self.assertIn(body["query"]["match"]["body"], ["job mechanic", "job physician", "job nurse"])
+        self.assertTrue(1 <= body["size"] <= 10)
+
+    def test_seeded_partitions_are_reproducible(self):
+        spec = {
+            "seed": 7,
+            "body": {
+                "query": {
+                    "term": {
+                        "body": "${term}"
+                    }
+                }
+            },
+            "placeholders": {
+                "term": {
+                    "values": ["a", "b", "c", "d", "e", "f", "g", "h"],
+                    "distribution": "zipfian"
+                }
+            }
+        }
+        first = params.TemplatedSearchParamSource(indices=self.indices, params=spec).partition(3, 4)
+        second = params.TemplatedSearchParamSource(indices=self.indices, params=spec).partition(3, 4)
+        self.assertEqual([first.params()["body"] for _ in range(20)], [second.params()["body"] for _ in range(20)])
+
+    def test_reads_terms_from_file(self):
+        source = params.TemplatedSearchParamSource(indices=self.indices, params={
+            "body": {
+                "query": {
+                    "term": {
+                        "body": "${term}"
+                    }
+                }
+            },
+            "placeholders": {
+                "term": {
+                    "file": "/tmp/terms.txt"
+                }
+            }
+        }, source=lambda file_name, mode: io.StringAsFileSource(["quick", "", "\"fox\""], mode))
+
+        self.assertEqual(["quick", "\"fox\""], source.value_sources["term"].terms)
+        body = json.loads(source.params()["body"])
+        self.assertIn(body["query"]["term"]["body"], ["quick", "\"fox\""])
+
+    def test_undefined_placeholder(self):
+        with self.assertRaises(exceptions.InvalidSyntax) as ctx:
+            params.TemplatedSearchParamSource(indices=self.indices, params={
+                "body": {
+                    "query": {
+                        "term": {
+                            "body": "${unknown}"
+                        }
+                    }
+                },
+                "placeholders": {
+                    "term": {
+                        "values": ["a"]
+                    }
+                }
+            })
+        self.assertEqual("Placeholder [unknown] is used in the query body but is not defined in 'placeholders'.", ctx.exception.args[0])
+
+    def test_unknown_distribution(self):
+        with self.assertRaises(exceptions.InvalidSyntax) as ctx:
+            params.value_source_for("term", {"values": ["a"], "distribution": "gaussian"})
+        self.assertEqual("Unknown distribution [gaussian] for placeholder [term].", ctx.exception.args[0])
+
+
+class ZipfianTermsTests(TestCase):
+    def test_prefers_terms_with_lower_rank(self):
+        terms = params.ZipfianTerms(["a", "b", "c", "d"], exponent=1.0)
+        rand = random.Random(0)
+        counts = Counter(terms.next(rand) for _ in range(10000))
+        self.assertTrue(counts["a"] > counts["b"] > counts["c"] > counts["d"])
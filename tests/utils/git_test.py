@@ -141,6 +141,52 @@ class GitTests(TestCase):
         self.assertEqual("3694a07", git.head_revision("/src"))
         run_subprocess.assert_called_with("git -C /src rev-parse --short HEAD")
 
+    @mock.patch("esrally.utils.process.run_subprocess")
+    @mock.patch("esrally.utils.process.run_subprocess_with_logging")
+    def test_add_worktree(self, run_subprocess_with_logging, run_subprocess):
+        run_subprocess_with_logging.return_value = 0
+        run_subprocess.return_value = False
+        git.add_worktree("/src", "/worktrees/3694a07", "3694a07")
+        run_subprocess.assert_called_with("git -C /src worktree add --detach /worktrees/3694a07 3694a07")
+
+    @mock.patch("shutil.rmtree")
+    @mock.patch("esrally.utils.process.run_subprocess")
+    @mock.patch("esrally.utils.process.run_subprocess_with_logging")
+    def test_remove_worktree(self, run_subprocess_with_logging, run_subprocess, rmtree):
+        run_subprocess_with_logging.return_value = 0
+        run_subprocess.return_value = False
+        git.remove_worktree("/src", "/worktrees/3694a07")
+        rmtree.assert_called_with("/worktrees/3694a07", ignore_errors=True)
+        run_subprocess.assert_called_with("git -C /src worktree prune")
+
+    @mock.patch("esrally.utils.process.run_subprocess_with_output")
+    @mock.patch("esrally.utils.process.run_subprocess_with_logging")
+    def test_has_local_changes(self, run_subprocess_with_logging, run_subprocess):
+        run_subprocess_with_logging.return_value = 0
+        run_subprocess.return_value = [" M server/build.gradle"]
+        self.assertTrue(git.has_local_changes("/src"))
+        run_subprocess.assert_called_with("git -C /src status --porcelain --untracked-files=no")
+
+        run_subprocess.return_value = []
+        self.assertFalse(git.has_local_changes("/src"))
+
+        git.has_local_changes("/src", include_untracked=True)
+        run_subprocess.assert_called_with("git -C /src status --porcelain --untracked-files=normal")
+
+    @mock.patch("os.path.getmtime")
+    @mock.patch("os.path.exists")
+    @mock.patch("time.time")
+    def test_fetched_within(self, time, path_exists, getmtime):
+        time.return_value = 1000
+        path_exists.return_value = True
+        getmtime.return_value = 900
+        self.assertTrue(git.fetched_within("/src", 3600))
+        self.assertFalse(git.fetched_within("/src", 60))
+        path_exists.assert_called_with("/src/.git/FETCH_HEAD")
+
+        path_exists.return_value = False
+        self.assertFalse(git.fetched_within("/src", 3600))
+
     @mock.patch("esrally.utils.process.run_subprocess_with_output")
     @mock.patch("esrally.utils.process.run_subprocess_with_logging")
     def test_list_remote_branches(self, run_subprocess_with_logging, run_subprocess):
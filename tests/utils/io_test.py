@@ -74,6 +74,34 @@ class IoTests(TestCase):
         self.assertFalse(io.has_extension("/tmp/README", "README"))
 
 
+class GetSizeTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        for shard in range(5):
+            index_path = os.path.join(self.root.name, "nodes", "0", "indices", "uuid", str(shard), "index")
+            os.makedirs(index_path)
+            for segment in range(3):
+                with open(os.path.join(index_path, "_%d.cfs" % segment), "wb") as f:
+                    f.write(b"x" * (100 * shard + segment))
+        with open(os.path.join(self.root.name, "nodes", "0", "node.lock"), "wb") as f:
+            f.write(b"x" * 7)
+        # symlinked directories are not followed
+        os.symlink(os.path.join(self.root.name, "nodes"), os.path.join(self.root.name, "link"))
+        self.expected_size = sum([100 * shard + segment for shard in range(5) for segment in range(3)]) + 7
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_get_size(self):
+        self.assertEqual(self.expected_size, io.get_size(self.root.name))
+
+    def test_get_size_concurrently(self):
+        self.assertEqual(self.expected_size, io.get_size(self.root.name, max_workers=4))
+
+    def test_get_size_of_missing_directory(self):
+        self.assertEqual(0, io.get_size(os.path.join(self.root.name, "does-not-exist"), max_workers=4))
+
+
 class DecompressionTests(TestCase):
     def test_decompresses_supported_file_formats(self):
         for ext in ["zip", "gz", "bz2", "tgz", "tar.bz2", "tar.gz"]:
@@ -0,0 +1,167 @@
+import http.server
+import json
+import os
+import re
+import socketserver
+import tempfile
+import threading
+from unittest import TestCase
+
+from esrally import exceptions
+from esrally.utils import net
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # parts are requested concurrently
+    daemon_threads = True
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    # set by the test
+    content = b""
+    support_ranges = True
+    # the number of responses that are aborted prematurely
+    failures = 0
+    requested_ranges = []
+    lock = threading.Lock()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.content)))
+        if self.support_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        if range_header and self.support_ranges:
+            start, end = [int(v) for v in re.match(r"bytes=(\d+)-(\d+)", range_header).groups()]
+            with self.lock:
+                RangeRequestHandler.requested_ranges.append((start, end))
+            body = self.content[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (start, end, len(self.content)))
+        else:
+            body = self.content
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        with self.lock:
+            fail = RangeRequestHandler.failures > 0
+            if fail:
+                RangeRequestHandler.failures -= 1
+        if fail:
+            # simulate a connection that breaks down in the middle of a response
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DownloadTests(TestCase):
+    def setUp(self):
+        RangeRequestHandler.content = os.urandom(100 * 1024)
+        RangeRequestHandler.support_ranges = True
+        RangeRequestHandler.failures = 0
+        RangeRequestHandler.requested_ranges = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.url = "http://127.0.0.1:%d/data.json.bz2" % self.server.server_port
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.local_path = os.path.join(self.tmp_dir.name, "data.json.bz2")
+
+        self.original_part_size = net.DOWNLOAD_PART_SIZE_BYTES
+        net.DOWNLOAD_PART_SIZE_BYTES = 16 * 1024
+        net.init()
+
+    def tearDown(self):
+        net.DOWNLOAD_PART_SIZE_BYTES = self.original_part_size
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def downloaded_content(self):
+        with open(self.local_path, "rb") as f:
+            return f.read()
+
+    def test_download_in_parts(self):
+        progress = []
+        net.download(self.url, self.local_path, expected_size_in_bytes=100 * 1024,
+                     progress_indicator=lambda read, total: progress.append((read, total)))
+
+        self.assertEqual(RangeRequestHandler.content, self.downloaded_content())
+        self.assertEqual(7, len(RangeRequestHandler.requested_ranges))
+        self.assertEqual((100 * 1024, 100 * 1024), progress[-1])
+        self.assertFalse(os.path.exists(self.local_path + ".tmp"))
+        self.assertFalse(os.path.exists(self.local_path + ".tmp.state"))
+
+    def test_retries_failed_parts(self):
+        RangeRequestHandler.failures = 3
+
+        net.download(self.url, self.local_path, max_workers=2)
+
+        self.assertEqual(RangeRequestHandler.content, self.downloaded_content())
+        # the download of failed parts continues where the previous attempt has stopped
+        self.assertGreater(len(RangeRequestHandler.requested_ranges), 7)
+
+    def test_resumes_interrupted_download(self):
+        tmp_path = self.local_path + ".tmp"
+        # pretend that a previous attempt has downloaded the first two parts
+        with open(tmp_path, "wb") as f:
+            f.write(RangeRequestHandler.content[:32 * 1024])
+            f.truncate(100 * 1024)
+        with open(tmp_path + ".state", "wt") as f:
+            json.dump({"url": self.url, "size": 100 * 1024, "completed": [0, 1]}, f)
+
+        net.download(self.url, self.local_path)
+
+        self.assertEqual(RangeRequestHandler.content, self.downloaded_content())
+        self.assertEqual(5, len(RangeRequestHandler.requested_ranges))
+        self.assertNotIn((0, 16 * 1024 - 1), RangeRequestHandler.requested_ranges)
+
+    def test_gives_up_after_too_many_failures(self):
+        RangeRequestHandler.failures = 1000
+
+        with self.assertRaises(IOError):
+            net.download(self.url, self.local_path)
+
+        self.assertFalse(os.path.exists(self.local_path))
+        # we keep the partial download to resume it later
+        self.assertTrue(os.path.exists(self.local_path + ".tmp"))
+
+    def test_download_without_range_support(self):
+        RangeRequestHandler.support_ranges = False
+
+        net.download(self.url, self.local_path, expected_size_in_bytes=100 * 1024)
+
+        self.assertEqual(RangeRequestHandler.content, self.downloaded_content())
+        self.assertEqual(0, len(RangeRequestHandler.requested_ranges))
+
+    def test_verifies_size(self):
+        with self.assertRaises(exceptions.DataError) as ctx:
+            net.download(self.url, self.local_path, expected_size_in_bytes=50)
+        self.assertEqual("Download of [%s] is corrupt. Downloaded [%d] bytes but [50] bytes are expected. Please retry." %
+                         (self.local_path, 100 * 1024), ctx.exception.args[0])
+        self.assertFalse(os.path.exists(self.local_path))
+
+
+class AggregatedProgressTests(TestCase):
+    def test_aggregates_progress_of_all_downloads(self):
+        reported = []
+        progress = net.AggregatedProgress(lambda read, total: reported.append((read, total)))
+        first = progress.for_download("http://example.org/a.bz2")
+        second = progress.for_download("http://example.org/b.bz2")
+
+        first(10, 100)
+        second(20, 50)
+        first(100, 100)
+
+        self.assertEqual([(10, 100), (30, 150), (120, 150)], reported)
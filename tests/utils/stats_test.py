@@ -0,0 +1,73 @@
+from unittest import TestCase
+
+from esrally.utils import stats
+
+
+class MannWhitneyUTests(TestCase):
+    def test_exact_p_value_for_small_samples(self):
+        u, p = stats.mann_whitney_u([1, 2, 3, 4], [5, 6, 7, 8])
+        self.assertEqual(16, u)
+        # only 2 out of 70 arrangements are as extreme
+        self.assertAlmostEqual(2 / 70, p)
+
+        u, p = stats.mann_whitney_u([5, 6, 7, 8], [1, 2, 3, 4])
+        self.assertEqual(0, u)
+        self.assertAlmostEqual(2 / 70, p)
+
+    def test_overlapping_samples_are_not_significant(self):
+        u, p = stats.mann_whitney_u([1, 3, 5], [2, 4, 6])
+        self.assertEqual(6, u)
+        self.assertAlmostEqual(0.7, p)
+
+    def test_normal_approximation_with_ties(self):
+        u, p = stats.mann_whitney_u([1, 1, 2, 2, 3] * 3, [2, 3, 3, 4, 4] * 3)
+        self.assertEqual(198, u)
+        self.assertAlmostEqual(0.000258, p, places=6)
+
+    def test_min_p_value(self):
+        self.assertAlmostEqual(1 / 3, stats.min_p_value(2, 2))
+        self.assertAlmostEqual(0.1, stats.min_p_value(3, 3))
+        self.assertAlmostEqual(2 / 70, stats.min_p_value(4, 4))
+        self.assertAlmostEqual(stats.mann_whitney_u([1, 2, 3], [4, 5, 6, 7])[1], stats.min_p_value(3, 4))
+
+    def test_identical_samples(self):
+        u, p = stats.mann_whitney_u([5, 5, 5], [5, 5, 5])
+        self.assertEqual(4.5, u)
+        self.assertEqual(1.0, p)
+
+
+class BootstrapTests(TestCase):
+    def test_confidence_interval_contains_difference_of_means(self):
+        lower, upper = stats.bootstrap_ci([10, 11, 12, 10], [20, 21, 19, 22])
+        self.assertTrue(lower <= 9.75 <= upper)
+        self.assertGreater(lower, 0)
+
+    def test_is_reproducible(self):
+        self.assertEqual(stats.bootstrap_ci([1, 5, 3], [2, 4, 8]), stats.bootstrap_ci([1, 5, 3], [2, 4, 8]))
+
+
+class CliffsDeltaTests(TestCase):
+    def test_cliffs_delta(self):
+        self.assertEqual(1.0, stats.cliffs_delta([1, 2], [3, 4]))
+        self.assertEqual(-1.0, stats.cliffs_delta([3, 4], [1, 2]))
+        self.assertEqual(0.0, stats.cliffs_delta([1, 3], [1, 3]))
+
+
+class ChangePointTests(TestCase):
+    def test_detects_level_shift(self):
+        values = [10, 11, 10, 12, 11, 10, 11, 8, 7, 8, 8, 7, 7, 8]
+        points = stats.change_points(values)
+        self.assertEqual(1, len(points))
+        index, p = points[0]
+        self.assertEqual(7, index)
+        self.assertLess(p, 0.05)
+
+    def test_detects_multiple_level_shifts(self):
+        values = [10, 11, 10, 12, 11, 10, 11, 20, 21, 20, 22, 21, 20, 21, 30, 31, 29, 30, 31, 30, 29]
+        self.assertEqual([7, 14], [index for index, _ in stats.change_points(values)])
+
+    def test_noise_has_no_change_points(self):
+        self.assertEqual([], stats.change_points([10, 11, 10, 12, 11, 10, 11, 10, 12, 11]))
+
+    def test_too_few_values(self):
+        self.assertEqual([], stats.change_points([10, 10, 20, 20]))
@@ -0,0 +1,79 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from esrally.utils import sysstats
+
+
+class ProcessHandle:
+    def __init__(self, pid):
+        self.pid = pid
+
+
+class SysStatsTests(TestCase):
+    def setUp(self):
+        self.proc_root = tempfile.TemporaryDirectory()
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    def tearDown(self):
+        self.proc_root.cleanup()
+
+    def write(self, path, content):
+        full_path = os.path.join(self.proc_root.name, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wt") as f:
+            f.write(content)
+
+    def test_process_cpu_times(self):
+        # the process name contains spaces and parentheses on purpose
+        self.write("4711/stat", "4711 (java (es) node) S 1 4711 4711 0 -1 4194560 1234 0 0 0 %d %d 0 0 20 0 120 0 1000 0 0\n" %
+                   (3 * self.clock_ticks, self.clock_ticks))
+
+        user, system = sysstats.process_cpu_times(ProcessHandle(4711), proc_root=self.proc_root.name)
+
+        self.assertEqual(3, user)
+        self.assertEqual(1, system)
+
+    def test_system_cpu_stats(self):
+        t = self.clock_ticks
+        self.write("stat", "cpu  %d %d %d %d %d 0 0 0 0 0\n"
+                           "cpu0 %d 0 %d %d %d 0 0 0 0 0\n"
+                           "cpu1 %d 0 0 %d 0 0 0 0 0 0\n"
+                           "intr 1 2 3\n"
+                           "ctxt 987654\n"
+                           "btime 1500000000\n"
+                           "processes 12345\n"
+                           "procs_running 3\n"
+                           "procs_blocked 0\n" % (5 * t, 0, t, 12 * t, t,
+                                                  4 * t, t, 2 * t, t,
+                                                  t, 10 * t))
+
+        per_core, context_switches, run_queue_length = sysstats.system_cpu_stats(proc_root=self.proc_root.name)
+
+        # busy time excludes idle and iowait
+        self.assertEqual([(5, 8), (1, 11)], per_core)
+        self.assertEqual(987654, context_switches)
+        self.assertEqual(3, run_queue_length)
+
+    def test_disk_io_stats(self):
+        self.write("diskstats", "   8       0 sda 1000 10 20000 500 2000 20 40000 1500 3 1800 2100\n"
+                                "   8       1 sda1 900 10 18000 450 1900 20 38000 1400 2 1700 1900\n"
+                                "   8       2 sda2 5 10 50 2\n")
+
+        stats = sysstats.disk_io_stats(proc_root=self.proc_root.name)
+
+        # older kernels report fewer fields for partitions; we ignore them
+        self.assertEqual(["sda", "sda1"], sorted(stats.keys()))
+        self.assertEqual(sysstats.DiskIoStats(read_count=900, write_count=1900, read_bytes=18000 * 512, write_bytes=38000 * 512,
+                                              read_time=450, write_time=1400, busy_time=1700, weighted_time=1900, in_flight=2),
+                         stats["sda1"])
+
+    def test_block_device(self):
+        st_dev = os.stat(self.proc_root.name).st_dev
+        self.write("diskstats", "   8       0 sda 1000 10 20000 500 2000 20 40000 1500 3 1800 2100\n"
+                                " %3d %7d nvme0n1p2 900 10 18000 450 1900 20 38000 1400 2 1700 1900\n" %
+                   (os.major(st_dev), os.minor(st_dev)))
+
+        # the data path does not exist yet
+        data_path = os.path.join(self.proc_root.name, "data", "nodes", "0")
+        self.assertEqual("nvme0n1p2", sysstats.block_device(data_path, proc_root=self.proc_root.name))